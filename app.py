@@ -4,9 +4,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from sqlalchemy.pool import NullPool
 from sqlalchemy.exc import OperationalError as SAOperationalError
 import time
+import atexit
 from sqlalchemy import text
 
 app = Flask(__name__)
@@ -15,10 +15,11 @@ app = Flask(__name__)
 
 
 # 数据库配置 - 支持本地SQLCipher和远程Turso一键切换
-from database_config import get_database_config
+from database_config import get_database_config, get_replica_config
 
 # 获取数据库配置
 db_config = get_database_config()
+replica_config = get_replica_config()
 
 # 应用数据库配置
 app.config['SQLALCHEMY_DATABASE_URI'] = db_config['SQLALCHEMY_DATABASE_URI']
@@ -26,24 +27,11 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'change-me')
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_config['SQLALCHEMY_ENGINE_OPTIONS']
 
-from db import db
+from db import db, RoutingSession
 
 # initialize db with app
 db.init_app(app)
 
-# 在应用上下文中添加事件监听器
-with app.app_context():
-    from sqlalchemy import event
-    
-    # 添加事件监听器来设置 SQLCipher 密钥
-    @event.listens_for(db.engine, "connect")
-    def set_sqlcipher_key(dbapi_connection, connection_record):
-        """在连接时设置 SQLCipher 加密密钥"""
-        cursor = dbapi_connection.cursor()
-        encryption_key = os.getenv('DB_ENCRYPTION_KEY', 'default_key_change_me')
-        cursor.execute(f"PRAGMA key = '{encryption_key}';")
-        cursor.close()
-
 # 添加Jinja2过滤器
 @app.template_filter('get_factors')
 def get_factors_filter(n):
@@ -56,204 +44,546 @@ def get_factors_filter(n):
 
 # import models after db is initialized to avoid circular imports
 with app.app_context():
-    from models import Season, Tournament, Player, Match, Manager, Ranking, User, Signup
+    from models import Season, Tournament, Player, Match, Manager, Ranking, User, Signup, PlayerLeaderboard, TournamentSequence, PlayerMatch
+
+# 派生数据缓存：写入提交后按数据版本自动失效
+from standings_cache import standings_cache, cached, get_or_compute, mark_tournament_changed, register_session_hooks
+from tournament_context import TournamentContext, HeadToHeadIndex, PlayoffIndex
+from player_profile import PlayerProfile, MEDAL_TYPE_KEYS, empty_medals
+from migrations import run_migrations, pending_migrations, migration_status
+from match_formats import FORMAT_ALLOWED_M_TYPES
+from read_batch import ReadBatch, HranaClient, configure_read_batch, read_batch_stats
+from queries import queries, register_query
+from replica import ReplicaSync, ReplicaRouter, replica_engine_for_path, register_replica_hooks
+from write_coordinator import WriteCoordinator, register_write_hooks
+from sql_metrics import SqlMetrics
+from recompute_scheduler import RecomputeScheduler, RecomputeError
+from jobs import JobRunner
+from bracket import BracketGraph
+from storage_profiles import get_storage_profile, apply_cipher_pragmas, apply_connection_pragmas, wal_checkpoint, WalCheckpointer
+
+register_session_hooks(db.session)
+
+# 写事务在进程内排队串行执行；本地 SQLite 取得写入权后立即 BEGIN IMMEDIATE（见 write_coordinator.py）
+write_coordinator = WriteCoordinator(
+    timeout=float(os.getenv('DB_WRITE_QUEUE_TIMEOUT', '30')),
+    slow_wait_ms=float(os.getenv('DB_WRITE_QUEUE_SLOW_MS', '200')),
+)
+register_write_hooks(db.session, write_coordinator, begin_immediate=db_config['DATABASE_TYPE'] == 'local')
+
+# 耗时的后台操作交给进程内的后台任务执行，页面轮询 /admin-secret/jobs/<job_id>（见 jobs.py）
+job_runner = JobRunner.from_env(app, coordinator=write_coordinator)
+
+# Turso 上页面的独立读查询合并为一次 Hrana 流水线请求（DB_READ_BATCH=0 关闭，改为逐条执行；
+# 启用本地副本时读查询改走副本，不再使用流水线）
+if db_config['DATABASE_TYPE'] == 'turso' and os.getenv('DB_READ_BATCH', '1') != '0' and replica_config is None:
+    configure_read_batch(HranaClient.from_database_url(db_config['SQLALCHEMY_DATABASE_URI']))
 
-# 在每次底层连接建立时设置 SQLite PRAGMA，以使用 WAL 模式和外键支持，减少锁冲突
 from sqlalchemy import event
-from sqlalchemy.engine import Engine
 from functools import wraps
+from collections import namedtuple
 
+# 物理连接建立次数（连接池复用连接时不增加，用于观察连接池效果）
+connection_stats = {'connects': 0}
 
-@event.listens_for(Engine, 'connect')
-def _set_sqlite_pragma(dbapi_connection, connection_record):
-    try:
-        cursor = dbapi_connection.cursor()
-        cursor.execute('PRAGMA journal_mode=WAL')
-        cursor.execute('PRAGMA synchronous=NORMAL')
-        cursor.execute('PRAGMA busy_timeout=30000')
+with app.app_context():
+    db_engine = db.engine
+
+# 本地 SQLite/SQLCipher 的存储配置（DB_STORAGE_PROFILE）：连接级 PRAGMA、WAL 检查点与只读请求
+storage_profile = get_storage_profile()
+wal_checkpointer = WalCheckpointer(db_engine, storage_profile) if db_config['DATABASE_TYPE'] == 'local' else None
+
+# 本地只读副本（DB_REPLICA_PATH）：公开页面的 GET 请求从副本读取，写入始终走主库
+read_replica = None
+if replica_config:
+    read_replica = ReplicaRouter(
+        ReplicaSync(db_engine, replica_engine_for_path(replica_config['path']), replica_config['max_delta']),
+        max_staleness=replica_config['max_staleness'],
+        log_retention=replica_config['log_retention'],
+    )
+    RoutingSession.read_router = read_replica
+    register_replica_hooks(db.session, read_replica)
+
+# 存储配置启用只读请求时，这些公开页面的请求以 query_only 连接执行
+# （赛事页在淘汰赛结束后首次访问时会写入最终排名，不在此列）
+READ_ONLY_ENDPOINTS = {'index', 'season_view', 'player_view', 'api_matches', 'api_players', 'health'}
+
+
+# 连接池中的每个物理连接只在建立时设置一次：SQLCipher 密钥与存储配置的 PRAGMA（WAL 模式、忙等待、缓存等），减少锁冲突
+@event.listens_for(db_engine, 'connect')
+def configure_connection(dbapi_connection, connection_record):
+    connection_stats['connects'] += 1
+    connection_record.info['configured_at'] = time.time()
+    if db_config['DATABASE_TYPE'] != 'local':
+        return
+    cursor = dbapi_connection.cursor()
+    encryption_key = os.getenv('DB_ENCRYPTION_KEY', 'default_key_change_me')
+    cursor.execute(f"PRAGMA key = '{encryption_key}';")
+    apply_cipher_pragmas(cursor, storage_profile)
     # NOTE: do not force foreign_keys=ON here because some existing DB schemas
     # in this project contain malformed FOREIGN KEY definitions (REFERENCES ""),
     # which cause SQLite to error when foreign key enforcement is enabled.
     # We will fix the schema with a migration script; until then, keep
     # foreign_keys as the database default to avoid "no such table: main." errors.
-    # cursor.execute('PRAGMA foreign_keys=ON')
+    apply_connection_pragmas(cursor, storage_profile)
+    cursor.close()
+
+
+@event.listens_for(db_engine, 'checkin')
+def reset_read_only_connection(dbapi_connection, connection_record):
+    """只读请求结束后恢复连接的写权限，再放回连接池"""
+    if connection_record.info.pop('query_only', False) and dbapi_connection is not None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA query_only = OFF')
         cursor.close()
-    except Exception:
-        # 非 SQLite 或执行失败则忽略
-        pass
 
 
-def commit_with_retry(retries: int = 5, initial_delay: float = 0.05):
-    """尝试提交，若遇到 sqlite 锁定则回退并重试（指数回退）。"""
-    delay = initial_delay
-    for i in range(retries):
-        try:
-            db.session.commit()
-            return
-        except SAOperationalError as e:
-            if 'database is locked' in str(e).lower():
-                try:
-                    db.session.rollback()
-                except Exception:
-                    pass
-                time.sleep(delay)
-                delay *= 2
-                continue
-            raise
-    # 最后一次尝试，让异常抛出
-    db.session.commit()
+def commit_with_retry():
+    """提交当前写事务
+
+    写事务已由写入协调器串行化，事务开始时即持有写锁，这里不再回滚后休眠重试（回滚会丢掉本次修改）。
+    其他进程长时间占用数据库超过 busy_timeout 时记录锁冲突并回滚，异常交给调用方处理。
+    """
+    try:
+        db.session.commit()
+    except SAOperationalError as e:
+        if 'database is locked' in str(e).lower():
+            write_coordinator.record_lock_error()
+            print(f"提交失败，数据库被其他进程锁定: {e}")
+            db.session.rollback()
+        raise
+
+
+# 赛事序号物化表字段（不含主键 t_id）
+TOURNAMENT_SEQUENCE_FIELDS = ('season_id', 'type', 'status', 'type_session_number', 'same_type_order', 'global_order')
+
+_tournament_sequence_table_ready = False
+_schema_version_checked = False
+
+
+def ensure_tournament_sequence_table():
+    """确保赛事序号表存在（兼容未执行 init_db 的旧数据库）"""
+    global _tournament_sequence_table_ready
+    if not _tournament_sequence_table_ready:
+        TournamentSequence.__table__.create(bind=db.session.connection(), checkfirst=True)
+        _tournament_sequence_table_ready = True
+
+
+def interleaved_sort_order(year, t_type, session_number):
+    """历届翻页排序键：从2025年下半年第5届正赛开始，默认是一届正赛后一届小赛"""
+    if year == '2025年下半年':
+        if t_type == 1 and session_number <= 4:
+            # 第1-4届正赛：编号1-4
+            return session_number
+        if t_type == 1 and session_number == 5:
+            # 第5届正赛：编号5
+            return 5
+        if t_type == 2 and session_number == 1:
+            # 第1届小赛：编号6
+            return 6
+        if t_type == 1 and session_number == 6:
+            # 第6届正赛：编号7
+            return 7
+        if t_type == 2 and session_number == 2:
+            # 第2届小赛：编号8
+            return 8
+        if t_type == 1 and session_number >= 7:
+            # 第7届及以后正赛：编号9, 11, 13...
+            return (session_number - 7) * 2 + 9
+        if t_type == 2 and session_number >= 3:
+            # 第3届及以后小赛：编号10, 12, 14...
+            return (session_number - 3) * 2 + 10
+        # 其他类型放最后
+        return session_number + 1000
+    # 其他情况按类型分段，确保唯一性
+    return session_number + {1: 20000, 2: 30000, 3: 40000}.get(t_type, 50000)
+
+
+def refresh_tournament_sequence(force=False):
+    """在当前事务内刷新赛事序号表 tournament_sequence，由调用方与赛事写入一同提交"""
+    try:
+        from sqlalchemy import text
+        from collections import defaultdict
+        
+        # 先把会话中未刷出的赛事变更写入当前事务
+        db.session.flush()
+        ensure_tournament_sequence_table()
+        
+        rows = db.session.execute(text("""
+            SELECT t.t_id, t.season_id, t.type, t.status, s.year,
+                   ROW_NUMBER() OVER (PARTITION BY t.season_id, t.type ORDER BY t.t_id) AS type_session_number
+            FROM tournament t
+            JOIN seasons s ON t.season_id = s.season_id
+        """)).fetchall()
+        
+        years = {row.t_id: row.year for row in rows}
+        entries = {
+            row.t_id: {
+                't_id': row.t_id,
+                'season_id': row.season_id,
+                'type': row.type,
+                'status': row.status,
+                'type_session_number': row.type_session_number,
+                'same_type_order': None,
+                'global_order': None
+            }
+            for row in rows
+        }
+        
+        def year_key(t_id):
+            # 与 SQLite ORDER BY year 一致：NULL 在前
+            return (years[t_id] is not None, years[t_id] or '')
+        
+        # 同类型翻页顺序（先按赛季排序，再按届次排序）
+        # 特殊规则：season_id=1跳过第13届正赛
+        same_type = defaultdict(list)
+        for entry in entries.values():
+            if not (entry['season_id'] == 1 and entry['t_id'] == 14):
+                same_type[entry['type']].append(entry)
+        for type_entries in same_type.values():
+            type_entries.sort(key=lambda e: (year_key(e['t_id']), e['type_session_number'], e['t_id']))
+            for order, entry in enumerate(type_entries, 1):
+                entry['same_type_order'] = order
+        
+        # 历届翻页顺序：只包含正常状态的赛事，正赛小赛交替
+        active = [entry for entry in entries.values() if entry['status'] == 1]
+        active.sort(key=lambda e: (
+            year_key(e['t_id']),
+            interleaved_sort_order(years[e['t_id']], e['type'], e['type_session_number']),
+            e['t_id']
+        ))
+        for order, entry in enumerate(active, 1):
+            entry['global_order'] = order
+        
+        previous_query = text("""
+            SELECT t_id, season_id, type, status, type_session_number, same_type_order, global_order
+            FROM tournament_sequence
+        """)
+        previous = {row[0]: tuple(row[1:]) for row in db.session.execute(previous_query).fetchall()}
+        current = {t_id: tuple(entry[field] for field in TOURNAMENT_SEQUENCE_FIELDS) for t_id, entry in entries.items()}
+        if not force and current == previous:
+            return True
+        
+        db.session.execute(text("DELETE FROM tournament_sequence"))
+        if entries:
+            db.session.execute(text("""
+                INSERT INTO tournament_sequence
+                    (t_id, season_id, type, status, type_session_number, same_type_order, global_order)
+                VALUES
+                    (:t_id, :season_id, :type, :status, :type_session_number, :same_type_order, :global_order)
+            """), list(entries.values()))
+        
+        print(f"赛事序号表已刷新，共 {len(entries)} 届赛事")
+        return True
+        
+    except Exception as e:
+        print(f"刷新赛事序号表失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+# 比赛长表字段（主键为 m_id + side）
+PLAYER_MATCH_FIELDS = ('m_id', 'side', 'player_id', 'opponent_id', 't_id', 'm_type', 'goals_for', 'goals_against', 'result')
+
+_player_matches_table_ready = False
+
+
+def player_match_side_sql(row, side):
+    """一名参赛选手视角的 player_matches 行（row 为触发器中的 NEW 或 matches 表别名）"""
+    own, other = (1, 2) if side == 1 else (2, 1)
+    return f"""
+        SELECT {row}.m_id, {side}, {row}.player_{own}_id, {row}.player_{other}_id, {row}.t_id, {row}.m_type,
+               {row}.player_{own}_score, {row}.player_{other}_score,
+               CASE
+                   WHEN {row}.player_{own}_score IS NULL OR {row}.player_{other}_score IS NULL THEN NULL
+                   WHEN {row}.player_{own}_score > {row}.player_{other}_score THEN 1
+                   WHEN {row}.player_{own}_score < {row}.player_{other}_score THEN -1
+                   ELSE 0
+               END"""
+
+
+def ensure_player_matches_table():
+    """确保比赛长表及其同步触发器存在（兼容未执行 init_db 的旧数据库）"""
+    global _player_matches_table_ready
+    if _player_matches_table_ready:
+        return
+    from sqlalchemy import text
+    
+    PlayerMatch.__table__.create(bind=db.session.connection(), checkfirst=True)
+    columns = ', '.join(PLAYER_MATCH_FIELDS)
+    # 自己对自己的比赛只有一名参赛选手，只写 side=1 一行
+    insert_sides = f"""
+            INSERT INTO player_matches ({columns}) {player_match_side_sql('NEW', 1)};
+            INSERT INTO player_matches ({columns}) {player_match_side_sql('NEW', 2)}
+            WHERE NEW.player_2_id IS NOT NEW.player_1_id;"""
+    db.session.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS player_matches_after_insert AFTER INSERT ON matches
+        BEGIN{insert_sides}
+        END
+    """))
+    db.session.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS player_matches_after_update AFTER UPDATE ON matches
+        BEGIN
+            DELETE FROM player_matches WHERE m_id = OLD.m_id;{insert_sides}
+        END
+    """))
+    db.session.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS player_matches_after_delete AFTER DELETE ON matches
+        BEGIN
+            DELETE FROM player_matches WHERE m_id = OLD.m_id;
+        END
+    """))
+    _player_matches_table_ready = True
 
 
+def refresh_player_matches(force=False):
+    """对照 matches 校准比赛长表（触发器负责日常同步，此处用于补建和修复），由调用方提交"""
+    try:
+        from sqlalchemy import text
+        
+        db.session.flush()
+        ensure_player_matches_table()
+        
+        columns = ', '.join(PLAYER_MATCH_FIELDS)
+        expected_sql = f"""
+            {player_match_side_sql('m', 1)}
+            FROM matches m
+            UNION ALL
+            {player_match_side_sql('m', 2)}
+            FROM matches m
+            WHERE m.player_2_id IS NOT m.player_1_id
+        """
+        if not force:
+            expected = set(tuple(row) for row in db.session.execute(text(expected_sql)).fetchall())
+            stored = set(tuple(row) for row in db.session.execute(text(f"SELECT {columns} FROM player_matches")).fetchall())
+            if expected == stored:
+                return True
+        
+        db.session.execute(text("DELETE FROM player_matches"))
+        db.session.execute(text(f"INSERT INTO player_matches ({columns}) {expected_sql}"))
+        print("比赛长表已重建")
+        return True
+        
+    except Exception as e:
+        print(f"刷新比赛长表失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+# 按请求统计 SQL 语句数、耗时与 N+1 重复语句（SQL_METRICS=0 关闭，见 sql_metrics.py）
+sql_metrics = SqlMetrics.from_env()
+if sql_metrics.enabled:
+    sql_metrics.install()
+
+
+@app.before_request
+def start_sql_metrics():
+    sql_metrics.start_request()
+
+
+@app.after_request
+def finish_sql_metrics(response):
+    """本请求的 SQL 统计写入 Server-Timing 响应头与 /admin-secret/metrics"""
+    sql_metrics.finish_request(request, response)
+    return response
+
+
+def sync_materialized_tables(rebuild_player_matches=False):
+    """执行未执行的迁移并校准物化表（赛事序号表、比赛长表、排行榜），返回是否成功
+
+    校准需要全表扫描 matches，不在请求中执行：由 init_db、flask --app app migrate（部署步骤）调用；
+    读取物化表的命令行与检查脚本也须先调用本函数。rebuild_player_matches=True 时全量重建比赛长表。
+    排行榜的近期赛事窗口依赖届次序号，在赛事序号表之后刷新。需要在应用上下文中调用。
+    """
+    try:
+        run_migrations()
+    except Exception as e:
+        print(f"执行数据库迁移失败: {e}")
+    try:
+        synced = (refresh_tournament_sequence() and refresh_player_matches(force=rebuild_player_matches)
+                  and refresh_player_leaderboard())
+    except Exception as e:
+        print(f"校准物化表失败: {e}")
+        synced = False
+    if synced:
+        db.session.commit()
+        return True
+    db.session.rollback()
+    return False
+
+
+@app.before_request
+def check_schema_version_once():
+    """进程内首次请求时只检查迁移版本（查询 schema_migrations），不扫描业务表，Serverless 冷启动开销固定
+
+    有未执行的迁移时（新建的数据库，或部署了带新迁移的版本但未执行部署步骤）才执行迁移并校准物化表。
+    外部工具修改数据后用 flask --app app migrate 或 rebuild-* 命令校准。
+    """
+    global _schema_version_checked
+    if _schema_version_checked:
+        return
+    _schema_version_checked = True
+    try:
+        pending = pending_migrations()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"检查数据库迁移版本失败: {e}")
+        pending = True
+    if pending:
+        sync_materialized_tables()
+    if wal_checkpointer is not None:
+        wal_checkpointer.start()
+
+
+@app.before_request
+def use_read_only_connection():
+    """存储配置启用只读请求时，公开页面的 GET 请求在 query_only 连接上执行（误写入会直接报错）"""
+    if not storage_profile.read_only_requests or wal_checkpointer is None:
+        return
+    if request.method not in ('GET', 'HEAD') or request.endpoint not in READ_ONLY_ENDPOINTS:
+        return
+    connection = db.session.connection()
+    connection.exec_driver_sql('PRAGMA query_only = ON')
+    connection.connection.info['query_only'] = True
+
+
+@app.before_request
+def use_read_replica():
+    """启用本地副本时，非管理页面的 GET 请求从副本读取；副本超过陈旧上限时先同步，同步失败则读主库"""
+    if read_replica is None:
+        return
+    if request.method not in ('GET', 'HEAD') or request.path.startswith('/admin-secret'):
+        db.session.info['use_read_replica'] = False
+        return
+    db.session.info['use_read_replica'] = read_replica.ensure_fresh()
+
+
+TYPE_SESSION_NUMBER = register_query('tournament_sequence.type_session_number', """
+    SELECT type_session_number FROM tournament_sequence WHERE t_id = :t_id
+""")
+TYPE_SESSION_NUMBERS_ALL = register_query('tournament_sequence.all_type_session_numbers', """
+    SELECT t_id, type_session_number FROM tournament_sequence
+""")
+TYPE_SESSION_NUMBERS_BY_IDS = register_query('tournament_sequence.type_session_numbers', """
+    SELECT t_id, type_session_number FROM tournament_sequence WHERE t_id IN :t_ids
+""", expanding=('t_ids',))
+
+
+def get_type_session_number(t_id):
+    """读取赛事的届次序号（主键查询）；赛事不存在时返回 None"""
+    row = TYPE_SESSION_NUMBER.execute({'t_id': t_id}).fetchone()
+    return row[0] if row else None
+
+
+def get_type_session_numbers(t_ids=None):
+    """批量读取届次序号，返回 t_id -> 序号；t_ids 为 None 时返回全部赛事"""
+    if t_ids is None:
+        rows = TYPE_SESSION_NUMBERS_ALL.execute().fetchall()
+    else:
+        t_ids = list(t_ids)
+        if not t_ids:
+            return {}
+        rows = TYPE_SESSION_NUMBERS_BY_IDS.execute({'t_ids': t_ids}).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def _tournament_page_info(row):
+    """翻页链接中显示的赛事信息"""
+    t_id_val, t_type, year, session_num = row
+    return {
+        't_id': t_id_val,
+        'season_year': year,
+        'session_number': session_num,
+        'type_name': '正赛' if t_type == 1 else '小赛' if t_type == 2 else '总决赛' if t_type == 3 else f'类型{t_type}'
+    }
+
+
+# 赛事翻页的 5 条查询（注册为具名语句，见 queries.py）
+PAGINATION_CURRENT = register_query('pagination.current', """
+    SELECT same_type_order, global_order FROM tournament_sequence WHERE t_id = :t_id
+""")
+PAGINATION_SAME_TYPE_NEIGHBORS = register_query('pagination.same_type_neighbors', """
+    SELECT ts.same_type_order, ts.t_id, ts.type, s.year, ts.type_session_number
+    FROM tournament_sequence ts
+    JOIN seasons s ON ts.season_id = s.season_id
+    WHERE ts.type = :tournament_type
+    AND ts.same_type_order IN (
+        (SELECT same_type_order - 1 FROM tournament_sequence WHERE t_id = :t_id),
+        (SELECT same_type_order + 1 FROM tournament_sequence WHERE t_id = :t_id)
+    )
+""")
+PAGINATION_SAME_TYPE_TOTAL = register_query('pagination.same_type_total', """
+    SELECT MAX(same_type_order) FROM tournament_sequence WHERE type = :tournament_type
+""")
+PAGINATION_GLOBAL_NEIGHBORS = register_query('pagination.global_neighbors', """
+    SELECT ts.global_order, ts.t_id, ts.type, s.year, ts.type_session_number
+    FROM tournament_sequence ts
+    JOIN seasons s ON ts.season_id = s.season_id
+    WHERE ts.global_order IN (
+        (SELECT global_order - 1 FROM tournament_sequence WHERE t_id = :t_id),
+        (SELECT global_order + 1 FROM tournament_sequence WHERE t_id = :t_id)
+    )
+""")
+PAGINATION_GLOBAL_TOTAL = register_query('pagination.global_total', """
+    SELECT MAX(global_order) FROM tournament_sequence
+""")
+
+
+@cached()
 def get_tournament_pagination(t_id):
-    """获取赛事翻页信息"""
+    """获取赛事翻页信息（基于 tournament_sequence 中物化的翻页顺序做索引点查，一批读取）"""
     try:
         # 获取当前赛事信息
         current_tournament = db.session.get(Tournament, t_id)
         if not current_tournament:
             return None
         
+        # 当前位置、相邻两届与总数互不依赖（相邻届次用子查询取当前位置），一批读取
+        params = {'t_id': t_id, 'tournament_type': current_tournament.type}
+        batch = ReadBatch()
+        current_result = batch.add(PAGINATION_CURRENT, {'t_id': t_id})
         # 获取同类型赛事翻页信息（先按赛季排序，再按届次排序）
-        # 特殊规则：season_id=1跳过第13届正赛
-        from sqlalchemy import text
-        same_type_query = text("""
-            SELECT t.t_id, t.type, t.season_id, s.year, tsv.type_session_number
-            FROM tournament t
-            JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
-            JOIN seasons s ON t.season_id = s.season_id
-            WHERE t.type = :tournament_type
-            AND NOT (t.season_id = 1 AND t.t_id = 14)  -- 跳过season_id=1的第13届正赛
-            ORDER BY s.year, tsv.type_session_number
-        """)
-        
-        result = db.session.execute(same_type_query, {'tournament_type': current_tournament.type})
-        same_type_tournaments = result.fetchall()
-        
-        # 找到当前赛事在同类型中的位置
-        current_index = None
-        for i, (t_id_val, t_type, season_id, year, session_num) in enumerate(same_type_tournaments):
-            if t_id_val == t_id:
-                current_index = i
-                break
+        # 特殊规则：season_id=1跳过第13届正赛（该赛事的 same_type_order 为空）
+        same_type_neighbors_result = batch.add(PAGINATION_SAME_TYPE_NEIGHBORS, params)
+        same_type_total_result = batch.add(PAGINATION_SAME_TYPE_TOTAL, {'tournament_type': current_tournament.type})
+        # 获取所有赛事翻页信息 - 正赛小赛交替排序（排序规则见 interleaved_sort_order）
+        # 只包含正常状态的赛事（其他状态的 global_order 为空）
+        global_neighbors_result = batch.add(PAGINATION_GLOBAL_NEIGHBORS, {'t_id': t_id})
+        global_total_result = batch.add(PAGINATION_GLOBAL_TOTAL)
+        batch.execute()
+        
+        current = current_result.first()
+        same_type_order, global_order = current if current else (None, None)
         
         same_type_pagination = None
-        if current_index is not None:
-            prev_info = None
-            next_info = None
-            
-            if current_index > 0:
-                prev_t_id, prev_type, prev_season_id, prev_year, prev_session_num = same_type_tournaments[current_index - 1]
-                prev_info = {
-                    't_id': prev_t_id,
-                    'season_year': prev_year,
-                    'session_number': prev_session_num,
-                    'type_name': '正赛' if prev_type == 1 else '小赛' if prev_type == 2 else '总决赛' if prev_type == 3 else f'类型{prev_type}'
-                }
-            
-            if current_index < len(same_type_tournaments) - 1:
-                next_t_id, next_type, next_season_id, next_year, next_session_num = same_type_tournaments[current_index + 1]
-                next_info = {
-                    't_id': next_t_id,
-                    'season_year': next_year,
-                    'session_number': next_session_num,
-                    'type_name': '正赛' if next_type == 1 else '小赛' if next_type == 2 else '总决赛' if next_type == 3 else f'类型{next_type}'
-                }
-            
+        if same_type_order is not None:
+            neighbors = {row[0]: row[1:] for row in same_type_neighbors_result.rows}
+            prev_row = neighbors.get(same_type_order - 1)
+            next_row = neighbors.get(same_type_order + 1)
             same_type_pagination = {
-                'has_prev': current_index > 0,
-                'has_next': current_index < len(same_type_tournaments) - 1,
-                'prev_info': prev_info,
-                'next_info': next_info,
-                'current_index': current_index + 1,
-                'total_count': len(same_type_tournaments)
+                'has_prev': prev_row is not None,
+                'has_next': next_row is not None,
+                'prev_info': _tournament_page_info(prev_row) if prev_row else None,
+                'next_info': _tournament_page_info(next_row) if next_row else None,
+                'current_index': same_type_order,
+                'total_count': same_type_total_result.scalar()
             }
         
-        # 获取所有赛事翻页信息 - 实现正赛小赛交替排序
-        # 从2025年下半年第5届正赛开始，默认是一届正赛后一届小赛
-        all_tournaments_query = text("""
-            SELECT t.t_id, t.type, t.season_id, s.year, tsv.type_session_number, t.status,
-                   CASE 
-                     WHEN s.year = '2025年下半年' THEN
-                       -- 2025年下半年，按交替顺序排序
-                       CASE 
-                         WHEN t.type = 1 AND tsv.type_session_number <= 4 THEN 
-                           -- 第1-4届正赛：编号1-4
-                           tsv.type_session_number
-                         WHEN t.type = 1 AND tsv.type_session_number = 5 THEN 
-                           -- 第5届正赛：编号5
-                           5
-                         WHEN t.type = 2 AND tsv.type_session_number = 1 THEN 
-                           -- 第1届小赛：编号6
-                           6
-                         WHEN t.type = 1 AND tsv.type_session_number = 6 THEN 
-                           -- 第6届正赛：编号7
-                           7
-                         WHEN t.type = 2 AND tsv.type_session_number = 2 THEN 
-                           -- 第2届小赛：编号8
-                           8
-                         WHEN t.type = 1 AND tsv.type_session_number >= 7 THEN 
-                           -- 第7届及以后正赛：编号9, 11, 13...
-                           (tsv.type_session_number - 7) * 2 + 9
-                         WHEN t.type = 2 AND tsv.type_session_number >= 3 THEN 
-                           -- 第3届及以后小赛：编号10, 12, 14...
-                           (tsv.type_session_number - 3) * 2 + 10
-                         ELSE tsv.type_session_number + 1000  -- 其他类型放最后
-                       END
-                     ELSE
-                       -- 其他情况按原逻辑排序，但确保唯一性
-                       CASE 
-                         WHEN t.type = 1 THEN tsv.type_session_number + 20000
-                         WHEN t.type = 2 THEN tsv.type_session_number + 30000
-                         WHEN t.type = 3 THEN tsv.type_session_number + 40000
-                         ELSE tsv.type_session_number + 50000
-                       END
-                   END as sort_order
-            FROM tournament t
-            JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
-            JOIN seasons s ON t.season_id = s.season_id
-            WHERE t.status = 1  -- 只显示正常状态的赛事
-            ORDER BY s.year, sort_order, t.t_id
-        """)
-        
-        result = db.session.execute(all_tournaments_query)
-        all_tournaments = result.fetchall()
-        
-        # 找到当前赛事在历届中的位置
-        current_all_index = None
-        for i, (t_id_val, t_type, season_id, year, session_num, status, sort_order) in enumerate(all_tournaments):
-            if t_id_val == t_id:
-                current_all_index = i
-                break
-        
         all_tournaments_pagination = None
-        if current_all_index is not None:
-            prev_info = None
-            next_info = None
-            
-            if current_all_index > 0:
-                prev_t_id, prev_type, prev_season_id, prev_year, prev_session_num, prev_status, prev_sort_order = all_tournaments[current_all_index - 1]
-                prev_info = {
-                    't_id': prev_t_id,
-                    'season_year': prev_year,
-                    'session_number': prev_session_num,
-                    'type_name': '正赛' if prev_type == 1 else '小赛' if prev_type == 2 else '总决赛' if prev_type == 3 else f'类型{prev_type}'
-                }
-            
-            if current_all_index < len(all_tournaments) - 1:
-                next_t_id, next_type, next_season_id, next_year, next_session_num, next_status, next_sort_order = all_tournaments[current_all_index + 1]
-                next_info = {
-                    't_id': next_t_id,
-                    'season_year': next_year,
-                    'session_number': next_session_num,
-                    'type_name': '正赛' if next_type == 1 else '小赛' if next_type == 2 else '总决赛' if next_type == 3 else f'类型{next_type}'
-                }
-            
+        if global_order is not None:
+            neighbors = {row[0]: row[1:] for row in global_neighbors_result.rows}
+            prev_row = neighbors.get(global_order - 1)
+            next_row = neighbors.get(global_order + 1)
             all_tournaments_pagination = {
-                'has_prev': current_all_index > 0,
-                'has_next': current_all_index < len(all_tournaments) - 1,
-                'prev_info': prev_info,
-                'next_info': next_info,
-                'current_index': current_all_index + 1,
-                'total_count': len(all_tournaments)
+                'has_prev': prev_row is not None,
+                'has_next': next_row is not None,
+                'prev_info': _tournament_page_info(prev_row) if prev_row else None,
+                'next_info': _tournament_page_info(next_row) if next_row else None,
+                'current_index': global_order,
+                'total_count': global_total_result.scalar()
             }
         
         return {
@@ -267,6 +597,7 @@ def get_tournament_pagination(t_id):
         traceback.print_exc()
         return None
 
+@cached()
 def get_season_pagination(season_id):
     """获取赛季翻页信息"""
     try:
@@ -316,8 +647,96 @@ def get_season_pagination(season_id):
         traceback.print_exc()
         return None
 
-def calculate_tournament_scores(t_id):
-    """计算指定赛事的积分并更新到数据库"""
+RANKINGS_FOR_SCORING = register_query('rankings.for_scoring', """
+    SELECT r.t_id, r.r_id, r.ranks, r.player_id, t.type
+    FROM rankings r
+    JOIN tournament t ON r.t_id = t.t_id
+    WHERE r.t_id IN :t_ids
+    ORDER BY r.t_id, r.ranks, r.r_id
+""", expanding=('t_ids',))
+UPDATE_RANKING_SCORE = register_query('rankings.update_score', """
+    UPDATE rankings SET scores = :scores WHERE r_id = :r_id
+""")
+
+
+def rank_scores(tournament_type, player_count):
+    """按名次排列的积分（未取整），未知的赛事类型返回 None"""
+    if tournament_type == 1:  # 大赛
+        # 第1名: player_count*30, 最后一名: 10
+        first_score = player_count * 30
+        last_score = 10
+    elif tournament_type == 2:  # 小赛
+        # 第1名: player_count*20, 最后一名: 10
+        first_score = player_count * 20
+        last_score = 10
+    elif tournament_type == 3:  # 总决赛
+        # 第1名: player_count, 最后一名: 1, 等差数列
+        first_score = player_count
+        last_score = 1
+    else:
+        return None
+    
+    if player_count == 1:
+        # 只有1个人
+        return [first_score]
+    if player_count == 2:
+        # 只有2个人
+        return [first_score, last_score]
+    if tournament_type == 3:
+        # 等差数列: d = (an - a1) / (n - 1)
+        d = (last_score - first_score) / (player_count - 1)
+        return [first_score + d * (i - 1) for i in range(1, player_count + 1)]
+    # 等比数列: a1, a1*r, ..., a1*r^(n-1)，其中 a1 = first_score, a1*r^(n-1) = last_score
+    # 所以 r = (last_score/first_score)^(1/(n-1))
+    r = (last_score / first_score) ** (1 / (player_count - 1))
+    return [first_score * (r ** (i - 1)) for i in range(1, player_count + 1)]
+
+
+def score_tournament_rankings(t_ids):
+    """按名次为各赛事的排名写入积分：一次查询全部排名、一次 executemany 更新
+    
+    不提交，在调用方的事务中执行（经应用的 Engine，本地 SQLite/SQLCipher 与 Turso 相同）；返回 {t_id: 是否成功}。
+    """
+    t_ids = [int(t_id) for t_id in t_ids]
+    rankings = {}
+    for row in RANKINGS_FOR_SCORING.execute({'t_ids': t_ids}):
+        rankings.setdefault(row.t_id, []).append(row)
+    
+    results = {}
+    updates = []
+    for t_id in t_ids:
+        rows = rankings.get(t_id)
+        if not rows:
+            print(f"赛事 {t_id} 没有排名数据")
+            results[t_id] = False
+            continue
+        
+        player_count = len(rows)
+        tournament_type = rows[0].type
+        print(f"计算赛事 {t_id} 积分: type={tournament_type}, player_count={player_count}")
+        
+        scores = rank_scores(tournament_type, player_count)
+        if scores is None:
+            print(f"未知的赛事类型: {tournament_type}")
+            results[t_id] = False
+            continue
+        
+        for row, score in zip(rows, scores):
+            updates.append({'r_id': row.r_id, 'scores': int(round(score))})
+            print(f"  排名 {row.ranks}: 选手 {row.player_id} -> 积分 {int(round(score))}")
+        mark_tournament_changed(t_id)
+        results[t_id] = True
+    
+    if updates:
+        UPDATE_RANKING_SCORE.execute(updates)
+    return results
+
+
+def calculate_tournament_scores(t_id, raise_errors=False):
+    """计算指定赛事的积分并更新到数据库（与物化排行榜的刷新在同一事务中提交）
+
+    没有排名数据或赛事不存在时返回 False；出错时回滚，raise_errors 为真时抛出异常，否则返回 False。
+    """
     try:
         # 获取赛事信息
         tournament = db.session.get(Tournament, t_id)
@@ -325,306 +744,111 @@ def calculate_tournament_scores(t_id):
             print(f"赛事 {t_id} 不存在")
             return False
         
-        # 获取该赛事的所有排名
-        rankings = Ranking.query.filter_by(t_id=t_id).order_by(Ranking.ranks).all()
-        if not rankings:
-            print(f"赛事 {t_id} 没有排名数据")
-            return False
-        
-        player_count = len(rankings)
-        tournament_type = tournament.type
-        
-        print(f"计算赛事 {t_id} 积分: type={tournament_type}, player_count={player_count}")
-        
-        # 根据赛事类型计算积分
-        if tournament_type == 1:  # 大赛
-            # 第1名: player_count*30, 最后一名: 10
-            first_score = player_count * 30
-            last_score = 10
-            
-            if player_count == 1:
-                # 只有1个人
-                scores = [first_score]
-            elif player_count == 2:
-                # 只有2个人
-                scores = [first_score, last_score]
-            else:
-                # 等比数列计算
-                # 第1名: first_score, 第2名: first_score/r, ..., 倒数第2名: last_score*r, 最后一名: last_score
-                # 等比数列: a1, a1*r, a1*r^2, ..., a1*r^(n-1)
-                # 其中 a1 = first_score, a1*r^(n-1) = last_score
-                # 所以 r^(n-1) = last_score/first_score
-                # r = (last_score/first_score)^(1/(n-1))
-                r = (last_score / first_score) ** (1 / (player_count - 1))
-                scores = [first_score * (r ** (i - 1)) for i in range(1, player_count + 1)]
-                
-        elif tournament_type == 2:  # 小赛
-            # 第1名: player_count*20, 最后一名: 10
-            first_score = player_count * 20
-            last_score = 10
-            
-            if player_count == 1:
-                scores = [first_score]
-            elif player_count == 2:
-                scores = [first_score, last_score]
-            else:
-                # 等比数列计算
-                r = (last_score / first_score) ** (1 / (player_count - 1))
-                scores = [first_score * (r ** (i - 1)) for i in range(1, player_count + 1)]
-                
-        elif tournament_type == 3:  # 总决赛
-            # 第1名: player_count, 最后一名: 1, 等差数列
-            first_score = player_count
-            last_score = 1
-            
-            if player_count == 1:
-                scores = [first_score]
-            elif player_count == 2:
-                scores = [first_score, last_score]
-            else:
-                # 等差数列计算
-                # a1 = first_score, an = last_score
-                # d = (an - a1) / (n - 1)
-                d = (last_score - first_score) / (player_count - 1)
-                scores = [first_score + d * (i - 1) for i in range(1, player_count + 1)]
-        else:
-            print(f"未知的赛事类型: {tournament_type}")
+        if not score_tournament_rankings([t_id])[t_id]:
             return False
         
-        # 更新积分到数据库
-        for i, ranking in enumerate(rankings):
-            ranking.scores = int(round(scores[i]))
-            print(f"  排名 {ranking.ranks}: 选手 {ranking.player_id} -> 积分 {ranking.scores}")
-        
-        # 使用直接SQL更新确保保存成功
-        import sqlite3
-        DB = os.path.join(os.path.dirname(__file__), 'curling_masters.db')
-        conn = sqlite3.connect(DB)
-        cur = conn.cursor()
-        for i, ranking in enumerate(rankings):
-            cur.execute('UPDATE rankings SET scores = ? WHERE r_id = ?', (int(round(scores[i])), ranking.r_id))
-        conn.commit()
-        conn.close()
+        # 刷新物化排行榜，与积分变更一同提交
+        refresh_player_leaderboard()
+        db.session.commit()
         print(f"赛事 {t_id} 积分计算完成")
         return True
         
     except Exception as e:
+        db.session.rollback()
         print(f"计算赛事 {t_id} 积分时出错: {e}")
+        if raise_errors:
+            raise
         import traceback
         traceback.print_exc()
         return False
 
-def check_playoff_result(t_id, player1_id, player2_id):
-    """检查两个选手之间是否有附加赛结果"""
-    from sqlalchemy import text
-    
-    playoff_query = text("""
-        SELECT player_1_score, player_2_score
-        FROM matches
-        WHERE t_id = :t_id AND m_type = 14
-        AND ((player_1_id = :p1_id AND player_2_id = :p2_id) OR 
-             (player_1_id = :p2_id AND player_2_id = :p1_id))
-        AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
-    """)
-    
-    result = db.session.execute(playoff_query, {
-        't_id': t_id, 
-        'p1_id': player1_id, 
-        'p2_id': player2_id
-    }).fetchone()
-    
-    if not result:
-        return 0  # 没有附加赛
-    
-    score1, score2 = result
-    
-    # 需要确定哪个是player1的分数
-    # 先查询比赛的主客队信息
-    match_query = text("""
-        SELECT player_1_id, player_2_id
-        FROM matches
-        WHERE t_id = :t_id AND m_type = 14
-        AND ((player_1_id = :p1_id AND player_2_id = :p2_id) OR 
-             (player_1_id = :p2_id AND player_2_id = :p1_id))
-        LIMIT 1
-    """)
-    
-    match_result = db.session.execute(match_query, {
-        't_id': t_id,
-        'p1_id': player1_id,
-        'p2_id': player2_id
-    }).fetchone()
-    
-    if match_result:
-        match_p1_id, match_p2_id = match_result
-        if match_p1_id == player1_id:  # player1是主队
-            if score1 > score2:
-                return 1  # player1胜
-            elif score2 > score1:
-                return -1  # player2胜
-            else:
-                return 0  # 平局
-        else:  # player2是主队
-            if score2 > score1:
-                return 1  # player1胜
-            elif score1 > score2:
-                return -1  # player2胜
-            else:
-                return 0  # 平局
-    
-    return 0  # 默认平局
 
-def apply_playoff_results(t_id, players):
-    """应用附加赛结果到选手数据中（只影响净胜分和总进球，不影响积分）"""
-    from sqlalchemy import text
+def calculate_scores_for_tournaments(t_ids):
+    """批量计算多个赛事的积分：一次查询、一次 executemany 更新、一次排行榜刷新，在一个事务中提交
     
-    for player in players:
-        player_id = player['player_id']
-        
-        # 查询该选手的附加赛结果
-        playoff_query = text("""
-            SELECT player_1_score, player_2_score, player_1_id, player_2_id
-            FROM matches
-            WHERE t_id = :t_id AND m_type = 14
-            AND (player_1_id = :player_id OR player_2_id = :player_id)
-            AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
-            AND player_1_score >= 0 AND player_2_score >= 0
-        """)
+    返回 {t_id: 是否成功}；出错时回滚，所有赛事的积分都不变。
+    """
+    try:
+        results = score_tournament_rankings(t_ids)
+        refresh_player_leaderboard()
+        db.session.commit()
+        print(f"批量积分计算完成: {sum(results.values())}/{len(results)} 个赛事")
+        return results
         
-        playoff_results = db.session.execute(playoff_query, {
-            't_id': t_id,
-            'player_id': player_id
-        }).fetchall()
-        
-        # 应用附加赛结果（只有胜者获得净胜分和总进球的增加）
-        for score1, score2, p1_id, p2_id in playoff_results:
-            if p1_id == player_id:
-                # 该选手是主队
-                if score1 > score2:
-                    # 该选手获胜，增加净胜分和总进球
-                    player['goals_for'] += score1
-                    player['goals_against'] += score2
-                    player['goal_difference'] = player['goals_for'] - player['goals_against']
-                # 如果该选手失败，不改变任何数据
-            else:
-                # 该选手是客队
-                if score2 > score1:
-                    # 该选手获胜，增加净胜分和总进球
-                    player['goals_for'] += score2
-                    player['goals_against'] += score1
-                    player['goal_difference'] = player['goals_for'] - player['goals_against']
-                # 如果该选手失败，不改变任何数据
+    except Exception as e:
+        db.session.rollback()
+        print(f"批量计算积分时出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return {int(t_id): False for t_id in t_ids}
+
+def check_playoff_result(t_id, player1_id, player2_id, ctx=None):
+    """检查两个选手之间是否有附加赛结果：1 表示 player1 胜，-1 表示 player2 胜，0 表示平局或没有附加赛"""
+    playoffs = ctx.playoffs() if ctx is not None else PlayoffIndex.load(t_id)
+    return playoffs.result(player1_id, player2_id)
+
+def apply_playoff_results(t_id, players, ctx=None):
+    """应用附加赛结果到选手数据中（只影响净胜分和总进球，不影响积分）"""
+    playoffs = ctx.playoffs() if ctx is not None else PlayoffIndex.load(t_id)
+    # 只有胜者获得净胜分和总进球的增加，负者不改变任何数据
+    playoffs.apply(players)
+
+HAS_PLAYOFF_MATCHES = register_query('playoffs.exists', """
+    SELECT 1 FROM matches
+    WHERE t_id = :t_id AND m_type = 14
+    LIMIT 1
+""")
+INSERT_PLAYOFF_MATCH = register_query('playoffs.insert', """
+    INSERT INTO matches (t_id, player_1_id, player_2_id, player_1_score, player_2_score, m_type)
+    VALUES (:t_id, :p1_id, :p2_id, 0, 0, 14)
+""")
+
 
 def generate_playoff_matches(t_id, tied_players):
     """为完全相同的选手生成附加赛"""
-    from sqlalchemy import text
+    mark_tournament_changed(t_id)
     
     # 检查是否已经有附加赛
-    existing_playoffs_query = text("""
-        SELECT COUNT(*) FROM matches
-        WHERE t_id = :t_id AND m_type = 14
-    """)
+    has_playoffs = HAS_PLAYOFF_MATCHES.execute({'t_id': t_id}).fetchone()
     
-    existing_count = db.session.execute(existing_playoffs_query, {'t_id': t_id}).fetchone()[0]
-    
-    if existing_count > 0:
+    if has_playoffs:
         return  # 已经有附加赛，不重复生成
     
-    # 为每对完全相同的选手生成附加赛
+    # 为每对完全相同的选手生成附加赛（同一组合只生成一场）
+    scheduled = set()
+    new_matches = []
     for i in range(len(tied_players)):
         for j in range(i + 1, len(tied_players)):
-            player1 = tied_players[i]
-            player2 = tied_players[j]
-            
-            # 检查是否已经有这两人的附加赛
-            check_query = text("""
-                SELECT COUNT(*) FROM matches
-                WHERE t_id = :t_id AND m_type = 14
-                AND ((player_1_id = :p1_id AND player_2_id = :p2_id) OR 
-                     (player_1_id = :p2_id AND player_2_id = :p1_id))
-            """)
-            
-            count = db.session.execute(check_query, {
-                't_id': t_id,
-                'p1_id': player1['player_id'],
-                'p2_id': player2['player_id']
-            }).fetchone()[0]
-            
-            if count == 0:
-                # 生成附加赛
-                insert_query = text("""
-                    INSERT INTO matches (t_id, player_1_id, player_2_id, player_1_score, player_2_score, m_type)
-                    VALUES (:t_id, :p1_id, :p2_id, 0, 0, 14)
-                """)
-                
-                db.session.execute(insert_query, {
-                    't_id': t_id,
-                    'p1_id': player1['player_id'],
-                    'p2_id': player2['player_id']
-                })
+            p1_id = tied_players[i]['player_id']
+            p2_id = tied_players[j]['player_id']
+            if (p1_id, p2_id) in scheduled or (p2_id, p1_id) in scheduled:
+                continue
+            scheduled.add((p1_id, p2_id))
+            new_matches.append({'t_id': t_id, 'p1_id': p1_id, 'p2_id': p2_id})
+    
+    if new_matches:
+        # 一次批量写入所有缺少的附加赛
+        INSERT_PLAYOFF_MATCH.execute(new_matches)
     
     db.session.commit()
 
-def calculate_same_points_ranking_for_round_robin(players_with_same_points, t_id, generate_playoffs=False):
+def calculate_same_points_ranking_for_round_robin(players_with_same_points, t_id, generate_playoffs=False, ctx=None):
     """计算单循环赛同积分选手的内部胜负关系排名"""
-    from sqlalchemy import text
+    if ctx is None:
+        ctx = TournamentContext.load(t_id)
     
-    # 获取这些选手之间的所有比赛
+    # 同届小组赛（m_type=1）交手索引
+    head_to_head = ctx.head_to_head((1,))
     player_ids = [p['player_id'] for p in players_with_same_points]
-    player_ids_str = ','.join(map(str, player_ids))
-    
-    matches_query = text(f"""
-        SELECT player_1_id, player_2_id, player_1_score, player_2_score
-        FROM matches
-        WHERE t_id = :t_id AND m_type = 1
-        AND player_1_id IN ({player_ids_str}) AND player_2_id IN ({player_ids_str})
-        AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
-    """)
-    
-    result = db.session.execute(matches_query, {'t_id': t_id}).fetchall()
     
     # 计算每个选手对同积分选手的胜负关系
     for player in players_with_same_points:
-        h2h_points = 0
-        h2h_wins = 0
-        h2h_draws = 0
-        h2h_losses = 0
-        h2h_goals_for = 0
-        h2h_goals_against = 0
-        
-        for match in result:
-            p1_id, p2_id, score_1, score_2 = match
-            
-            if p1_id == player['player_id']:
-                # 该选手是主队
-                h2h_goals_for += score_1
-                h2h_goals_against += score_2
-                if score_1 > score_2:
-                    h2h_wins += 1
-                    h2h_points += 3
-                elif score_1 == score_2:
-                    h2h_draws += 1
-                    h2h_points += 1
-                else:
-                    h2h_losses += 1
-            elif p2_id == player['player_id']:
-                # 该选手是客队
-                h2h_goals_for += score_2
-                h2h_goals_against += score_1
-                if score_2 > score_1:
-                    h2h_wins += 1
-                    h2h_points += 3
-                elif score_2 == score_1:
-                    h2h_draws += 1
-                    h2h_points += 1
-                else:
-                    h2h_losses += 1
-        
-        player['h2h_points'] = h2h_points
-        player['h2h_wins'] = h2h_wins
-        player['h2h_draws'] = h2h_draws
-        player['h2h_losses'] = h2h_losses
-        player['h2h_goal_difference'] = h2h_goals_for - h2h_goals_against
+        h2h = head_to_head.totals(player['player_id'], player_ids)
+        player['h2h_points'] = h2h['points']
+        player['h2h_wins'] = h2h['wins']
+        player['h2h_draws'] = h2h['draws']
+        player['h2h_losses'] = h2h['losses']
+        player['h2h_goal_difference'] = h2h['goals_for'] - h2h['goals_against']
     
     # 按照正确的排序：净胜分 -> 内部胜负关系 -> 总得分
     def compare_h2h(player1, player2):
@@ -636,30 +860,10 @@ def calculate_same_points_ranking_for_round_robin(players_with_same_points, t_id
         if player1['h2h_points'] != player2['h2h_points']:
             return player2['h2h_points'] - player1['h2h_points']
         
-        # 3. 内部胜负关系积分相同，比较相互之间的胜负关系
-        for match in result:
-            p1_id, p2_id, score_1, score_2 = match
-            
-            # 找到两人之间的比赛
-            if (p1_id == player1['player_id'] and p2_id == player2['player_id']) or \
-               (p1_id == player2['player_id'] and p2_id == player1['player_id']):
-                
-                if p1_id == player1['player_id']:
-                    # player1是主队
-                    if score_1 > score_2:
-                        return -1  # player1排在前面
-                    elif score_2 > score_1:
-                        return 1   # player2排在前面
-                    else:
-                        break  # 平局，继续比较其他指标
-                else:
-                    # player2是主队
-                    if score_2 > score_1:
-                        return -1  # player2排在前面
-                    elif score_1 > score_2:
-                        return 1   # player1排在前面
-                    else:
-                        break  # 平局，继续比较其他指标
+        # 3. 内部胜负关系积分相同，比较两人首场交手的胜负（平局继续比较其他指标）
+        first_result = head_to_head.first_result(player1['player_id'], player2['player_id'])
+        if first_result != 0:
+            return -first_result  # 1表示player1胜，返回-1让player1排在前面
         
         # 4. 相互胜负关系相同（平局或未交手），比较总得分
         if player1['goals_for'] != player2['goals_for']:
@@ -667,7 +871,7 @@ def calculate_same_points_ranking_for_round_robin(players_with_same_points, t_id
         
         # 5. 所有指标都相同，需要生成附加赛
         # 先检查是否已经有附加赛
-        playoff_result = check_playoff_result(t_id, player1['player_id'], player2['player_id'])
+        playoff_result = check_playoff_result(t_id, player1['player_id'], player2['player_id'], ctx=ctx)
         if playoff_result != 0:
             return -playoff_result  # 1表示player1胜，返回-1让player1排在前面
         
@@ -683,7 +887,7 @@ def calculate_same_points_ranking_for_round_robin(players_with_same_points, t_id
     players_with_same_points.sort(key=cmp_to_key(compare_h2h))
     
     # 应用附加赛结果到排名计算中
-    apply_playoff_results(t_id, players_with_same_points)
+    apply_playoff_results(t_id, players_with_same_points, ctx=ctx)
     
     # 检测完全相同的选手（所有指标都相同）
     tied_groups = []
@@ -714,77 +918,30 @@ def calculate_same_points_ranking_for_round_robin(players_with_same_points, t_id
     
     return players_with_same_points
 
-def calculate_head_to_head_result(player1_id, player2_id, matches):
-    """计算两个选手之间的胜负关系（谁赢了谁）"""
-    player1_wins = 0
-    player2_wins = 0
-    
-    for match in matches:
-        if len(match) == 5:  # 包含m_type字段
-            p1_id, p1_score, p2_id, p2_score, m_type = match
-        else:  # 不包含m_type字段（向后兼容）
-            p1_id, p1_score, p2_id, p2_score = match
-            m_type = 1
-        
-        # 检查是否是这两个选手之间的比赛
-        if ((p1_id == player1_id and p2_id == player2_id) or 
-            (p1_id == player2_id and p2_id == player1_id)):
-            
-            if p1_id == player1_id:
-                # player1是主队
-                if p1_score > p2_score:
-                    player1_wins += 1
-                elif p2_score > p1_score:
-                    player2_wins += 1
-            else:
-                # player1是客队
-                if p2_score > p1_score:
-                    player1_wins += 1
-                elif p1_score > p2_score:
-                    player2_wins += 1
-    
-    # 返回胜负关系：1表示player1胜，-1表示player2胜，0表示平局或未交手
-    if player1_wins > player2_wins:
-        return 1
-    elif player2_wins > player1_wins:
-        return -1
-    else:
-        return 0
-
-def calculate_knockout_matches(t_id):
+@cached(scope='tournament')
+def calculate_knockout_matches(t_id, ctx=None):
     """计算淘汰赛数据（通用函数，支持所有赛制）"""
     try:
-        from sqlalchemy import text
+        if ctx is None:
+            ctx = TournamentContext.load(t_id)
         
         # 获取所有淘汰赛类型的比赛
-        knockout_query = text("""
-            SELECT m.m_id, m.m_type, m.player_1_id, m.player_1_score, m.player_2_id, m.player_2_score,
-                   p1.name as player1_name, p2.name as player2_name
-            FROM matches m
-            LEFT JOIN players p1 ON m.player_1_id = p1.player_id
-            LEFT JOIN players p2 ON m.player_2_id = p2.player_id
-            WHERE m.t_id = :t_id AND m.m_type IN (8, 9, 10, 11, 12, 13)
-            ORDER BY m.m_type, m.m_id
-        """)
-        
-        knockout_result = db.session.execute(knockout_query, {'t_id': t_id}).fetchall()
+        knockout_result = sorted(ctx.matches_of_types((8, 9, 10, 11, 12, 13)), key=lambda m: (m.m_type, m.m_id))
         
         if not knockout_result:
             return []
         
         knockout_matches = []
-        for match_row in knockout_result:
-            m_id, m_type, player_1_id, player_1_score, player_2_id, player_2_score, player1_name, player2_name = match_row
-            
+        for match in knockout_result:
             knockout_matches.append({
-                'm_id': m_id,
-                'm_type': m_type,
-                'player_1_id': player_1_id,
-                'player_1_score': player_1_score,
-                'player_2_id': player_2_id,
-                'player_2_score': player_2_score,
-                'player1': {'name': player1_name or '待定'},
-                'player2': {'name': player2_name or '待定'}
+                'm_id': match.m_id,
+                'm_type': match.m_type,
+                'player_1_id': match.player_1_id,
+                'player_1_score': match.player_1_score,
+                'player_2_id': match.player_2_id,
+                'player_2_score': match.player_2_score,
+                'player1': {'name': ctx.player_name(match.player_1_id) or '待定'},
+                'player2': {'name': ctx.player_name(match.player_2_id) or '待定'}
             })
         
         return knockout_matches
@@ -794,61 +951,41 @@ def calculate_knockout_matches(t_id):
         return []
 
 
-def calculate_round_robin_standings(t_id):
+@cached(scope='tournament')
+def calculate_round_robin_standings(t_id, ctx=None):
     try:
-        from sqlalchemy import text
-        
-        # 获取赛事格式信息
-        tournament_query = text("""
-            SELECT t_format FROM tournament WHERE t_id = :t_id
-        """)
-        tournament_result = db.session.execute(tournament_query, {'t_id': t_id}).fetchone()
-        if not tournament_result:
+        if ctx is None:
+            ctx = TournamentContext.load(t_id)
+        if not ctx.tournament:
             return []
         
-        t_format = tournament_result[0]
+        t_format = ctx.t_format
         
         # 根据赛事格式确定要统计的比赛类型
         if t_format == 6:  # 苏超赛制（CM250）
             # 苏超赛制：统计主客场小组赛（m_type=2和3）
-            matches_query = text("""
-                SELECT player_1_id, player_1_score, player_2_id, player_2_score, m_type
-                FROM matches
-                WHERE t_id = :t_id AND m_type IN (2, 3) AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
-                AND player_1_score >= 0 AND player_2_score >= 0
-            """)
+            counted_types = (2, 3)
         elif t_format == 4:  # 单循环赛
             # 单循环赛：统计所有小组赛类型的比赛（m_type=1,2,3），附加赛不参与积分计算
-            matches_query = text("""
-                SELECT player_1_id, player_1_score, player_2_id, player_2_score, m_type
-                FROM matches
-                WHERE t_id = :t_id AND m_type IN (1, 2, 3) AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL AND player_1_score >= 0 AND player_2_score >= 0
-            """)
+            counted_types = (1, 2, 3)
         else:
             # 其他赛制：统计普通小组赛（m_type=1）
-            matches_query = text("""
-                SELECT player_1_id, player_1_score, player_2_id, player_2_score, m_type
-                FROM matches
-                WHERE t_id = :t_id AND m_type = 1 AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
-                AND player_1_score >= 0 AND player_2_score >= 0
-            """)
-        matches = db.session.execute(matches_query, {'t_id': t_id}).fetchall()
+            counted_types = (1,)
+        matches = [
+            (m.player_1_id, m.player_1_score, m.player_2_id, m.player_2_score, m.m_type)
+            for m in ctx.scored_matches(counted_types, non_negative=True)
+        ]
         
         # 获取该赛事的所有参赛选手
-        players_query = text("""
-            SELECT DISTINCT p.player_id, p.name
-            FROM players p
-            JOIN rankings r ON p.player_id = r.player_id
-            WHERE r.t_id = :t_id
-            ORDER BY p.name
-        """)
-        players = db.session.execute(players_query, {'t_id': t_id}).fetchall()
+        ranked_ids = [pid for pid in ctx.ranking_player_ids() if pid in ctx.players]
+        names = {pid: ctx.player_name(pid) for pid in ranked_ids}
+        players = [(pid, names[pid]) for pid in ctx.sort_by_name(ranked_ids, names)]
         
         # 初始化选手统计数据
         standings = {}
         for player_id, player_name in players:
             # 计算该选手需要打的总场次数
-            total_matches = calculate_player_total_matches(t_id, player_id, t_format)
+            total_matches = calculate_player_total_matches(t_id, player_id, t_format, ctx=ctx)
             
             standings[player_id] = {
                 'player_id': player_id,
@@ -874,7 +1011,7 @@ def calculate_round_robin_standings(t_id):
             
             if player_1_id not in standings:
                 # 计算该选手需要打的总场次数
-                total_matches = calculate_player_total_matches(t_id, player_1_id, t_format)
+                total_matches = calculate_player_total_matches(t_id, player_1_id, t_format, ctx=ctx)
                 
                 standings[player_1_id] = {
                     'player_id': player_1_id,
@@ -891,7 +1028,7 @@ def calculate_round_robin_standings(t_id):
                 }
             if player_2_id not in standings:
                 # 计算该选手需要打的总场次数
-                total_matches = calculate_player_total_matches(t_id, player_2_id, t_format)
+                total_matches = calculate_player_total_matches(t_id, player_2_id, t_format, ctx=ctx)
                 
                 standings[player_2_id] = {
                     'player_id': player_2_id,
@@ -967,7 +1104,7 @@ def calculate_round_robin_standings(t_id):
                 final_standings.extend(group)
             else:
                 # 多个选手同积分，需要计算内部胜负关系
-                ranked_group = calculate_same_points_ranking_for_round_robin(group, t_id, generate_playoffs=False)
+                ranked_group = calculate_same_points_ranking_for_round_robin(group, t_id, generate_playoffs=False, ctx=ctx)
                 final_standings.extend(ranked_group)
         
         standings_list = final_standings
@@ -1237,6 +1374,9 @@ def update_final_rankings_and_scores(t_id):
             score_text = f'{score}分' if score is not None else '不计分'
             print(f"  排名 {rank}: 选手 {player_id}({status_text}) -> {score_text}")
         
+        # 刷新物化排行榜，与排名写入一同提交
+        mark_tournament_changed(t_id)
+        refresh_player_leaderboard()
         db.session.commit()
         print(f"最终排名和积分更新完成")
         return True
@@ -1535,7 +1675,7 @@ def auto_generate_next_round_matches(t_id):
         tournament_query = text("""
             SELECT t.type, t.t_format, tsv.type_session_number
             FROM tournament t
-            JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
+            JOIN tournament_sequence tsv ON t.t_id = tsv.t_id
             WHERE t.t_id = :t_id
         """)
         tournament_result = db.session.execute(tournament_query, {'t_id': t_id}).fetchone()
@@ -1796,7 +1936,7 @@ def auto_generate_knockout_matches(t_id):
         tournament_query = text("""
             SELECT t.type, tsv.type_session_number
             FROM tournament t
-            JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
+            JOIN tournament_sequence tsv ON t.t_id = tsv.t_id
             WHERE t.t_id = :t_id
         """)
         tournament_result = db.session.execute(tournament_query, {'t_id': t_id}).fetchone()
@@ -1965,13 +2105,14 @@ def calculate_special_knockout_stages(t_id):
         }
 
 # 小赛淘汰赛
-def calculate_minor_tournament_knockout(t_id):
+def calculate_minor_tournament_knockout(t_id, ctx=None):
     """计算小赛循环赛的淘汰赛阶段（金牌赛和铜牌赛）"""
     try:
-        from sqlalchemy import text
+        if ctx is None:
+            ctx = TournamentContext.load(t_id)
         
         # 获取循环赛阶段的排名
-        round_robin_standings = calculate_round_robin_standings(t_id)
+        round_robin_standings = calculate_round_robin_standings(t_id, ctx=ctx)
         
         if len(round_robin_standings) < 4:
             return {
@@ -1981,23 +2122,14 @@ def calculate_minor_tournament_knockout(t_id):
                 'final_rankings': round_robin_standings
             }
         
-        # 获取金牌赛和铜牌赛的比赛
-        knockout_query = text("""
-            SELECT m_id, m_type, player_1_id, player_1_score, player_2_id, player_2_score
-            FROM matches
-            WHERE t_id = :t_id AND m_type IN (11, 12)  -- 11=铜牌赛, 12=金牌赛
-            ORDER BY m_type
-        """)
-        knockout_matches = db.session.execute(knockout_query, {'t_id': t_id}).fetchall()
+        # 获取金牌赛和铜牌赛的比赛（11=铜牌赛, 12=金牌赛）
+        knockout_matches = [
+            (m.m_id, m.m_type, m.player_1_id, m.player_1_score, m.player_2_id, m.player_2_score)
+            for m in sorted(ctx.matches_of_types((11, 12)), key=lambda m: (m.m_type, m.m_id))
+        ]
         
         # 获取选手信息
-        players_query = text("""
-            SELECT player_id, name FROM players WHERE player_id IN (
-                SELECT DISTINCT player_id FROM rankings WHERE t_id = :t_id
-            )
-        """)
-        players_result = db.session.execute(players_query, {'t_id': t_id}).fetchall()
-        players_dict = {p[0]: p[1] for p in players_result}
+        players_dict = {pid: ctx.player_name(pid) for pid in ctx.ranking_player_ids() if pid in ctx.players}
         
         # 分析淘汰赛结果
         gold_match = None
@@ -2062,8 +2194,15 @@ def calculate_minor_tournament_knockout(t_id):
             # 计算最终排名的积分
             final_rankings = calculate_final_ranking_scores(final_rankings, t_id)
             
-            # 更新rankings表
-            update_rankings_table_with_final_scores(t_id, final_rankings)
+            # 更新rankings表（已是最终结果时不再重复写入）
+            from collections import Counter
+            stored_rankings = Counter((r.player_id, r.ranks, r.scores) for r in ctx.rankings)
+            computed_rankings = Counter(
+                (p['player_id'], p.get('final_rank', i + 1), p.get('final_points', 0))
+                for i, p in enumerate(final_rankings)
+            )
+            if stored_rankings != computed_rankings:
+                update_rankings_table_with_final_scores(t_id, final_rankings)
         else:
             # 淘汰赛未完成，返回循环赛排名
             final_rankings = round_robin_standings
@@ -2185,6 +2324,9 @@ def update_rankings_table_with_final_scores(t_id, final_rankings):
             
             print(f"更新排名: 选手 {player_data['player_id']} -> 排名 {final_rank}, 积分 {final_points}")
         
+        # 刷新物化排行榜，与排名写入一同提交
+        mark_tournament_changed(t_id)
+        refresh_player_leaderboard()
         db.session.commit()
         print(f"成功更新rankings表，共 {len(final_rankings)} 条记录")
         return True
@@ -2195,81 +2337,115 @@ def update_rankings_table_with_final_scores(t_id, final_rankings):
         return False
 
 
+MEDAL_CUBE = register_query('medals.cube', """
+    SELECT 
+        t.season_id,
+        t.type,
+        p.player_id,
+        p.name,
+        SUM(CASE WHEN r.ranks = 1 THEN 1 ELSE 0 END) as gold,
+        SUM(CASE WHEN r.ranks = 2 THEN 1 ELSE 0 END) as silver,
+        SUM(CASE WHEN r.ranks = 3 THEN 1 ELSE 0 END) as bronze
+    FROM rankings r
+    JOIN tournament t ON r.t_id = t.t_id
+    JOIN players p ON r.player_id = p.player_id
+    WHERE p.status = 1
+    AND t.status = 1
+    AND r.ranks IN (1, 2, 3)
+    GROUP BY t.season_id, t.type, p.player_id, p.name
+""")
+
+
+@cached(copy_result=False)
+def build_medal_cube():
+    """一次 GROUP BY 计算 赛季 × 赛事类型 × 选手 的金银铜奖牌立方体（仅统计 status=1 的选手与赛事）
+    
+    返回 (cube, names)：cube 以 (season_id, type, player_id) 为键，值为 {'gold','silver','bronze'}；
+    names 为 player_id -> name。结果由缓存复用，调用方不得修改。
+    """
+    try:
+        return medal_cube_from_rows(MEDAL_CUBE.execute().fetchall())
+        
+    except Exception as e:
+        print(f"计算奖牌立方体失败: {e}")
+        return {}, {}
+
+
+def medal_cube_from_rows(rows):
+    """由 MEDAL_CUBE 的结果行构造 (cube, names)"""
+    cube = {}
+    names = {}
+    for row in rows:
+        cube[(row[0], row[1], row[2])] = {'gold': row[4] or 0, 'silver': row[5] or 0, 'bronze': row[6] or 0}
+        names[row[2]] = row[3]
+    return cube, names
+
+
+def rollup_medal_cube(tournament_type, season_id=None, cube=None):
+    """从奖牌立方体汇总指定赛事类型（可选限定赛季）的奖牌榜，按金、银、铜、姓名排序
+    
+    cube 为 (cube, names)，默认取缓存的 build_medal_cube()。
+    """
+    cube, names = cube if cube is not None else build_medal_cube()
+    
+    totals = {}
+    for (cube_season_id, cube_type, player_id), medals in cube.items():
+        if cube_type != tournament_type:
+            continue
+        if season_id is not None and cube_season_id != season_id:
+            continue
+        entry = totals.setdefault(player_id, {'gold': 0, 'silver': 0, 'bronze': 0})
+        entry['gold'] += medals['gold']
+        entry['silver'] += medals['silver']
+        entry['bronze'] += medals['bronze']
+    
+    return rank_medal_totals(totals, names)
+
+
+def rank_medal_totals(totals, names):
+    """把 player_id -> 金银铜数量 整理为奖牌榜列表，按金、银、铜、姓名排序"""
+    standings = []
+    for player_id, medals in totals.items():
+        total = medals['gold'] + medals['silver'] + medals['bronze']
+        if total > 0:
+            standings.append({
+                'player_id': player_id,
+                'name': names.get(player_id),
+                'gold': medals['gold'],
+                'silver': medals['silver'],
+                'bronze': medals['bronze'],
+                'total': total
+            })
+    
+    standings.sort(key=lambda x: (-x['gold'], -x['silver'], -x['bronze'], x['name'] or ''))
+    return standings
+
+
 def calculate_medal_standings():
-    """计算奖牌榜"""
+    """计算奖牌榜（所有参与排名选手的大赛/小赛/总决赛奖牌，由奖牌立方体汇总）"""
     try:
-        from sqlalchemy import text
+        cube, names = build_medal_cube()
         
         # 获取所有参与排名的选手（status=1）
         players = Player.query.filter_by(status=1).all()
         
-        # 为每个选手计算奖牌数
         medal_stats = {}
-        
         for player in players:
-            # 统计大赛奖牌
-            major_medal_query = text("""
-                SELECT 
-                    SUM(CASE WHEN r.ranks = 1 THEN 1 ELSE 0 END) as gold,
-                    SUM(CASE WHEN r.ranks = 2 THEN 1 ELSE 0 END) as silver,
-                    SUM(CASE WHEN r.ranks = 3 THEN 1 ELSE 0 END) as bronze
-                FROM rankings r
-                JOIN tournament t ON r.t_id = t.t_id
-                WHERE r.player_id = :player_id 
-                AND t.type = 1 AND t.status = 1
-                AND r.ranks IN (1, 2, 3)
-            """)
-            
-            # 统计小赛奖牌
-            minor_medal_query = text("""
-                SELECT 
-                    SUM(CASE WHEN r.ranks = 1 THEN 1 ELSE 0 END) as gold,
-                    SUM(CASE WHEN r.ranks = 2 THEN 1 ELSE 0 END) as silver,
-                    SUM(CASE WHEN r.ranks = 3 THEN 1 ELSE 0 END) as bronze
-                FROM rankings r
-                JOIN tournament t ON r.t_id = t.t_id
-                WHERE r.player_id = :player_id 
-                AND t.type = 2 AND t.status = 1
-                AND r.ranks IN (1, 2, 3)
-            """)
-            
-            # 统计总决赛奖牌
-            final_medal_query = text("""
-                SELECT 
-                    SUM(CASE WHEN r.ranks = 1 THEN 1 ELSE 0 END) as gold,
-                    SUM(CASE WHEN r.ranks = 2 THEN 1 ELSE 0 END) as silver,
-                    SUM(CASE WHEN r.ranks = 3 THEN 1 ELSE 0 END) as bronze
-                FROM rankings r
-                JOIN tournament t ON r.t_id = t.t_id
-                WHERE r.player_id = :player_id 
-                AND t.type = 3 AND t.status = 1
-                AND r.ranks IN (1, 2, 3)
-            """)
-            
-            major_result = db.session.execute(major_medal_query, {'player_id': player.player_id}).fetchone()
-            minor_result = db.session.execute(minor_medal_query, {'player_id': player.player_id}).fetchone()
-            final_result = db.session.execute(final_medal_query, {'player_id': player.player_id}).fetchone()
-            
             medal_stats[player.player_id] = {
                 'player_id': player.player_id,
                 'name': player.name,
-                'major': {
-                    'gold': major_result[0] or 0,
-                    'silver': major_result[1] or 0,
-                    'bronze': major_result[2] or 0
-                },
-                'minor': {
-                    'gold': minor_result[0] or 0,
-                    'silver': minor_result[1] or 0,
-                    'bronze': minor_result[2] or 0
-                },
-                'final': {
-                    'gold': final_result[0] or 0,
-                    'silver': final_result[1] or 0,
-                    'bronze': final_result[2] or 0
-                }
+                'major': {'gold': 0, 'silver': 0, 'bronze': 0},
+                'minor': {'gold': 0, 'silver': 0, 'bronze': 0},
+                'final': {'gold': 0, 'silver': 0, 'bronze': 0}
             }
         
+        for (season_id, tournament_type, player_id), medals in cube.items():
+            type_key = MEDAL_TYPE_KEYS.get(tournament_type)
+            if type_key is None or player_id not in medal_stats:
+                continue
+            for medal in ('gold', 'silver', 'bronze'):
+                medal_stats[player_id][type_key][medal] += medals[medal]
+        
         return medal_stats
         
     except Exception as e:
@@ -2277,291 +2453,308 @@ def calculate_medal_standings():
         return {}
 
 
+@cached()
 def get_medal_standings_by_type(tournament_type):
     """按比赛类型获取奖牌榜排名"""
     try:
-        from sqlalchemy import text
-        
-        medal_query = text("""
-            SELECT 
-                p.player_id,
-                p.name,
-                SUM(CASE WHEN r.ranks = 1 THEN 1 ELSE 0 END) as gold,
-                SUM(CASE WHEN r.ranks = 2 THEN 1 ELSE 0 END) as silver,
-                SUM(CASE WHEN r.ranks = 3 THEN 1 ELSE 0 END) as bronze
-            FROM players p
-            LEFT JOIN rankings r ON p.player_id = r.player_id
-            LEFT JOIN tournament t ON r.t_id = t.t_id
-            WHERE p.status = 1 
-            AND t.type = :tournament_type 
-            AND t.status = 1
-            AND r.ranks IN (1, 2, 3)
-            GROUP BY p.player_id, p.name
-            HAVING (gold + silver + bronze) > 0
-            ORDER BY gold DESC, silver DESC, bronze DESC, p.name ASC
-        """)
-        
-        result = db.session.execute(medal_query, {'tournament_type': tournament_type})
-        standings = []
-        
-        for row in result.fetchall():
-            standings.append({
-                'player_id': row[0],
-                'name': row[1],
-                'gold': row[2] or 0,
-                'silver': row[3] or 0,
-                'bronze': row[4] or 0,
-                'total': (row[2] or 0) + (row[3] or 0) + (row[4] or 0)
-            })
-        
-        return standings
-        
+        return rollup_medal_cube(tournament_type)
     except Exception as e:
         print(f"获取奖牌榜失败: {e}")
         return []
 
 
+@cached()
 def get_season_medal_standings_by_type(season_id, tournament_type):
     """按赛季和比赛类型获取奖牌榜排名"""
     try:
-        from sqlalchemy import text
-        
-        medal_query = text("""
-            SELECT 
-                p.player_id,
-                p.name,
-                SUM(CASE WHEN r.ranks = 1 THEN 1 ELSE 0 END) as gold,
-                SUM(CASE WHEN r.ranks = 2 THEN 1 ELSE 0 END) as silver,
-                SUM(CASE WHEN r.ranks = 3 THEN 1 ELSE 0 END) as bronze
-            FROM players p
-            LEFT JOIN rankings r ON p.player_id = r.player_id
-            LEFT JOIN tournament t ON r.t_id = t.t_id
-            WHERE p.status = 1 
-            AND t.season_id = :season_id
-            AND t.type = :tournament_type 
-            AND t.status = 1
-            AND r.ranks IN (1, 2, 3)
-            GROUP BY p.player_id, p.name
-            HAVING (gold + silver + bronze) > 0
-            ORDER BY gold DESC, silver DESC, bronze DESC, p.name ASC
-        """)
-        
-        result = db.session.execute(medal_query, {'season_id': season_id, 'tournament_type': tournament_type})
-        standings = []
-        
-        for row in result.fetchall():
-            standings.append({
-                'player_id': row[0],
-                'name': row[1],
-                'gold': row[2] or 0,
-                'silver': row[3] or 0,
-                'bronze': row[4] or 0,
-                'total': (row[2] or 0) + (row[3] or 0) + (row[4] or 0)
-            })
-        
-        return standings
-        
+        return rollup_medal_cube(tournament_type, season_id=season_id)
     except Exception as e:
         print(f"获取赛季奖牌榜失败: {e}")
         return []
 
 
+# 最近20届：按类型分区，最新赛季优先、届数降序，取前20（与原先"最新赛季不足20届则向前补足"等价）
+# 起计分：选手在窗口内积分降序第10高（不足10次为0）
+# 参赛次数：所有赛季有效赛事（status=1）中已计分的大赛/小赛次数
+PLAYER_TOTAL_SCORES = register_query('leaderboard.compute', """
+    WITH recent_tournaments AS (
+        SELECT t_id
+        FROM (
+            SELECT t.t_id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY t.type
+                       ORDER BY t.season_id DESC, tsv.type_session_number DESC
+                   ) AS recent_no
+            FROM tournament t
+            JOIN tournament_sequence tsv ON t.t_id = tsv.t_id
+            WHERE t.status = 1 AND t.type IN (1, 2)
+        )
+        WHERE recent_no <= 20
+    ),
+    recent_scores AS (
+        SELECT r.player_id,
+               r.scores,
+               ROW_NUMBER() OVER (PARTITION BY r.player_id ORDER BY r.scores DESC) AS score_no
+        FROM rankings r
+        JOIN recent_tournaments rt ON r.t_id = rt.t_id
+        WHERE r.scores IS NOT NULL
+    ),
+    score_totals AS (
+        SELECT player_id,
+               SUM(scores) AS total_score,
+               MAX(CASE WHEN score_no = 10 THEN scores END) AS baseline_score
+        FROM recent_scores
+        GROUP BY player_id
+    ),
+    entry_counts AS (
+        SELECT r.player_id,
+               SUM(CASE WHEN t.type = 1 THEN 1 ELSE 0 END) AS major_count,
+               SUM(CASE WHEN t.type = 2 THEN 1 ELSE 0 END) AS minor_count
+        FROM rankings r
+        JOIN tournament t ON r.t_id = t.t_id
+        WHERE t.status = 1 AND r.scores IS NOT NULL
+        GROUP BY r.player_id
+    )
+    SELECT p.player_id,
+           p.name,
+           COALESCE(st.total_score, 0) AS total_score,
+           COALESCE(st.baseline_score, 0) AS baseline_score,
+           COALESCE(ec.major_count, 0) AS major_count,
+           COALESCE(ec.minor_count, 0) AS minor_count
+    FROM players p
+    LEFT JOIN score_totals st ON p.player_id = st.player_id
+    LEFT JOIN entry_counts ec ON p.player_id = ec.player_id
+    WHERE p.status = 1
+    ORDER BY p.player_id
+""")
+
+
 def calculate_player_total_scores():
-    """计算所有选手的总积分排名"""
+    """计算所有选手的总积分排名（集合化查询：一次窗口函数查询得到全部选手的积分、起计分与参赛次数）"""
     try:
-        from sqlalchemy import text
-        
-        # 获取所有参与排名的选手（status=1）
-        players = Player.query.filter_by(status=1).all()
-        
-        # 获取最新赛季ID
-        latest_season_query = text("""
-            SELECT MAX(season_id) as latest_season_id
-            FROM tournament
-            WHERE status = 1
-        """)
-        latest_season_result = db.session.execute(latest_season_query)
-        latest_season_id = latest_season_result.fetchone()[0]
+        rows = PLAYER_TOTAL_SCORES.execute().fetchall()
         
-        # 获取最新赛季的大赛和小赛
-        latest_season_major_query = text("""
-            SELECT t.t_id, tsv.type_session_number
-            FROM tournament t
-            JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
-            WHERE t.status = 1 AND t.type = 1 AND t.season_id = :latest_season_id
-            ORDER BY tsv.type_session_number DESC
-        """)
-        
-        latest_season_minor_query = text("""
-            SELECT t.t_id, tsv.type_session_number
-            FROM tournament t
-            JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
-            WHERE t.status = 1 AND t.type = 2 AND t.season_id = :latest_season_id
-            ORDER BY tsv.type_session_number DESC
-        """)
+        player_scores = []
+        for row in rows:
+            player_scores.append({
+                'player_id': row[0],
+                'name': row[1],
+                'total_score': row[2],
+                'baseline_score': row[3],
+                'major_count': row[4],  # 所有赛季的大赛参与次数
+                'minor_count': row[5],   # 所有赛季的小赛参与次数
+                'total_count': row[4] + row[5]
+            })
         
-        latest_major_result = db.session.execute(latest_season_major_query, {'latest_season_id': latest_season_id})
-        latest_minor_result = db.session.execute(latest_season_minor_query, {'latest_season_id': latest_season_id})
+        # 按总积分降序排序（稳定排序，同分保持选手ID顺序）
+        sorted_players = sorted(player_scores, key=lambda x: x['total_score'], reverse=True)
         
-        latest_major_tournaments = latest_major_result.fetchall()
-        latest_minor_tournaments = latest_minor_result.fetchall()
+        # 更新排名
+        for rank, player_data in enumerate(sorted_players, 1):
+            player_data['rank'] = rank
         
-        # 构建最近20届大赛的t_id列表
-        recent_major_t_ids = []
-        if len(latest_major_tournaments) >= 20:
-            # 最新赛季就有20届或更多大赛
-            recent_major_t_ids = [row[0] for row in latest_major_tournaments[:20]]
-        else:
-            # 最新赛季大赛不够20届，需要从上个赛季补足
-            recent_major_t_ids = [row[0] for row in latest_major_tournaments]
-            remaining_needed = 20 - len(latest_major_tournaments)
-            
-            # 获取其他赛季的大赛，按赛季和届数降序排列
-            other_seasons_major_query = text("""
-                SELECT t.t_id, tsv.type_session_number
-                FROM tournament t
-                JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
-                WHERE t.status = 1 AND t.type = 1 AND t.season_id < :latest_season_id
-                ORDER BY t.season_id DESC, tsv.type_session_number DESC
-                LIMIT :remaining_needed
-            """)
-            
-            other_major_result = db.session.execute(other_seasons_major_query, {
-                'latest_season_id': latest_season_id,
-                'remaining_needed': remaining_needed
-            })
-            other_major_tournaments = other_major_result.fetchall()
-            recent_major_t_ids.extend([row[0] for row in other_major_tournaments])
-        
-        # 构建最近20届小赛的t_id列表
-        recent_minor_t_ids = []
-        if len(latest_minor_tournaments) >= 20:
-            # 最新赛季就有20届或更多小赛
-            recent_minor_t_ids = [row[0] for row in latest_minor_tournaments[:20]]
-        else:
-            # 最新赛季小赛不够20届，需要从上个赛季补足
-            recent_minor_t_ids = [row[0] for row in latest_minor_tournaments]
-            remaining_needed = 20 - len(latest_minor_tournaments)
-            
-            # 获取其他赛季的小赛，按赛季和届数降序排列
-            other_seasons_minor_query = text("""
-                SELECT t.t_id, tsv.type_session_number
-                FROM tournament t
-                JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
-                WHERE t.status = 1 AND t.type = 2 AND t.season_id < :latest_season_id
-                ORDER BY t.season_id DESC, tsv.type_session_number DESC
-                LIMIT :remaining_needed
-            """)
-            
-            other_minor_result = db.session.execute(other_seasons_minor_query, {
-                'latest_season_id': latest_season_id,
-                'remaining_needed': remaining_needed
-            })
-            other_minor_tournaments = other_minor_result.fetchall()
-            recent_minor_t_ids.extend([row[0] for row in other_minor_tournaments])
+        return sorted_players
         
-        # 为每个选手计算总积分
-        player_scores = {}
+    except Exception as e:
+        print(f"计算选手总积分失败: {e}")
+        return []
+
+
+# 物化排行榜字段（与 calculate_player_total_scores 的输出保持一致）
+PLAYER_LEADERBOARD_FIELDS = ('rank', 'name', 'total_score', 'baseline_score', 'major_count', 'minor_count', 'total_count')
+
+def refresh_player_leaderboard(force=False):
+    """在当前事务内刷新物化排行榜 player_leaderboard，由调用方与排名写入一同提交
+    
+    出错时抛出异常（不写入空表），调用方回滚整个事务，排行榜与排名不会不一致。
+    """
+    from sqlalchemy import text
+    from datetime import datetime
+    
+    # 先把会话中未刷出的排名变更写入当前事务，保证重新计算读到最新数据
+    db.session.flush()
+    
+    rows = calculate_player_total_scores()
+    if not rows and Player.query.filter_by(status=1).count() > 0:
+        # 计算失败时保留原有排行榜，避免写入空表
+        raise RuntimeError("刷新物化排行榜失败: 重新计算结果为空")
+    
+    previous_query = text("""
+        SELECT player_id, rank, name, total_score, baseline_score, major_count, minor_count, total_count
+        FROM player_leaderboard
+    """)
+    previous = {row[0]: tuple(row[1:]) for row in db.session.execute(previous_query).fetchall()}
+    
+    current = {row['player_id']: tuple(row[field] for field in PLAYER_LEADERBOARD_FIELDS) for row in rows}
+    if not force and current == previous:
+        # 排行榜未变化，保留上一次的名次变化记录
+        return True
+    
+    updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    params = []
+    for row in rows:
+        previous_rank = previous[row['player_id']][0] if row['player_id'] in previous else None
+        params.append({
+            'player_id': row['player_id'],
+            'name': row['name'],
+            'rank': row['rank'],
+            'total_score': row['total_score'],
+            'baseline_score': row['baseline_score'],
+            'major_count': row['major_count'],
+            'minor_count': row['minor_count'],
+            'total_count': row['total_count'],
+            'previous_rank': previous_rank,
+            'rank_change': previous_rank - row['rank'] if previous_rank is not None else None,
+            'updated_at': updated_at
+        })
+    
+    db.session.execute(text("DELETE FROM player_leaderboard"))
+    if params:
+        db.session.execute(text("""
+            INSERT INTO player_leaderboard
+                (player_id, name, rank, total_score, baseline_score, major_count, minor_count,
+                 total_count, previous_rank, rank_change, updated_at)
+            VALUES
+                (:player_id, :name, :rank, :total_score, :baseline_score, :major_count, :minor_count,
+                 :total_count, :previous_rank, :rank_change, :updated_at)
+        """), params)
+    
+    print(f"物化排行榜已刷新，共 {len(params)} 名选手")
+    return True
+
+
+PLAYER_LEADERBOARD = register_query('leaderboard.materialized', """
+    SELECT player_id, name, rank, total_score, baseline_score, major_count, minor_count,
+           total_count, previous_rank, rank_change
+    FROM player_leaderboard
+    ORDER BY rank
+""")
+
+
+@cached()
+def get_player_leaderboard():
+    """读取物化排行榜（按 rank 索引单次查询）；表不存在或为空时回退到实时计算"""
+    try:
+        rows = PLAYER_LEADERBOARD.execute().fetchall()
+        if rows:
+            return [dict(row._mapping) for row in rows]
+    except Exception as e:
+        print(f"读取物化排行榜失败，改为实时计算: {e}")
+    
+    return live_player_leaderboard()
+
+
+def live_player_leaderboard():
+    """实时计算的排行榜（物化表不可用时的回退），没有排名升降"""
+    player_rankings = calculate_player_total_scores()
+    for player_data in player_rankings:
+        player_data['previous_rank'] = None
+        player_data['rank_change'] = None
+    return player_rankings
+
+
+def get_player_leaderboard_entry(player_id):
+    """读取单个选手在物化排行榜中的记录（主键查询）；未参与排名返回 None"""
+    try:
+        from sqlalchemy import text
         
-        for player in players:
-            # 获取该选手在最近20届大赛中的积分
-            major_scores = []
-            if recent_major_t_ids:
-                # 使用字符串格式化构建查询
-                major_placeholders = ','.join([str(t_id) for t_id in recent_major_t_ids])
-                major_query = text(f"""
-                    SELECT r.scores
-                    FROM rankings r
-                    WHERE r.player_id = {player.player_id} 
-                    AND r.t_id IN ({major_placeholders})
-                    AND r.scores IS NOT NULL
-                """)
-                
-                major_result = db.session.execute(major_query)
-                major_scores = [row[0] for row in major_result.fetchall()]
-            
-            # 获取该选手在最近20届小赛中的积分
-            minor_scores = []
-            if recent_minor_t_ids:
-                # 使用字符串格式化构建查询
-                minor_placeholders = ','.join([str(t_id) for t_id in recent_minor_t_ids])
-                minor_query = text(f"""
-                    SELECT r.scores
-                    FROM rankings r
-                    WHERE r.player_id = {player.player_id} 
-                    AND r.t_id IN ({minor_placeholders})
-                    AND r.scores IS NOT NULL
-                """)
-                
-                minor_result = db.session.execute(minor_query)
-                minor_scores = [row[0] for row in minor_result.fetchall()]
-            
-            # 计算总积分
-            total_score = sum(major_scores) + sum(minor_scores)
-            
-            # 计算起计分：如果参赛次数≥10次，取积分第10高的；否则为0
-            all_scores = major_scores + minor_scores
-            if len(all_scores) >= 10:
-                all_scores.sort(reverse=True)
-                baseline_score = all_scores[9]  # 第10高积分（索引9）
-            else:
-                baseline_score = 0
-            
-            # 统计该选手在所有赛季参加的大赛和小赛总数
-            all_major_count_query = text(f"""
-                SELECT COUNT(*)
-                FROM rankings r
-                JOIN tournament t ON r.t_id = t.t_id
-                WHERE r.player_id = {player.player_id} 
-                AND t.type = 1 AND t.status = 1
-                AND r.scores IS NOT NULL
-            """)
-            
-            all_minor_count_query = text(f"""
-                SELECT COUNT(*)
-                FROM rankings r
-                JOIN tournament t ON r.t_id = t.t_id
-                WHERE r.player_id = {player.player_id} 
-                AND t.type = 2 AND t.status = 1
-                AND r.scores IS NOT NULL
-            """)
-            
-            all_major_count_result = db.session.execute(all_major_count_query)
-            all_minor_count_result = db.session.execute(all_minor_count_query)
-            
-            all_major_count = all_major_count_result.fetchone()[0]
-            all_minor_count = all_minor_count_result.fetchone()[0]
-            
-            player_scores[player.player_id] = {
-                'player_id': player.player_id,
-                'name': player.name,
-                'total_score': total_score,
-                'baseline_score': baseline_score,
-                'major_count': all_major_count,  # 所有赛季的大赛参与次数
-                'minor_count': all_minor_count,   # 所有赛季的小赛参与次数
-                'total_count': all_major_count + all_minor_count
-            }
+        entry_query = text("""
+            SELECT player_id, name, rank, total_score, baseline_score, major_count, minor_count,
+                   total_count, previous_rank, rank_change
+            FROM player_leaderboard
+            WHERE player_id = :player_id
+        """)
+        row = db.session.execute(entry_query, {'player_id': player_id}).fetchone()
+        if row:
+            return dict(row._mapping)
         
-        # 按总积分降序排序
-        sorted_players = sorted(player_scores.values(), key=lambda x: x['total_score'], reverse=True)
+        # 表中有数据说明该选手不参与排名；表为空则回退到实时计算
+        if db.session.execute(text("SELECT 1 FROM player_leaderboard LIMIT 1")).fetchone():
+            return None
+    except Exception as e:
+        print(f"读取物化排行榜失败，改为实时计算: {e}")
+    
+    for player_data in get_player_leaderboard():
+        if player_data['player_id'] == player_id:
+            return player_data
+    return None
+
+
+def verify_player_leaderboard():
+    """对比物化排行榜与实时计算结果，返回差异列表（为空表示一致）"""
+    from sqlalchemy import text
+    
+    stored_query = text("""
+        SELECT player_id, rank, name, total_score, baseline_score, major_count, minor_count, total_count
+        FROM player_leaderboard
+    """)
+    stored = {row[0]: dict(zip(PLAYER_LEADERBOARD_FIELDS, row[1:])) for row in db.session.execute(stored_query).fetchall()}
+    expected = {row['player_id']: row for row in calculate_player_total_scores()}
+    
+    differences = []
+    for player_id in sorted(set(stored) | set(expected)):
+        if player_id not in stored:
+            differences.append({'player_id': player_id, 'field': None, 'stored': None, 'expected': 'missing row'})
+            continue
+        if player_id not in expected:
+            differences.append({'player_id': player_id, 'field': None, 'stored': 'extra row', 'expected': None})
+            continue
+        for field in PLAYER_LEADERBOARD_FIELDS:
+            if stored[player_id][field] != expected[player_id][field]:
+                differences.append({
+                    'player_id': player_id,
+                    'field': field,
+                    'stored': stored[player_id][field],
+                    'expected': expected[player_id][field]
+                })
+    return differences
+
+
+HomeSeason = namedtuple('HomeSeason', ['season_id', 'year'])
+
+SEASONS_BY_YEAR = register_query('seasons.by_year_desc', """
+    SELECT season_id, year FROM seasons ORDER BY year DESC
+""")
+
+
+def load_home_page():
+    """首页数据：赛季列表（按年份倒序）、总积分排行榜与大赛/小赛/总决赛奖牌榜
+    
+    三条查询互不依赖，放在同一个 ReadBatch 中执行；结果按全局数据版本缓存。
+    物化排行榜不可用时回退到实时计算，与 get_player_leaderboard 一致。
+    """
+    def compute():
+        batch = ReadBatch()
+        seasons_result = batch.add(SEASONS_BY_YEAR)
+        leaderboard_result = batch.add(PLAYER_LEADERBOARD)
+        cube_result = batch.add(MEDAL_CUBE)
+        batch.execute()
         
-        # 更新排名
-        for rank, player_data in enumerate(sorted_players, 1):
-            player_data['rank'] = rank
+        seasons = [HomeSeason(row.season_id, row.year) for row in seasons_result.rows]
         
-        return sorted_players
+        try:
+            leaderboard = [dict(row._mapping) for row in leaderboard_result.rows]
+        except Exception as e:
+            print(f"读取物化排行榜失败，改为实时计算: {e}")
+            leaderboard = []
+        if not leaderboard:
+            leaderboard = live_player_leaderboard()
         
-    except Exception as e:
-        print(f"计算选手总积分失败: {e}")
-        return []
+        try:
+            cube = medal_cube_from_rows(cube_result.rows)
+        except Exception as e:
+            print(f"计算奖牌立方体失败: {e}")
+            cube = ({}, {})
+        medal_standings = {t_type: rollup_medal_cube(t_type, cube=cube) for t_type in (1, 2, 3)}
+        return seasons, leaderboard, medal_standings
+    
+    return get_or_compute('load_home_page', ('load_home_page',), standings_cache.version_token(), compute)
 
 
 @app.route('/')
 def index():
-    seasons = Season.query.order_by(Season.year.desc()).all()
-    
-    # 计算选手总积分排名
-    player_rankings_data = calculate_player_total_scores()
+    # 赛季列表、物化排行榜与奖牌立方体一批读取
+    seasons, player_rankings_data, medal_standings = load_home_page()
     
     # 将字典数据转换为对象格式，以便模板使用
     class PlayerRanking:
@@ -2572,20 +2765,16 @@ def index():
             self.total_score = data['total_score']
             self.baseline_score = data['baseline_score']
             self.total_count = data['total_count']
+            self.rank_change = data.get('rank_change')
     
     player_rankings = [PlayerRanking(data) for data in player_rankings_data]
     
-    # 获取奖牌榜数据
-    major_medal_standings = get_medal_standings_by_type(1)  # 大赛
-    minor_medal_standings = get_medal_standings_by_type(2)  # 小赛
-    final_medal_standings = get_medal_standings_by_type(3)  # 总决赛
-    
     return render_template('index.html', 
                          seasons=seasons, 
                          player_rankings=player_rankings,
-                         major_medal_standings=major_medal_standings,
-                         minor_medal_standings=minor_medal_standings,
-                         final_medal_standings=final_medal_standings)
+                         major_medal_standings=medal_standings[1],  # 大赛
+                         minor_medal_standings=medal_standings[2],  # 小赛
+                         final_medal_standings=medal_standings[3])  # 总决赛
 
 
 def admin_required(f):
@@ -2671,6 +2860,7 @@ def add_match_score():
         )
         
         db.session.add(match)
+        mark_tournament_changed(t_id)
         db.session.commit()
         
         return jsonify({'success': True, 'message': '比赛添加成功'})
@@ -2764,6 +2954,7 @@ def update_match_scores():
                 if match:
                     match.player_1_score = player_1_score
                     match.player_2_score = player_2_score
+                    mark_tournament_changed(match.t_id)
                     updated_matches += 1
                     
             except (ValueError, TypeError) as e:
@@ -2800,7 +2991,7 @@ def update_match_scores():
                         try:
                             # 这里我们需要调用update_knockout_bracket的逻辑
                             # 但由于这是POST请求，我们需要直接调用逻辑
-                            update_knockout_bracket_logic(tournament_id)
+                            update_knockout_bracket_logic(tournament_id, [int(m_id) for m_id in scores])
                         except Exception as e:
                             print(f"更新淘汰赛对阵时出错: {e}")
         
@@ -2851,22 +3042,20 @@ def update_single_match_score(t_id, match_id):
         
         match.player_1_score = player_1_score
         match.player_2_score = player_2_score
+        mark_tournament_changed(t_id)
         
         db.session.commit()
         
-        # 重新计算积分和排名
-        print(f"重新计算赛事 {t_id} 的积分")
-        calculate_tournament_scores(t_id)
-        
-        # 检查是否需要更新淘汰赛对阵
-        tournament = db.session.get(Tournament, t_id)
-        if tournament and tournament.t_format in [1, 3]:  # 支持淘汰赛的赛事格式
-            try:
-                update_knockout_bracket_logic(t_id)
-            except Exception as e:
-                print(f"更新淘汰赛对阵时出错: {e}")
+        # 重新计算积分和排名：合并窗口内的多次录入只重算一次；recompute=inline 时立即重算（读到自己的写入）
+        inline = data.get('recompute') == 'inline' or request.args.get('recompute') == 'inline'
+        try:
+            recompute = recompute_scheduler.schedule(t_id, inline=inline, m_ids=[match_id])
+        except RecomputeError as e:
+            # 比分已提交，积分重算失败如实报告
+            return jsonify({'success': False, 'error': f'比分已保存，但积分重算失败: {e}',
+                            'recompute': 'failed'}), 500
         
-        return jsonify({'success': True, 'message': '比分更新成功'})
+        return jsonify({'success': True, 'message': '比分更新成功', 'recompute': recompute})
         
     except Exception as e:
         db.session.rollback()
@@ -2876,51 +3065,258 @@ def update_single_match_score(t_id, match_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/season/<int:season_id>')
-def season_view(season_id):
-    season = Season.query.get_or_404(season_id)
+# 批量录入比分：一次 IN 查询校验全部比赛，一次 executemany 更新，每个赛事只重算一次积分、推进一次淘汰赛对阵
+BULK_SCORE_MATCHES = register_query('matches.by_ids', """
+    SELECT m_id, t_id, m_type FROM matches WHERE m_id IN :m_ids
+""", expanding=('m_ids',))
+UPDATE_MATCH_SCORE = register_query('matches.update_score', """
+    UPDATE matches SET player_1_score = :player_1_score, player_2_score = :player_2_score
+    WHERE m_id = :m_id
+""")
+RANKING_SCORES = register_query('rankings.scores_by_tournaments', """
+    SELECT t_id, player_id, ranks, scores FROM rankings WHERE t_id IN :t_ids
+""", expanding=('t_ids',))
+
+def recompute_tournament(t_id, m_ids=None):
+    """重算赛事积分，支持淘汰赛的赛制同时推进淘汰赛对阵（m_ids 为录入比分的比赛，只推进其下游），返回是否更新了对阵
+
+    积分计算出错时抛出异常（由 RecomputeScheduler 记为重算失败）。
+    """
+    print(f"重新计算赛事 {t_id} 的积分")
+    calculate_tournament_scores(t_id, raise_errors=True)
+    tournament = db.session.get(Tournament, t_id)
+    if tournament and tournament.t_format in [1, 3]:  # 支持淘汰赛的赛事格式
+        return update_knockout_bracket_logic(t_id, m_ids)
+    return False
+
+
+# 录入比分后的积分重算按赛事合并（RECOMPUTE_WINDOW；Turso 与 Serverless 环境默认立即重算），进程退出前执行未执行的重算
+recompute_scheduler = RecomputeScheduler.from_env(recompute_tournament, app=app, database_type=db_config['DATABASE_TYPE'])
+atexit.register(recompute_scheduler.flush_all)
+
+# 排名变化中对比的字段：小组赛排名（按比分实时计算）与 rankings 表的名次、积分
+STANDING_FIELDS = ('rank', 'points', 'wins', 'draws', 'losses', 'goal_difference')
+STANDING_DELTA_FIELDS = STANDING_FIELDS + ('ranks', 'scores')
+
+
+def parse_bulk_scores(items):
+    """解析批量比分：[[m_id, 比分1, 比分2], ...] 或 [{'m_id', 'player_1_score', 'player_2_score'}, ...]
     
-    # 使用SQL视图获取带序号的届次数据
-    from sqlalchemy import text
-    view_query = text("""
-        SELECT t.t_id, t.season_id, s.year, t.type, t.player_count, t.t_format,
-               ts.type_session_number
-        FROM tournament t
-        JOIN seasons s ON t.season_id = s.season_id
-        JOIN tournament_session_view ts ON t.t_id = ts.t_id
-        WHERE t.season_id = :season_id
-        ORDER BY t.type, t.t_id
-    """)
+    返回 (比分列表, 错误列表)；与单场录入的校验一致（不能为负数、不能都为0），同一场比赛不能重复提交。
+    """
+    if not isinstance(items, list) or not items:
+        return [], ['scores 必须是非空列表']
+    entries, errors, seen = [], [], set()
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, dict):
+                m_id, score_1, score_2 = item['m_id'], item['player_1_score'], item['player_2_score']
+            else:
+                m_id, score_1, score_2 = item
+            m_id, score_1, score_2 = int(m_id), int(score_1), int(score_2)
+        except (KeyError, TypeError, ValueError):
+            errors.append(f"第 {index + 1} 项格式无效")
+            continue
+        if m_id in seen:
+            errors.append(f"比赛 {m_id} 重复提交")
+        elif score_1 < 0 or score_2 < 0:
+            errors.append(f"比赛 {m_id} 比分不能为负数")
+        elif score_1 == 0 and score_2 == 0:
+            errors.append(f"比赛 {m_id} 双方比分不能都为0")
+        seen.add(m_id)
+        entries.append({'m_id': m_id, 'player_1_score': score_1, 'player_2_score': score_2})
+    return entries, errors
+
+
+def standings_snapshot(t_ids):
+    """各赛事的小组赛排名与 rankings 表的名次、积分：{t_id: {player_id: {...}}}"""
+    snapshot = {t_id: {} for t_id in t_ids}
+    for t_id in t_ids:
+        for player in calculate_round_robin_standings(t_id):
+            snapshot[t_id][player['player_id']] = {
+                'name': player['name'],
+                **{field: player.get(field) for field in STANDING_FIELDS},
+            }
+    for t_id, player_id, ranks, scores in RANKING_SCORES.execute({'t_ids': list(t_ids)}):
+        entry = snapshot[t_id].setdefault(player_id, {'name': None})
+        entry.update({'ranks': ranks, 'scores': scores})
+    return snapshot
+
+
+def standings_delta(before, after):
+    """前后两次快照中有变化的选手：[{player_id, name, before, after}]"""
+    delta = []
+    for player_id in sorted(set(before) | set(after)):
+        old, new = before.get(player_id, {}), after.get(player_id, {})
+        old_values = {field: old.get(field) for field in STANDING_DELTA_FIELDS}
+        new_values = {field: new.get(field) for field in STANDING_DELTA_FIELDS}
+        if old_values != new_values:
+            delta.append({
+                'player_id': player_id,
+                'name': new.get('name') or old.get('name'),
+                'before': old_values,
+                'after': new_values,
+            })
+    return delta
+
+
+@app.route('/admin-secret/matches/bulk-scores', methods=['POST'])
+@admin_required
+def bulk_update_match_scores():
+    """批量录入比分（JSON: {"scores": [[m_id, 比分1, 比分2], ...]}），返回各赛事的排名变化
     
-    result = db.session.execute(view_query, {'season_id': season_id})
-    tournaments_data = result.fetchall()
+    全部比分先整体校验，任一无效则不写入；通过后在一个事务中更新，再对每个涉及的赛事各重算一次积分、
+    推进一次淘汰赛对阵（支持淘汰赛的赛制）。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        entries, errors = parse_bulk_scores(data.get('scores'))
+        if errors:
+            return jsonify({'success': False, 'error': '比分校验失败', 'errors': errors}), 400
+
+        m_ids = [entry['m_id'] for entry in entries]
+        matches = {row.m_id: row for row in BULK_SCORE_MATCHES.execute({'m_ids': m_ids})}
+        missing = [m_id for m_id in m_ids if m_id not in matches]
+        if missing:
+            return jsonify({'success': False, 'error': '比赛不存在', 'errors': [f"比赛 {m_id} 不存在" for m_id in missing]}), 404
+
+        t_ids = sorted({matches[m_id].t_id for m_id in m_ids})
+        before = standings_snapshot(t_ids)
+
+        UPDATE_MATCH_SCORE.execute(entries)
+        for t_id in t_ids:
+            mark_tournament_changed(t_id)
+        db.session.commit()
+
+        results = []
+        failed = []
+        for t_id in t_ids:
+            # 立即重算（同时取消该赛事已排队的合并重算），淘汰赛对阵只从本次录入的比赛沿下游推进
+            changed = [m_id for m_id in m_ids if matches[m_id].t_id == t_id]
+            try:
+                bracket_updated = recompute_scheduler.run_now(t_id, changed)
+                results.append({'t_id': t_id, 'bracket_updated': bool(bracket_updated)})
+            except RecomputeError as e:
+                failed.append(t_id)
+                results.append({'t_id': t_id, 'bracket_updated': False, 'error': str(e)})
+
+        after = standings_snapshot(t_ids)
+        for result in results:
+            result['standings_delta'] = standings_delta(before[result['t_id']], after[result['t_id']])
+
+        if failed:
+            # 比分已提交，积分重算失败的赛事如实报告
+            return jsonify({'success': False, 'error': f'比分已保存，但赛事 {failed} 的积分重算失败',
+                            'updated_matches': len(entries), 'tournaments': results}), 500
+        return jsonify({'success': True, 'updated_matches': len(entries), 'tournaments': results})
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"批量更新比分失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# 赛季页面的一届赛事（带届次序号和前三名）
+SeasonTournament = namedtuple('SeasonTournament', [
+    't_id', 'season_id', 'type', 'status', 'player_count', 't_format', 'type_session_number', 'podium'
+])
+
+
+SEASON_TOURNAMENTS = register_query('season.tournaments', """
+    SELECT t.t_id, t.season_id, t.type, t.status, t.player_count, t.t_format,
+           ts.type_session_number
+    FROM tournament t
+    JOIN seasons s ON t.season_id = s.season_id
+    JOIN tournament_sequence ts ON t.t_id = ts.t_id
+    WHERE t.season_id = :season_id
+    ORDER BY t.type, t.t_id
+""")
+# 每届按名次取前三条排名作为领奖台；名次 1-3 的记录同时计入奖牌榜
+SEASON_PODIUMS = register_query('season.podiums', """
+    SELECT t_id, ranks, player_id, name, player_status, t_type, t_status, podium_no
+    FROM (
+        SELECT r.t_id, r.ranks, r.player_id, p.name, p.status AS player_status,
+               t.type AS t_type, t.status AS t_status,
+               ROW_NUMBER() OVER (PARTITION BY r.t_id ORDER BY r.ranks, r.r_id) AS podium_no
+        FROM rankings r
+        JOIN tournament t ON r.t_id = t.t_id
+        LEFT JOIN players p ON r.player_id = p.player_id
+        WHERE r.t_id IN (SELECT t_id FROM tournament WHERE season_id = :season_id)
+    )
+    WHERE podium_no <= 3 OR ranks IN (1, 2, 3)
+    ORDER BY t_id, podium_no
+""")
+
+
+def load_season_page(season_id, batch=None):
+    """批量加载赛季页面数据：届次列表、各届前三名与本赛季大赛/小赛奖牌榜
     
-    # 将查询结果转换为对象列表
-    tournaments = []
-    for row in tournaments_data:
-        tournament = db.session.get(Tournament, row.t_id)
-        tournament.type_session_number = row.type_session_number
-        tournaments.append(tournament)
+    第一次查询取本赛季的届次及序号（与调用方加入 batch 的查询一并执行）；前三名与奖牌榜由第二次查询一并算出，
+    并按本赛季全部赛事的数据版本缓存（其他赛季的写入不会使其失效）。
+    """
+    batch = batch if batch is not None else ReadBatch()
+    tournaments_result = batch.add(SEASON_TOURNAMENTS, {'season_id': season_id})
+    batch.execute()
+    tournament_rows = tournaments_result.rows
+    
+    def compute():
+        
+        podiums = {}
+        medal_totals = {1: {}, 2: {}}
+        names = {}
+        medal_keys = {1: 'gold', 2: 'silver', 3: 'bronze'}
+        for row in SEASON_PODIUMS.execute({'season_id': season_id}).fetchall():
+            if row.podium_no <= 3:
+                podium = podiums.setdefault(row.t_id, {1: '', 2: '', 3: ''})
+                podium[row.ranks] = row.name or ''
+            # 奖牌榜只统计正常状态的赛事和参与排名的选手（status=1）
+            if (row.ranks in medal_keys and row.t_type in medal_totals
+                    and row.t_status == 1 and row.player_status == 1):
+                entry = medal_totals[row.t_type].setdefault(row.player_id, {'gold': 0, 'silver': 0, 'bronze': 0})
+                entry[medal_keys[row.ranks]] += 1
+                names[row.player_id] = row.name
+        
+        return {
+            'podiums': podiums,
+            'major_medal_standings': rank_medal_totals(medal_totals[1], names),  # 大赛
+            'minor_medal_standings': rank_medal_totals(medal_totals[2], names)   # 小赛
+        }
     
-        # attach top-3 podium names if available
-    for tt in tournaments:
-        try:
-            top = Ranking.query.filter_by(t_id=tt.t_id).order_by(Ranking.ranks).limit(3).all()
-            podium = {1: '', 2: '', 3: ''}
-            for r in top:
-                try:
-                    pname = r.player.name
-                except Exception:
-                    pname = ''
-                podium.get(r.ranks)  # ensure key exists
-                podium[r.ranks] = pname
-            tt.podium = podium
-        except Exception:
-            tt.podium = {1: '', 2: '', 3: ''}
-    
-    # 获取当前赛季的奖牌榜数据（只显示大赛和小赛）
-    major_medal_standings = get_season_medal_standings_by_type(season_id, 1)  # 大赛
-    minor_medal_standings = get_season_medal_standings_by_type(season_id, 2)  # 小赛
+    token = standings_cache.tournaments_version_token(row.t_id for row in tournament_rows)
+    page = get_or_compute('load_season_page', ('load_season_page', season_id), token, compute)
+    
+    tournaments = [
+        SeasonTournament(
+            t_id=row.t_id,
+            season_id=row.season_id,
+            type=row.type,
+            status=row.status,
+            player_count=row.player_count,
+            t_format=row.t_format,
+            type_session_number=row.type_session_number,
+            podium=page['podiums'].get(row.t_id, {1: '', 2: '', 3: ''})
+        )
+        for row in tournament_rows
+    ]
+    return tournaments, page['major_medal_standings'], page['minor_medal_standings']
+
+
+SEASON_BY_ID = register_query('season.by_id', """
+    SELECT season_id, year FROM seasons WHERE season_id = :season_id
+""")
+
+
+@app.route('/season/<int:season_id>')
+def season_view(season_id):
+    # 赛季与届次列表一批读取；前三名与本赛季奖牌榜（只显示大赛和小赛）一次批量加载
+    batch = ReadBatch()
+    season_result = batch.add(SEASON_BY_ID, {'season_id': season_id})
+    tournaments, major_medal_standings, minor_medal_standings = load_season_page(season_id, batch=batch)
+    season = season_result.first()
+    if season is None:
+        abort(404)
     
     # 获取赛季翻页信息
     season_pagination = get_season_pagination(season_id)
@@ -2936,34 +3332,29 @@ def season_view(season_id):
 @app.route('/tournament/<int:t_id>')
 def tournament_view(t_id):
     t = Tournament.query.get_or_404(t_id)
+    # 录入比分后尚未执行的合并重算先执行，页面读到最新的积分与对阵
+    recompute_scheduler.flush(t_id)
     
-    # 使用SQL视图获取该届次的序号
+    # 届次序号与本届赛事的比赛、分组、排名与选手快照一批读取，后续计算均基于该快照
     from sqlalchemy import text
-    view_query = text("""
-        SELECT type_session_number
-        FROM tournament_session_view
-        WHERE t_id = :t_id
-    """)
-    
-    result = db.session.execute(view_query, {'t_id': t_id})
-    row = result.fetchone()
-    if row:
-        t.type_session_number = row.type_session_number
-    else:
-        t.type_session_number = None
+    batch = ReadBatch()
+    session_number_result = batch.add(TYPE_SESSION_NUMBER, {'t_id': t_id})
+    ctx = TournamentContext.load(t_id, batch=batch)
+    context_version = standings_cache.version_token(t_id)
+    t.type_session_number = session_number_result.scalar()
     
     # 获取翻页信息
     pagination_info = get_tournament_pagination(t_id)
     
     # fetch matches and group by m_type (ascending)
-    matches = Match.query.filter_by(t_id=t_id).order_by(Match.m_type.asc(), Match.m_id.asc()).all()
+    matches = sorted(ctx.matches, key=lambda m: (m.m_type or 0, m.m_id))
     from collections import OrderedDict
     matches_grouped = OrderedDict()
     for m in matches:
         key = m.m_type or 0
         matches_grouped.setdefault(key, []).append(m)
     # rankings for this tournament
-    rankings = Ranking.query.filter_by(t_id=t_id).order_by(Ranking.ranks).all()
+    rankings = ctx.rankings
     # compute points for group-stage only (小组赛): 胜者+3, 平局+1, 负者不加分
     points = {}
     try:
@@ -2993,48 +3384,27 @@ def tournament_view(t_id):
     # 获取参赛选手信息（用于填写比分和分组设置）
     participants = []
     try:
-        # 优先从小组赛数据中获取参赛选手
-        has_groups = db.session.execute(text("""
-            SELECT COUNT(*) FROM tgroups WHERE t_id = :t_id
-        """), {'t_id': t_id}).fetchone()[0] > 0
+        # 优先从小组赛数据中获取参赛选手，其次从排名表中获取
+        if ctx.groups:
+            participant_ids = [pid for tgp_id, tg_id, pid in ctx.group_members]
+        else:
+            participant_ids = ctx.ranking_player_ids()
+        participant_ids = list(dict.fromkeys(pid for pid in participant_ids if pid in ctx.players))
         
-        if has_groups:
-            # 如果已有小组赛数据，从小组赛中获取参赛选手
-            participants_query = text("""
-                SELECT DISTINCT p.player_id, p.name
+        if ctx.groups or ctx.rankings:
+            names = {pid: ctx.player_name(pid) for pid in participant_ids}
+            participants = [{'player_id': pid, 'name': names[pid]}
+                            for pid in ctx.sort_by_name(participant_ids, names)]
+        else:
+            # 如果还没有排名，从所有选手中选择（只选择参与排名的选手）
+            # 对于分组设置，我们需要获取所有可用选手
+            participants_result = db.session.execute(text("""
+                SELECT p.player_id, p.name
                 FROM players p
-                JOIN tg_players tgp ON p.player_id = tgp.player_id
-                JOIN tgroups tg ON tgp.tg_id = tg.tg_id
-                WHERE tg.t_id = :t_id
+                WHERE p.status IN (1, 2)
                 ORDER BY p.name
-            """)
-        else:
-            # 检查该赛事是否已有排名数据
-            has_rankings = db.session.execute(text("""
-                SELECT COUNT(*) FROM rankings WHERE t_id = :t_id
-            """), {'t_id': t_id}).fetchone()[0] > 0
-            
-            if has_rankings:
-                # 如果已有排名，从排名表中获取参赛选手
-                participants_query = text("""
-                    SELECT DISTINCT p.player_id, p.name
-                    FROM players p
-                    JOIN rankings r ON p.player_id = r.player_id
-                    WHERE r.t_id = :t_id
-                    ORDER BY p.name
-                """)
-            else:
-                # 如果还没有排名，从所有选手中选择（只选择参与排名的选手）
-                # 对于分组设置，我们需要获取所有可用选手
-                participants_query = text("""
-                    SELECT p.player_id, p.name
-                    FROM players p
-                    WHERE p.status IN (1, 2)
-                    ORDER BY p.name
-                """)
-        
-        participants_result = db.session.execute(participants_query, {'t_id': t_id}).fetchall()
-        participants = [{'player_id': row[0], 'name': row[1]} for row in participants_result]
+            """)).fetchall()
+            participants = [{'player_id': row[0], 'name': row[1]} for row in participants_result]
         
         # 如果分组设置需要更多选手，确保有足够的选手
         if t.player_count > len(participants):
@@ -3050,19 +3420,14 @@ def tournament_view(t_id):
     try:
         # 检查是否是单循环赛制（t_format = 1 表示单循环）或苏超赛制（t_format = 6）
         if t.t_format in [1, 6]:
-            round_robin_standings = calculate_round_robin_standings(t_id)
+            round_robin_standings = calculate_round_robin_standings(t_id, ctx=ctx)
         
         # 如果是支持小组赛的赛事（type = 1, 2, 3），计算淘汰赛阶段
         if t.type in [1, 2, 3]:
             # 特殊处理：赛事24使用特殊淘汰赛阶段
             if t_id == 24:
                 # 检查特殊淘汰赛是否存在，如果不存在才生成
-                from sqlalchemy import text
-                knockout_check_query = text("""
-                    SELECT COUNT(*) FROM matches 
-                    WHERE t_id = :t_id AND m_type IN (9, 10, 11, 12)
-                """)
-                knockout_count = db.session.execute(knockout_check_query, {'t_id': t_id}).fetchone()[0]
+                knockout_count = len(ctx.matches_of_types((9, 10, 11, 12)))
                 
                 if knockout_count == 0:
                     # 没有特殊淘汰赛，生成新的
@@ -3072,25 +3437,28 @@ def tournament_view(t_id):
             else:
                 # 其他小赛使用标准淘汰赛
                 # 不在这里自动生成淘汰赛，等当前阶段完成后再生成
-                minor_knockout_data = calculate_minor_tournament_knockout(t_id)
+                minor_knockout_data = calculate_minor_tournament_knockout(t_id, ctx=ctx)
     except Exception as e:
         print(f"计算排名失败: {e}")
     
-    # 重新获取比赛数据，以防特殊淘汰赛生成时删除了旧的对阵
-    matches = Match.query.filter_by(t_id=t_id).order_by(Match.m_type.asc(), Match.m_id.asc()).all()
-    matches_grouped = OrderedDict()
-    for m in matches:
-        key = m.m_type or 0
-        matches_grouped.setdefault(key, []).append(m)
+    # 淘汰赛生成或排名写入后数据版本会变化，此时重新加载快照（以防特殊淘汰赛生成时删除了旧的对阵）
+    if standings_cache.version_token(t_id) != context_version:
+        ctx = TournamentContext.load(t_id)
+        rankings = ctx.rankings
+        matches = sorted(ctx.matches, key=lambda m: (m.m_type or 0, m.m_id))
+        matches_grouped = OrderedDict()
+        for m in matches:
+            key = m.m_type or 0
+            matches_grouped.setdefault(key, []).append(m)
     
     # 获取小组赛数据（大赛、小赛和总决赛都支持小组赛显示）
     group_stage_data = None
     top8_players = []
     if t.type in [1, 2, 3]:  # 大赛、小赛和总决赛都支持小组赛显示
-        groups = get_tournament_groups(t_id)
+        groups = get_tournament_groups(t_id, ctx=ctx)
         if groups:
             # 计算总排名
-            total_rankings = calculate_total_group_rankings(t_id)
+            total_rankings = calculate_total_group_rankings(t_id, ctx=ctx)
             
             # 获取总排名前8名选手（用于1/4决赛手动指定位次）
             all_players = []
@@ -3107,17 +3475,17 @@ def tournament_view(t_id):
             }
         elif t.type == 2:  # 小赛没有分组数据时，创建虚拟分组显示所有比赛
             # 为小赛创建单循环显示
-            single_round_robin_data = create_single_round_robin_display(t_id)
+            single_round_robin_data = create_single_round_robin_display(t_id, ctx=ctx)
             if single_round_robin_data:
                 group_stage_data = single_round_robin_data
         elif t.type == 1 and t.t_format in [4, 5, 6]:  # 大赛单循环/双循环赛/苏超赛制
             # 为大赛的单循环/双循环赛/苏超赛制创建虚拟分组显示
-            single_round_robin_data = create_single_round_robin_display(t_id)
+            single_round_robin_data = create_single_round_robin_display(t_id, ctx=ctx)
             if single_round_robin_data:
                 group_stage_data = single_round_robin_data
     
     # 获取淘汰赛数据（通用，支持所有赛制）
-    knockout_matches = calculate_knockout_matches(t_id)
+    knockout_matches = calculate_knockout_matches(t_id, ctx=ctx)
     
     # 获取当前用户信息
     current_user = None
@@ -3188,6 +3556,7 @@ def generate_group_names(groups_count):
 def create_tournament_groups(t_id, group_size, group_names):
     """创建赛事分组"""
     from sqlalchemy import text
+    mark_tournament_changed(t_id)
     
     # 删除现有分组
     db.session.execute(text("DELETE FROM tg_players WHERE tg_id IN (SELECT tg_id FROM tgroups WHERE t_id = :t_id)"), {'t_id': t_id})
@@ -3201,27 +3570,27 @@ def create_tournament_groups(t_id, group_size, group_names):
     db.session.commit()
     return True
 
-def get_tournament_groups(t_id):
+@cached(scope='tournament')
+def get_tournament_groups(t_id, ctx=None):
     """获取赛事的所有分组，包括选手和比赛数据"""
-    from sqlalchemy import text
-    
-    # 获取分组信息
-    query = text("""
-        SELECT tg.tg_id, tg.t_name, COUNT(tgp.player_id) as current_player_count
-        FROM tgroups tg
-        LEFT JOIN tg_players tgp ON tg.tg_id = tgp.tg_id
-        WHERE tg.t_id = :t_id
-        GROUP BY tg.tg_id, tg.t_name
-        ORDER BY tg.t_name
-    """)
-    
-    result = db.session.execute(query, {'t_id': t_id}).fetchall()
+    if ctx is None:
+        ctx = TournamentContext.load(t_id)
+    
+    # 获取分组信息（组名、当前人数）
+    result = [
+        (group['tg_id'], group['t_name'],
+         len([pid for pid in ctx.group_player_ids(group['tg_id']) if pid is not None]))
+        for group in ctx.groups
+    ]
     groups = []
     
+    # 小组赛比赛（含负分），用于组内统计
+    group_stage_matches = ctx.scored_matches((1, 2, 3))
+    
     # 获取赛事总人数和分组数，计算每组应该有多少人
-    tournament = db.session.get(Tournament, t_id)
+    tournament = ctx.tournament
     if tournament and result:
-        total_players = tournament.player_count
+        total_players = tournament['player_count']
         group_count = len(result)
         expected_group_size = total_players // group_count
         remaining_players = total_players % group_count
@@ -3237,63 +3606,34 @@ def get_tournament_groups(t_id):
             t_name = row[1]
             
             # 获取该分组的选手信息，直接从比赛结果计算统计数据
-            players_query = text("""
-                SELECT p.player_id, p.name,
-                       COALESCE(stats.wins, 0) as wins,
-                       COALESCE(stats.losses, 0) as losses,
-                       COALESCE(stats.draws, 0) as draws,
-                       COALESCE(stats.goals_for, 0) as goals_for,
-                       COALESCE(stats.goals_against, 0) as goals_against
-                FROM tg_players tgp
-                JOIN players p ON tgp.player_id = p.player_id
-                LEFT JOIN (
-                    SELECT 
-                        player_id,
-                        SUM(wins) as wins,
-                        SUM(losses) as losses,
-                        SUM(draws) as draws,
-                        SUM(goals_for) as goals_for,
-                        SUM(goals_against) as goals_against
-                    FROM (
-                        SELECT 
-                            player_1_id as player_id,
-                            CASE WHEN player_1_score > player_2_score THEN 1 ELSE 0 END as wins,
-                            CASE WHEN player_1_score < player_2_score THEN 1 ELSE 0 END as losses,
-                            CASE WHEN player_1_score = player_2_score AND player_1_score > 0 THEN 1 ELSE 0 END as draws,
-                            player_1_score as goals_for,
-                            player_2_score as goals_against
-                        FROM matches 
-                        WHERE t_id = :t_id AND m_type IN (1, 2, 3) 
-                        AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
-                        AND player_1_id IN (SELECT player_id FROM tg_players WHERE tg_id = :tg_id)
-                        
-                        UNION ALL
-                        
-                        SELECT 
-                            player_2_id as player_id,
-                            CASE WHEN player_2_score > player_1_score THEN 1 ELSE 0 END as wins,
-                            CASE WHEN player_2_score < player_1_score THEN 1 ELSE 0 END as losses,
-                            CASE WHEN player_1_score = player_2_score AND player_1_score > 0 THEN 1 ELSE 0 END as draws,
-                            player_2_score as goals_for,
-                            player_1_score as goals_against
-                        FROM matches 
-                        WHERE t_id = :t_id AND m_type IN (1, 2, 3) 
-                        AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
-                        AND player_2_id IN (SELECT player_id FROM tg_players WHERE tg_id = :tg_id)
-                    ) match_stats
-                    GROUP BY player_id
-                ) stats ON p.player_id = stats.player_id
-                WHERE tgp.tg_id = :tg_id
-                ORDER BY tgp.tgp_id ASC
-            """)
-            
-            players_result = db.session.execute(players_query, {'t_id': t_id, 'tg_id': tg_id}).fetchall()
+            players_result = []
+            for player_id in ctx.group_player_ids(tg_id):
+                if player_id not in ctx.players:
+                    continue
+                wins = losses = draws = goals_for = goals_against = 0
+                for m in group_stage_matches:
+                    if m.player_1_id == player_id:
+                        own_score, opponent_score = m.player_1_score, m.player_2_score
+                    elif m.player_2_id == player_id:
+                        own_score, opponent_score = m.player_2_score, m.player_1_score
+                    else:
+                        continue
+                    if own_score > opponent_score:
+                        wins += 1
+                    elif own_score < opponent_score:
+                        losses += 1
+                    elif own_score > 0:
+                        draws += 1
+                    goals_for += own_score
+                    goals_against += opponent_score
+                players_result.append((player_id, ctx.player_name(player_id),
+                                       wins, losses, draws, goals_for, goals_against))
             
             # 先计算组内排名
             group_players = []
             for player_row in players_result:
                 # 计算该选手需要打的总场次数
-                total_matches = calculate_player_total_matches(t_id, player_row[0])
+                total_matches = calculate_player_total_matches(t_id, player_row[0], ctx=ctx)
                 
                 player_data = {
                     'player_id': player_row[0],
@@ -3350,18 +3690,8 @@ def get_tournament_groups(t_id):
         # 现在计算总排名
         from collections import defaultdict
         
-        # 获取所有比赛数据用于计算胜负关系
-        all_matches_query = text("""
-            SELECT player_1_id, player_2_id, player_1_score, player_2_score, m_type
-            FROM matches
-            WHERE t_id = :t_id AND m_type IN (1, 2, 3)
-            AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
-        """)
-        
-        all_matches_result = db.session.execute(all_matches_query, {'t_id': t_id}).fetchall()
-        all_matches = []
-        for match_row in all_matches_result:
-            all_matches.append((match_row[0], match_row[1], match_row[2], match_row[3], match_row[4]))
+        # 小组赛胜负关系索引（沿用原 calculate_head_to_head_result 的比较规则）
+        head_to_head = ctx.cross_group_head_to_head()
         
         # 收集所有选手的排名数据
         all_standings = []
@@ -3388,7 +3718,7 @@ def get_tournament_groups(t_id):
                 
                 # 2. 积分相同，需要计算内部胜负关系
                 # 获取这两个选手之间的比赛记录
-                h2h_result = calculate_head_to_head_result(player1['player_id'], player2['player_id'], all_matches)
+                h2h_result = head_to_head.head_to_head_result(player1['player_id'], player2['player_id'])
                 if h2h_result != 0:
                     return -h2h_result  # 1表示player1胜，返回-1让player1排在前面
                 
@@ -3419,32 +3749,24 @@ def get_tournament_groups(t_id):
         # 构建最终结果
         final_groups = []
         for group in groups:
-            # 获取该分组的比赛信息
-            matches_query = text("""
-                SELECT m.m_id, m.player_1_id, m.player_2_id, m.player_1_score, m.player_2_score,
-                       p1.name as player1_name, p2.name as player2_name, m.m_type
-                FROM matches m
-                JOIN players p1 ON m.player_1_id = p1.player_id
-                JOIN players p2 ON m.player_2_id = p2.player_id
-                WHERE m.t_id = :t_id AND m.m_type IN (1, 2, 3)
-                AND m.player_1_id IN (SELECT player_id FROM tg_players WHERE tg_id = :tg_id)
-                AND m.player_2_id IN (SELECT player_id FROM tg_players WHERE tg_id = :tg_id)
-                ORDER BY m.m_id
-            """)
-            
-            matches_result = db.session.execute(matches_query, {'t_id': t_id, 'tg_id': group['tg_id']}).fetchall()
+            # 获取该分组的比赛信息（双方都在本组）
+            members = set(ctx.group_player_ids(group['tg_id']))
             matches = []
             
-            for match_row in matches_result:
+            for m in ctx.matches_of_types((1, 2, 3)):
+                if m.player_1_id not in members or m.player_2_id not in members:
+                    continue
+                if m.player_1_id not in ctx.players or m.player_2_id not in ctx.players:
+                    continue
                 matches.append({
-                    'm_id': match_row[0],
-                    'player_1_id': match_row[1],
-                    'player_2_id': match_row[2],
-                    'player_1_score': match_row[3] or 0,
-                    'player_2_score': match_row[4] or 0,
-                    'player1': {'name': match_row[5]},
-                    'player2': {'name': match_row[6]},
-                    'm_type': match_row[7]
+                    'm_id': m.m_id,
+                    'player_1_id': m.player_1_id,
+                    'player_2_id': m.player_2_id,
+                    'player_1_score': m.player_1_score or 0,
+                    'player_2_score': m.player_2_score or 0,
+                    'player1': {'name': ctx.player_name(m.player_1_id)},
+                    'player2': {'name': ctx.player_name(m.player_2_id)},
+                    'm_type': m.m_type
                 })
             
             final_groups.append({
@@ -3489,6 +3811,7 @@ def assign_player_to_group(player_id, tg_id):
 def assign_players_to_group(t_id, group_name, player_ids):
     """将多个选手分配到指定分组"""
     from sqlalchemy import text
+    mark_tournament_changed(t_id)
     
     # 获取分组ID
     group_query = text("""
@@ -3510,6 +3833,7 @@ def assign_players_to_group(t_id, group_name, player_ids):
 def clear_tournament_groups_and_matches(t_id):
     """清除赛事的所有分组和比赛"""
     from sqlalchemy import text
+    mark_tournament_changed(t_id)
     
     # 删除比赛
     db.session.execute(text("DELETE FROM matches WHERE t_id = :t_id"), {'t_id': t_id})
@@ -3525,9 +3849,10 @@ def clear_tournament_groups_and_matches(t_id):
     
     db.session.commit()
 
-def generate_group_matches(t_id, round_robin_type='single'):
-    """为所有分组生成比赛场次"""
+def generate_group_matches(t_id, round_robin_type='single', progress=None):
+    """为所有分组生成比赛场次（progress(已完成分组数, 分组总数, 说明) 报告进度）"""
     from sqlalchemy import text
+    mark_tournament_changed(t_id)
     
     # 获取所有分组
     groups_query = text("SELECT tg_id FROM tgroups WHERE t_id = :t_id")
@@ -3535,13 +3860,28 @@ def generate_group_matches(t_id, round_robin_type='single'):
     
     is_double = (round_robin_type == 'double')
     
-    for group_row in groups_result:
+    for index, group_row in enumerate(groups_result):
         tg_id = group_row[0]
         generate_group_round_robin_matches(t_id, tg_id, is_double)
+        if progress is not None:
+            progress(index + 1, len(groups_result), '生成分组场次')
+
+
+@job_runner.task('group_matches')
+def group_matches_job(job):
+    """后台任务：为所有分组生成循环赛场次，再处理退赛选手"""
+    t_id = job.params['t_id']
+    generate_group_matches(t_id, job.params.get('round_robin_type', 'single'), progress=job.progress)
+    withdrawals = job.params.get('withdrawals', [])
+    for withdrawal in withdrawals:
+        handle_player_withdraw(t_id, withdrawal['player_id'], withdrawal['group_name'])
+    db.session.commit()
+    return {'withdrawals': len(withdrawals)}
 
 def handle_player_withdraw(t_id, player_id, group_name):
     """处理选手退赛，自动填充剩余比赛结果"""
     from sqlalchemy import text
+    mark_tournament_changed(t_id)
     
     # 获取分组ID
     group_query = text("""
@@ -3554,18 +3894,18 @@ def handle_player_withdraw(t_id, player_id, group_name):
     
     tg_id = group_result[0]
     
-    # 获取该选手在该组内的所有未完成比赛
+    # 获取该选手在该组内的所有未完成比赛（经比赛长表按 (player_id, t_id) 索引定位）
     matches_query = text("""
-        SELECT m_id, player_1_id, player_2_id 
-        FROM matches 
-        WHERE t_id = :t_id AND m_type IN (1, 2, 3)
-        AND (player_1_id = :player_id OR player_2_id = :player_id)
-        AND (player_1_score IS NULL OR player_2_score IS NULL OR 
-             (player_1_score = 0 AND player_2_score = 0))
-        AND m_id IN (
-            SELECT m.m_id FROM matches m
-            JOIN tg_players tgp1 ON m.player_1_id = tgp1.player_id
-            JOIN tg_players tgp2 ON m.player_2_id = tgp2.player_id
+        SELECT m.m_id, m.player_1_id, m.player_2_id 
+        FROM player_matches pm
+        JOIN matches m ON m.m_id = pm.m_id
+        WHERE pm.player_id = :player_id AND pm.t_id = :t_id AND pm.m_type IN (1, 2, 3)
+        AND (pm.goals_for IS NULL OR pm.goals_against IS NULL OR 
+             (pm.goals_for = 0 AND pm.goals_against = 0))
+        AND m.m_id IN (
+            SELECT gm.m_id FROM matches gm
+            JOIN tg_players tgp1 ON gm.player_1_id = tgp1.player_id
+            JOIN tg_players tgp2 ON gm.player_2_id = tgp2.player_id
             WHERE tgp1.tg_id = :tg_id AND tgp2.tg_id = :tg_id
         )
     """)
@@ -3624,6 +3964,7 @@ def get_group_players(tg_id):
 def generate_group_round_robin_matches(t_id, tg_id, is_double_round_robin=False):
     """为指定分组生成循环赛对阵"""
     from sqlalchemy import text
+    mark_tournament_changed(t_id)
     
     # 获取分组内的选手
     players = get_group_players(tg_id)
@@ -3779,58 +4120,42 @@ def generate_group_round_robin_matches(t_id, tg_id, is_double_round_robin=False)
     db.session.commit()
     return True
 
-def calculate_player_total_matches(t_id, player_id, t_format=None):
+def calculate_player_total_matches(t_id, player_id, t_format=None, ctx=None):
     """计算指定选手在小组赛中需要打的总场次数"""
-    from sqlalchemy import text
+    if ctx is None:
+        ctx = TournamentContext.load(t_id)
     
-    # 如果没有提供t_format，从数据库获取
+    # 如果没有提供t_format，从赛事快照获取
     if t_format is None:
-        tournament_query = text("SELECT t_format FROM tournament WHERE t_id = :t_id")
-        tournament_result = db.session.execute(tournament_query, {'t_id': t_id}).fetchone()
-        if not tournament_result:
+        if not ctx.tournament:
             return 0
-        t_format = tournament_result[0]
+        t_format = ctx.t_format
     
+    return ctx.cached_total_matches(
+        (player_id, t_format),
+        lambda: _calculate_player_total_matches(ctx, player_id, t_format)
+    )
+
+def _calculate_player_total_matches(ctx, player_id, t_format):
+    """基于赛事快照计算选手应赛场次"""
     # 获取该选手所在分组的其他选手数量
     if t_format in [4, 5, 6]:  # 单循环/双循环赛/苏超赛制（大赛）
         # 获取所有参赛选手数量
-        players_query = text("""
-            SELECT COUNT(DISTINCT player_id) as player_count
-            FROM rankings
-            WHERE t_id = :t_id
-        """)
-        player_count = db.session.execute(players_query, {'t_id': t_id}).fetchone()[0]
+        player_count = len(ctx.ranking_player_ids())
     else:
         # 分组赛制，获取该选手所在分组的选手数量
-        group_query = text("""
-            SELECT COUNT(*) as group_player_count
-            FROM tg_players tgp1
-            WHERE tgp1.tg_id = (
-                SELECT tgp2.tg_id 
-                FROM tg_players tgp2 
-                JOIN tgroups tg ON tgp2.tg_id = tg.tg_id
-                WHERE tgp2.player_id = :player_id AND tg.t_id = :t_id
-            )
-        """)
-        result = db.session.execute(group_query, {'player_id': player_id, 't_id': t_id}).fetchone()
-        if not result or result[0] is None:
-            return 0
-        player_count = result[0]
+        player_groups = ctx.groups_of_player(player_id)
+        player_count = ctx.group_member_count(player_groups[0]) if player_groups else 0
     
     # 根据赛制计算每个选手需要打的场次数
     if t_format == 1:  # 小组赛+淘汰赛
         # 检查该选手的小组赛比赛类型，判断是单循环还是双循环
-        group_matches_query = text("""
-            SELECT DISTINCT m_type
-            FROM matches m
-            JOIN tg_players tgp1 ON m.player_1_id = tgp1.player_id
-            JOIN tg_players tgp2 ON m.player_2_id = tgp2.player_id
-            WHERE m.t_id = :t_id AND m.m_type IN (1, 2, 3)
-            AND tgp1.tg_id = tgp2.tg_id
-            AND (m.player_1_id = :player_id OR m.player_2_id = :player_id)
-        """)
-        result = db.session.execute(group_matches_query, {'t_id': t_id, 'player_id': player_id}).fetchall()
-        match_types = [row[0] for row in result]
+        match_types = set()
+        for m in ctx.matches_of_types((1, 2, 3)):
+            if m.player_1_id != player_id and m.player_2_id != player_id:
+                continue
+            if set(ctx.groups_of_player(m.player_1_id)) & set(ctx.groups_of_player(m.player_2_id)):
+                match_types.add(m.m_type)
         
         if len(match_types) > 1:  # 有多个比赛类型，说明是双循环
             total_matches = (player_count - 1) * 2
@@ -3848,32 +4173,29 @@ def calculate_player_total_matches(t_id, player_id, t_format=None):
     
     return total_matches
 
-def calculate_group_standings(t_id, tg_id):
+def calculate_group_standings(t_id, tg_id, ctx=None):
     """计算分组内的排名"""
     # print(f"DEBUG: 开始计算分组 {tg_id} 的排名")
-    from sqlalchemy import text
+    if ctx is None:
+        ctx = TournamentContext.load(t_id)
     
-    # 获取分组内的选手
-    players = get_group_players(tg_id)
+    # 获取分组内的选手（按分配顺序）
+    member_ids = ctx.group_player_ids(tg_id)
+    players = [{'player_id': pid, 'name': ctx.player_name(pid)} for pid in member_ids if pid in ctx.players]
     if not players:
         return []
     
-    # 获取分组内的比赛（包括所有小组赛类型：1=普通，2=主，3=客）
-    query = text("""
-        SELECT m.player_1_id, m.player_2_id, m.player_1_score, m.player_2_score, m.m_type
-        FROM matches m
-        JOIN tg_players tgp1 ON m.player_1_id = tgp1.player_id
-        JOIN tg_players tgp2 ON m.player_2_id = tgp2.player_id
-        WHERE m.t_id = :t_id AND m.m_type IN (1, 2, 3) AND tgp1.tg_id = :tg_id AND tgp2.tg_id = :tg_id
-    """)
-    
-    result = db.session.execute(query, {'t_id': t_id, 'tg_id': tg_id}).fetchall()
+    # 获取分组内的比赛（包括所有小组赛类型：1=普通，2=主，3=客），重复分配的选手按分配次数计入
+    result = []
+    for m in ctx.matches_of_types((1, 2, 3)):
+        multiplicity = member_ids.count(m.player_1_id) * member_ids.count(m.player_2_id)
+        result.extend([(m.player_1_id, m.player_2_id, m.player_1_score, m.player_2_score, m.m_type)] * multiplicity)
     
     # 计算每个选手的统计数据
     standings = {}
     for player in players:
         # 计算该选手需要打的总场次数
-        total_matches = calculate_player_total_matches(t_id, player['player_id'])
+        total_matches = calculate_player_total_matches(t_id, player['player_id'], ctx=ctx)
         
         standings[player['player_id']] = {
             'player_id': player['player_id'],
@@ -3928,81 +4250,21 @@ def calculate_group_standings(t_id, tg_id):
     standings_list = list(standings.values())
     
     # 小组赛同积分排名逻辑
-    def calculate_same_points_ranking(players_with_same_points, all_matches):
+    def calculate_same_points_ranking(players_with_same_points, head_to_head):
         """计算同积分选手的排名"""
-        # print(f"DEBUG: 开始计算同积分选手排名，选手: {[p['name'] for p in players_with_same_points]}")
-        # print(f"DEBUG: 选手ID映射: {[(p['name'], p['player_id']) for p in players_with_same_points]}")
-        
         # 为每个选手计算对同分选手的胜负关系
+        player_ids = [p['player_id'] for p in players_with_same_points]
         for player in players_with_same_points:
-            player_id = player['player_id']
-            h2h_points = 0
-            h2h_wins = 0
-            h2h_draws = 0
-            h2h_losses = 0
-            h2h_goals_for = 0
-            h2h_goals_against = 0
-            
-            # print(f"DEBUG: 计算 {player['name']} 对同分选手的胜负关系")
-            
-            # 遍历所有比赛，找到与同分选手的比赛
-            for match in all_matches:
-                p1_id, p2_id, score_1, score_2, m_type = match
-                if score_1 is None or score_2 is None:
-                    continue
-                
-                    # print(f"DEBUG: 检查比赛 {p1_id}({score_1}) vs {p2_id}({score_2})")
-                
-                # 检查这场比赛是否涉及当前选手和同分选手
-                if p1_id == player_id:
-                    # 当前选手是主队
-                    for other_player in players_with_same_points:
-                        if other_player['player_id'] == p2_id and other_player['player_id'] != player_id:
-                            # print(f"DEBUG: 找到同分选手比赛: {player['name']}({player_id}) vs {other_player['name']}({p2_id})")
-                            h2h_goals_for += score_1
-                            h2h_goals_against += score_2
-                            if score_1 > score_2:
-                                h2h_points += 3
-                                h2h_wins += 1
-                                # print(f"DEBUG: {player['name']} 胜 {other_player['name']} ({score_1}-{score_2})")
-                            elif score_1 == score_2:
-                                h2h_points += 1
-                                h2h_draws += 1
-                                # print(f"DEBUG: {player['name']} 平 {other_player['name']} ({score_1}-{score_2})")
-                            else:
-                                h2h_losses += 1
-                                # print(f"DEBUG: {player['name']} 负 {other_player['name']} ({score_1}-{score_2})")
-                            break
-                elif p2_id == player_id:
-                    # 当前选手是客队
-                    for other_player in players_with_same_points:
-                        if other_player['player_id'] == p1_id and other_player['player_id'] != player_id:
-                            # print(f"DEBUG: 找到同分选手比赛: {player['name']}({player_id}) vs {other_player['name']}({p1_id})")
-                            h2h_goals_for += score_2
-                            h2h_goals_against += score_1
-                            if score_2 > score_1:
-                                h2h_points += 3
-                                h2h_wins += 1
-                                # print(f"DEBUG: {player['name']} 胜 {other_player['name']} ({score_2}-{score_1})")
-                            elif score_1 == score_2:
-                                h2h_points += 1
-                                h2h_draws += 1
-                                # print(f"DEBUG: {player['name']} 平 {other_player['name']} ({score_1}-{score_2})")
-                            else:
-                                h2h_losses += 1
-                                # print(f"DEBUG: {player['name']} 负 {other_player['name']} ({score_1}-{score_2})")
-                            break
+            h2h = head_to_head.totals(player['player_id'], player_ids)
             
             # 保存胜负关系数据
-            player['h2h_points'] = h2h_points
-            player['h2h_wins'] = h2h_wins
-            player['h2h_draws'] = h2h_draws
-            player['h2h_losses'] = h2h_losses
-            player['h2h_goals_for'] = h2h_goals_for
-            player['h2h_goals_against'] = h2h_goals_against
-            player['h2h_goal_difference'] = h2h_goals_for - h2h_goals_against
-            
-            # print(f"DEBUG: {player['name']} 对同分选手: {h2h_points}分 ({h2h_wins}胜{h2h_draws}平{h2h_losses}负), 净胜球:{player['h2h_goal_difference']}")
+            player['h2h_points'] = h2h['points']
+            player['h2h_wins'] = h2h['wins']
+            player['h2h_draws'] = h2h['draws']
+            player['h2h_losses'] = h2h['losses']
+            player['h2h_goals_for'] = h2h['goals_for']
+            player['h2h_goals_against'] = h2h['goals_against']
+            player['h2h_goal_difference'] = h2h['goals_for'] - h2h['goals_against']
         
         # 按照胜负关系排序：积分 -> 相互胜负关系 -> 净胜球 -> 总进球
         def compare_h2h(player1, player2):
@@ -4010,42 +4272,10 @@ def calculate_group_standings(t_id, tg_id):
             if player1['h2h_points'] != player2['h2h_points']:
                 return player2['h2h_points'] - player1['h2h_points']
             
-            # 2. 胜负关系积分相同时，比较相互之间的胜负关系
-            # print(f"DEBUG: 比较相互胜负关系: {player1['name']} vs {player2['name']}")
-            
-            # 查找两人之间的直接比赛
-            for match in all_matches:
-                p1_id, p2_id, score_1, score_2, m_type = match
-                if score_1 is None or score_2 is None:
-                    continue
-                
-                # 找到两人之间的比赛
-                if (p1_id == player1['player_id'] and p2_id == player2['player_id']) or \
-                   (p1_id == player2['player_id'] and p2_id == player1['player_id']):
-                    # print(f"DEBUG: 找到直接比赛: {p1_id}({score_1}) vs {p2_id}({score_2})")
-                    
-                    if p1_id == player1['player_id']:
-                        # player1是主队
-                        if score_1 > score_2:
-                            # print(f"DEBUG: {player1['name']} 胜 {player2['name']}")
-                            return -1  # player1排在前面
-                        elif score_2 > score_1:
-                            # print(f"DEBUG: {player2['name']} 胜 {player1['name']}")
-                            return 1   # player2排在前面
-                        else:
-                            # print(f"DEBUG: {player1['name']} 平 {player2['name']}")
-                            break  # 平局，继续比较其他指标
-                    else:
-                        # player1是客队
-                        if score_2 > score_1:
-                            # print(f"DEBUG: {player1['name']} 胜 {player2['name']}")
-                            return -1  # player1排在前面
-                        elif score_1 > score_2:
-                            # print(f"DEBUG: {player2['name']} 胜 {player1['name']}")
-                            return 1   # player2排在前面
-                        else:
-                            # print(f"DEBUG: {player1['name']} 平 {player2['name']}")
-                            break  # 平局，继续比较其他指标
+            # 2. 胜负关系积分相同时，比较两人首场交手的胜负（平局继续比较其他指标）
+            first_result = head_to_head.first_result(player1['player_id'], player2['player_id'])
+            if first_result != 0:
+                return -first_result  # 1表示player1胜，返回-1让player1排在前面
             
             # 3. 相互胜负关系相同（平局或未交手），比较总净胜球
             if player1['goal_difference'] != player2['goal_difference']:
@@ -4073,6 +4303,9 @@ def calculate_group_standings(t_id, tg_id):
         
         return players_with_same_points
     
+    # 组内交手索引（与上面的比赛列表一致，按分配次数计入）
+    head_to_head = HeadToHeadIndex(result)
+    
     # 按积分分组，对同积分选手进行特殊排序
     from collections import defaultdict
     points_groups = defaultdict(list)
@@ -4089,7 +4322,7 @@ def calculate_group_standings(t_id, tg_id):
             final_standings.extend(group)
         else:
             # 多个选手同积分，需要计算胜负关系
-            ranked_group = calculate_same_points_ranking(group, result)
+            ranked_group = calculate_same_points_ranking(group, head_to_head)
             final_standings.extend(ranked_group)
     
     standings_list = final_standings
@@ -4101,19 +4334,21 @@ def calculate_group_standings(t_id, tg_id):
     
     return standings_list
 
-def calculate_total_group_rankings(t_id):
+@cached(scope='tournament')
+def calculate_total_group_rankings(t_id, ctx=None):
     """计算所有小组的总排名"""
-    from sqlalchemy import text
+    if ctx is None:
+        ctx = TournamentContext.load(t_id)
     
     # 获取所有小组
-    groups = get_tournament_groups(t_id)
+    groups = get_tournament_groups(t_id, ctx=ctx)
     if not groups:
         return {}
     
     # 收集所有选手的排名数据
     all_standings = []
     for group in groups:
-        group_standings = calculate_group_standings(t_id, group['tg_id'])
+        group_standings = calculate_group_standings(t_id, group['tg_id'], ctx=ctx)
         for i, standing in enumerate(group_standings):
             standing['group_name'] = group['t_name']
             standing['group_rank'] = i + 1
@@ -4123,18 +4358,8 @@ def calculate_total_group_rankings(t_id):
     from collections import defaultdict
     rank_groups = defaultdict(list)
     
-    # 获取所有比赛数据用于计算胜负关系
-    all_matches_query = text("""
-        SELECT player_1_id, player_2_id, player_1_score, player_2_score, m_type
-        FROM matches
-        WHERE t_id = :t_id AND m_type IN (1, 2, 3)
-        AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
-    """)
-    
-    all_matches_result = db.session.execute(all_matches_query, {'t_id': t_id}).fetchall()
-    matches = []
-    for match_row in all_matches_result:
-        matches.append((match_row[0], match_row[1], match_row[2], match_row[3], match_row[4]))
+    # 小组赛胜负关系索引（沿用原 calculate_head_to_head_result 的比较规则）
+    head_to_head = ctx.cross_group_head_to_head()
     
     for player in all_standings:
         rank_groups[player['group_rank']].append(player)
@@ -4156,7 +4381,7 @@ def calculate_total_group_rankings(t_id):
             
             # 3. 净胜分相同，比较内部胜负关系
             # 获取这两个选手之间的比赛记录
-            h2h_result = calculate_head_to_head_result(player1['player_id'], player2['player_id'], matches)
+            h2h_result = head_to_head.head_to_head_result(player1['player_id'], player2['player_id'])
             if h2h_result != 0:
                 return -h2h_result  # 1表示player1胜，返回-1让player1排在前面
             
@@ -4240,17 +4465,19 @@ def set_group_stage():
                 group_name = group_names[group_number - 1]
                 assign_players_to_group(t_id, group_name, player_ids)
         
-        # 生成比赛场次
-        generate_group_matches(t_id, round_robin_type)
-        
-        # 处理退赛选手
+        # 生成比赛场次、处理退赛选手（后台任务）
+        withdrawals = []
         for withdraw_data in withdraw_players:
             player_id = withdraw_data['player_id']
             group_number = withdraw_data['group_number']
             
             if group_number <= len(group_names):
                 group_name = group_names[group_number - 1]
-                handle_player_withdraw(t_id, player_id, group_name)
+                withdrawals.append({'player_id': player_id, 'group_name': group_name})
+        db.session.commit()
+        job_id = job_runner.enqueue('group_matches', {
+            't_id': t_id, 'round_robin_type': round_robin_type, 'withdrawals': withdrawals
+        })
         
         # 如果设置了1/4决赛格式，生成淘汰赛
         if quarterfinal_format and tournament.t_format in [1, 3]:
@@ -4263,9 +4490,11 @@ def set_group_stage():
         
         return jsonify({
             'success': True, 
-            'message': f'成功创建{group_info["groups_count"]}个分组并分配选手',
+            'message': f'成功创建{group_info["groups_count"]}个分组并分配选手，正在生成比赛场次',
             'group_info': group_info,
-            'group_names': group_names
+            'group_names': group_names,
+            'job_id': job_id,
+            'job_url': url_for('admin_job_status', job_id=job_id)
         })
         
     except Exception as e:
@@ -4289,18 +4518,18 @@ def check_player_matches():
     try:
         from sqlalchemy import text
         
-        # 检查选手是否在指定组有交手记录
+        # 检查选手是否在指定组有交手记录（比赛长表中该选手的行，对手也须在该组）
         matches_query = text("""
             SELECT COUNT(*) as match_count
-            FROM matches m
-            JOIN tg_players tgp1 ON m.player_1_id = tgp1.player_id
-            JOIN tg_players tgp2 ON m.player_2_id = tgp2.player_id
-            WHERE m.t_id = :tournament_id 
-            AND m.m_type IN (1, 2, 3)
-            AND (m.player_1_id = :player_id OR m.player_2_id = :player_id)
+            FROM player_matches pm
+            JOIN tg_players tgp1 ON pm.player_id = tgp1.player_id
+            JOIN tg_players tgp2 ON pm.opponent_id = tgp2.player_id
+            WHERE pm.player_id = :player_id
+            AND pm.t_id = :tournament_id 
+            AND pm.m_type IN (1, 2, 3)
             AND tgp1.tg_id = :group_id AND tgp2.tg_id = :group_id
-            AND (m.player_1_score IS NOT NULL AND m.player_2_score IS NOT NULL)
-            AND NOT (m.player_1_score = 0 AND m.player_2_score = 0)
+            AND (pm.goals_for IS NOT NULL AND pm.goals_against IS NOT NULL)
+            AND NOT (pm.goals_for = 0 AND pm.goals_against = 0)
         """)
         
         result = db.session.execute(matches_query, {
@@ -4410,13 +4639,16 @@ def assign_players_to_groups_api(t_id):
             if not success:
                 raise Exception(f"无法找到分组: {group_name}")
         
-        # 生成比赛场次
+        # 生成比赛场次（后台任务）
         round_robin_type = 'single'  # 默认单循环，可以根据需要调整
-        generate_group_matches(t_id, round_robin_type)
+        db.session.commit()
+        job_id = job_runner.enqueue('group_matches', {'t_id': t_id, 'round_robin_type': round_robin_type})
         
         return jsonify({
             'success': True, 
-            'message': '选手分组成功'
+            'message': '选手分组成功，正在生成比赛场次',
+            'job_id': job_id,
+            'job_url': url_for('admin_job_status', job_id=job_id)
         })
         
     except Exception as e:
@@ -4438,24 +4670,161 @@ def get_tournament_players_api(t_id):
             ORDER BY p.name
         """)
         
-        players_result = db.session.execute(players_query).fetchall()
+        players_result = db.session.execute(players_query).fetchall()
+        players = [{'player_id': row[0], 'name': row[1]} for row in players_result]
+        
+        return jsonify({
+            'success': True,
+            'players': players
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'获取选手数据失败: {str(e)}'}), 500
+
+@job_runner.task('set_participants')
+def set_participants_job(job):
+    """后台任务：写入大赛的参赛选手并按赛制生成场次"""
+    from sqlalchemy import text
+    
+    t_id = job.params['t_id']
+    player_ids = job.params['player_ids']
+    tournament = db.session.get(Tournament, t_id)
+    match_count = 0
+    matches_error = None
+    
+    print("开始清空现有排名数据...")
+    # 清空现有排名数据
+    delete_rankings_query = text("DELETE FROM rankings WHERE t_id = :t_id")
+    db.session.execute(delete_rankings_query, {'t_id': t_id})
+    
+    print("开始插入新的排名数据...")
+    # 插入新的排名数据
+    for i, player_id in enumerate(player_ids):
+        print(f"插入选手 {i+1}: player_id={player_id}")
+        insert_ranking_query = text("""
+            INSERT INTO rankings (t_id, player_id, ranks, scores)
+            VALUES (:t_id, :player_id, :ranks, 0)
+        """)
+        db.session.execute(insert_ranking_query, {
+            't_id': t_id,
+            'player_id': player_id,
+            'ranks': i + 1
+        })
+    
+    print("提交数据库事务...")
+    db.session.commit()
+    
+    # 自动生成场次
+    print("开始自动生成场次...")
+    try:
+        # 获取所有参赛选手
+        players_query = text("""
+            SELECT DISTINCT p.player_id, p.name
+            FROM players p
+            JOIN rankings r ON p.player_id = r.player_id
+            WHERE r.t_id = :t_id
+            ORDER BY p.name
+        """)
+        
+        players_result = db.session.execute(players_query, {'t_id': t_id}).fetchall()
         players = [{'player_id': row[0], 'name': row[1]} for row in players_result]
-        
-        return jsonify({
-            'success': True,
-            'players': players
-        })
-        
+        print(f"获取到 {len(players)} 名参赛选手")
+        
+        if len(players) >= 2:
+            # 清空现有场次
+            print("清空现有场次...")
+            delete_query = text("DELETE FROM matches WHERE t_id = :t_id")
+            delete_result = db.session.execute(delete_query, {'t_id': t_id})
+            print(f"删除了 {delete_result.rowcount} 场现有场次")
+            
+            # 根据赛事格式生成场次
+            new_matches = []
+            print(f"赛事格式: {tournament.t_format}")
+            
+            if tournament.t_format == 4:  # 单循环赛
+                print("生成单循环赛场次...")
+                # 生成单循环赛场次
+                for i in range(len(players)):
+                    for j in range(i + 1, len(players)):
+                        player1 = players[i]
+                        player2 = players[j]
+                        new_matches.append({
+                            'player_1_id': player1['player_id'],
+                            'player_2_id': player2['player_id'],
+                            'm_type': 1  # 小组赛（普通）
+                        })
+            elif tournament.t_format == 5:  # 双循环赛
+                print("生成双循环赛场次...")
+                # 生成双循环赛场次
+                # 主场比赛
+                for i in range(len(players)):
+                    for j in range(i + 1, len(players)):
+                        player1 = players[i]
+                        player2 = players[j]
+                        new_matches.append({
+                            'player_1_id': player1['player_id'],
+                            'player_2_id': player2['player_id'],
+                            'm_type': 2  # 小组赛（主）
+                        })
+                # 客场比赛
+                for i in range(len(players)):
+                    for j in range(i + 1, len(players)):
+                        player1 = players[i]
+                        player2 = players[j]
+                        new_matches.append({
+                            'player_1_id': player1['player_id'],
+                            'player_2_id': player2['player_id'],
+                            'm_type': 3  # 小组赛（客）
+                        })
+            elif tournament.t_format == 6:  # 苏超赛制
+                # 苏超赛制不在这里生成场次，需要用户手动选择主客场
+                print("苏超赛制需要用户手动选择主客场，不自动生成场次")
+                new_matches = []
+            
+            print(f"准备插入 {len(new_matches)} 场新场次")
+            
+            # 插入新场次
+            for i, match in enumerate(new_matches):
+                try:
+                    insert_query = text("""
+                        INSERT INTO matches (t_id, player_1_id, player_2_id, player_1_score, player_2_score, m_type)
+                        VALUES (:t_id, :player_1_id, :player_2_id, -1, -1, :m_type)
+                    """)
+                    db.session.execute(insert_query, {
+                        't_id': t_id,
+                        'player_1_id': match['player_1_id'],
+                        'player_2_id': match['player_2_id'],
+                        'm_type': match['m_type']
+                    })
+                    if (i + 1) % 10 == 0:  # 每10场打印一次进度
+                        print(f"已插入 {i + 1} 场次...")
+                    job.progress(i + 1, len(new_matches), '生成场次')
+                except Exception as match_error:
+                    print(f"插入第 {i + 1} 场次时出错: {str(match_error)}")
+                    raise match_error
+            
+            print("提交数据库事务...")
+            db.session.commit()
+            match_count = len(new_matches)
+            print(f"成功生成 {len(new_matches)} 场次")
+        else:
+            print("选手数量不足，跳过场次生成")
+            
     except Exception as e:
-        return jsonify({'success': False, 'error': f'获取选手数据失败: {str(e)}'}), 500
+        print(f"生成场次时出错: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        db.session.rollback()
+        matches_error = str(e)
+        # 不抛出异常，因为选手设置已经成功
+    
+    return {'player_count': len(player_ids), 'match_count': match_count, 'matches_error': matches_error}
 
 @app.route('/admin-secret/tournaments/set-participants', methods=['POST'])
 @admin_required
 def set_tournament_participants():
-    """设置大赛的参赛选手"""
+    """设置大赛的参赛选手（写入选手与生成场次在后台任务中执行）"""
     try:
-        from sqlalchemy import text
-        
         print("=== set_tournament_participants 开始 ===")
         data = request.get_json()
         print(f"接收到的数据: {data}")
@@ -4489,133 +4858,13 @@ def set_tournament_participants():
             print(f"错误：赛事格式不支持，当前格式: {tournament.t_format}")
             return jsonify({'success': False, 'error': '只有单循环/双循环赛/苏超赛制才能使用此功能'})
         
-        print("开始清空现有排名数据...")
-        # 清空现有排名数据
-        delete_rankings_query = text("DELETE FROM rankings WHERE t_id = :t_id")
-        db.session.execute(delete_rankings_query, {'t_id': t_id})
-        
-        print("开始插入新的排名数据...")
-        # 插入新的排名数据
-        for i, player_id in enumerate(player_ids):
-            print(f"插入选手 {i+1}: player_id={player_id}")
-            insert_ranking_query = text("""
-                INSERT INTO rankings (t_id, player_id, ranks, scores)
-                VALUES (:t_id, :player_id, :ranks, 0)
-            """)
-            db.session.execute(insert_ranking_query, {
-                't_id': t_id,
-                'player_id': player_id,
-                'ranks': i + 1
-            })
-        
-        print("提交数据库事务...")
-        db.session.commit()
-        
-        # 自动生成场次
-        print("开始自动生成场次...")
-        try:
-            # 获取所有参赛选手
-            players_query = text("""
-                SELECT DISTINCT p.player_id, p.name
-                FROM players p
-                JOIN rankings r ON p.player_id = r.player_id
-                WHERE r.t_id = :t_id
-                ORDER BY p.name
-            """)
-            
-            players_result = db.session.execute(players_query, {'t_id': t_id}).fetchall()
-            players = [{'player_id': row[0], 'name': row[1]} for row in players_result]
-            print(f"获取到 {len(players)} 名参赛选手")
-            
-            if len(players) >= 2:
-                # 清空现有场次
-                print("清空现有场次...")
-                delete_query = text("DELETE FROM matches WHERE t_id = :t_id")
-                delete_result = db.session.execute(delete_query, {'t_id': t_id})
-                print(f"删除了 {delete_result.rowcount} 场现有场次")
-                
-                # 根据赛事格式生成场次
-                new_matches = []
-                print(f"赛事格式: {tournament.t_format}")
-                
-                if tournament.t_format == 4:  # 单循环赛
-                    print("生成单循环赛场次...")
-                    # 生成单循环赛场次
-                    for i in range(len(players)):
-                        for j in range(i + 1, len(players)):
-                            player1 = players[i]
-                            player2 = players[j]
-                            new_matches.append({
-                                'player_1_id': player1['player_id'],
-                                'player_2_id': player2['player_id'],
-                                'm_type': 1  # 小组赛（普通）
-                            })
-                elif tournament.t_format == 5:  # 双循环赛
-                    print("生成双循环赛场次...")
-                    # 生成双循环赛场次
-                    # 主场比赛
-                    for i in range(len(players)):
-                        for j in range(i + 1, len(players)):
-                            player1 = players[i]
-                            player2 = players[j]
-                            new_matches.append({
-                                'player_1_id': player1['player_id'],
-                                'player_2_id': player2['player_id'],
-                                'm_type': 2  # 小组赛（主）
-                            })
-                    # 客场比赛
-                    for i in range(len(players)):
-                        for j in range(i + 1, len(players)):
-                            player1 = players[i]
-                            player2 = players[j]
-                            new_matches.append({
-                                'player_1_id': player1['player_id'],
-                                'player_2_id': player2['player_id'],
-                                'm_type': 3  # 小组赛（客）
-                            })
-                elif tournament.t_format == 6:  # 苏超赛制
-                    # 苏超赛制不在这里生成场次，需要用户手动选择主客场
-                    print("苏超赛制需要用户手动选择主客场，不自动生成场次")
-                    new_matches = []
-                
-                print(f"准备插入 {len(new_matches)} 场新场次")
-                
-                # 插入新场次
-                for i, match in enumerate(new_matches):
-                    try:
-                        insert_query = text("""
-                            INSERT INTO matches (t_id, player_1_id, player_2_id, player_1_score, player_2_score, m_type)
-                            VALUES (:t_id, :player_1_id, :player_2_id, -1, -1, :m_type)
-                        """)
-                        db.session.execute(insert_query, {
-                            't_id': t_id,
-                            'player_1_id': match['player_1_id'],
-                            'player_2_id': match['player_2_id'],
-                            'm_type': match['m_type']
-                        })
-                        if (i + 1) % 10 == 0:  # 每10场打印一次进度
-                            print(f"已插入 {i + 1} 场次...")
-                    except Exception as match_error:
-                        print(f"插入第 {i + 1} 场次时出错: {str(match_error)}")
-                        raise match_error
-                
-                print("提交数据库事务...")
-                db.session.commit()
-                print(f"成功生成 {len(new_matches)} 场次")
-            else:
-                print("选手数量不足，跳过场次生成")
-                
-        except Exception as e:
-            print(f"生成场次时出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            db.session.rollback()
-            # 不抛出异常，因为选手设置已经成功
-        
-        print("=== set_tournament_participants 成功 ===")
+        job_id = job_runner.enqueue('set_participants', {'t_id': t_id, 'player_ids': player_ids})
+        print(f"=== set_tournament_participants 已提交后台任务 {job_id} ===")
         return jsonify({
             'success': True, 
-            'message': f'成功设置{len(player_ids)}名参赛选手并生成单循环赛场次'
+            'message': f'正在设置{len(player_ids)}名参赛选手并生成单循环赛场次',
+            'job_id': job_id,
+            'job_url': url_for('admin_job_status', job_id=job_id)
         })
         
     except Exception as e:
@@ -4625,6 +4874,104 @@ def set_tournament_participants():
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)})
 
+@job_runner.task('jiangsu_premier_league_matches')
+def jiangsu_premier_league_matches_job(job):
+    """后台任务：按主客场选择生成苏超赛制场次（参数已在请求中校验）"""
+    from sqlalchemy import text
+    
+    t_id = job.params['t_id']
+    home_away_data = job.params['home_away_data']
+    
+    players_query = text("""
+        SELECT DISTINCT player_id
+        FROM rankings
+        WHERE t_id = :t_id
+        ORDER BY player_id
+    """)
+    all_player_ids = [row[0] for row in db.session.execute(players_query, {'t_id': t_id}).fetchall()]
+    player_count = len(all_player_ids)
+    expected_home_matches = (player_count - 1) // 2
+    
+    # 清空现有场次
+    delete_query = text("DELETE FROM matches WHERE t_id = :t_id")
+    db.session.execute(delete_query, {'t_id': t_id})
+    
+    # 实现苏超赛制逻辑
+    new_matches = []
+    processed_pairs = set()
+    
+    # 统计每个选手被选为主场对手的次数
+    home_selected_count = {player_id: 0 for player_id in all_player_ids}
+    
+    # 处理用户选择的主场对手
+    for player_id, home_opponents in home_away_data.items():
+        player_id = int(player_id)
+        
+        # 生成主场场次（该选手作为player_1）
+        for opponent_id in home_opponents:
+            pair = tuple(sorted([player_id, opponent_id]))
+            if pair not in processed_pairs:
+                new_matches.append({
+                    'player_1_id': player_id,
+                    'player_2_id': opponent_id,
+                    'm_type': 2  # 小组赛（主）
+                })
+                processed_pairs.add(pair)
+                home_selected_count[opponent_id] += 1
+    
+    # 自动分配剩余场次
+    while len(processed_pairs) < player_count * (player_count - 1) // 2:
+        # 找到已经被(n-1)/2个其他选手选为主场对手的选手
+        candidates = [player_id for player_id in all_player_ids 
+                     if home_selected_count[player_id] == expected_home_matches]
+        
+        if not candidates:
+            # 如果没有符合条件的选手，选择被选次数最少的选手
+            min_count = min(home_selected_count.values())
+            candidates = [player_id for player_id in all_player_ids 
+                         if home_selected_count[player_id] == min_count]
+        
+        # 选择第一个候选选手
+        current_player = candidates[0]
+        
+        # 找到该选手还没有比赛的对手
+        played_opponents = set()
+        for pair in processed_pairs:
+            if current_player in pair:
+                played_opponents.add(pair[0] if pair[1] == current_player else pair[1])
+        
+        remaining_opponents = set(all_player_ids) - {current_player} - played_opponents
+        
+        # 为该选手自动分配剩余场次（作为主场）
+        for opponent_id in remaining_opponents:
+            pair = tuple(sorted([current_player, opponent_id]))
+            if pair not in processed_pairs:
+                new_matches.append({
+                    'player_1_id': current_player,
+                    'player_2_id': opponent_id,
+                    'm_type': 2  # 小组赛（主）
+                })
+                processed_pairs.add(pair)
+                home_selected_count[opponent_id] += 1
+                break  # 一次只分配一场
+    
+    # 插入新场次
+    for i, match in enumerate(new_matches):
+        insert_query = text("""
+            INSERT INTO matches (t_id, player_1_id, player_2_id, player_1_score, player_2_score, m_type)
+            VALUES (:t_id, :player_1_id, :player_2_id, -1, -1, :m_type)
+        """)
+        db.session.execute(insert_query, {
+            't_id': t_id,
+            'player_1_id': match['player_1_id'],
+            'player_2_id': match['player_2_id'],
+            'm_type': match['m_type']
+        })
+        job.progress(i + 1, len(new_matches), '生成场次')
+    
+    db.session.commit()
+    return {'match_count': len(new_matches), 'message': f'成功生成{len(new_matches)}场苏超赛制比赛'}
+
 @app.route('/admin-secret/tournaments/generate-jiangsu-premier-league-matches', methods=['POST'])
 @admin_required
 def generate_jiangsu_premier_league_matches():
@@ -4676,87 +5023,13 @@ def generate_jiangsu_premier_league_matches():
                 if home_away_data.get(str(opponent_id), []).count(int(player_id)) > 0:
                     return jsonify({'success': False, 'error': f'主客场分配冲突：选手 {player_id} 和 {opponent_id} 都选择了对方作为主场对手'})
         
-        # 清空现有场次
-        delete_query = text("DELETE FROM matches WHERE t_id = :t_id")
-        db.session.execute(delete_query, {'t_id': t_id})
-        
-        # 实现苏超赛制逻辑
-        new_matches = []
-        processed_pairs = set()
-        
-        # 统计每个选手被选为主场对手的次数
-        home_selected_count = {player_id: 0 for player_id in all_player_ids}
-        
-        # 处理用户选择的主场对手
-        for player_id, home_opponents in home_away_data.items():
-            player_id = int(player_id)
-            
-            # 生成主场场次（该选手作为player_1）
-            for opponent_id in home_opponents:
-                pair = tuple(sorted([player_id, opponent_id]))
-                if pair not in processed_pairs:
-                    new_matches.append({
-                        'player_1_id': player_id,
-                        'player_2_id': opponent_id,
-                        'm_type': 2  # 小组赛（主）
-                    })
-                    processed_pairs.add(pair)
-                    home_selected_count[opponent_id] += 1
-        
-        # 自动分配剩余场次
-        while len(processed_pairs) < player_count * (player_count - 1) // 2:
-            # 找到已经被(n-1)/2个其他选手选为主场对手的选手
-            candidates = [player_id for player_id in all_player_ids 
-                         if home_selected_count[player_id] == expected_home_matches]
-            
-            if not candidates:
-                # 如果没有符合条件的选手，选择被选次数最少的选手
-                min_count = min(home_selected_count.values())
-                candidates = [player_id for player_id in all_player_ids 
-                             if home_selected_count[player_id] == min_count]
-            
-            # 选择第一个候选选手
-            current_player = candidates[0]
-            
-            # 找到该选手还没有比赛的对手
-            played_opponents = set()
-            for pair in processed_pairs:
-                if current_player in pair:
-                    played_opponents.add(pair[0] if pair[1] == current_player else pair[1])
-            
-            remaining_opponents = set(all_player_ids) - {current_player} - played_opponents
-            
-            # 为该选手自动分配剩余场次（作为主场）
-            for opponent_id in remaining_opponents:
-                pair = tuple(sorted([current_player, opponent_id]))
-                if pair not in processed_pairs:
-                    new_matches.append({
-                        'player_1_id': current_player,
-                        'player_2_id': opponent_id,
-                        'm_type': 2  # 小组赛（主）
-                    })
-                    processed_pairs.add(pair)
-                    home_selected_count[opponent_id] += 1
-                    break  # 一次只分配一场
-        
-        # 插入新场次
-        for match in new_matches:
-            insert_query = text("""
-                INSERT INTO matches (t_id, player_1_id, player_2_id, player_1_score, player_2_score, m_type)
-                VALUES (:t_id, :player_1_id, :player_2_id, -1, -1, :m_type)
-            """)
-            db.session.execute(insert_query, {
-                't_id': t_id,
-                'player_1_id': match['player_1_id'],
-                'player_2_id': match['player_2_id'],
-                'm_type': match['m_type']
-            })
-        
-        db.session.commit()
+        job_id = job_runner.enqueue('jiangsu_premier_league_matches', {'t_id': t_id, 'home_away_data': home_away_data})
         
         return jsonify({
             'success': True, 
-            'message': f'成功生成{len(new_matches)}场苏超赛制比赛'
+            'message': '正在生成苏超赛制比赛',
+            'job_id': job_id,
+            'job_url': url_for('admin_job_status', job_id=job_id)
         })
         
     except Exception as e:
@@ -5040,90 +5313,49 @@ def generate_group_matches_api(t_id):
             if len(players) < 2:
                 return jsonify({'success': False, 'message': f'{group["t_name"]}组选手数量不足，无法生成比赛'}), 400
         
-        # 为每个分组生成比赛
-        for group in groups:
-            generate_group_round_robin_matches(t_id, group['tg_id'], is_double_round_robin)
+        # 为每个分组生成比赛（后台任务）
+        job_id = job_runner.enqueue('group_matches', {
+            't_id': t_id, 'round_robin_type': 'double' if is_double_round_robin else 'single'
+        })
         
-        return jsonify({'success': True, 'message': '比赛生成成功'})
+        return jsonify({'success': True, 'message': '正在生成比赛', 'job_id': job_id,
+                        'job_url': url_for('admin_job_status', job_id=job_id)})
     except Exception as e:
         return jsonify({'success': False, 'message': f'生成比赛失败: {str(e)}'}), 500
 
+@cached()
+def get_player_profile_summary(player_id):
+    """选手档案摘要：历届排名、最近20届第10高分、奖牌与积分排名（选手不存在返回 None）"""
+    profile = PlayerProfile.load(player_id, include_matches=False)
+    if profile is None:
+        return None
+    summary = profile.summary()
+    # 从物化排行榜读取该选手的总积分和排名
+    summary['player_stats'] = get_player_leaderboard_entry(player_id)
+    return summary
+
+
+def get_player_medals(player_id):
+    """直接统计单个选手的奖牌（经选手档案只读取该选手的排名记录，与档案页的奖牌一致）；选手不存在时全为 0"""
+    profile = PlayerProfile.load(player_id, include_matches=False)
+    return profile.medals() if profile is not None else empty_medals()
+
+
 @app.route('/player/<int:player_id>')
 def player_view(player_id):
     p = Player.query.get_or_404(player_id)
-    # matches involving this player
-    matches = Match.query.filter((Match.player_1_id == player_id) | (Match.player_2_id == player_id)).all()
-    
-    # 为每个比赛添加序号信息
-    for match in matches:
-        if match.tournament:
-            # 使用SQL视图获取该届次的序号
-            from sqlalchemy import text
-            view_query = text("""
-                SELECT type_session_number
-                FROM tournament_session_view
-                WHERE t_id = :t_id
-            """)
-            
-            result = db.session.execute(view_query, {'t_id': match.tournament.t_id})
-            row = result.fetchone()
-            if row:
-                match.tournament.type_session_number = row.type_session_number
-            else:
-                match.tournament.type_session_number = None
-    
-    # 计算该选手的总积分和排名
-    player_rankings = calculate_player_total_scores()
-    player_stats = None
-    for player_data in player_rankings:
-        if player_data['player_id'] == player_id:
-            player_stats = player_data
-            break
-    
-    # 获取该选手的历届排名和积分
-    from sqlalchemy import text
-    history_query = text("""
-        SELECT t.t_id, t.type, s.year, tsv.type_session_number, r.ranks, r.scores
-        FROM rankings r
-        JOIN tournament t ON r.t_id = t.t_id
-        JOIN seasons s ON t.season_id = s.season_id
-        JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
-        WHERE r.player_id = :player_id 
-        AND t.status = 1
-        AND r.scores IS NOT NULL
-        ORDER BY s.year DESC, tsv.type_session_number DESC
-    """)
-    
-    result = db.session.execute(history_query, {'player_id': player_id})
-    tournament_history = result.fetchall()
-    
-    # 计算该选手最近20届比赛中的第10高分
-    recent_20_scores = []
-    for t_id, t_type, year, session_num, ranks, scores in tournament_history[:20]:
-        if scores is not None:
-            recent_20_scores.append(scores)
-    
-    # 找到第10高分
-    tenth_highest_score = None
-    if len(recent_20_scores) >= 10:
-        recent_20_scores.sort(reverse=True)
-        tenth_highest_score = recent_20_scores[9]  # 第10高分（索引9）
-    
-    # 获取该选手的奖牌统计
-    medal_stats = calculate_medal_standings()
-    player_medal_stats = medal_stats.get(player_id, {
-        'major': {'gold': 0, 'silver': 0, 'bronze': 0},
-        'minor': {'gold': 0, 'silver': 0, 'bronze': 0},
-        'final': {'gold': 0, 'silver': 0, 'bronze': 0}
-    })
+    # 该选手参与的比赛（一次查询带出赛事、赛季、届次序号与双方姓名）
+    matches = PlayerProfile.load_matches(player_id)
+    # 历届排名、第10高分、奖牌与排名只读取该选手的记录，并按数据版本缓存
+    summary = get_player_profile_summary(player_id)
     
     return render_template('player.html', 
                          player=p, 
                          matches=matches, 
-                         player_stats=player_stats, 
-                         tournament_history=tournament_history,
-                         player_medal_stats=player_medal_stats,
-                         tenth_highest_score=tenth_highest_score)
+                         player_stats=summary['player_stats'], 
+                         tournament_history=summary['tournament_history'],
+                         player_medal_stats=summary['medals'],
+                         tenth_highest_score=summary['tenth_highest_score'])
 
 
 @app.route('/api/matches/<int:t_id>')
@@ -5139,8 +5371,8 @@ def admin_index():
     managers = Manager.query.all()
     players = Player.query.order_by(Player.name).all()
     
-    # 计算选手总积分排名
-    player_rankings = calculate_player_total_scores()
+    # 读取物化排行榜
+    player_rankings = get_player_leaderboard()
     
     # 创建积分排名字典，方便查找
     ranking_dict = {player_data['player_id']: player_data for player_data in player_rankings}
@@ -5170,14 +5402,14 @@ def admin_index():
         3: [p for p in players if getattr(p, 'status', 1) == 3],
     }
     
-    # 使用SQL视图获取带序号的届次数据
+    # 从赛事序号表获取带序号的届次数据
     from sqlalchemy import text
     view_query = text("""
         SELECT t.t_id, t.season_id, s.year, t.type, t.player_count, t.t_format,
                ts.type_session_number
         FROM tournament t
         JOIN seasons s ON t.season_id = s.season_id
-        JOIN tournament_session_view ts ON t.t_id = ts.t_id
+        JOIN tournament_sequence ts ON t.t_id = ts.t_id
         ORDER BY s.year DESC, t.type, t.t_id
     """)
     
@@ -5269,6 +5501,7 @@ def admin_add_player():
         status = int(request.form.get('status') or 1)
         p = Player(name=name, status=status)
         db.session.add(p)
+        refresh_player_leaderboard()
         commit_with_retry()
         flash('选手已添加')
         return redirect(url_for('admin_index'))
@@ -5286,6 +5519,7 @@ def admin_edit_player(player_id):
             return redirect(request.url)
         p.name = name
         p.status = int(request.form.get('status') or p.status or 1)
+        refresh_player_leaderboard()
         commit_with_retry()
         flash('已更新')
         return redirect(url_for('admin_index'))
@@ -5297,6 +5531,7 @@ def admin_edit_player(player_id):
 def admin_delete_player(player_id):
     p = Player.query.get_or_404(player_id)
     db.session.delete(p)
+    refresh_player_leaderboard()
     commit_with_retry()
     flash('已删除')
     return redirect(url_for('admin_index'))
@@ -5321,6 +5556,7 @@ def admin_add_season():
 def admin_delete_season(season_id):
     s = Season.query.get_or_404(season_id)
     db.session.delete(s)
+    refresh_tournament_sequence()
     commit_with_retry()
     flash('赛季已删除')
     return redirect(url_for('admin_index'))
@@ -5372,6 +5608,8 @@ def admin_add_tournament():
                     return redirect(url_for('admin_index'))
             
             try:
+                # 新届次的序号与翻页顺序与赛事一同提交
+                refresh_tournament_sequence()
                 commit_with_retry()
                 new_id = t.t_id
                 print(f"SQLAlchemy插入成功，新ID: {new_id}")
@@ -5386,6 +5624,10 @@ def admin_add_tournament():
                 new_id = cur.lastrowid
                 conn.close()
                 print(f"使用fallback插入，错误: {e}")
+                # fallback 绕过了会话，单独补刷赛事序号表
+                db.session.rollback()
+                if refresh_tournament_sequence():
+                    commit_with_retry()
             
             flash('单届比赛已添加')
             # Safely redirect to rankings page if we have a new_id; fall back to admin index
@@ -5414,20 +5656,9 @@ def admin_add_tournament():
 def admin_tournament_rankings(t_id):
     t = Tournament.query.get_or_404(t_id)
     
-    # 使用SQL视图获取该届次的序号
+    # 从赛事序号表读取该届次的序号
     from sqlalchemy import text
-    view_query = text("""
-        SELECT type_session_number
-        FROM tournament_session_view
-        WHERE t_id = :t_id
-    """)
-    
-    result = db.session.execute(view_query, {'t_id': t_id})
-    row = result.fetchone()
-    if row:
-        t.type_session_number = row.type_session_number
-    else:
-        t.type_session_number = None
+    t.type_session_number = get_type_session_number(t_id)
     
     players = Player.query.order_by(Player.name).all()
     # existing rankings for this tournament
@@ -5451,6 +5682,9 @@ def admin_tournament_rankings(t_id):
                 r = Ranking.query.filter_by(t_id=t_id, ranks=rank_pos).first()
                 if r:
                     db.session.delete(r)
+        # 刷新物化排行榜，与名次写入一同提交
+        mark_tournament_changed(t_id)
+        refresh_player_leaderboard()
         commit_with_retry()
         flash('名次已保存')
         
@@ -5474,20 +5708,9 @@ def admin_tournament_rankings(t_id):
 def admin_edit_tournament(t_id):
     t = Tournament.query.get_or_404(t_id)
     
-    # 使用SQL视图获取该届次的序号
+    # 从赛事序号表读取该届次的序号
     from sqlalchemy import text
-    view_query = text("""
-        SELECT type_session_number
-        FROM tournament_session_view
-        WHERE t_id = :t_id
-    """)
-    
-    result = db.session.execute(view_query, {'t_id': t_id})
-    row = result.fetchone()
-    if row:
-        t.type_session_number = row.type_session_number
-    else:
-        t.type_session_number = None
+    t.type_session_number = get_type_session_number(t_id)
     
     if request.method == 'POST':
         # allow updating season_id, type and player_count
@@ -5512,6 +5735,9 @@ def admin_edit_tournament(t_id):
             # 清空报名截止时间
             t.signup_deadline = None
         
+        # 赛季或类型变化会改变届次序号与翻页顺序，届次序号又影响排行榜的近期赛事窗口
+        refresh_tournament_sequence()
+        refresh_player_leaderboard()
         commit_with_retry()
         flash('届次已更新')
         # redirect back to provided next (e.g., rankings page) or admin index
@@ -5545,12 +5771,12 @@ def admin_add_match():
 
     players = Player.query.order_by(Player.name).all()
     tournaments = Tournament.query.order_by(Tournament.t_id).all()
-    # 使用SQL视图获取带序号的届次数据
+    # 从赛事序号表获取带序号的届次数据
     from sqlalchemy import text
     view_query = text("""
         SELECT t.t_id, ts.type_session_number
         FROM tournament t
-        JOIN tournament_session_view ts ON t.t_id = ts.t_id
+        JOIN tournament_sequence ts ON t.t_id = ts.t_id
         ORDER BY t.season_id, t.type, t.t_id
     """)
     
@@ -5585,12 +5811,12 @@ def admin_edit_match(m_id):
     players = Player.query.order_by(Player.name).all()
     tournaments = Tournament.query.order_by(Tournament.t_id).all()
     
-    # 使用SQL视图获取带序号的届次数据
+    # 从赛事序号表获取带序号的届次数据
     from sqlalchemy import text
     view_query = text("""
         SELECT t.t_id, ts.type_session_number
         FROM tournament t
-        JOIN tournament_session_view ts ON t.t_id = ts.t_id
+        JOIN tournament_sequence ts ON t.t_id = ts.t_id
         ORDER BY t.season_id, t.type, t.t_id
     """)
     
@@ -5627,22 +5853,56 @@ def admin_calculate_scores(t_id):
     return redirect(url_for('tournament_view', t_id=t_id))
 
 
-@app.route('/admin-secret/tournaments/calculate-all-scores', methods=['POST'])
-@admin_required
-def admin_calculate_all_scores():
-    """计算所有已提交排名的赛事积分"""
-    # 获取所有有排名数据的赛事
-    tournaments_with_rankings = db.session.query(Tournament).join(Ranking).distinct().all()
+# 重算全部积分时每批的赛事数：每批一次查询、一次 executemany、一次提交，批次之间报告进度
+SCORE_BATCH_SIZE = 20
+
+
+@job_runner.task('calculate_all_scores')
+def calculate_all_scores_job(job):
+    """后台任务：计算所有已提交排名的赛事积分"""
+    # 获取所有有排名数据的赛事，按批批量计算
+    t_ids = [t.t_id for t in db.session.query(Tournament).join(Ranking).distinct().all()]
     
+    total_count = len(t_ids)
     success_count = 0
-    total_count = len(tournaments_with_rankings)
-    
-    for tournament in tournaments_with_rankings:
-        if calculate_tournament_scores(tournament.t_id):
-            success_count += 1
+    job.progress(0, total_count)
+    for start in range(0, total_count, SCORE_BATCH_SIZE):
+        batch = t_ids[start:start + SCORE_BATCH_SIZE]
+        success_count += sum(calculate_scores_for_tournaments(batch).values())
+        job.progress(start + len(batch), message=f'已计算 {start + len(batch)}/{total_count} 个赛事')
     
-    flash(f'积分计算完成: {success_count}/{total_count} 个赛事')
-    return redirect(url_for('admin_index'))
+    return {'success_count': success_count, 'total_count': total_count,
+            'message': f'积分计算完成: {success_count}/{total_count} 个赛事'}
+
+
+@app.route('/admin-secret/tournaments/calculate-all-scores', methods=['POST'])
+@admin_required
+def admin_calculate_all_scores():
+    """计算所有已提交排名的赛事积分（后台任务，积分管理页显示进度）"""
+    job_id = job_runner.enqueue('calculate_all_scores')
+    flash(f'已开始在后台重新计算所有积分（任务 #{job_id}）')
+    return redirect(url_for('admin_index', job=job_id))
+
+
+@app.route('/admin-secret/jobs')
+@admin_required
+def admin_jobs():
+    """最近的后台任务"""
+    limit = request.args.get('limit', 20, type=int)
+    job_runner.recover_interrupted()
+    return jsonify({'success': True, 'jobs': job_runner.recent(limit)})
+
+
+@app.route('/admin-secret/jobs/<int:job_id>')
+@admin_required
+def admin_job_status(job_id):
+    """后台任务的状态、进度、结果与错误（页面轮询）"""
+    # 所在实例已退出的任务（心跳超时）在查看时标记为失败
+    job_runner.recover_interrupted()
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+    return jsonify({'success': True, 'job': job})
 
 
 @app.route('/admin-secret/tournaments/<int:t_id>/toggle-status', methods=['POST'])
@@ -5660,10 +5920,14 @@ def admin_toggle_tournament_status(t_id):
             tournament.status = 1
             status_text = "恢复"
         
+        # 赛事状态影响历届翻页顺序和总积分统计，刷新赛事序号表与物化排行榜
+        refresh_tournament_sequence()
+        refresh_player_leaderboard()
         commit_with_retry()
         flash(f'成功{status_text}赛事：第{tournament.type_session_number}届', 'success')
         
     except Exception as e:
+        db.session.rollback()
         print(f"切换赛事状态失败: {e}")
         flash('切换赛事状态失败', 'error')
     
@@ -5675,10 +5939,177 @@ def admin_toggle_tournament_status(t_id):
     return redirect(url_for('admin_index'))
 
 
+@app.route('/admin-secret/cache/stats')
+@admin_required
+def admin_cache_stats():
+    """派生数据缓存命中率、批量读取、本地副本、写入队列与积分重算合并统计"""
+    return jsonify({'success': True, 'stats': standings_cache.stats(), 'read_batch': read_batch_stats(),
+                    'read_replica': read_replica.stats() if read_replica else None,
+                    'write_queue': write_coordinator.stats(),
+                    'recompute': recompute_scheduler.stats()})
+
+
+@app.route('/admin-secret/cache/clear', methods=['POST'])
+@admin_required
+def admin_cache_clear():
+    """清空派生数据缓存"""
+    standings_cache.clear()
+    return jsonify({'success': True, 'message': '缓存已清空'})
+
+
+@app.route('/admin-secret/metrics')
+@admin_required
+def admin_sql_metrics():
+    """按请求的 SQL 统计：各端点汇总、具名语句的执行次数与最近的请求
+    （?endpoint=端点名 &nplus1=1 只看有重复语句的请求 &limit=条数）"""
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({
+        'success': True,
+        'enabled': sql_metrics.enabled,
+        'repeat_threshold': sql_metrics.repeat_threshold,
+        'endpoints': sql_metrics.endpoint_summary(),
+        'queries': [row for row in queries.stats() if row['runs']],
+        'recent': sql_metrics.recent(limit, request.args.get('endpoint'), request.args.get('nplus1') == '1'),
+    })
+
+
 def init_db():
     # 如果数据库文件不存在，创建表
     with app.app_context():
         db.create_all()
+        sync_materialized_tables()
+
+
+@app.cli.command('rebuild-leaderboard')
+def rebuild_leaderboard_command():
+    """从 rankings 全量重建物化排行榜（用法: flask --app app rebuild-leaderboard）"""
+    # 排行榜的近期赛事窗口依赖届次序号
+    sync_materialized_tables()
+    try:
+        refresh_player_leaderboard(force=True)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ 物化排行榜重建失败: {e}")
+        raise SystemExit(1)
+    print("✅ 物化排行榜重建完成")
+
+
+@app.cli.command('check-leaderboard')
+def check_leaderboard_command():
+    """对比物化排行榜与实时计算结果（用法: flask --app app check-leaderboard）"""
+    sync_materialized_tables()
+    differences = verify_player_leaderboard()
+    if not differences:
+        print("✅ 物化排行榜与实时计算一致")
+        return
+    print(f"❌ 发现 {len(differences)} 处差异:")
+    for diff in differences:
+        print(f"  选手 {diff['player_id']} {diff['field'] or ''}: 存储={diff['stored']} 期望={diff['expected']}")
+    print("可运行 flask --app app rebuild-leaderboard 修复")
+    raise SystemExit(1)
+
+
+@app.cli.command('migrate')
+def migrate_command():
+    """执行未执行的数据库迁移并校准物化表，部署时执行（用法: flask --app app migrate）"""
+    try:
+        executed = run_migrations()
+    except Exception as e:
+        print(f"❌ 数据库迁移失败: {e}")
+        raise SystemExit(1)
+    if not sync_materialized_tables():
+        print("❌ 物化表校准失败")
+        raise SystemExit(1)
+    print(f"✅ 数据库已是最新版本（本次执行 {len(executed)} 个迁移），物化表已校准")
+
+
+@app.cli.command('migrate-status')
+def migrate_status_command():
+    """查看数据库迁移的执行状态（用法: flask --app app migrate-status）"""
+    for version, name, applied_at in migration_status():
+        state = f"已执行 {applied_at}" if applied_at else "未执行"
+        print(f"{version:04d}_{name}: {state}")
+
+
+@app.cli.command('wal-checkpoint')
+def wal_checkpoint_command():
+    """按当前存储配置的模式执行一次 WAL 检查点（用法: flask --app app wal-checkpoint）"""
+    if db_config['DATABASE_TYPE'] != 'local':
+        print("❌ 只有本地 SQLite/SQLCipher 数据库需要 WAL 检查点")
+        raise SystemExit(1)
+    try:
+        with db.engine.connect() as connection:
+            busy, wal_pages, checkpointed = wal_checkpoint(connection, storage_profile.checkpoint_mode)
+    except Exception as e:
+        print(f"❌ WAL 检查点失败: {e}")
+        raise SystemExit(1)
+    print(f"存储配置: {storage_profile.name}，检查点模式: {storage_profile.checkpoint_mode}")
+    if busy:
+        print(f"⚠️  检查点被并发读写阻塞，WAL {wal_pages} 页中已写回 {checkpointed} 页")
+    else:
+        print(f"✅ WAL 检查点完成，WAL {wal_pages} 页中已写回 {checkpointed} 页")
+
+
+@app.cli.command('sync-replica')
+def sync_replica_command():
+    """立即把本地只读副本同步到主库（用法: DB_REPLICA_PATH=... flask --app app sync-replica）"""
+    if read_replica is None:
+        print("❌ 未配置本地副本（DB_REPLICA_PATH）")
+        raise SystemExit(1)
+    try:
+        result = read_replica.sync.sync()
+        pruned = read_replica.sync.prune_change_log(read_replica.log_retention)
+    except Exception as e:
+        print(f"❌ 同步本地副本失败: {e}")
+        raise SystemExit(1)
+    print(f"✅ 本地副本已同步（方式: {result['mode']}，变更行数: {result['changes']}，日志序号: {result['seq']}，"
+          f"清理日志 {pruned} 条）")
+
+
+@app.cli.command('drop-replica-log')
+def drop_replica_log_command():
+    """停用本地副本后删除主库上的变更日志与触发器（用法: flask --app app drop-replica-log）"""
+    try:
+        dropped = ReplicaSync(db_engine, None).drop_change_log()
+    except Exception as e:
+        print(f"❌ 删除副本变更日志失败: {e}")
+        raise SystemExit(1)
+    print(f"✅ 已删除副本变更日志与 {dropped} 个触发器")
+
+
+@app.cli.command('rebuild-tournament-sequence')
+def rebuild_tournament_sequence_command():
+    """全量重建赛事序号表（用法: flask --app app rebuild-tournament-sequence）"""
+    try:
+        run_migrations()
+    except Exception as e:
+        print(f"❌ 数据库迁移失败: {e}")
+        raise SystemExit(1)
+    if refresh_tournament_sequence(force=True):
+        db.session.commit()
+        print("✅ 赛事序号表重建完成")
+    else:
+        db.session.rollback()
+        print("❌ 赛事序号表重建失败")
+        raise SystemExit(1)
+
+
+@app.cli.command('rebuild-player-matches')
+def rebuild_player_matches_command():
+    """按 matches 全量重建比赛长表并补建同步触发器（用法: flask --app app rebuild-player-matches）"""
+    try:
+        run_migrations()
+    except Exception as e:
+        print(f"❌ 数据库迁移失败: {e}")
+        raise SystemExit(1)
+    if refresh_player_matches(force=True):
+        db.session.commit()
+        print("✅ 比赛长表重建完成")
+    else:
+        db.session.rollback()
+        print("❌ 比赛长表重建失败")
+        raise SystemExit(1)
 
 
 @app.context_processor
@@ -5710,18 +6141,7 @@ def inject_formats():
         14: '附加赛',
         15: '不可用'
     }
-    # allowed m_type per t_format
-    allowed = {
-        1: [1,2,3,8,10,11,12,13,14],  # 小组赛 + 1/4决赛 + 附加赛
-        2: [1,2,3,7,14],  # 小赛 + 附加赛
-        3: [1,2,3,9,10,11,12,13,14],  # 小组赛 + 半决赛资格赛 + 附加赛
-        4: [1,9,10,11,12,14],  # 单循环赛 + 附加赛
-        5: [2,3,9,10,11,12,14],  # 双循环赛 + 附加赛
-        6: [2,3,9,10,11,12,14],  # 苏超赛制 + 附加赛
-        7: [4,5,6,11,12,14],  # 双败淘汰赛 + 附加赛
-        8: [1,2,3,4,5,6,7,8,9,10,11,12,13,14,15]  # 其他格式
-    }
-    return dict(t_format_labels=t_format_labels, m_type_labels=m_type_labels, format_allowed=allowed)
+    return dict(t_format_labels=t_format_labels, m_type_labels=m_type_labels, format_allowed=FORMAT_ALLOWED_M_TYPES)
 
 
 # 淘汰赛管理辅助函数
@@ -5732,17 +6152,18 @@ def get_group_stage_standings(t_id):
         if not tournament or tournament.type != 1:  # 只有大赛才有小组赛
             return None
         
-        groups = get_tournament_groups(t_id)
+        ctx = TournamentContext.load(t_id)
+        groups = get_tournament_groups(t_id, ctx=ctx)
         if not groups:
             return None
         
         # 计算总排名
-        total_rankings = calculate_total_group_rankings(t_id)
+        total_rankings = calculate_total_group_rankings(t_id, ctx=ctx)
         
         # 构建与tournament_view相同的格式
         result = {}
         for group in groups:
-            group_standings = calculate_group_standings(t_id, group['tg_id'])
+            group_standings = calculate_group_standings(t_id, group['tg_id'], ctx=ctx)
             result[group['tg_id']] = {
                 'group_name': group['t_name'],
                 'standings': group_standings
@@ -7373,13 +7794,19 @@ def knockout_update(t_id):
 
 
 # 更新比分提交逻辑，集成新的淘汰赛系统
-def update_knockout_bracket_logic(t_id):
-    """更新淘汰赛对阵的逻辑函数（不依赖HTTP请求）"""
+def update_knockout_bracket_logic(t_id, m_ids=None):
+    """更新淘汰赛对阵的逻辑函数（不依赖HTTP请求）
+    
+    按淘汰赛对阵图推进（bracket.py）：m_ids 为录入比分的比赛时只推进这些比赛的下游，为空时检查全部轮次。
+    推进规则与 KnockoutManager.check_and_update_next_round 一致（check/check_bracket_graph.py 回放核对）。
+    """
     try:
-        manager = KnockoutManager(t_id)
-        manager.check_and_update_next_round()
+        if BracketGraph.load(t_id).advance(m_ids):
+            mark_tournament_changed(t_id)
+            db.session.commit()
         return True
     except Exception as e:
+        db.session.rollback()
         print(f"更新淘汰赛对阵时出错: {e}")
         return False
 
@@ -7460,66 +7887,64 @@ def update_knockout_bracket(t_id):
         return jsonify({'success': False, 'error': f'更新失败: {str(e)}'})
 
 
-def create_single_round_robin_display(t_id):
+@cached(scope='tournament')
+def create_single_round_robin_display(t_id, ctx=None):
     """为小赛创建单循环赛制显示数据"""
-    from sqlalchemy import text
     from collections import defaultdict
+    if ctx is None:
+        ctx = TournamentContext.load(t_id)
     
     # 获取所有参赛选手
-    players_query = text("""
-        SELECT DISTINCT p.player_id, p.name
-        FROM players p
-        JOIN matches m ON (p.player_id = m.player_1_id OR p.player_id = m.player_2_id)
-        WHERE m.t_id = :t_id AND m.m_type IN (1, 2, 3, 14)
-        ORDER BY p.name
-    """)
-    
-    players_result = db.session.execute(players_query, {'t_id': t_id}).fetchall()
+    player_ids = set()
+    for m in ctx.matches_of_types((1, 2, 3, 14)):
+        player_ids.update((m.player_1_id, m.player_2_id))
+    player_ids = [pid for pid in player_ids if pid in ctx.players]
+    names = {pid: ctx.player_name(pid) for pid in player_ids}
+    players_result = [(pid, names[pid]) for pid in ctx.sort_by_name(player_ids, names)]
     if not players_result:
         return None
     
+    # 小组赛已完成的比赛（排除负分）
+    counted_matches = ctx.scored_matches((1, 2, 3), non_negative=True)
+    
     # 计算每个选手的统计数据
     player_stats = {}
     for player_id, player_name in players_result:
-        stats_query = text("""
-            SELECT 
-                SUM(CASE WHEN player_1_id = :player_id AND player_1_score > player_2_score THEN 1 ELSE 0 END) +
-                SUM(CASE WHEN player_2_id = :player_id AND player_2_score > player_1_score THEN 1 ELSE 0 END) as wins,
-                SUM(CASE WHEN player_1_id = :player_id AND player_1_score < player_2_score THEN 1 ELSE 0 END) +
-                SUM(CASE WHEN player_2_id = :player_id AND player_2_score < player_1_score THEN 1 ELSE 0 END) as losses,
-                SUM(CASE WHEN player_1_id = :player_id AND player_1_score = player_2_score AND player_1_score > 0 THEN 1 ELSE 0 END) +
-                SUM(CASE WHEN player_2_id = :player_id AND player_2_score = player_1_score AND player_2_score > 0 THEN 1 ELSE 0 END) as draws,
-                SUM(CASE WHEN player_1_id = :player_id THEN player_1_score ELSE 0 END) +
-                SUM(CASE WHEN player_2_id = :player_id THEN player_2_score ELSE 0 END) as goals_for,
-                SUM(CASE WHEN player_1_id = :player_id THEN player_2_score ELSE 0 END) +
-                SUM(CASE WHEN player_2_id = :player_id THEN player_1_score ELSE 0 END) as goals_against
-            FROM matches
-            WHERE t_id = :t_id AND m_type IN (1, 2, 3) 
-            AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
-            AND player_1_score >= 0 AND player_2_score >= 0
-            AND (player_1_id = :player_id OR player_2_id = :player_id)
-        """)
-        
-        stats_result = db.session.execute(stats_query, {'t_id': t_id, 'player_id': player_id}).fetchone()
+        wins = losses = draws = goals_for = goals_against = 0
+        for m in counted_matches:
+            if m.player_1_id == player_id:
+                own_score, opponent_score = m.player_1_score, m.player_2_score
+            elif m.player_2_id == player_id:
+                own_score, opponent_score = m.player_2_score, m.player_1_score
+            else:
+                continue
+            if own_score > opponent_score:
+                wins += 1
+            elif own_score < opponent_score:
+                losses += 1
+            elif own_score > 0:
+                draws += 1
+            goals_for += own_score
+            goals_against += opponent_score
         
         # 计算该选手需要打的总场次数
-        total_matches = calculate_player_total_matches(t_id, player_id)
+        total_matches = calculate_player_total_matches(t_id, player_id, ctx=ctx)
         
         player_stats[player_id] = {
             'player_id': player_id,
             'name': player_name,
-            'wins': stats_result[0] or 0,
-            'losses': stats_result[1] or 0,
-            'draws': stats_result[2] or 0,
-            'goals_for': stats_result[3] or 0,
-            'goals_against': stats_result[4] or 0,
+            'wins': wins,
+            'losses': losses,
+            'draws': draws,
+            'goals_for': goals_for,
+            'goals_against': goals_against,
             'total_matches': total_matches,  # 添加总场次字段
         }
         player_stats[player_id]['goal_difference'] = player_stats[player_id]['goals_for'] - player_stats[player_id]['goals_against']
         player_stats[player_id]['points'] = player_stats[player_id]['wins'] * 3 + player_stats[player_id]['draws']
     
     # 应用附加赛结果到所有选手数据中
-    apply_playoff_results(t_id, list(player_stats.values()))
+    apply_playoff_results(t_id, list(player_stats.values()), ctx=ctx)
     
     # 按积分分组，对同积分选手进行特殊排序
     from collections import defaultdict
@@ -7537,7 +7962,7 @@ def create_single_round_robin_display(t_id):
             sorted_players.extend(group)
         else:
             # 多个选手同积分，需要计算内部胜负关系
-            ranked_group = calculate_same_points_ranking_for_round_robin(group, t_id, generate_playoffs=False)
+            ranked_group = calculate_same_points_ranking_for_round_robin(group, t_id, generate_playoffs=False, ctx=ctx)
             sorted_players.extend(ranked_group)
     
     # 分配排名
@@ -7546,29 +7971,20 @@ def create_single_round_robin_display(t_id):
         player['total_rank'] = i + 1
     
     # 获取所有比赛
-    matches_query = text("""
-        SELECT m.m_id, m.player_1_id, m.player_2_id, m.player_1_score, m.player_2_score, m.m_type,
-               p1.name as player1_name, p2.name as player2_name
-        FROM matches m
-        JOIN players p1 ON m.player_1_id = p1.player_id
-        JOIN players p2 ON m.player_2_id = p2.player_id
-        WHERE m.t_id = :t_id AND m.m_type IN (1, 2, 3, 14)
-        ORDER BY m.m_id
-    """)
-    
-    matches_result = db.session.execute(matches_query, {'t_id': t_id}).fetchall()
     matches = []
     
-    for match_row in matches_result:
+    for m in ctx.matches_of_types((1, 2, 3, 14)):
+        if m.player_1_id not in ctx.players or m.player_2_id not in ctx.players:
+            continue
         matches.append({
-            'm_id': match_row[0],
-            'player_1_id': match_row[1],
-            'player_2_id': match_row[2],
-            'player_1_score': match_row[3] or 0,
-            'player_2_score': match_row[4] or 0,
-            'm_type': match_row[5],
-            'player1': {'name': match_row[6]},
-            'player2': {'name': match_row[7]}
+            'm_id': m.m_id,
+            'player_1_id': m.player_1_id,
+            'player_2_id': m.player_2_id,
+            'player_1_score': m.player_1_score or 0,
+            'player_2_score': m.player_2_score or 0,
+            'm_type': m.m_type,
+            'player1': {'name': ctx.player_name(m.player_1_id)},
+            'player2': {'name': ctx.player_name(m.player_2_id)}
         })
     
     # 创建虚拟分组
@@ -8226,94 +8642,16 @@ def user_profile():
     player_matches_by_season = {}
     
     if user.player:
-        rankings = Ranking.query.filter_by(player_id=user.player.player_id).all()
-        
-        # 获取所有相关的tournament ID
-        tournament_ids = set()
-        for ranking in rankings:
-            tournament_ids.add(ranking.tournament.t_id)
-        
-        # 使用SQL视图获取所有tournament的届次信息
-        from sqlalchemy import text
-        if tournament_ids:
-            placeholders = ','.join([':t_id' + str(i) for i in range(len(tournament_ids))])
-            view_query = text(f"""
-                SELECT t_id, type_session_number
-                FROM tournament_session_view
-                WHERE t_id IN ({','.join([':t_id' + str(i) for i in range(len(tournament_ids))])})
-            """)
-            
-            params = {f't_id{i}': t_id for i, t_id in enumerate(tournament_ids)}
-            result = db.session.execute(view_query, params)
-            tournament_numbers = {row.t_id: row.type_session_number for row in result}
-        else:
-            tournament_numbers = {}
+        # 参赛记录与历史场次共用同一份选手档案（赛事、赛季与届次序号随查询一并带出）
+        profile = PlayerProfile.load(user.player.player_id)
         
         # 按赛季和类型分组参赛记录
-        for ranking in rankings:
-            tournament = ranking.tournament
-            tournament.type_session_number = tournament_numbers.get(tournament.t_id)
-            season_year = tournament.season.year if tournament.season else tournament.season_id
-            
-            if season_year not in player_rankings_by_season:
-                player_rankings_by_season[season_year] = {}
-            
-            tournament_type = tournament.type
-            if tournament_type not in player_rankings_by_season[season_year]:
-                player_rankings_by_season[season_year][tournament_type] = []
-            
-            player_rankings_by_season[season_year][tournament_type].append(ranking)
-            player_rankings.append(ranking)
-        
-        # 获取选手历史场次
-        matches = Match.query.filter(
-            (Match.player_1_id == user.player.player_id) | 
-            (Match.player_2_id == user.player.player_id)
-        ).all()
-        
-        # 过滤掉未进行的比赛（0-0或-1:-1）
-        valid_matches = []
-        match_tournament_ids = set()
-        for match in matches:
-            # 检查是否为未进行的比赛
-            if (match.player_1_score == 0 and match.player_2_score == 0) or \
-               (match.player_1_score == -1 and match.player_2_score == -1):
-                continue
-            valid_matches.append(match)
-            match_tournament_ids.add(match.tournament.t_id)
-        
-        # 为历史场次的tournament获取届次信息
-        if match_tournament_ids:
-            # 合并所有tournament ID
-            all_tournament_ids = tournament_ids.union(match_tournament_ids)
-            if len(all_tournament_ids) > len(tournament_ids):
-                # 如果有新的tournament ID，重新查询
-                placeholders = ','.join([':t_id' + str(i) for i in range(len(all_tournament_ids))])
-                view_query = text(f"""
-                    SELECT t_id, type_session_number
-                    FROM tournament_session_view
-                    WHERE t_id IN ({','.join([':t_id' + str(i) for i in range(len(all_tournament_ids))])})
-                """)
-                
-                params = {f't_id{i}': t_id for i, t_id in enumerate(all_tournament_ids)}
-                result = db.session.execute(view_query, params)
-                tournament_numbers = {row.t_id: row.type_session_number for row in result}
+        player_rankings = profile.rankings
+        player_rankings_by_season = PlayerProfile.group_by_season(player_rankings)
         
-        # 按赛季和类型分组场次
-        for match in valid_matches:
-            tournament = match.tournament
-            tournament.type_session_number = tournament_numbers.get(tournament.t_id)
-            season_year = tournament.season.year if tournament.season else tournament.season_id
-            
-            if season_year not in player_matches_by_season:
-                player_matches_by_season[season_year] = {}
-            
-            tournament_type = tournament.type
-            if tournament_type not in player_matches_by_season[season_year]:
-                player_matches_by_season[season_year][tournament_type] = []
-            
-            player_matches_by_season[season_year][tournament_type].append(match)
-            player_matches.append(match)
+        # 过滤掉未进行的比赛（0-0或-1:-1），按赛季和类型分组场次
+        player_matches = profile.played_matches()
+        player_matches_by_season = PlayerProfile.group_by_season(player_matches)
         
         # 获取所有赛季
         seasons = Season.query.order_by(Season.year.desc()).all()
@@ -8425,20 +8763,9 @@ def admin_unbind_user_player(uid):
 def tournament_signup(t_id):
     tournament = Tournament.query.get_or_404(t_id)
     
-    # 使用SQL视图获取该届次的序号
+    # 从赛事序号表读取该届次的序号
     from sqlalchemy import text
-    view_query = text("""
-        SELECT type_session_number
-        FROM tournament_session_view
-        WHERE t_id = :t_id
-    """)
-    
-    result = db.session.execute(view_query, {'t_id': t_id})
-    row = result.fetchone()
-    if row:
-        tournament.type_session_number = row.type_session_number
-    else:
-        tournament.type_session_number = None
+    tournament.type_session_number = get_type_session_number(t_id)
     
     # 获取当前用户信息
     current_user = None
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+淘汰赛对阵图
+每个赛事的淘汰赛建成一张依赖图：每场比赛是一个节点，记录它的来源比赛与取胜者/负者的位置（feeders），
+以及依赖它结果的下游比赛（targets）。录入比分后只从录入的比赛沿下游推进，
+不再对每个淘汰赛类型逐一重新查询、重新推导整个淘汰赛（KnockoutManager.check_and_update_next_round）。
+
+推进规则与 KnockoutManager.check_and_update_next_round 一致：
+- 1/4决赛资格赛（13）全部完成后填入待定（player_2_id = -1）的1/4决赛：第 k 场资格赛胜者 -> 第 k 场待定的1/4决赛
+  （资格赛模式生成时第1名、第2名的1/4决赛依次在前，与按小组排名对应的结果相同）；
+- 1/4决赛（8）全部完成且还没有半决赛时生成半决赛：QF1胜者 vs QF2胜者、QF3胜者 vs QF4胜者；
+- 半决赛（10）全部完成且还没有金牌赛、铜牌赛时生成：金牌赛 SF1胜者 vs SF2胜者，铜牌赛 SF1负者 vs SF2负者；
+- 比分 0:0 视为未完成；player_1 比分高时 player_1 胜，否则 player_2 胜；
+- 同一轮的比赛一起生成（m_id 顺序即对阵顺序），已生成的比赛和已填入的位置不再改动。
+
+用法：
+    graph = BracketGraph.load(t_id)        # 一次查询该赛事的全部淘汰赛
+    changed = graph.advance([m_id])        # 只推进该比赛的下游；不传比赛时检查全部轮次
+    db.session.commit()                     # 写入会话，由调用方提交
+"""
+
+from db import db
+from models import Match
+from queries import register_query
+
+
+QUARTERFINAL_QUALIFIER = 13  # 1/4决赛资格赛
+QUARTERFINAL = 8             # 1/4决赛
+SEMIFINAL = 10               # 半决赛
+BRONZE = 11                  # 铜牌赛
+GOLD = 12                    # 金牌赛
+KNOCKOUT_M_TYPES = (QUARTERFINAL_QUALIFIER, QUARTERFINAL, SEMIFINAL, BRONZE, GOLD)
+
+# 资格赛模式的1/4决赛中待定的对手
+PENDING_PLAYER = -1
+
+# 下游节点所在的轮次 -> 推进该轮次的顺序（上游在前）
+STAGE_OF_M_TYPE = {QUARTERFINAL: 'quarterfinals', SEMIFINAL: 'semifinals', BRONZE: 'finals', GOLD: 'finals'}
+STAGES = ('quarterfinals', 'semifinals', 'finals')
+
+KNOCKOUT_MATCHES = register_query('matches.knockout_by_tournament', """
+    SELECT m_id, m_type, player_1_id, player_1_score, player_2_id, player_2_score
+    FROM matches
+    WHERE t_id = :t_id AND m_type IN (8, 10, 11, 12, 13)
+    ORDER BY m_id
+""")
+FILL_PENDING_SLOT = register_query('matches.fill_pending_slot', """
+    UPDATE matches SET player_2_id = :player_2_id WHERE m_id = :m_id AND player_2_id = -1
+""")
+
+
+class BracketNode:
+    """淘汰赛中的一场比赛（m_id 为空表示尚未生成的比赛）"""
+
+    __slots__ = ('m_id', 'm_type', 'player_1_id', 'player_1_score', 'player_2_id', 'player_2_score',
+                 'feeders', 'targets')
+
+    def __init__(self, m_type, m_id=None, player_1_id=None, player_1_score=0, player_2_id=None, player_2_score=0):
+        self.m_id = m_id
+        self.m_type = m_type
+        self.player_1_id = player_1_id
+        self.player_1_score = player_1_score
+        self.player_2_id = player_2_id
+        self.player_2_score = player_2_score
+        self.feeders = {}    # 位置（'player_1_id'/'player_2_id'）-> (来源节点, 'winner'/'loser')
+        self.targets = []    # 依赖本场结果的下游节点
+
+    def __repr__(self):
+        return f"<BracketNode {self.m_type}:{self.m_id} {self.player_1_id} vs {self.player_2_id}>"
+
+    @property
+    def complete(self):
+        return not (self.player_1_score == 0 and self.player_2_score == 0)
+
+    def outcome(self, kind):
+        """胜者或负者的选手ID"""
+        player_1_wins = self.player_1_score > self.player_2_score
+        if kind == 'winner':
+            return self.player_1_id if player_1_wins else self.player_2_id
+        return self.player_2_id if player_1_wins else self.player_1_id
+
+    def feed(self, slot, source, kind):
+        self.feeders[slot] = (source, kind)
+        source.targets.append(self)
+
+    def resolve(self):
+        """按来源比赛的结果填入各位置"""
+        for slot, (source, kind) in self.feeders.items():
+            setattr(self, slot, source.outcome(kind))
+
+
+class BracketGraph:
+    """一个赛事的淘汰赛依赖图（见模块说明）"""
+
+    def __init__(self, t_id, rows):
+        self.t_id = t_id
+        self.nodes = {}
+        rounds = {m_type: [] for m_type in KNOCKOUT_M_TYPES}
+        for row in rows:
+            node = BracketNode(row.m_type, row.m_id, row.player_1_id, row.player_1_score,
+                               row.player_2_id, row.player_2_score)
+            self.nodes[node.m_id] = node
+            rounds[node.m_type].append(node)
+        self.qualifiers = rounds[QUARTERFINAL_QUALIFIER]
+        self.quarterfinals = rounds[QUARTERFINAL]
+        self.semifinals = rounds[SEMIFINAL]
+        self.finals = rounds[GOLD] + rounds[BRONZE]
+        self._link()
+
+    @classmethod
+    def load(cls, t_id, session=None):
+        return cls(t_id, KNOCKOUT_MATCHES.execute({'t_id': t_id}, session=session).fetchall())
+
+    def _link(self):
+        """连接来源比赛与下游比赛；尚未生成的半决赛、决赛作为待生成的节点加入图中"""
+        pending = [qf for qf in self.quarterfinals if qf.player_2_id == PENDING_PLAYER]
+        for qualifier, quarterfinal in zip(self.qualifiers, pending):
+            quarterfinal.feed('player_2_id', qualifier, 'winner')
+
+        if len(self.quarterfinals) >= 4:
+            semifinals = self.semifinals[:2] if self.semifinals else [BracketNode(SEMIFINAL), BracketNode(SEMIFINAL)]
+            for index, semifinal in enumerate(semifinals):
+                semifinal.feed('player_1_id', self.quarterfinals[index * 2], 'winner')
+                if index * 2 + 1 < len(self.quarterfinals):
+                    semifinal.feed('player_2_id', self.quarterfinals[index * 2 + 1], 'winner')
+            self._planned_semifinals = [] if self.semifinals else semifinals
+        else:
+            self._planned_semifinals = []
+
+        semifinals = self.semifinals or self._planned_semifinals
+        self._planned_finals = []
+        if len(semifinals) >= 2:
+            existing = {node.m_type: node for node in self.finals}
+            for m_type, kind in ((GOLD, 'winner'), (BRONZE, 'loser')):
+                final = existing.get(m_type)
+                if final is None:
+                    final = BracketNode(m_type)
+                    if not self.finals:
+                        self._planned_finals.append(final)
+                final.feed('player_1_id', semifinals[0], kind)
+                final.feed('player_2_id', semifinals[1], kind)
+
+    # ---- 推进 ----
+
+    def advance(self, m_ids=None):
+        """从录入比分的比赛沿下游推进（m_ids 为空时检查全部轮次），补位与新生成的比赛写入会话（不提交）
+
+        返回补位或新生成的比赛数。
+        """
+        if m_ids is None:
+            stages = set(STAGES)
+        else:
+            stages = set()
+            for m_id in m_ids:
+                node = self.nodes.get(int(m_id))
+                if node is not None:
+                    stages.update(STAGE_OF_M_TYPE[target.m_type] for target in node.targets)
+
+        changed = 0
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            updated = getattr(self, f'_advance_{stage}')()
+            for node in updated:
+                stages.update(STAGE_OF_M_TYPE[target.m_type] for target in node.targets)
+            changed += len(updated)
+        return changed
+
+    def _advance_quarterfinals(self):
+        """资格赛全部完成后填入待定的1/4决赛"""
+        if not self.qualifiers or not all(node.complete for node in self.qualifiers):
+            return []
+        filled = [qf for qf in self.quarterfinals if qf.player_2_id == PENDING_PLAYER and qf.feeders]
+        if not filled:
+            return []
+        for quarterfinal in filled:
+            quarterfinal.resolve()
+            print(f"更新1/4决赛 {quarterfinal.m_id}: {quarterfinal.player_1_id} vs {quarterfinal.player_2_id}")
+        FILL_PENDING_SLOT.execute([{'m_id': qf.m_id, 'player_2_id': qf.player_2_id} for qf in filled])
+        return filled
+
+    def _advance_semifinals(self):
+        """1/4决赛全部完成且还没有半决赛时生成半决赛"""
+        if not self._planned_semifinals or not all(node.complete for node in self.quarterfinals):
+            return []
+        created = self._create(self._planned_semifinals)
+        self.semifinals, self._planned_semifinals = created, []
+        print(f"创建半决赛: {created[0].player_1_id} vs {created[0].player_2_id}, "
+              f"{created[1].player_1_id} vs {created[1].player_2_id}")
+        return created
+
+    def _advance_finals(self):
+        """半决赛全部完成且还没有金牌赛、铜牌赛时生成"""
+        if (not self._planned_finals or not self.semifinals
+                or not all(node.complete for node in self.semifinals)):
+            return []
+        created = self._create(self._planned_finals)
+        self.finals, self._planned_finals = created, []
+        for node in created:
+            print(f"创建{'金牌赛' if node.m_type == GOLD else '铜牌赛'}: {node.player_1_id} vs {node.player_2_id}")
+        return created
+
+    def _create(self, nodes):
+        matches = []
+        for node in nodes:
+            node.resolve()
+            match = Match(
+                t_id=self.t_id,
+                m_type=node.m_type,
+                player_1_id=node.player_1_id,
+                player_2_id=node.player_2_id,
+                player_1_score=0,
+                player_2_score=0
+            )
+            db.session.add(match)
+            matches.append(match)
+        db.session.flush()
+        for node, match in zip(nodes, matches):
+            node.m_id = match.m_id
+            self.nodes[node.m_id] = node
+        return nodes
+
+    # ---- 查看 ----
+
+    def expected_players(self, node):
+        """按来源比赛推导的 (player_1_id, player_2_id)；来源比赛未完成的位置为 None"""
+        players = {'player_1_id': node.player_1_id, 'player_2_id': node.player_2_id}
+        for slot, (source, kind) in node.feeders.items():
+            players[slot] = source.outcome(kind) if source.complete else None
+        return players['player_1_id'], players['player_2_id']
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+淘汰赛对阵图回放检查
+对数据库中每个有淘汰赛的赛事（小组赛+1/4决赛、小组赛+半决赛资格赛），按历史比分重放淘汰赛的录入过程，
+分别用原有的全量推导（KnockoutManager.check_and_update_next_round）与对阵图的增量推进
+（update_knockout_bracket_logic，只推进录入比赛的下游）各回放一遍，检查：
+1. 每录入一场比分后，两种实现得到的淘汰赛（类型、对阵、比分，按 m_id 顺序）完全一致；
+2. 回放结束后对阵图全量检查不再产生变更，已生成的半决赛、决赛与对阵图按来源比赛推导的对阵一致；
+3. 与 update_quarterfinal_semifinals、update_final_matchups 按同一结果更新的半决赛、决赛对阵一致。
+
+回放的初始状态：由上一轮推导生成的半决赛、决赛删除，其余淘汰赛比分清零，资格赛胜者所在的1/4决赛位置恢复为待定。
+每次回放后恢复赛事原有的淘汰赛，检查会临时修改当前数据库，请在数据库副本上运行。
+
+用法: python check/check_bracket_graph.py [赛事ID ...]
+"""
+
+import io
+import contextlib
+import os
+import sys
+
+os.environ.setdefault('STANDINGS_CACHE_MAX_ENTRIES', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import (app, db, sync_materialized_tables, KnockoutManager, update_knockout_bracket_logic,  # noqa: E402
+                 update_quarterfinal_semifinals, update_final_matchups)
+from bracket import (BracketGraph, KNOCKOUT_M_TYPES, PENDING_PLAYER, QUARTERFINAL_QUALIFIER,  # noqa: E402
+                     QUARTERFINAL, SEMIFINAL, BRONZE, GOLD)
+
+
+# 回放的录入顺序：按轮次，同一轮内按 m_id
+REPLAY_ORDER = (QUARTERFINAL_QUALIFIER, QUARTERFINAL, SEMIFINAL, GOLD, BRONZE)
+KNOCKOUT_IN = ', '.join(str(m_type) for m_type in KNOCKOUT_M_TYPES)
+
+
+def knockout_rows(t_id):
+    rows = db.session.execute(text(f"""
+        SELECT * FROM matches WHERE t_id = :t_id AND m_type IN ({KNOCKOUT_IN}) ORDER BY m_id
+    """), {'t_id': t_id}).mappings().fetchall()
+    return [dict(row) for row in rows]
+
+
+def snapshot(t_id):
+    return [(row['m_type'], row['player_1_id'], row['player_1_score'], row['player_2_id'], row['player_2_score'])
+            for row in knockout_rows(t_id)]
+
+
+def pairings(state):
+    return [(m_type, player_1_id, player_2_id) for m_type, player_1_id, _, player_2_id, _ in state]
+
+
+def by_position(rows):
+    """(m_type, 同类型中的序号) -> 行"""
+    positions, counts = {}, {}
+    for row in rows:
+        index = counts.get(row['m_type'], 0)
+        counts[row['m_type']] = index + 1
+        positions[(row['m_type'], index)] = row
+    return positions
+
+
+def winner(row):
+    return row['player_1_id'] if row['player_1_score'] > row['player_2_score'] else row['player_2_id']
+
+
+def restore(t_id, original):
+    """删除赛事当前的淘汰赛并按原样写回"""
+    db.session.execute(text(f"DELETE FROM matches WHERE t_id = :t_id AND m_type IN ({KNOCKOUT_IN})"), {'t_id': t_id})
+    if original:
+        columns = list(original[0])
+        db.session.execute(text(f"""
+            INSERT INTO matches ({', '.join(columns)}) VALUES ({', '.join(':' + column for column in columns)})
+        """), original)
+    db.session.commit()
+
+
+def prepare(t_id, original):
+    """写入回放的初始状态"""
+    counts = {m_type: sum(1 for row in original if row['m_type'] == m_type) for m_type in KNOCKOUT_M_TYPES}
+    derived = set()
+    if counts[QUARTERFINAL] >= 4:
+        derived.add(SEMIFINAL)
+    if counts[SEMIFINAL] >= 2 or SEMIFINAL in derived:
+        derived.update((GOLD, BRONZE))
+    if derived:
+        db.session.execute(text(f"""
+            DELETE FROM matches WHERE t_id = :t_id AND m_type IN ({', '.join(str(m_type) for m_type in derived)})
+        """), {'t_id': t_id})
+
+    # 资格赛胜者所在的1/4决赛位置恢复为待定
+    quarterfinals = [row for row in original if row['m_type'] == QUARTERFINAL]
+    for qualifier in (row for row in original if row['m_type'] == QUARTERFINAL_QUALIFIER):
+        for quarterfinal in quarterfinals:
+            if quarterfinal['player_2_id'] == winner(qualifier):
+                db.session.execute(text("UPDATE matches SET player_2_id = :pending WHERE m_id = :m_id"),
+                                   {'pending': PENDING_PLAYER, 'm_id': quarterfinal['m_id']})
+                quarterfinals.remove(quarterfinal)
+                break
+
+    db.session.execute(text(f"""
+        UPDATE matches SET player_1_score = 0, player_2_score = 0 WHERE t_id = :t_id AND m_type IN ({KNOCKOUT_IN})
+    """), {'t_id': t_id})
+    db.session.commit()
+
+
+def legacy_advance(t_id, m_id):
+    try:
+        KnockoutManager(t_id).check_and_update_next_round()
+    except Exception as e:
+        db.session.rollback()
+        return f"{e.__class__.__name__}: {e}"
+    return None
+
+
+def graph_advance(t_id, m_id):
+    return None if update_knockout_bracket_logic(t_id, [m_id]) else '更新失败'
+
+
+def replay(t_id, original, advance):
+    """从初始状态按历史比分逐场录入，返回每一步后的 (录入位置, 错误, 淘汰赛快照)"""
+    prepare(t_id, original)
+    history = by_position(original)
+    steps = []
+    for m_type in REPLAY_ORDER:
+        index = 0
+        while (m_type, index) in history:
+            current = by_position(knockout_rows(t_id)).get((m_type, index))
+            if current is not None:
+                score = history[(m_type, index)]
+                db.session.execute(text("""
+                    UPDATE matches SET player_1_score = :player_1_score, player_2_score = :player_2_score
+                    WHERE m_id = :m_id
+                """), {'player_1_score': score['player_1_score'], 'player_2_score': score['player_2_score'],
+                       'm_id': current['m_id']})
+                db.session.commit()
+                error = advance(t_id, current['m_id'])
+                steps.append(((m_type, index), error, snapshot(t_id)))
+            index += 1
+    return steps
+
+
+def check_final_state(t_id):
+    """回放结束后（对阵图的结果上）检查对阵图的一致性与 update_* 函数的结果，返回问题列表"""
+    problems = []
+    graph = BracketGraph.load(t_id)
+    for node in graph.semifinals + graph.finals:
+        expected = graph.expected_players(node)
+        actual = (node.player_1_id, node.player_2_id)
+        if any(e is not None and e != a for e, a in zip(expected, actual)):
+            problems.append(f"比赛 {node.m_id}（类型 {node.m_type}）对阵 {actual} 与来源比赛推导的 {expected} 不一致")
+    if graph.advance() != 0:
+        db.session.rollback()
+        problems.append("回放结束后全量检查仍产生变更")
+
+    # update_* 会清零被更新比赛的比分，先更新决赛（依赖半决赛比分）再更新半决赛
+    before = pairings(snapshot(t_id))
+    for name, update in (('update_final_matchups', update_final_matchups),
+                         ('update_quarterfinal_semifinals', update_quarterfinal_semifinals)):
+        if update(t_id) and pairings(snapshot(t_id)) != before:
+            problems.append(f"{name} 更新后的对阵与对阵图不一致: {before} -> {pairings(snapshot(t_id))}")
+    return problems
+
+
+def check_tournament(t_id):
+    """回放一个赛事，返回问题列表"""
+    original = knockout_rows(t_id)
+    problems, legacy_steps, graph_steps = [], [], []
+    try:
+        legacy_steps = replay(t_id, original, legacy_advance)
+        restore(t_id, original)
+        graph_steps = replay(t_id, original, graph_advance)
+        problems.extend(check_final_state(t_id))
+    finally:
+        db.session.rollback()
+        restore(t_id, original)
+
+    if len(legacy_steps) != len(graph_steps):
+        problems.append(f"录入步数不一致: 全量推导 {len(legacy_steps)} 步，对阵图 {len(graph_steps)} 步")
+    for step, (legacy, graph) in enumerate(zip(legacy_steps, graph_steps), 1):
+        if legacy != graph:
+            position, legacy_error, legacy_state = legacy
+            _, graph_error, graph_state = graph
+            problems.append(f"第 {step} 步（录入类型 {position[0]} 第 {position[1] + 1} 场）结果不一致:\n"
+                            f"      全量推导: {legacy_state}{' 错误: ' + legacy_error if legacy_error else ''}\n"
+                            f"      对阵图:   {graph_state}{' 错误: ' + graph_error if graph_error else ''}")
+            break
+    return problems, len(graph_steps)
+
+
+def main():
+    client = app.test_client()
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求预热
+    client.get('/health')
+    with app.app_context():
+        if len(sys.argv) > 1:
+            t_ids = [int(arg) for arg in sys.argv[1:]]
+        else:
+            t_ids = [row[0] for row in db.session.execute(text(f"""
+                SELECT DISTINCT t.t_id FROM tournament t
+                JOIN matches m ON m.t_id = t.t_id
+                WHERE t.t_format IN (1, 3) AND m.m_type IN ({KNOCKOUT_IN})
+                ORDER BY t.t_id
+            """))]
+        if not t_ids:
+            print("没有可回放的淘汰赛（小组赛+1/4决赛、小组赛+半决赛资格赛）")
+            return
+
+        failures = 0
+        for t_id in t_ids:
+            # 两种实现的逐步输出不显示
+            with contextlib.redirect_stdout(io.StringIO()):
+                problems, steps = check_tournament(t_id)
+            if problems:
+                failures += 1
+                print(f"❌ 赛事 {t_id}（{steps} 步）:")
+                for problem in problems:
+                    print(f"    {problem}")
+            else:
+                print(f"✅ 赛事 {t_id}: {steps} 步回放一致")
+
+    if failures:
+        print(f"❌ {failures}/{len(t_ids)} 个赛事的回放结果不一致")
+        sys.exit(1)
+    print(f"✅ {len(t_ids)} 个赛事的回放结果全部一致")
+
+
+if __name__ == "__main__":
+    main()
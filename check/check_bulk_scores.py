@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量录入比分检查
+向 /admin-secret/matches/bulk-scores 提交真实的批量比分（多个赛事的小组赛），检查：
+1. 返回 200，updated_matches 与提交的场数一致，每个涉及的赛事都有结果；
+2. 数据库中的比分与提交的一致，涉及赛事的排名都已写入积分；
+3. 含无效比分（0:0）的请求返回 400，且不写入其中任何一场。
+
+检查会修改当前本地数据库中的比分，请在数据库副本上运行。
+
+用法: python check/check_bulk_scores.py [赛事数] [每个赛事的场数]
+"""
+
+import os
+import sys
+
+os.environ.setdefault('STANDINGS_CACHE_MAX_ENTRIES', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import bindparam, text  # noqa: E402
+
+from app import app, db, sync_materialized_tables  # noqa: E402
+from bracket import KNOCKOUT_M_TYPES  # noqa: E402
+
+URL = '/admin-secret/matches/bulk-scores'
+KNOCKOUT_IN = ', '.join(str(m_type) for m_type in KNOCKOUT_M_TYPES)
+
+
+def sample_matches(tournament_count, per_tournament):
+    """每个赛事取前几场小组赛：[(m_id, t_id, 比分1, 比分2)]"""
+    t_ids = [row[0] for row in db.session.execute(text(f"""
+        SELECT DISTINCT t_id FROM matches WHERE m_type NOT IN ({KNOCKOUT_IN}) ORDER BY t_id LIMIT :count
+    """), {'count': tournament_count})]
+    matches = []
+    for t_id in t_ids:
+        matches += db.session.execute(text(f"""
+            SELECT m_id, t_id, player_1_score, player_2_score FROM matches
+            WHERE t_id = :t_id AND m_type NOT IN ({KNOCKOUT_IN}) ORDER BY m_id LIMIT :count
+        """), {'t_id': t_id, 'count': per_tournament}).fetchall()
+    return [tuple(row) for row in matches]
+
+
+def stored_scores(m_ids):
+    rows = db.session.execute(text("""
+        SELECT m_id, player_1_score, player_2_score FROM matches WHERE m_id IN :m_ids
+    """).bindparams(bindparam('m_ids', expanding=True)), {'m_ids': list(m_ids)}).fetchall()
+    db.session.commit()
+    return {m_id: (score_1, score_2) for m_id, score_1, score_2 in rows}
+
+
+def unscored_rankings(t_ids):
+    count = db.session.execute(text("""
+        SELECT COUNT(*) FROM rankings WHERE t_id IN :t_ids AND scores IS NULL
+    """).bindparams(bindparam('t_ids', expanding=True)), {'t_ids': list(t_ids)}).scalar()
+    db.session.commit()
+    return count
+
+
+def main():
+    tournament_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    per_tournament = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    client = app.test_client()
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求预热
+    client.get('/health')
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    with app.app_context():
+        matches = sample_matches(tournament_count, per_tournament)
+    if not matches:
+        print("❌ 数据库中没有小组赛")
+        sys.exit(1)
+    t_ids = sorted({t_id for _, t_id, _, _ in matches})
+    failures = 0
+
+    # 含一场 0:0 的请求整体拒绝，不写入其余比分
+    with app.app_context():
+        before = stored_scores(m_id for m_id, _, _, _ in matches)
+    invalid = [[m_id, score_1 + 1, score_2] for m_id, _, score_1, score_2 in matches[:-1]]
+    invalid.append([matches[-1][0], 0, 0])
+    response = client.post(URL, json={'scores': invalid})
+    with app.app_context():
+        unchanged = stored_scores(m_id for m_id, _, _, _ in matches) == before
+    if response.status_code != 400 or not unchanged:
+        print(f"❌ 含无效比分的请求: HTTP {response.status_code}，比分{'未变' if unchanged else '已被写入'}")
+        failures += 1
+    else:
+        print("✅ 含无效比分的请求返回 400，没有写入任何比分")
+
+    # 有效的批量比分
+    expected = {m_id: (score_1 + 1, score_2) for m_id, _, score_1, score_2 in matches}
+    response = client.post(URL, json={'scores': [[m_id, *scores] for m_id, scores in expected.items()]})
+    payload = response.get_json(silent=True) or {}
+    if response.status_code != 200 or not payload.get('success'):
+        print(f"❌ 批量录入: HTTP {response.status_code} {payload.get('error')}")
+        failures += 1
+    else:
+        reported = sorted(result['t_id'] for result in payload.get('tournaments', []))
+        if payload.get('updated_matches') != len(expected) or reported != t_ids:
+            print(f"❌ 批量录入返回 {payload.get('updated_matches')} 场、赛事 {reported}，"
+                  f"提交了 {len(expected)} 场、赛事 {t_ids}")
+            failures += 1
+        else:
+            print(f"✅ 批量录入返回 200: {len(expected)} 场比赛，{len(t_ids)} 个赛事")
+
+    with app.app_context():
+        stored = stored_scores(expected)
+        missing_scores = unscored_rankings(t_ids)
+    wrong = {m_id: stored.get(m_id) for m_id in expected if stored.get(m_id) != expected[m_id]}
+    if wrong:
+        for m_id, scores in sorted(wrong.items()):
+            print(f"❌ 比赛 {m_id}: 数据库中为 {scores}，提交的是 {expected[m_id]}")
+        failures += len(wrong)
+    else:
+        print("✅ 数据库中的比分与提交的一致")
+    if missing_scores:
+        print(f"❌ 涉及的赛事中有 {missing_scores} 条排名没有积分")
+        failures += 1
+
+    if failures:
+        print(f"❌ 发现 {failures} 处问题")
+        sys.exit(1)
+    print("✅ 批量录入比分检查通过")
+
+
+if __name__ == "__main__":
+    main()
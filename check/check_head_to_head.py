@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交手索引与原实现一致性检查
+对数据库中的每届赛事，用交手索引改造前 app.py 中的原实现（以下 baseline_* 函数逐字摘自改造前的代码，
+包括 calculate_head_to_head_result 对比赛元组的原有拆解方式）重新计算胜负关系，并与当前实现逐对比较：
+1. 单循环赛同积分排名（m_type=1）：对同积分选手的胜负关系积分与两人首场交手结果；
+2. 小组内同积分排名：按分配次数计入的组内比赛列表上的胜负关系积分与首场交手结果；
+3. 跨组总排名：calculate_head_to_head_result 与 CrossGroupHeadToHead 对每对选手的比较结果，
+   并用原比较函数对 get_tournament_groups、calculate_total_group_rankings 的结果重新排序，确认总排名不变。
+
+用法: python check/check_head_to_head.py [赛事ID ...]
+"""
+
+import contextlib
+import io
+import os
+import sys
+from collections import defaultdict
+from functools import cmp_to_key
+
+os.environ.setdefault('STANDINGS_CACHE_MAX_ENTRIES', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db, sync_materialized_tables, get_tournament_groups, calculate_total_group_rankings  # noqa: E402
+from tournament_context import TournamentContext, HeadToHeadIndex  # noqa: E402
+
+
+# ---- 原实现（摘自改造前的 app.py） ----
+
+def baseline_round_robin_h2h(player, result):
+    """calculate_same_points_ranking_for_round_robin：选手对同积分选手的胜负关系"""
+    h2h_points = 0
+    h2h_wins = 0
+    h2h_draws = 0
+    h2h_losses = 0
+    h2h_goals_for = 0
+    h2h_goals_against = 0
+
+    for match in result:
+        p1_id, p2_id, score_1, score_2 = match
+
+        if p1_id == player['player_id']:
+            # 该选手是主队
+            h2h_goals_for += score_1
+            h2h_goals_against += score_2
+            if score_1 > score_2:
+                h2h_wins += 1
+                h2h_points += 3
+            elif score_1 == score_2:
+                h2h_draws += 1
+                h2h_points += 1
+            else:
+                h2h_losses += 1
+        elif p2_id == player['player_id']:
+            # 该选手是客队
+            h2h_goals_for += score_2
+            h2h_goals_against += score_1
+            if score_2 > score_1:
+                h2h_wins += 1
+                h2h_points += 3
+            elif score_2 == score_1:
+                h2h_draws += 1
+                h2h_points += 1
+            else:
+                h2h_losses += 1
+
+    return (h2h_points, h2h_wins, h2h_draws, h2h_losses, h2h_goals_for - h2h_goals_against)
+
+
+def baseline_round_robin_mutual(player1, player2, result):
+    """calculate_same_points_ranking_for_round_robin.compare_h2h 第 3 步：相互之间的胜负关系（None 表示继续比较）"""
+    for match in result:
+        p1_id, p2_id, score_1, score_2 = match
+
+        # 找到两人之间的比赛
+        if (p1_id == player1['player_id'] and p2_id == player2['player_id']) or \
+           (p1_id == player2['player_id'] and p2_id == player1['player_id']):
+
+            if p1_id == player1['player_id']:
+                # player1是主队
+                if score_1 > score_2:
+                    return -1  # player1排在前面
+                elif score_2 > score_1:
+                    return 1   # player2排在前面
+                else:
+                    break  # 平局，继续比较其他指标
+            else:
+                # player2是主队
+                if score_2 > score_1:
+                    return -1  # player2排在前面
+                elif score_1 > score_2:
+                    return 1   # player1排在前面
+                else:
+                    break  # 平局，继续比较其他指标
+    return None
+
+
+def baseline_group_h2h(player, players_with_same_points, all_matches):
+    """calculate_group_standings.calculate_same_points_ranking：选手对同分选手的胜负关系"""
+    player_id = player['player_id']
+    h2h_points = 0
+    h2h_wins = 0
+    h2h_draws = 0
+    h2h_losses = 0
+    h2h_goals_for = 0
+    h2h_goals_against = 0
+
+    # 遍历所有比赛，找到与同分选手的比赛
+    for match in all_matches:
+        p1_id, p2_id, score_1, score_2, m_type = match
+        if score_1 is None or score_2 is None:
+            continue
+
+        # 检查这场比赛是否涉及当前选手和同分选手
+        if p1_id == player_id:
+            # 当前选手是主队
+            for other_player in players_with_same_points:
+                if other_player['player_id'] == p2_id and other_player['player_id'] != player_id:
+                    h2h_goals_for += score_1
+                    h2h_goals_against += score_2
+                    if score_1 > score_2:
+                        h2h_points += 3
+                        h2h_wins += 1
+                    elif score_1 == score_2:
+                        h2h_points += 1
+                        h2h_draws += 1
+                    else:
+                        h2h_losses += 1
+                    break
+        elif p2_id == player_id:
+            # 当前选手是客队
+            for other_player in players_with_same_points:
+                if other_player['player_id'] == p1_id and other_player['player_id'] != player_id:
+                    h2h_goals_for += score_2
+                    h2h_goals_against += score_1
+                    if score_2 > score_1:
+                        h2h_points += 3
+                        h2h_wins += 1
+                    elif score_1 == score_2:
+                        h2h_points += 1
+                        h2h_draws += 1
+                    else:
+                        h2h_losses += 1
+                    break
+
+    return (h2h_points, h2h_wins, h2h_draws, h2h_losses, h2h_goals_for - h2h_goals_against)
+
+
+def baseline_group_mutual(player1, player2, all_matches):
+    """calculate_group_standings.compare_h2h 第 2 步：相互之间的胜负关系（None 表示继续比较）"""
+    for match in all_matches:
+        p1_id, p2_id, score_1, score_2, m_type = match
+        if score_1 is None or score_2 is None:
+            continue
+
+        # 找到两人之间的比赛
+        if (p1_id == player1['player_id'] and p2_id == player2['player_id']) or \
+           (p1_id == player2['player_id'] and p2_id == player1['player_id']):
+
+            if p1_id == player1['player_id']:
+                # player1是主队
+                if score_1 > score_2:
+                    return -1  # player1排在前面
+                elif score_2 > score_1:
+                    return 1   # player2排在前面
+                else:
+                    break  # 平局，继续比较其他指标
+            else:
+                # player1是客队
+                if score_2 > score_1:
+                    return -1  # player1排在前面
+                elif score_1 > score_2:
+                    return 1   # player2排在前面
+                else:
+                    break  # 平局，继续比较其他指标
+    return None
+
+
+def calculate_head_to_head_result(player1_id, player2_id, matches):
+    """计算两个选手之间的胜负关系（谁赢了谁）"""
+    player1_wins = 0
+    player2_wins = 0
+
+    for match in matches:
+        if len(match) == 5:  # 包含m_type字段
+            p1_id, p1_score, p2_id, p2_score, m_type = match
+        else:  # 不包含m_type字段（向后兼容）
+            p1_id, p1_score, p2_id, p2_score = match
+            m_type = 1
+
+        # 检查是否是这两个选手之间的比赛
+        if ((p1_id == player1_id and p2_id == player2_id) or
+                (p1_id == player2_id and p2_id == player1_id)):
+
+            if p1_id == player1_id:
+                # player1是主队
+                if p1_score > p2_score:
+                    player1_wins += 1
+                elif p2_score > p1_score:
+                    player2_wins += 1
+            else:
+                # player1是客队
+                if p2_score > p1_score:
+                    player1_wins += 1
+                elif p1_score > p2_score:
+                    player2_wins += 1
+
+    # 返回胜负关系：1表示player1胜，-1表示player2胜，0表示平局或未交手
+    if player1_wins > player2_wins:
+        return 1
+    elif player2_wins > player1_wins:
+        return -1
+    else:
+        return 0
+
+
+def baseline_all_matches(t_id):
+    """get_tournament_groups / calculate_total_group_rankings 中用于计算胜负关系的比赛数据"""
+    all_matches_query = text("""
+        SELECT player_1_id, player_2_id, player_1_score, player_2_score, m_type
+        FROM matches
+        WHERE t_id = :t_id AND m_type IN (1, 2, 3)
+        AND player_1_score IS NOT NULL AND player_2_score IS NOT NULL
+    """)
+
+    all_matches_result = db.session.execute(all_matches_query, {'t_id': t_id}).fetchall()
+    all_matches = []
+    for match_row in all_matches_result:
+        all_matches.append((match_row[0], match_row[1], match_row[2], match_row[3], match_row[4]))
+    return all_matches
+
+
+def baseline_groups_compare(all_matches):
+    """get_tournament_groups.compare_same_rank"""
+    def compare_same_rank(player1, player2):
+        # 1. 积分
+        if player1['points'] != player2['points']:
+            return player2['points'] - player1['points']
+
+        # 2. 积分相同，需要计算内部胜负关系
+        h2h_result = calculate_head_to_head_result(player1['player_id'], player2['player_id'], all_matches)
+        if h2h_result != 0:
+            return -h2h_result  # 1表示player1胜，返回-1让player1排在前面
+
+        # 3. 胜负关系相同（平局或未交手），比较净胜分
+        if player1['goal_difference'] != player2['goal_difference']:
+            return player2['goal_difference'] - player1['goal_difference']
+
+        # 4. 净胜分相同，比较总得分
+        if player1['goals_for'] != player2['goals_for']:
+            return player2['goals_for'] - player1['goals_for']
+
+        # 5. 按姓名排序
+        if player1['name'] < player2['name']:
+            return -1
+        elif player1['name'] > player2['name']:
+            return 1
+        else:
+            return 0
+    return compare_same_rank
+
+
+def baseline_total_compare(matches):
+    """calculate_total_group_rankings.compare_same_rank"""
+    def compare_same_rank(player1, player2):
+        # 1. 积分
+        if player1['points'] != player2['points']:
+            return player2['points'] - player1['points']
+
+        # 2. 积分相同，先比较净胜分
+        if player1['goal_difference'] != player2['goal_difference']:
+            return player2['goal_difference'] - player1['goal_difference']
+
+        # 3. 净胜分相同，比较内部胜负关系
+        h2h_result = calculate_head_to_head_result(player1['player_id'], player2['player_id'], matches)
+        if h2h_result != 0:
+            return -h2h_result  # 1表示player1胜，返回-1让player1排在前面
+
+        # 4. 胜负关系相同（平局或未交手），比较总得分
+        if player1['goals_for'] != player2['goals_for']:
+            return player2['goals_for'] - player1['goals_for']
+
+        # 5. 按姓名排序
+        if player1['name'] < player2['name']:
+            return -1
+        elif player1['name'] > player2['name']:
+            return 1
+        else:
+            return 0
+    return compare_same_rank
+
+
+# ---- 检查 ----
+
+def index_h2h(index, player_id, opponent_ids):
+    totals = index.totals(player_id, opponent_ids)
+    return (totals['points'], totals['wins'], totals['draws'], totals['losses'],
+            totals['goals_for'] - totals['goals_against'])
+
+
+def index_mutual(index, player1_id, player2_id):
+    first_result = index.first_result(player1_id, player2_id)
+    return -first_result if first_result != 0 else None
+
+
+def check_pairs(label, player_ids, index, baseline_h2h, baseline_mutual):
+    """逐对比较同积分胜负关系（积分、胜平负、净胜分）与相互胜负关系；胜负关系按对累加，逐对一致即任意同分组合一致"""
+    problems = []
+    for a in player_ids:
+        for b in player_ids:
+            if a == b:
+                continue
+            pair = [{'player_id': a}, {'player_id': b}]
+            if index_h2h(index, a, (a, b)) != baseline_h2h(pair[0], pair):
+                problems.append(f"{label}: 选手 {a} 对 {b} 的胜负关系不一致")
+            if index_mutual(index, a, b) != baseline_mutual(pair[0], pair[1]):
+                problems.append(f"{label}: 选手 {a} vs {b} 的相互胜负关系不一致")
+    return problems
+
+
+def total_order(standings):
+    return [(s['total_rank'], s['player_id']) for s in sorted(standings, key=lambda s: s['total_rank'])]
+
+
+def resort_by_baseline(standings, compare):
+    """按组内排名分组，用原比较函数重新排序并分配总排名"""
+    rank_groups = defaultdict(list)
+    for player in sorted(standings, key=lambda s: s['total_rank']):
+        rank_groups[player['group_rank']].append(player)
+    ordered = []
+    for rank in sorted(rank_groups.keys()):
+        ordered.extend(sorted(rank_groups[rank], key=cmp_to_key(compare)))
+    return [(i + 1, s['player_id']) for i, s in enumerate(ordered)]
+
+
+def check_tournament(t_id):
+    ctx = TournamentContext.load(t_id)
+    problems = []
+
+    # 1. 单循环赛同积分排名
+    result = [(m.player_1_id, m.player_2_id, m.player_1_score, m.player_2_score) for m in ctx.scored_matches((1,))]
+    player_ids = sorted({pid for match in result for pid in match[:2]})
+    problems += check_pairs(
+        "单循环", player_ids, ctx.head_to_head((1,)),
+        lambda player, tied: baseline_round_robin_h2h(
+            player, [m for m in result if m[0] in {p['player_id'] for p in tied} and m[1] in {p['player_id'] for p in tied}]),
+        lambda player1, player2: baseline_round_robin_mutual(
+            player1, player2, [m for m in result if {m[0], m[1]} <= {player1['player_id'], player2['player_id']}]))
+
+    # 2. 小组内同积分排名（重复分配的选手按分配次数计入，与 calculate_group_standings 一致）
+    for group in ctx.groups:
+        member_ids = ctx.group_player_ids(group['tg_id'])
+        all_matches = []
+        for m in ctx.matches_of_types((1, 2, 3)):
+            multiplicity = member_ids.count(m.player_1_id) * member_ids.count(m.player_2_id)
+            all_matches.extend([(m.player_1_id, m.player_2_id, m.player_1_score, m.player_2_score, m.m_type)] * multiplicity)
+        problems += check_pairs(
+            f"分组 {group['t_name']}", sorted(set(member_ids)), HeadToHeadIndex(all_matches),
+            lambda player, tied, all_matches=all_matches: baseline_group_h2h(player, tied, all_matches),
+            lambda player1, player2, all_matches=all_matches: baseline_group_mutual(player1, player2, all_matches))
+
+    # 3. 跨组总排名
+    if ctx.groups:
+        matches = baseline_all_matches(t_id)
+        cross_group = ctx.cross_group_head_to_head()
+        participants = sorted(ctx.players)
+        for a in participants:
+            for b in participants:
+                if a != b and cross_group.head_to_head_result(a, b) != calculate_head_to_head_result(a, b, matches):
+                    problems.append(f"跨组: 选手 {a} vs {b} 的胜负关系不一致")
+
+        groups = get_tournament_groups(t_id)
+        standings = [player for group in groups for player in group['players']]
+        if total_order(standings) != resort_by_baseline(standings, baseline_groups_compare(matches)):
+            problems.append("get_tournament_groups 的总排名与原比较规则不一致")
+
+        rankings = calculate_total_group_rankings(t_id)
+        standings = [player for group_standings in rankings.values() for player in group_standings]
+        if total_order(standings) != resort_by_baseline(standings, baseline_total_compare(matches)):
+            problems.append("calculate_total_group_rankings 的总排名与原比较规则不一致")
+
+    return problems
+
+
+def main():
+    client = app.test_client()
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求预热
+    client.get('/health')
+    with app.app_context():
+        if len(sys.argv) > 1:
+            t_ids = [int(arg) for arg in sys.argv[1:]]
+        else:
+            t_ids = [row[0] for row in db.session.execute(text("SELECT t_id FROM tournament ORDER BY t_id"))]
+
+        failures = 0
+        for t_id in t_ids:
+            # 排名计算过程中的输出不显示
+            with contextlib.redirect_stdout(io.StringIO()):
+                problems = check_tournament(t_id)
+            if problems:
+                failures += 1
+                print(f"❌ 赛事 {t_id}: {len(problems)} 处不一致")
+                for problem in problems[:10]:
+                    print(f"    {problem}")
+            else:
+                print(f"✅ 赛事 {t_id}: 与原实现一致")
+
+    if failures:
+        print(f"❌ {failures}/{len(t_ids)} 个赛事与原实现不一致")
+        sys.exit(1)
+    print(f"✅ {len(t_ids)} 个赛事的胜负关系与总排名全部与原实现一致")
+
+
+if __name__ == "__main__":
+    main()
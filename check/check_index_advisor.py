@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+索引检查（index advisor）
+以管理员和已绑定选手的用户身份访问所有 GET 路由（路径参数取数据库中的样例），记录每个请求执行的 SQL，
+再逐条用 EXPLAIN QUERY PLAN 分析；对 matches 或 rankings 的全表扫描视为缺少索引并报错。
+
+按设计需要读取整张表的统计查询（如全站排行榜、奖牌榜）列在 ALLOWED_FULL_SCANS 中，
+新增条目时需注明原因。
+
+用法: python check/check_index_advisor.py
+"""
+
+import os
+import re
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import app, db, sync_materialized_tables  # noqa: E402
+
+# 需要检查的表
+WATCHED_TABLES = ('matches', 'rankings')
+
+# 允许全表扫描的查询：(SQL 片段, 原因)
+ALLOWED_FULL_SCANS = [
+    ("GROUP BY t.season_id, t.type, p.player_id, p.name", "奖牌立方体：汇总全部前三名记录"),
+    ("recent_tournaments AS", "总积分排行榜：汇总全部排名记录"),
+    ("FROM matches m\n            UNION ALL", "比赛长表校准：对照全部比赛"),
+]
+
+# 路径参数 -> 取样查询
+SAMPLE_QUERIES = {
+    't_id': "SELECT t_id FROM tournament ORDER BY t_id",
+    'season_id': "SELECT season_id FROM seasons ORDER BY season_id",
+    'player_id': "SELECT player_id FROM players ORDER BY player_id LIMIT 5",
+    'm_id': "SELECT m_id FROM matches ORDER BY m_id LIMIT 3",
+}
+
+# 不检查的路由（会修改会话状态）
+SKIPPED_ENDPOINTS = {'static', 'logout', 'admin_logout'}
+
+
+def table_aliases(statement):
+    """语句中被检查的表及其别名（EXPLAIN QUERY PLAN 输出使用别名）"""
+    aliases = {}
+    for table, alias in re.findall(r'\b(?:FROM|JOIN)\s+"?(\w+)"?(?:\s+(?:AS\s+)?(\w+))?', statement, re.IGNORECASE):
+        if table.lower() in WATCHED_TABLES:
+            aliases[table.lower()] = table.lower()
+            if alias and alias.upper() not in ('WHERE', 'JOIN', 'LEFT', 'INNER', 'ON', 'ORDER', 'GROUP', 'LIMIT', 'UNION'):
+                aliases[alias] = table.lower()
+    return aliases
+
+
+def full_scans(connection, statement, parameters):
+    """返回语句对被检查表的全表扫描步骤"""
+    aliases = table_aliases(statement)
+    if not aliases:
+        return []
+    plan = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        match = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+        if match and match.group(1) in aliases:
+            scans.append(f"{detail} ({aliases[match.group(1)]})")
+    return scans
+
+
+def sample_urls():
+    """为每个 GET 路由生成待访问的 URL"""
+    from sqlalchemy import text
+
+    samples = {name: [row[0] for row in db.session.execute(text(query)).fetchall()]
+               for name, query in SAMPLE_QUERIES.items()}
+    urls = []
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint in SKIPPED_ENDPOINTS:
+            continue
+        if not rule.arguments:
+            urls.append(rule.rule)
+            continue
+        if len(rule.arguments) > 1 or not set(rule.arguments) <= set(samples):
+            print(f"⚠️  跳过路由 {rule.rule}（无样例参数）")
+            continue
+        argument = next(iter(rule.arguments))
+        for value in samples[argument]:
+            urls.append(rule.rule.replace(f'<int:{argument}>', str(value)))
+    return urls
+
+
+def main():
+    from sqlalchemy import text
+
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((statement, parameters))
+
+    client = app.test_client()
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求，不计入检查
+    client.get('/health')
+
+    with app.app_context():
+        user_row = db.session.execute(text("SELECT uid FROM users WHERE player_id IS NOT NULL LIMIT 1")).fetchone()
+        urls = sample_urls()
+        engine = db.engine
+
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+        if user_row:
+            sess['user_logged_in'] = True
+            sess['user_id'] = user_row[0]
+
+    statement_urls = defaultdict(set)
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for url in urls:
+            start = len(captured)
+            response = client.get(url)
+            if response.status_code >= 500:
+                print(f"❌ {url} 返回 {response.status_code}")
+            for statement, parameters in captured[start:]:
+                statement_urls[(statement, tuple(parameters) if isinstance(parameters, (list, tuple)) else parameters)].add(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    problems = 0
+    checked = set()
+    with app.app_context():
+        with db.engine.connect() as connection:
+            for (statement, parameters), urls_for_statement in statement_urls.items():
+                if statement in checked:
+                    continue
+                checked.add(statement)
+                scans = full_scans(connection, statement, parameters)
+                if not scans:
+                    continue
+                allowed = next((reason for fragment, reason in ALLOWED_FULL_SCANS if fragment in statement), None)
+                if allowed:
+                    continue
+                problems += 1
+                print(f"❌ 全表扫描: {'; '.join(scans)}")
+                print(f"   路由示例: {sorted(urls_for_statement)[0]}")
+                print("   " + " ".join(statement.split())[:300])
+
+    print(f"共访问 {len(urls)} 个 URL，分析 {len(checked)} 条不同的查询")
+    if problems:
+        print(f"❌ 发现 {problems} 条查询对 {'/'.join(WATCHED_TABLES)} 做全表扫描")
+        sys.exit(1)
+    print(f"✅ 所有路由的查询均未对 {'/'.join(WATCHED_TABLES)} 做全表扫描")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+具名语句检查
+在当前数据库的临时表上检查 queries.NamedQuery：
+1. 参数列表（executemany）经 NamedQuery.execute 原样执行，写入全部行；
+2. IN / NOT IN 列表补齐到 2 的幂后结果不变（含空列表），流水线展开（inline）的结果与会话执行一致；
+3. 同一语句不同长度的 IN 列表渲染出的 SQL 文本不超过 log2(最长列表) + 1 种。
+
+检查只使用临时表，不修改数据库中的数据。
+
+用法: python check/check_named_queries.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db  # noqa: E402
+from queries import NamedQuery  # noqa: E402
+
+INSERT_VALUE = NamedQuery('check.insert_value', """
+    INSERT INTO temp.check_named_queries (id, label, weight) VALUES (:id, :label, :weight)
+""")
+VALUES_IN = NamedQuery('check.values_in', """
+    SELECT id FROM temp.check_named_queries WHERE id IN :ids ORDER BY id
+""", expanding=('ids',))
+VALUES_NOT_IN = NamedQuery('check.values_not_in', """
+    SELECT id FROM temp.check_named_queries WHERE id NOT IN :ids ORDER BY id
+""", expanding=('ids',))
+
+ROW_COUNT = 12
+MAX_LIST = 9
+
+
+def check_executemany():
+    """参数列表经 NamedQuery.execute 写入，返回失败数"""
+    rows = [{'id': i, 'label': f"row-{i}", 'weight': i * 1.5} for i in range(1, ROW_COUNT + 1)]
+    try:
+        INSERT_VALUE.execute(rows)
+    except Exception as e:
+        print(f"❌ executemany 执行失败: {e}")
+        return 1
+    stored = db.session.execute(text(
+        "SELECT id, label, weight FROM temp.check_named_queries ORDER BY id")).mappings().fetchall()
+    if [dict(row) for row in stored] != rows:
+        print(f"❌ executemany 写入 {len(stored)} 行，与参数列表（{len(rows)} 行）不一致")
+        return 1
+    print(f"✅ executemany 写入 {len(rows)} 行")
+    return 0
+
+
+def check_in_lists():
+    """各种长度的 IN / NOT IN 列表，返回失败数"""
+    failures = 0
+    all_ids = list(range(1, ROW_COUNT + 1))
+    for query, expected_of in ((VALUES_IN, lambda ids: sorted(set(ids))),
+                               (VALUES_NOT_IN, lambda ids: [i for i in all_ids if i not in ids])):
+        texts, problems = set(), 0
+        for size in range(MAX_LIST + 1):
+            ids = list(range(2, 2 + size))
+            expected = expected_of(ids)
+            actual = [row[0] for row in query.execute({'ids': ids})]
+            sql, params = query.inline({'ids': ids})
+            inlined = [row[0] for row in db.session.execute(text(sql), params)]
+            texts.add(sql)
+            if actual != expected or inlined != expected:
+                print(f"❌ {query.name} 列表长度 {size}: 期望 {expected}，会话执行 {actual}，展开执行 {inlined}")
+                problems += 1
+        limit = (MAX_LIST - 1).bit_length() + 2  # 2 的幂的种数加上空列表
+        if len(texts) > limit:
+            print(f"❌ {query.name}: {MAX_LIST + 1} 种列表长度渲染出 {len(texts)} 种 SQL 文本（上限 {limit}）")
+            problems += 1
+        elif not problems:
+            print(f"✅ {query.name}: 列表长度 0-{MAX_LIST} 结果正确，{len(texts)} 种 SQL 文本")
+        failures += problems
+    return failures
+
+
+def main():
+    with app.app_context():
+        db.session.execute(text("""
+            CREATE TEMP TABLE check_named_queries (id INTEGER PRIMARY KEY, label TEXT, weight REAL)
+        """))
+        try:
+            failures = check_executemany()
+            failures += check_in_lists()
+        finally:
+            db.session.rollback()
+            db.session.execute(text("DROP TABLE IF EXISTS temp.check_named_queries"))
+            db.session.commit()
+
+    if failures:
+        print(f"❌ 发现 {failures} 处问题")
+        sys.exit(1)
+    print("✅ 具名语句检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比赛长表 player_matches 检查
+先执行未执行的迁移、刷新赛事序号表并按 matches 全量重建长表（与 flask --app app rebuild-player-matches 相同），然后：
+1. 与 matches 逐行对照（每场比赛每名参赛选手一行，结果为该选手视角的胜/平/负）；
+2. 在回滚的事务中插入、修改、删除一场比赛，确认触发器同步长表；
+3. 用 EXPLAIN QUERY PLAN 确认按选手、按赛事的查询走长表的复合索引而不是全表扫描。
+
+用法: python check/check_player_matches.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db, sync_materialized_tables, player_match_side_sql, PLAYER_MATCH_FIELDS  # noqa: E402
+from player_profile import MATCHES_BY_PLAYER_SQL, _TOURNAMENT_COLUMNS  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (说明, 查询语句, 查询计划中必须出现的索引)
+PLAN_CHECKS = [
+    ("选手档案的比赛列表",
+     MATCHES_BY_PLAYER_SQL.format(tournament_columns=_TOURNAMENT_COLUMNS),
+     'ix_player_matches_player_t'),
+    ("选手在某届赛事的小组赛",
+     """
+        SELECT pm.m_id FROM player_matches pm
+        WHERE pm.player_id = :player_id AND pm.t_id = :t_id AND pm.m_type IN (1, 2, 3)
+     """,
+     'ix_player_matches_player_t'),
+    ("两名选手的交手记录",
+     """
+        SELECT pm.result, pm.goals_for, pm.goals_against FROM player_matches pm
+        WHERE pm.player_id = :player_id AND pm.opponent_id = :opponent_id
+     """,
+     'ix_player_matches_player_t'),
+    ("某届赛事某类场次",
+     """
+        SELECT pm.player_id, pm.result FROM player_matches pm
+        WHERE pm.t_id = :t_id AND pm.m_type = :m_type
+     """,
+     'ix_player_matches_t_type'),
+]
+
+
+def check_rows():
+    """长表与 matches 推导出的行逐一对照，返回不一致的行数"""
+    from sqlalchemy import text
+
+    columns = ', '.join(PLAYER_MATCH_FIELDS)
+    expected = set(tuple(row) for row in db.session.execute(text(f"""
+        {player_match_side_sql('m', 1)} FROM matches m
+        UNION ALL
+        {player_match_side_sql('m', 2)} FROM matches m WHERE m.player_2_id IS NOT m.player_1_id
+    """)).fetchall())
+    stored = set(tuple(row) for row in db.session.execute(text(f"SELECT {columns} FROM player_matches")).fetchall())
+
+    for row in sorted(expected - stored)[:10]:
+        print(f"❌ 长表缺少: {dict(zip(PLAYER_MATCH_FIELDS, row))}")
+    for row in sorted(stored - expected)[:10]:
+        print(f"❌ 长表多出: {dict(zip(PLAYER_MATCH_FIELDS, row))}")
+    print(f"共对照 {len(expected)} 行")
+    return len(expected ^ stored)
+
+
+def check_triggers():
+    """在事务中增删改一场比赛并检查长表，最后回滚，返回失败数"""
+    from sqlalchemy import text
+
+    sample = db.session.execute(text("""
+        SELECT t_id, m_type, player_1_id, player_2_id FROM matches
+        WHERE player_1_id != player_2_id ORDER BY m_id LIMIT 1
+    """)).fetchone()
+    if not sample:
+        print("⚠️ 没有比赛数据，跳过触发器检查")
+        return 0
+
+    def side_results(m_id):
+        rows = db.session.execute(text("""
+            SELECT side, player_id, opponent_id, goals_for, goals_against, result
+            FROM player_matches WHERE m_id = :m_id ORDER BY side
+        """), {'m_id': m_id}).fetchall()
+        return [tuple(row) for row in rows]
+
+    failures = 0
+    try:
+        m_id = db.session.execute(text("""
+            INSERT INTO matches (t_id, m_type, player_1_id, player_1_score, player_2_id, player_2_score)
+            VALUES (:t_id, :m_type, :p1, 3, :p2, 1)
+        """), {'t_id': sample.t_id, 'm_type': sample.m_type, 'p1': sample.player_1_id, 'p2': sample.player_2_id}).lastrowid
+
+        p1, p2 = sample.player_1_id, sample.player_2_id
+        steps = [
+            ("插入", None, [(1, p1, p2, 3, 1, 1), (2, p2, p1, 1, 3, -1)]),
+            ("修改比分", "UPDATE matches SET player_1_score = 2, player_2_score = 2 WHERE m_id = :m_id",
+             [(1, p1, p2, 2, 2, 0), (2, p2, p1, 2, 2, 0)]),
+            ("删除", "DELETE FROM matches WHERE m_id = :m_id", []),
+        ]
+        for label, statement, expected in steps:
+            if statement:
+                db.session.execute(text(statement), {'m_id': m_id})
+            actual = side_results(m_id)
+            if actual != expected:
+                print(f"❌ 触发器（{label}）: 期望 {expected}，实际 {actual}")
+                failures += 1
+    finally:
+        db.session.rollback()
+
+    if not failures:
+        print("触发器同步检查通过（插入/修改/删除）")
+    return failures
+
+
+def check_plans():
+    """检查查询计划使用了长表的复合索引，返回失败数"""
+    from sqlalchemy import text
+
+    params = {'player_id': 1, 'opponent_id': 2, 't_id': 1, 'm_type': 1}
+    queries = list(PLAN_CHECKS)
+    with open(os.path.join(ROOT, 'sql', 'wr_2025_1.sql'), encoding='utf-8') as f:
+        queries.append(("赛季胜率统计 sql/wr_2025_1.sql", f.read().strip().rstrip(';'), 'ix_player_matches_t_type'))
+
+    failures = 0
+    for label, query, index_name in queries:
+        plan = [row[-1] for row in db.session.execute(text("EXPLAIN QUERY PLAN " + query), params).fetchall()]
+        long_table_steps = [step for step in plan if ' pm ' in f' {step} ' or 'player_matches' in step]
+        if not any(index_name in step for step in long_table_steps) or \
+                any(step.startswith('SCAN') for step in long_table_steps):
+            print(f"❌ {label}: 未使用 {index_name}")
+            for step in plan:
+                print(f"    {step}")
+            failures += 1
+        else:
+            print(f"✅ {label}: {'; '.join(long_table_steps)}")
+    return failures
+
+
+def main():
+    with app.app_context():
+        if not sync_materialized_tables(rebuild_player_matches=True):
+            print("❌ 迁移或物化表重建失败")
+            sys.exit(1)
+
+        failures = check_rows()
+        failures += check_triggers()
+        failures += check_plans()
+
+        if failures:
+            print(f"❌ 发现 {failures} 处问题（数据不一致可运行 flask --app app rebuild-player-matches 修复）")
+            sys.exit(1)
+        print("✅ 比赛长表与 matches 一致，触发器与索引工作正常")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+附加赛生成检查
+对数据库中还没有附加赛（m_type=14）的赛事，取该赛事的几名选手作为完全相同的选手，
+调用 generate_playoff_matches 实际写入附加赛，检查：
+1. 写入的附加赛与原有的逐对生成一致：每对选手一场，按选手顺序排列，比分 0:0；
+2. 再次调用不重复生成；
+3. PlayoffIndex 能读到新生成的附加赛（未录入比分时结果为 0）。
+
+每个赛事检查后删除生成的附加赛；检查会临时修改当前数据库，请在数据库副本上运行。
+
+用法: python check/check_playoff_generation.py [赛事数] [选手数]
+"""
+
+import os
+import sys
+
+os.environ.setdefault('STANDINGS_CACHE_MAX_ENTRIES', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db, sync_materialized_tables, generate_playoff_matches  # noqa: E402
+from tournament_context import PlayoffIndex  # noqa: E402
+
+
+def tournament_players(t_id, count):
+    rows = db.session.execute(text("""
+        SELECT player_id FROM (
+            SELECT player_1_id AS player_id, m_id FROM matches WHERE t_id = :t_id AND m_type = 1
+            UNION ALL
+            SELECT player_2_id, m_id FROM matches WHERE t_id = :t_id AND m_type = 1
+        ) GROUP BY player_id ORDER BY MIN(m_id), player_id LIMIT :count
+    """), {'t_id': t_id, 'count': count}).fetchall()
+    return [row[0] for row in rows]
+
+
+def playoff_rows(t_id):
+    rows = db.session.execute(text("""
+        SELECT player_1_id, player_2_id, player_1_score, player_2_score FROM matches
+        WHERE t_id = :t_id AND m_type = 14 ORDER BY m_id
+    """), {'t_id': t_id}).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def expected_pairs(player_ids):
+    """原有的逐对生成：每对选手一场"""
+    return [(player_ids[i], player_ids[j], 0, 0)
+            for i in range(len(player_ids)) for j in range(i + 1, len(player_ids))]
+
+
+def check_tournament(t_id, player_ids):
+    """生成一个赛事的附加赛，返回问题列表"""
+    problems = []
+    tied_players = [{'player_id': player_id} for player_id in player_ids]
+    expected = expected_pairs(player_ids)
+    try:
+        try:
+            generate_playoff_matches(t_id, tied_players)
+        except Exception as e:
+            problems.append(f"生成附加赛失败: {e}")
+            return problems, len(expected)
+        generated = playoff_rows(t_id)
+        if generated != expected:
+            problems.append(f"生成的附加赛 {generated} 与逐对生成的 {expected} 不一致")
+
+        generate_playoff_matches(t_id, tied_players)
+        if playoff_rows(t_id) != generated:
+            problems.append(f"再次调用后附加赛变为 {playoff_rows(t_id)}")
+
+        playoffs = PlayoffIndex.load(t_id)
+        for p1_id, p2_id, _, _ in generated:
+            if playoffs.result(p1_id, p2_id) != 0:
+                problems.append(f"未录入比分的附加赛 {p1_id} vs {p2_id} 结果不为 0")
+    finally:
+        db.session.rollback()
+        db.session.execute(text("DELETE FROM matches WHERE t_id = :t_id AND m_type = 14"), {'t_id': t_id})
+        db.session.commit()
+    return problems, len(expected)
+
+
+def main():
+    tournament_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    player_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    client = app.test_client()
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求预热
+    client.get('/health')
+    with app.app_context():
+        t_ids = [row[0] for row in db.session.execute(text("""
+            SELECT t_id FROM matches GROUP BY t_id
+            HAVING SUM(m_type = 1) > 0 AND SUM(m_type = 14) = 0
+            ORDER BY t_id LIMIT :count
+        """), {'count': tournament_count})]
+        if not t_ids:
+            print("❌ 没有可生成附加赛的赛事（有小组赛且没有附加赛）")
+            sys.exit(1)
+
+        failures = 0
+        for t_id in t_ids:
+            player_ids = tournament_players(t_id, player_count)
+            if len(player_ids) < 2:
+                print(f"⚠️  赛事 {t_id} 的选手不足 2 名，跳过")
+                continue
+            problems, generated = check_tournament(t_id, player_ids)
+            if problems:
+                failures += 1
+                print(f"❌ 赛事 {t_id}:")
+                for problem in problems:
+                    print(f"    {problem}")
+            else:
+                print(f"✅ 赛事 {t_id}: {len(player_ids)} 名选手生成 {generated} 场附加赛")
+
+    if failures:
+        print(f"❌ {failures}/{len(t_ids)} 个赛事的附加赛生成有问题")
+        sys.exit(1)
+    print(f"✅ {len(t_ids)} 个赛事的附加赛生成正确")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量读取（Hrana 流水线）检查
+在本机启动一个模拟的 Hrana HTTP 服务（/v2/pipeline，以 sqlite3 读取同一个本地数据库文件），
+把 ReadBatch 指向它，然后：
+1. 各种值类型（整数、浮点、文本、NULL、BLOB）与出错语句的结果与会话逐条执行一致；
+2. 首页、赛季页、赛事页在逐条执行与流水线两种方式下渲染结果完全相同，并统计每个页面的 HTTP 往返次数。
+
+设置环境变量 HRANA_URL（及 HRANA_AUTH_TOKEN）时改为连接真实的 libsql/sqld 服务，
+该服务须提供与本地数据库相同的数据。
+
+用法: python check/check_read_batch.py
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault('STANDINGS_CACHE_MAX_ENTRIES', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db, sync_materialized_tables  # noqa: E402
+from read_batch import ReadBatch, HranaClient, configure_read_batch, encode_value, decode_value  # noqa: E402
+from queries import NamedQuery  # noqa: E402
+
+# 值类型检查：(说明, 语句, 参数)
+VALUE_CHECKS = [
+    ("整数与文本参数", "SELECT :number AS number, :name AS name, typeof(:number) AS kind",
+     {'number': 42, 'name': '冰壶'}),
+    ("浮点与 NULL", "SELECT :ratio * 2 AS doubled, :missing AS missing", {'ratio': 1.25, 'missing': None}),
+    ("BLOB", "SELECT :data AS data, length(:data) AS size", {'data': b'\x00\x01curling'}),
+    ("多行结果", "SELECT value FROM (SELECT 1 AS value UNION ALL SELECT 2 UNION ALL SELECT 3) ORDER BY value", {}),
+    ("空结果", "SELECT 1 AS value WHERE 0", {}),
+    ("具名语句的 IN 列表", NamedQuery('check.in_list', "SELECT value FROM (SELECT 1 AS value UNION ALL SELECT 2 "
+                                   "UNION ALL SELECT 3) WHERE value IN :values ORDER BY value", expanding=('values',)),
+     {'values': [1, 3]}),
+    ("具名语句的空 IN 列表", NamedQuery('check.empty_in_list', "SELECT COUNT(*) AS total FROM (SELECT 1 AS value) "
+                                    "WHERE value NOT IN :values", expanding=('values',)),
+     {'values': []}),
+]
+
+
+class MockHranaHandler(BaseHTTPRequestHandler):
+    """最小的 Hrana 2 流水线实现：execute 与 close 请求，命名参数，带类型的值"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path != '/v2/pipeline':
+            self.send_error(404)
+            return
+        self.server.round_trips += 1
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        connection = sqlite3.connect(self.server.database_path, isolation_level=None)
+        results = []
+        try:
+            for request in body['requests']:
+                if request['type'] == 'close':
+                    results.append({'type': 'ok', 'response': {'type': 'close'}})
+                    continue
+                stmt = request['stmt']
+                params = {arg['name'].lstrip(':@$'): decode_value(arg['value']) for arg in stmt.get('named_args', [])}
+                try:
+                    cursor = connection.execute(stmt['sql'], params)
+                    rows = cursor.fetchall() if stmt.get('want_rows', True) else []
+                    columns = [{'name': column[0]} for column in (cursor.description or [])]
+                    results.append({'type': 'ok', 'response': {'type': 'execute', 'result': {
+                        'cols': columns,
+                        'rows': [[encode_value(value) for value in row] for row in rows],
+                        'affected_row_count': 0,
+                        'last_insert_rowid': None,
+                    }}})
+                except sqlite3.Error as e:
+                    results.append({'type': 'error', 'error': {'message': str(e)}})
+        finally:
+            connection.close()
+
+        data = json.dumps({'baton': None, 'base_url': None, 'results': results}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_mock_server(database_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockHranaHandler)
+    server.database_path = database_path
+    server.round_trips = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check_values(client):
+    """流水线与会话逐条执行的结果逐条对照，返回失败数"""
+    failures = 0
+    local_batch = ReadBatch(client=False)
+    remote_batch = ReadBatch(client=client)
+    pairs = [(local_batch.add(sql, params), remote_batch.add(sql, params)) for _, sql, params in VALUE_CHECKS]
+    error_pair = (local_batch.add("SELECT * FROM no_such_table"), remote_batch.add("SELECT * FROM no_such_table"))
+    local_batch.execute()
+    remote_batch.execute()
+
+    for (label, _, _), (local, remote) in zip(VALUE_CHECKS, pairs):
+        local_rows = [tuple(row) for row in local.rows]
+        remote_rows = [tuple(row) for row in remote.rows]
+        local_mapping = [dict(row._mapping) for row in local.rows]
+        remote_mapping = [dict(row._mapping) for row in remote.rows]
+        if local_rows != remote_rows or local_mapping != remote_mapping:
+            print(f"❌ {label}: 逐条执行 {local_mapping}，流水线 {remote_mapping}")
+            failures += 1
+        else:
+            print(f"✅ {label}: {remote_mapping}")
+
+    for name, result in zip(('逐条执行', '流水线'), error_pair):
+        try:
+            result.rows
+            print(f"❌ {name}: 出错语句没有抛出异常")
+            failures += 1
+        except Exception as e:
+            print(f"✅ {name}: 出错语句在读取结果时抛出异常（{type(e).__name__}）")
+    return failures
+
+
+def sample_urls():
+    from sqlalchemy import text
+
+    urls = ['/']
+    urls += [f"/season/{row[0]}" for row in db.session.execute(text(
+        "SELECT season_id FROM seasons ORDER BY season_id")).fetchall()]
+    urls += [f"/tournament/{row[0]}" for row in db.session.execute(text(
+        "SELECT t_id FROM tournament ORDER BY t_id")).fetchall()]
+    return urls
+
+
+def check_pages(client, server):
+    """逐条执行与流水线渲染的页面对照，返回不一致的页面数
+
+    赛事页访问时可能写入最终排名并刷新排行榜，因此每个页面先逐条渲染两遍（第一遍使数据稳定），
+    紧接着以流水线渲染一遍做对照。
+    """
+    test_client = app.test_client()
+    configure_read_batch(None)
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求预热
+    test_client.get('/health')
+    with app.app_context():
+        urls = sample_urls()
+
+    failures = 0
+    round_trips = {}
+    try:
+        for url in urls:
+            configure_read_batch(None)
+            test_client.get(url)
+            expected = test_client.get(url).data
+
+            configure_read_batch(client)
+            before = server.round_trips if server else 0
+            actual = test_client.get(url).data
+            round_trips[url] = (server.round_trips - before) if server else None
+            if actual != expected:
+                print(f"❌ {url}: 流水线渲染结果与逐条执行不同")
+                failures += 1
+    finally:
+        configure_read_batch(None)
+
+    for prefix in ('/', '/season/', '/tournament/'):
+        url = next((u for u in urls if u == prefix or (prefix != '/' and u.startswith(prefix))), None)
+        if url and round_trips[url] is not None:
+            print(f"   {url}: {round_trips[url]} 次流水线请求")
+    print(f"共对照 {len(urls)} 个页面")
+    return failures
+
+
+def main():
+    hrana_url = os.getenv('HRANA_URL')
+    server = None
+    if hrana_url:
+        client = HranaClient(hrana_url, os.getenv('HRANA_AUTH_TOKEN'))
+        print(f"使用 Hrana 服务: {hrana_url}")
+    else:
+        with app.app_context():
+            database_path = db.engine.url.database
+        server = start_mock_server(database_path)
+        client = HranaClient(f"http://127.0.0.1:{server.server_address[1]}")
+        print(f"已启动模拟 Hrana 服务: 127.0.0.1:{server.server_address[1]}")
+
+    try:
+        with app.app_context():
+            failures = check_values(client)
+        failures += check_pages(client, server)
+    finally:
+        if server:
+            server.shutdown()
+
+    if failures:
+        print(f"❌ 发现 {failures} 处不一致")
+        sys.exit(1)
+    print("✅ 流水线批量读取与逐条执行结果一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地只读副本检查
+用两个本地 SQLite 文件分别充当主库和副本（主库复制自当前配置的本地数据库），检查：
+1. 首次同步整库复制，副本各表内容与主库一致；
+2. 主库插入、更新、删除后增量同步，副本与主库一致；无变更时不做任何事；
+3. 主库表结构变化、或变更日志被清理到副本同步位置之后时，改为整库复制；
+4. 陈旧上限：上限内不重复同步，超过上限或本进程提交写入后先同步；
+5. 应用以副本模式（DB_REPLICA_PATH）运行时，公开页面从副本读取且渲染结果与直接读主库相同，
+   事务中写入后的读取走主库（读到自己的写入）。
+
+检查使用临时文件，不修改当前数据库以外的文件；第 5 项结束后删除主库上的变更日志与触发器。
+
+用法: python check/check_replica.py
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+os.environ.setdefault('STANDINGS_CACHE_MAX_ENTRIES', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+
+from replica import ReplicaSync, ReplicaRouter, replica_engine_for_path, CHANGE_LOG_TABLE  # noqa: E402
+
+
+def table_contents(path):
+    """各用户表按 rowid 排序的全部行（不含副本内部表）"""
+    connection = sqlite3.connect(path)
+    try:
+        tables = [row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+            "AND name NOT LIKE 'replica_%' ORDER BY name")]
+        return {table: connection.execute(f'SELECT rowid, * FROM "{table}" ORDER BY rowid').fetchall()
+                for table in tables}
+    finally:
+        connection.close()
+
+
+def compare(label, primary_path, replica_path):
+    primary = table_contents(primary_path)
+    replica = table_contents(replica_path)
+    differences = [table for table in sorted(set(primary) | set(replica)) if primary.get(table) != replica.get(table)]
+    if differences:
+        print(f"❌ {label}: 副本与主库不同的表 {differences}")
+        return 1
+    print(f"✅ {label}: {len(primary)} 张表、{sum(len(rows) for rows in primary.values())} 行与主库一致")
+    return 0
+
+
+def expect(label, condition, detail=''):
+    if condition:
+        print(f"✅ {label}{detail}")
+        return 0
+    print(f"❌ {label}{detail}")
+    return 1
+
+
+def check_sync(source_path, work_dir):
+    """第 1-4 项：两个文件之间的同步"""
+    primary_path = os.path.join(work_dir, 'primary.db')
+    replica_path = os.path.join(work_dir, 'replica.db')
+    shutil.copyfile(source_path, primary_path)
+    primary_engine = create_engine(f"sqlite:///{primary_path}")
+    replica_sync = ReplicaSync(primary_engine, replica_engine_for_path(replica_path))
+    failures = 0
+
+    result = replica_sync.sync()
+    failures += expect("首次同步", result['mode'] == 'full', f"（方式: {result['mode']}）")
+    failures += compare("整库复制", primary_path, replica_path)
+
+    with primary_engine.begin() as connection:
+        player_id = connection.execute(text("SELECT MAX(player_id) FROM players")).scalar() or 0
+        connection.execute(text("INSERT INTO players (player_id, name) VALUES (:id, :name)"),
+                           [{'id': player_id + 1, 'name': '副本检查选手'}, {'id': player_id + 2, 'name': '副本检查选手2'}])
+        connection.execute(text("UPDATE players SET name = name || '*' WHERE player_id = :id"), {'id': player_id})
+        connection.execute(text("DELETE FROM players WHERE player_id = :id"), {'id': player_id + 1})
+    result = replica_sync.sync()
+    failures += expect("增量同步", result['mode'] == 'delta', f"（方式: {result['mode']}，变更行数: {result['changes']}）")
+    failures += compare("插入/更新/删除之后", primary_path, replica_path)
+
+    result = replica_sync.sync()
+    failures += expect("无变更时不同步", result['mode'] == 'noop', f"（方式: {result['mode']}）")
+
+    with primary_engine.begin() as connection:
+        connection.execute(text("CREATE TABLE replica_check_notes (id INTEGER PRIMARY KEY, note TEXT)"))
+        connection.execute(text("INSERT INTO replica_check_notes (note) VALUES ('结构变化')"))
+    result = replica_sync.sync()
+    failures += expect("表结构变化后整库复制", result['mode'] == 'full', f"（方式: {result['mode']}）")
+    failures += compare("表结构变化之后", primary_path, replica_path)
+
+    with primary_engine.begin() as connection:
+        connection.execute(text("INSERT INTO replica_check_notes (note) VALUES ('新的触发器已生效')"))
+        connection.execute(text(f"UPDATE {CHANGE_LOG_TABLE} SET created_at = datetime('now', '-2 days')"))
+    pruned = replica_sync.prune_change_log(3600)
+    result = replica_sync.sync()
+    failures += expect("变更日志清理后整库复制", pruned > 0 and result['mode'] == 'full',
+                       f"（清理 {pruned} 条，方式: {result['mode']}）")
+    failures += compare("日志清理之后", primary_path, replica_path)
+
+    router = ReplicaRouter(replica_sync, max_staleness=60)
+    router.ensure_fresh()
+    syncs = router.syncs
+    with primary_engine.begin() as connection:
+        connection.execute(text("UPDATE replica_check_notes SET note = '陈旧上限' WHERE id = 1"))
+    router.ensure_fresh()
+    stale_note = sqlite3.connect(replica_path).execute("SELECT note FROM replica_check_notes WHERE id = 1").fetchone()[0]
+    failures += expect("陈旧上限内不重复同步", router.syncs == syncs and stale_note == '结构变化',
+                       f"（副本仍为: {stale_note}）")
+    router.max_staleness = 0
+    router.ensure_fresh()
+    fresh_note = sqlite3.connect(replica_path).execute("SELECT note FROM replica_check_notes WHERE id = 1").fetchone()[0]
+    failures += expect("超过陈旧上限后先同步", router.syncs == syncs + 1 and fresh_note == '陈旧上限',
+                       f"（副本: {fresh_note}）")
+    router.mark_dirty()
+    router.ensure_fresh()
+    failures += expect("提交写入后立即同步", router.syncs == syncs + 2)
+
+    primary_engine.dispose()
+    replica_sync.replica_engine.dispose()
+    return failures
+
+
+def check_app(work_dir):
+    """第 5 项：以副本模式运行应用"""
+    os.environ['DB_REPLICA_PATH'] = os.path.join(work_dir, 'app_replica.db')
+    from app import app, db, sync_materialized_tables, read_replica, RoutingSession
+
+    replica_statements = []
+    event.listen(read_replica.replica_engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: replica_statements.append(statement))
+
+    failures = 0
+    test_client = app.test_client()
+    try:
+        with app.app_context():
+            # 执行迁移并校准物化表（请求中只检查迁移版本）
+            sync_materialized_tables()
+        # 首个请求预热
+        test_client.get('/health')
+        with app.app_context():
+            urls = ['/']
+            urls += [f"/season/{row[0]}" for row in db.session.execute(text(
+                "SELECT season_id FROM seasons ORDER BY season_id")).fetchall()]
+            urls += [f"/tournament/{row[0]}" for row in db.session.execute(text(
+                "SELECT t_id FROM tournament ORDER BY t_id")).fetchall()]
+            urls += [f"/player/{row[0]}" for row in db.session.execute(text(
+                "SELECT player_id FROM players ORDER BY player_id LIMIT 5")).fetchall()]
+
+        # 赛事页访问时可能写入最终排名，每个页面先直接读主库渲染两遍（第一遍使数据稳定），再从副本渲染对照
+        different = []
+        for url in urls:
+            RoutingSession.read_router = None
+            test_client.get(url)
+            expected = test_client.get(url).data
+            RoutingSession.read_router = read_replica
+            read_replica.mark_dirty()
+            before = len(replica_statements)
+            actual = test_client.get(url).data
+            if actual != expected or len(replica_statements) == before:
+                different.append(url)
+        failures += expect("副本模式页面渲染", not different,
+                           f"（对照 {len(urls)} 个页面，副本执行 {len(replica_statements)} 条语句"
+                           + (f"，不一致: {different}）" if different else "）"))
+
+        with app.test_request_context('/'):
+            read_replica.ensure_fresh()
+            db.session.info['use_read_replica'] = True
+            before = len(replica_statements)
+            name = db.session.execute(text("SELECT name FROM players ORDER BY player_id LIMIT 1")).scalar()
+            read_from_replica = len(replica_statements) > before
+            db.session.execute(text("UPDATE players SET name = :name WHERE player_id = "
+                                    "(SELECT MIN(player_id) FROM players)"), {'name': name + '*'})
+            before = len(replica_statements)
+            updated = db.session.execute(text("SELECT name FROM players ORDER BY player_id LIMIT 1")).scalar()
+            failures += expect("写入后读到自己的写入", read_from_replica and updated == name + '*'
+                               and len(replica_statements) == before,
+                               f"（写入前读副本: {read_from_replica}，写入后读到: {updated}）")
+            db.session.rollback()
+    finally:
+        RoutingSession.read_router = None
+        read_replica.sync.drop_change_log()
+    return failures
+
+
+def main():
+    from database_config import get_database_config
+
+    config = get_database_config()
+    if config['DATABASE_TYPE'] != 'local':
+        print("❌ 副本检查需要本地 SQLite 数据库（DATABASE_TYPE=local）")
+        sys.exit(1)
+    source_path = create_engine(config['SQLALCHEMY_DATABASE_URI']).url.database
+
+    work_dir = tempfile.mkdtemp(prefix='replica_check_')
+    try:
+        failures = check_sync(source_path, work_dir)
+        failures += check_app(work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if failures:
+        print(f"❌ 发现 {failures} 处问题")
+        sys.exit(1)
+    print("✅ 本地副本同步与读写路由正常")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+写入队列检查
+多个线程并发提交比分（/admin-secret/tournament/<t_id>/match/<match_id>/score），
+同时另一个连接间歇地持有数据库写锁（模拟命令行脚本等其他进程的写入），检查：
+1. 所有提交都成功，数据库中的比分与最后一次提交一致（没有因回滚重试丢失的写入）；
+2. 写入队列统计：排队、等待时间、锁冲突次数。
+
+检查会修改当前本地数据库中的比分，请在数据库副本上运行。
+
+用法: python check/check_write_queue.py [线程数] [每线程提交次数]
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+os.environ.setdefault('STANDINGS_CACHE_MAX_ENTRIES', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db, sync_materialized_tables, write_coordinator  # noqa: E402
+
+
+def hold_write_lock(database_path, stop, interval=0.2, hold=0.05):
+    """间歇地以 BEGIN IMMEDIATE 持有写锁"""
+    connection = sqlite3.connect(database_path, timeout=30, isolation_level=None)
+    while not stop.wait(interval):
+        connection.execute('BEGIN IMMEDIATE')
+        time.sleep(hold)
+        connection.execute('COMMIT')
+    connection.close()
+
+
+def main():
+    thread_count = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    client = app.test_client()
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求预热
+    client.get('/health')
+    with app.app_context():
+        if db.engine.url.get_backend_name() != 'sqlite':
+            print("❌ 写入队列检查需要本地 SQLite 数据库")
+            sys.exit(1)
+        database_path = db.engine.url.database
+        matches = db.session.execute(text("""
+            SELECT m_id, t_id FROM matches ORDER BY m_id LIMIT :count
+        """), {'count': thread_count}).fetchall()
+    if len(matches) < thread_count:
+        print(f"❌ 数据库中的比赛不足 {thread_count} 场")
+        sys.exit(1)
+
+    errors = []
+    expected = {}
+    lock = threading.Lock()
+
+    def worker(index, match_id, t_id):
+        thread_client = app.test_client()
+        with thread_client.session_transaction() as session:
+            session['admin_logged_in'] = True
+        for round_number in range(rounds):
+            scores = {'player_1_score': index + round_number + 1, 'player_2_score': round_number}
+            response = thread_client.post(f"/admin-secret/tournament/{t_id}/match/{match_id}/score", json=scores)
+            payload = response.get_json(silent=True) or {}
+            with lock:
+                if response.status_code != 200 or not payload.get('success'):
+                    errors.append((match_id, response.status_code, payload.get('error')))
+                expected[match_id] = (scores['player_1_score'], scores['player_2_score'])
+
+    stop = threading.Event()
+    holder = threading.Thread(target=hold_write_lock, args=(database_path, stop), daemon=True)
+    holder.start()
+    threads = [threading.Thread(target=worker, args=(index, m_id, t_id))
+               for index, (m_id, t_id) in enumerate(matches)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    holder.join()
+
+    failures = len(errors)
+    for match_id, status, error in errors:
+        print(f"❌ 比赛 {match_id}: HTTP {status} {error}")
+
+    connection = sqlite3.connect(database_path)
+    for match_id, scores in sorted(expected.items()):
+        stored = connection.execute("SELECT player_1_score, player_2_score FROM matches WHERE m_id = ?",
+                                    (match_id,)).fetchone()
+        if tuple(stored) != scores:
+            print(f"❌ 比赛 {match_id}: 数据库中为 {tuple(stored)}，最后一次提交为 {scores}")
+            failures += 1
+    connection.close()
+
+    stats = write_coordinator.stats()
+    print(f"{thread_count} 个线程 × {rounds} 次提交，耗时 {elapsed:.2f}s")
+    print(f"写事务 {stats['acquisitions']} 个，其中排队 {stats['contended']} 个，最大排队 {stats['max_queue_depth']}，"
+          f"平均等待 {stats['mean_wait_ms']:.1f} ms（最长 {stats['max_wait_ms']:.1f} ms），"
+          f"平均持有 {stats['mean_hold_ms']:.1f} ms，锁冲突 {stats['lock_errors']}，排队超时 {stats['timeouts']}")
+
+    if failures or stats['lock_errors'] or stats['timeouts']:
+        print(f"❌ 发现 {failures} 处问题")
+        sys.exit(1)
+    print("✅ 并发提交全部成功且没有丢失写入")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@
 import os
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 from sqlalchemy import create_engine
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool, SingletonThreadPool
 from scripts.sqlcipher_connector import get_sqlcipher_database_uri
 
 def get_database_config():
@@ -21,6 +21,7 @@ def get_database_config():
     - DB_ENCRYPTION_KEY: 本地数据库加密密钥
     - TURSO_URL: Turso数据库URL
     - TURSO_AUTH_TOKEN: Turso认证令牌
+    - DB_POOL_*: 连接池配置，见 get_pool_options
     """
     
     # 默认使用Turso数据库（适合生产环境）
@@ -40,6 +41,113 @@ def get_database_config():
     else:
         return get_local_config()
 
+# 连接池模式 -> 连接池类
+POOL_CLASSES = {
+    'null': NullPool,                  # 每次取连接都新建物理连接（旧行为）
+    'queue': QueuePool,                # 进程内共享的连接池
+    'singleton': SingletonThreadPool,  # 每个线程固定一个连接
+    'persistent': QueuePool,           # 保持常驻的少量连接（Turso 会话复用）
+}
+
+# 各数据库类型的默认连接池参数
+POOL_DEFAULTS = {
+    'local': {'mode': 'queue', 'size': 5, 'max_overflow': 10, 'pre_ping': False, 'recycle': 1800},
+    'turso': {'mode': 'persistent', 'size': 1, 'max_overflow': 4, 'pre_ping': True, 'recycle': 300},
+}
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"⚠️  环境变量 {name}={value!r} 不是整数，使用默认值 {default}")
+        return default
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def get_pool_options(database_type):
+    """
+    连接池相关的引擎参数
+    物理连接在池中复用，连接建立时的 PRAGMA/密钥设置只在每个物理连接上执行一次（见 app.configure_connection）
+
+    环境变量：
+    - DB_POOL_MODE: 'queue' / 'singleton' / 'persistent' / 'null' (默认: 本地 queue，Turso persistent)
+    - DB_POOL_SIZE: 常驻连接数 (默认: 本地 5，Turso 1)
+    - DB_POOL_MAX_OVERFLOW: 高峰时允许额外创建的连接数，仅 queue/persistent (默认: 本地 10，Turso 4)
+    - DB_POOL_TIMEOUT: 等待空闲连接的秒数，仅 queue/persistent (默认: 30)
+    - DB_POOL_PRE_PING: 取出连接前先探测连接是否可用 (默认: 本地 false，Turso true)
+    - DB_POOL_RECYCLE: 连接使用超过该秒数后重建，-1 表示不重建 (默认: 本地 1800，Turso 300)
+    """
+    defaults = POOL_DEFAULTS.get(database_type, POOL_DEFAULTS['local'])
+    mode = os.getenv('DB_POOL_MODE', defaults['mode']).strip().lower()
+    if mode not in POOL_CLASSES:
+        print(f"⚠️  未知的连接池模式 DB_POOL_MODE={mode!r}，使用默认值 {defaults['mode']}")
+        mode = defaults['mode']
+
+    options = {'poolclass': POOL_CLASSES[mode]}
+    if mode == 'null':
+        return options
+
+    options['pool_size'] = _env_int('DB_POOL_SIZE', defaults['size'])
+    options['pool_recycle'] = _env_int('DB_POOL_RECYCLE', defaults['recycle'])
+    options['pool_pre_ping'] = _env_bool('DB_POOL_PRE_PING', defaults['pre_ping'])
+    if options['poolclass'] is QueuePool:
+        options['max_overflow'] = _env_int('DB_POOL_MAX_OVERFLOW', defaults['max_overflow'])
+        options['pool_timeout'] = _env_int('DB_POOL_TIMEOUT', 30)
+    return options
+
+
+def describe_pool_options(options):
+    """连接池配置的简短说明（用于启动日志和基准测试输出）"""
+    parts = [options['poolclass'].__name__]
+    for key in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping'):
+        if key in options:
+            parts.append(f"{key}={options[key]}")
+    return ' '.join(parts)
+
+
+def is_serverless():
+    """
+    是否运行在 Serverless 函数中（Netlify Functions / AWS Lambda）
+    每次调用结束后进程可能被冻结或回收，不能依赖后台线程、定时器和进程退出钩子完成工作
+
+    环境变量：
+    - SERVERLESS: 1 表示按 Serverless 环境运行（netlify/functions/app.py 会设置）；
+      未设置时按 AWS_LAMBDA_FUNCTION_NAME 判断
+    """
+    return _env_bool('SERVERLESS', bool(os.getenv('AWS_LAMBDA_FUNCTION_NAME')))
+
+
+def get_replica_config():
+    """
+    本地只读副本配置（见 replica.py），未设置 DB_REPLICA_PATH 时返回 None
+
+    环境变量：
+    - DB_REPLICA_PATH: 本地副本文件路径，如 /tmp/curling_masters_replica.db（Serverless 环境须可写）
+    - DB_REPLICA_MAX_STALENESS: 副本允许落后主库的秒数，超过后读请求先同步 (默认: 5)
+    - DB_REPLICA_LOG_RETENTION: 主库变更日志保留秒数，落后更久的副本整库复制 (默认: 604800，即 7 天)
+    - DB_REPLICA_MAX_DELTA: 一次同步中待同步的变更超过该条数时改为整库复制 (默认: 50000)
+    """
+    path = os.getenv('DB_REPLICA_PATH', '').strip()
+    if not path:
+        return None
+    return {
+        'path': path,
+        'max_staleness': _env_int('DB_REPLICA_MAX_STALENESS', 5),
+        'log_retention': _env_int('DB_REPLICA_LOG_RETENTION', 7 * 24 * 3600),
+        'max_delta': _env_int('DB_REPLICA_MAX_DELTA', 50000),
+    }
+
+
 def get_local_config():
     """获取本地SQLCipher数据库配置"""
     db_path = os.path.join(os.path.dirname(__file__), 'curling_masters.db')
@@ -52,7 +160,7 @@ def get_local_config():
         'DATABASE_TYPE': 'local',
         'SQLALCHEMY_DATABASE_URI': database_uri,
         'SQLALCHEMY_ENGINE_OPTIONS': {
-            'poolclass': NullPool,
+            **get_pool_options('local'),
             'connect_args': {
                 'timeout': 30,
                 'check_same_thread': False
@@ -114,7 +222,7 @@ def get_turso_config():
         'DATABASE_TYPE': 'turso',
         'SQLALCHEMY_DATABASE_URI': url,
         'SQLALCHEMY_ENGINE_OPTIONS': {
-            'poolclass': NullPool,
+            **get_pool_options('turso'),
             'connect_args': connect_args
         }
     }
@@ -161,6 +269,7 @@ if __name__ == "__main__":
     try:
         config = get_database_config()
         print(f"数据库URI: {config['SQLALCHEMY_DATABASE_URI'][:50]}...")
+        print(f"连接池: {describe_pool_options(config['SQLALCHEMY_ENGINE_OPTIONS'])}")
         print("配置加载成功！")
     except Exception as e:
         print(f"配置加载失败: {e}")
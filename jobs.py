@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台任务
+耗时的后台操作（重算全部积分、生成场次等）不在请求中执行：请求完成校验后把任务写入 jobs 表并交给进程内的线程池，
+立即返回任务编号，页面轮询 /admin-secret/jobs/<job_id> 查看状态、进度与错误。
+
+- 任务状态：queued -> running -> succeeded / failed，写入 jobs 表（迁移 0006），其他进程和重启后也能查到；
+- 进度：任务函数调用 job.progress(完成数, 总数, 说明)，内存中实时更新，在任务没有未提交的写入时写入 jobs 表；
+- jobs 表的写入使用独立连接（经写入队列排队），不进入请求/任务会话的事务，也不使派生数据缓存失效；
+  因此 enqueue 应在提交本请求的写入之后调用；
+- 中断检测：任务记录所在实例（主机名、进程号与启动时生成的随机串，迁移 0007）与心跳时间。本实例的心跳线程
+  定期为排队和执行中的任务更新心跳，写入进度时也一并更新；心跳超过 JOB_HEARTBEAT_TIMEOUT 秒未更新的
+  queued/running 任务由任意实例标记为失败（recover_interrupted），不依赖进程号，多个实例共用 Turso 数据库时
+  也不会把其他实例正在执行的任务误判为中断；
+- Serverless 环境（database_config.is_serverless）不支持后台执行：调用结束后进程可能被冻结，线程池中的任务
+  不会继续执行，因此 enqueue 在当前请求中同步执行任务，返回时任务已完成（或失败）。
+
+用法：
+    @job_runner.task('calculate_all_scores')
+    def calculate_all_scores_job(job):
+        for i, t_id in enumerate(t_ids):
+            ...
+            job.progress(i + 1, len(t_ids))
+        return {'success_count': ...}
+
+    job_id = job_runner.enqueue('calculate_all_scores', {})
+
+环境变量：
+- JOB_WORKERS: 执行任务的线程数 (默认: 2)
+- JOB_HEARTBEAT_TIMEOUT: 心跳超过该秒数未更新的任务视为中断 (默认: 120)
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from database_config import is_serverless
+from db import db
+
+
+FINISHED_STATUSES = ('succeeded', 'failed')
+
+# 进度写入 jobs 表的最小间隔（秒），内存中的进度总是实时的
+PROGRESS_SAVE_INTERVAL = 0.5
+
+# 本进程的实例标识：进程号可能被复用、不同主机的进程号可能相同，附加主机名与随机串
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Job:
+    """传给任务函数的当前任务"""
+
+    def __init__(self, runner, job_id, kind, params):
+        self.runner = runner
+        self.job_id = job_id
+        self.kind = kind
+        self.params = params
+        self.done = 0
+        self.total = None
+        self.message = None
+        self._saved_at = 0.0
+
+    def progress(self, done, total=None, message=None):
+        """报告进度；total 为空时沿用上一次的总数"""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        now = time.monotonic()
+        if now - self._saved_at >= PROGRESS_SAVE_INTERVAL and not _has_pending_writes(db.session):
+            self._saved_at = now
+            self.runner._save(self.job_id, progress_done=self.done, progress_total=self.total, message=self.message,
+                              heartbeat_at=_now())
+
+
+def _has_pending_writes(session):
+    return bool(session.new or session.dirty or session.deleted or session.info.get('pending_writes'))
+
+
+class JobRunner:
+    """进程内的后台任务队列（见模块说明）"""
+
+    def __init__(self, app, max_workers=2, coordinator=None, heartbeat_timeout=120, inline=False):
+        self.app = app
+        self.max_workers = max_workers
+        self.coordinator = coordinator
+        self.heartbeat_timeout = heartbeat_timeout
+        self.inline = inline    # True 时 enqueue 在当前线程同步执行任务（Serverless 环境）
+        self._tasks = {}
+        self._active = {}       # job_id -> Job（本进程中排队或正在执行的任务）
+        self._lock = threading.Lock()
+        self._executor = None
+        self._heartbeat = None
+        self._stopping = threading.Event()
+
+    @classmethod
+    def from_env(cls, app, coordinator=None):
+        try:
+            workers = int(os.getenv('JOB_WORKERS', '2'))
+        except ValueError:
+            print("⚠️  环境变量 JOB_WORKERS 不是整数，使用默认值 2")
+            workers = 2
+        try:
+            heartbeat_timeout = int(os.getenv('JOB_HEARTBEAT_TIMEOUT', '120'))
+        except ValueError:
+            print("⚠️  环境变量 JOB_HEARTBEAT_TIMEOUT 不是整数，使用默认值 120")
+            heartbeat_timeout = 120
+        return cls(app, max_workers=max(workers, 1), coordinator=coordinator,
+                   heartbeat_timeout=max(heartbeat_timeout, 10), inline=is_serverless())
+
+    def task(self, kind):
+        """注册任务函数的装饰器"""
+        def decorator(func):
+            self._tasks[kind] = func
+            return func
+        return decorator
+
+    # ---- jobs 表 ----
+
+    def _write(self, sql, params):
+        """经写入队列用独立连接写 jobs 表"""
+        if self.coordinator is not None:
+            self.coordinator.acquire('jobs')
+        try:
+            with db.engine.begin() as connection:
+                return connection.execute(text(sql), params)
+        finally:
+            if self.coordinator is not None:
+                self.coordinator.release()
+
+    def _save(self, job_id, **fields):
+        assignments = ', '.join(f"{name} = :{name}" for name in fields)
+        try:
+            self._write(f"UPDATE jobs SET {assignments} WHERE job_id = :job_id", {**fields, 'job_id': job_id})
+        except Exception as e:
+            print(f"更新任务 {job_id} 状态失败: {e}")
+
+    # ---- 提交与执行 ----
+
+    def enqueue(self, kind, params=None):
+        """写入任务并交给线程池执行（Serverless 环境在当前线程执行完毕后返回），返回任务编号"""
+        if kind not in self._tasks:
+            raise ValueError(f"未注册的任务: {kind}")
+        params = params or {}
+        result = self._write("""
+            INSERT INTO jobs (kind, status, params, progress_done, pid, instance_id, heartbeat_at)
+            VALUES (:kind, 'queued', :params, 0, :pid, :instance_id, :heartbeat_at)
+        """, {'kind': kind, 'params': json.dumps(params, ensure_ascii=False), 'pid': os.getpid(),
+              'instance_id': INSTANCE_ID, 'heartbeat_at': _now()})
+        job_id = result.lastrowid
+        job = Job(self, job_id, kind, params)
+        with self._lock:
+            self._active[job_id] = job
+        if self.inline:
+            self._execute(job)
+            return job_id
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            executor = self._executor
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name='job-heartbeat', daemon=True)
+                self._heartbeat.start()
+        executor.submit(self._execute, job)
+        print(f"任务 {job_id} ({kind}) 已加入队列")
+        return job_id
+
+    def _heartbeat_loop(self):
+        """定期为本实例排队和执行中的任务更新心跳"""
+        while not self._stopping.wait(self.heartbeat_timeout / 4):
+            with self._lock:
+                job_ids = list(self._active)
+            if not job_ids:
+                continue
+            try:
+                with self.app.app_context():
+                    self._write(f"""
+                        UPDATE jobs SET heartbeat_at = :heartbeat_at
+                        WHERE job_id IN ({', '.join(str(int(job_id)) for job_id in job_ids)})
+                        AND status IN ('queued', 'running')
+                    """, {'heartbeat_at': _now()})
+            except Exception as e:
+                print(f"更新任务心跳失败: {e}")
+
+    def _execute(self, job):
+        job_id, kind = job.job_id, job.kind
+        try:
+            with self.app.app_context():
+                self._save(job_id, status='running', pid=os.getpid(), instance_id=INSTANCE_ID,
+                           started_at=_now(), heartbeat_at=_now())
+                try:
+                    result = self._tasks[kind](job)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"任务 {job_id} ({kind}) 失败: {e}")
+                    traceback.print_exc()
+                    self._save(job_id, status='failed', error=str(e) or e.__class__.__name__,
+                               progress_done=job.done, progress_total=job.total, message=job.message,
+                               finished_at=_now())
+                    return
+                self._save(job_id, status='succeeded', result=json.dumps(result, ensure_ascii=False, default=str),
+                           progress_done=job.total if job.total is not None else job.done,
+                           progress_total=job.total, message=job.message, finished_at=_now())
+                print(f"任务 {job_id} ({kind}) 完成")
+        finally:
+            with self._lock:
+                self._active.pop(job_id, None)
+
+    # ---- 查看 ----
+
+    def get(self, job_id, session=None):
+        """任务状态（本进程中正在执行的任务使用内存中的实时进度），不存在时返回 None"""
+        session = session or db.session
+        row = session.execute(text("""
+            SELECT job_id, kind, status, params, result, error, progress_done, progress_total, message,
+                   created_at, started_at, finished_at
+            FROM jobs WHERE job_id = :job_id
+        """), {'job_id': job_id}).mappings().fetchone()
+        if row is None:
+            return None
+        return self._describe(row)
+
+    def recent(self, limit=20, session=None):
+        session = session or db.session
+        rows = session.execute(text("""
+            SELECT job_id, kind, status, params, result, error, progress_done, progress_total, message,
+                   created_at, started_at, finished_at
+            FROM jobs ORDER BY job_id DESC LIMIT :limit
+        """), {'limit': limit}).mappings().fetchall()
+        return [self._describe(row) for row in rows]
+
+    def _describe(self, row):
+        job = dict(row)
+        for field in ('params', 'result'):
+            job[field] = json.loads(job[field]) if job[field] else None
+        with self._lock:
+            live = self._active.get(job['job_id'])
+        if live is not None and job['status'] not in FINISHED_STATUSES:
+            job['progress_done'], job['progress_total'], job['message'] = live.done, live.total, live.message
+        total = job['progress_total']
+        if job['status'] == 'succeeded':
+            job['percent'] = 100.0
+        else:
+            job['percent'] = round(job['progress_done'] * 100 / total, 1) if total else None
+        job['finished'] = job['status'] in FINISHED_STATUSES
+        return job
+
+    def recover_interrupted(self, session=None):
+        """把心跳超时（所在实例已退出或被冻结）的 queued/running 任务标记为失败，返回标记的任务数"""
+        session = session or db.session
+        cutoff = _now(time.time() - self.heartbeat_timeout)
+        rows = session.execute(text("""
+            SELECT job_id FROM jobs
+            WHERE status IN ('queued', 'running')
+            AND COALESCE(heartbeat_at, started_at, created_at) < :cutoff
+        """), {'cutoff': cutoff}).fetchall()
+        session.commit()
+        with self._lock:
+            active = set(self._active)
+        interrupted = [job_id for job_id, in rows if job_id not in active]
+        for job_id in interrupted:
+            # 条件更新：判断之后恢复了心跳（或已完成）的任务不受影响
+            try:
+                self._write("""
+                    UPDATE jobs SET status = 'failed', error = :error, finished_at = :finished_at
+                    WHERE job_id = :job_id AND status IN ('queued', 'running')
+                    AND COALESCE(heartbeat_at, started_at, created_at) < :cutoff
+                """, {'job_id': job_id, 'cutoff': cutoff, 'finished_at': _now(),
+                      'error': f'任务心跳超过 {self.heartbeat_timeout} 秒未更新（所在实例已退出），任务未完成'})
+            except Exception as e:
+                print(f"更新任务 {job_id} 状态失败: {e}")
+        if interrupted:
+            print(f"⚠️  {len(interrupted)} 个后台任务心跳超时未完成，已标记为失败")
+        return len(interrupted)
+
+    def shutdown(self, wait=True):
+        self._stopping.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _now(timestamp=None):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(timestamp))
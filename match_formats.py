@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+赛制与比赛类型的对应关系
+每种赛制（tournament.t_format）允许的比赛类型（matches.m_type）。后台表单（inject_formats 的 format_allowed）
+与数据库中的 allowed_m_types 表（迁移 0005 写入，validate_m_type 触发器据此校验）使用同一份映射。
+"""
+
+FORMAT_ALLOWED_M_TYPES = {
+    1: [1, 2, 3, 8, 10, 11, 12, 13, 14],  # 小组赛 + 1/4决赛 + 附加赛
+    2: [1, 2, 3, 7, 14],  # 小赛 + 附加赛
+    3: [1, 2, 3, 9, 10, 11, 12, 13, 14],  # 小组赛 + 半决赛资格赛 + 附加赛
+    4: [1, 9, 10, 11, 12, 14],  # 单循环赛 + 附加赛
+    5: [2, 3, 9, 10, 11, 12, 14],  # 双循环赛 + 附加赛
+    6: [2, 3, 9, 10, 11, 12, 14],  # 苏超赛制 + 附加赛
+    7: [4, 5, 6, 11, 12, 14],  # 双败淘汰赛 + 附加赛
+    8: [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15]  # 其他格式
+}
+
+
+def allowed_m_type_rows():
+    """allowed_m_types 表的行：[(t_format, m_type)]"""
+    return [(t_format, m_type) for t_format, m_types in FORMAT_ALLOWED_M_TYPES.items() for m_type in m_types]
+
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+版本化数据库迁移
+迁移按版本号顺序执行，已执行的版本记录在 schema_migrations 表中；全部通过 SQLAlchemy 会话执行，
+本地 SQLite/SQLCipher 与 Turso(libsql) 使用同一套迁移。每个迁移在单独的事务中执行并记录版本，
+失败时回滚该迁移，之后的迁移不再执行。
+
+新增迁移：在 MIGRATIONS 末尾追加 (版本号, 名称, 步骤列表)，版本号递增且不可修改已发布的迁移；
+步骤为 SQL 字符串，或接收会话的函数（用于需要先检查表结构的迁移）。
+"""
+
+from sqlalchemy import text
+
+from db import db
+from match_formats import allowed_m_type_rows
+
+
+def create_index(name, table, columns):
+    """创建索引的迁移步骤；表不存在时（如未导入分组数据的新库）跳过"""
+    def step(session):
+        exists = session.execute(text("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :table
+        """), {'table': table}).fetchone()
+        if not exists:
+            print(f"⚠️  表 {table} 不存在，跳过索引 {name}")
+            return
+        session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+    return step
+
+
+def add_column(table, column, definition):
+    """添加列的迁移步骤；列已存在时（多个进程同时迁移）跳过"""
+    def step(session):
+        columns = {row[1] for row in session.execute(text(f"PRAGMA table_info({table})")).fetchall()}
+        if column not in columns:
+            session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    return step
+
+
+# 比赛类型校验：赛制允许的比赛类型存于 allowed_m_types（主键即 (t_format, m_type) 索引），
+# 触发器按主键查一次赛事、查一次允许表，代替逐个赛制比较的相关子查询（最多 8 次查询赛事表）。
+# 与原触发器一致：赛事不存在时报错；赛制未设置或不在映射中、比赛类型为空时不限制。
+M_TYPE_TRIGGER_BODY = """
+BEGIN
+    SELECT RAISE(ABORT, '无效的锦标赛ID')
+    WHERE NOT EXISTS (SELECT 1 FROM tournament WHERE t_id = NEW.t_id);
+    SELECT RAISE(ABORT, 'm_type不在该t_format允许的比赛类型中（见 allowed_m_types）')
+    FROM tournament t
+    WHERE t.t_id = NEW.t_id
+      AND NEW.m_type IS NOT NULL
+      AND EXISTS (SELECT 1 FROM allowed_m_types a WHERE a.t_format = t.t_format)
+      AND NOT EXISTS (SELECT 1 FROM allowed_m_types a WHERE a.t_format = t.t_format AND a.m_type = NEW.m_type);
+END
+"""
+
+
+def create_allowed_m_types(session):
+    """创建并按 match_formats 的映射写入 allowed_m_types"""
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS allowed_m_types (
+            t_format INTEGER NOT NULL,
+            m_type INTEGER NOT NULL,
+            PRIMARY KEY (t_format, m_type)
+        )
+    """))
+    session.execute(text("DELETE FROM allowed_m_types"))
+    session.execute(text("INSERT INTO allowed_m_types (t_format, m_type) VALUES (:t_format, :m_type)"),
+                    [{'t_format': t_format, 'm_type': m_type} for t_format, m_type in allowed_m_type_rows()])
+
+
+def replace_m_type_triggers(session):
+    """以查 allowed_m_types 的触发器替换 sql/m_type_trg1.sql、m_type_trg2.sql 中的旧触发器；
+    更新时只在 t_id 或 m_type 变化时校验（录入比分不再触发）"""
+    exists = session.execute(text("""
+        SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'matches'
+    """)).fetchone()
+    if not exists:
+        print("⚠️  表 matches 不存在，跳过比赛类型校验触发器")
+        return
+    session.execute(text("DROP TRIGGER IF EXISTS validate_m_type"))
+    session.execute(text("DROP TRIGGER IF EXISTS validate_m_type_update"))
+    session.execute(text("CREATE TRIGGER validate_m_type BEFORE INSERT ON matches" + M_TYPE_TRIGGER_BODY))
+    session.execute(text("CREATE TRIGGER validate_m_type_update BEFORE UPDATE OF t_id, m_type ON matches"
+                         + M_TYPE_TRIGGER_BODY))
+
+
+# 热点查询的过滤条件：按赛事取比赛（常带 m_type）、按赛事/选手取排名、按赛事取分组、按分组取组员、按用户和赛事取报名
+MIGRATIONS = [
+    (1, 'matches_t_id_m_type_index', [
+        create_index('ix_matches_t_type', 'matches', ['t_id', 'm_type']),
+    ]),
+    (2, 'rankings_indexes', [
+        create_index('ix_rankings_t_ranks', 'rankings', ['t_id', 'ranks']),
+        create_index('ix_rankings_player', 'rankings', ['player_id']),
+    ]),
+    (3, 'group_indexes', [
+        create_index('ix_tgroups_t', 'tgroups', ['t_id']),
+        create_index('ix_tg_players_tg', 'tg_players', ['tg_id']),
+    ]),
+    (4, 'signups_user_tournament_index', [
+        create_index('ix_signups_u_t', 'signups', ['u_id', 't_id']),
+    ]),
+    (5, 'allowed_m_types_lookup', [
+        create_allowed_m_types,
+        replace_m_type_triggers,
+    ]),
+    # 后台任务（jobs.py）：状态、进度与结果
+    (6, 'jobs_table', [
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            params TEXT,
+            result TEXT,
+            error TEXT,
+            progress_done INTEGER NOT NULL DEFAULT 0,
+            progress_total INTEGER,
+            message TEXT,
+            pid INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME,
+            finished_at DATETIME
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status)",
+    ]),
+    # 后台任务所在实例与心跳：按心跳时间判断任务是否中断（pid 在多实例/Serverless 环境中没有意义）
+    (7, 'jobs_heartbeat', [
+        add_column('jobs', 'instance_id', 'TEXT'),
+        add_column('jobs', 'heartbeat_at', 'DATETIME'),
+    ]),
+    # 物化排行榜（models.PlayerLeaderboard）：由迁移建表，部署步骤中的 sync_materialized_tables 写入数据
+    (8, 'player_leaderboard_table', [
+        """
+        CREATE TABLE IF NOT EXISTS player_leaderboard (
+            player_id INTEGER NOT NULL PRIMARY KEY,
+            name VARCHAR,
+            rank INTEGER NOT NULL,
+            total_score INTEGER NOT NULL,
+            baseline_score INTEGER NOT NULL,
+            major_count INTEGER NOT NULL,
+            minor_count INTEGER NOT NULL,
+            total_count INTEGER NOT NULL,
+            previous_rank INTEGER,
+            rank_change INTEGER,
+            updated_at VARCHAR,
+            FOREIGN KEY(player_id) REFERENCES players (player_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_player_leaderboard_rank ON player_leaderboard (rank)",
+    ]),
+]
+
+
+def ensure_migrations_table(session):
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def applied_versions(session=None):
+    """已执行的迁移：版本号 -> (名称, 执行时间)"""
+    session = session or db.session
+    ensure_migrations_table(session)
+    rows = session.execute(text("SELECT version, name, applied_at FROM schema_migrations")).fetchall()
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+
+def pending_migrations(session=None):
+    applied = applied_versions(session)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def run_migrations(session=None, verbose=True):
+    """按版本顺序执行未执行的迁移，返回本次执行的版本号列表；失败时抛出异常"""
+    session = session or db.session
+    pending = pending_migrations(session)
+    session.commit()
+
+    executed = []
+    for version, name, steps in pending:
+        try:
+            for step in steps:
+                if callable(step):
+                    step(session)
+                else:
+                    session.execute(text(step))
+            # 多个进程同时迁移时，步骤本身是幂等的，版本记录以先写入者为准
+            session.execute(text("""
+                INSERT OR IGNORE INTO schema_migrations (version, name) VALUES (:version, :name)
+            """), {'version': version, 'name': name})
+            session.commit()
+        except Exception:
+            session.rollback()
+            print(f"❌ 迁移 {version:04d}_{name} 失败")
+            raise
+        executed.append(version)
+        if verbose:
+            print(f"✅ 迁移 {version:04d}_{name} 已执行")
+    return executed
+
+
+def migration_status(session=None):
+    """每个迁移的执行状态：[(版本号, 名称, 执行时间或 None)]"""
+    applied = applied_versions(session)
+    return [(version, name, applied.get(version, (None, None))[1]) for version, name, _ in MIGRATIONS]
@@ -139,3 +139,69 @@ class Signup(db.Model):
         return f'<Signup {self.u_id} -> {self.t_id}>'
 
 
+
+
+class PlayerLeaderboard(db.Model):
+    """总积分排行榜物化表：在 rankings 写入的同一事务内刷新"""
+    __tablename__ = 'player_leaderboard'
+    player_id = db.Column(db.Integer, db.ForeignKey('players.player_id'), primary_key=True, autoincrement=False)
+    name = db.Column(db.String)
+    rank = db.Column(db.Integer, nullable=False, index=True)
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    baseline_score = db.Column(db.Integer, nullable=False, default=0)
+    major_count = db.Column(db.Integer, nullable=False, default=0)
+    minor_count = db.Column(db.Integer, nullable=False, default=0)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    # 排名变化：上次刷新前的名次，rank_change = previous_rank - rank（正数为上升）
+    previous_rank = db.Column(db.Integer, nullable=True)
+    rank_change = db.Column(db.Integer, nullable=True)
+    updated_at = db.Column(db.String, nullable=True)
+
+    def __repr__(self):
+        return f'<PlayerLeaderboard {self.player_id} #{self.rank}>'
+
+
+class TournamentSequence(db.Model):
+    """赛事序号物化表：届次序号、同类型翻页顺序与历届交替顺序，在赛事增删改时刷新"""
+    __tablename__ = 'tournament_sequence'
+    t_id = db.Column(db.Integer, db.ForeignKey('tournament.t_id'), primary_key=True, autoincrement=False)
+    season_id = db.Column(db.Integer, nullable=False)
+    type = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.Integer, nullable=False, default=1)
+    # 同赛季同类型内按 t_id 的序号（与 tournament_session_view 一致，含已取消赛事）
+    type_session_number = db.Column(db.Integer, nullable=False)
+    # 同类型翻页顺序（按赛季年份、届次），不参与翻页的赛事为空
+    same_type_order = db.Column(db.Integer, nullable=True)
+    # 历届翻页顺序（正赛小赛交替），已取消赛事为空
+    global_order = db.Column(db.Integer, nullable=True, index=True)
+
+    __table_args__ = (
+        db.Index('ix_tournament_sequence_type_order', 'type', 'same_type_order'),
+    )
+
+    def __repr__(self):
+        return f'<TournamentSequence {self.t_id} #{self.type_session_number}>'
+
+
+class PlayerMatch(db.Model):
+    """比赛长表：每场比赛每名参赛选手一行（由 matches 表上的触发器同步），供按选手查询比赛使用"""
+    __tablename__ = 'player_matches'
+    m_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # 1=该选手为 player_1，2=该选手为 player_2（自己对自己的比赛只有 side=1 一行）
+    side = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    player_id = db.Column(db.Integer, nullable=False)
+    opponent_id = db.Column(db.Integer, nullable=False)
+    t_id = db.Column(db.Integer, nullable=False)
+    m_type = db.Column(db.Integer, nullable=True)
+    goals_for = db.Column(db.Integer, nullable=True)
+    goals_against = db.Column(db.Integer, nullable=True)
+    # 该选手视角的结果：1=胜，0=平，-1=负，比分不全时为空
+    result = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_player_matches_player_t', 'player_id', 't_id'),
+        db.Index('ix_player_matches_t_type', 't_id', 'm_type'),
+    )
+
+    def __repr__(self):
+        return f'<PlayerMatch {self.m_id}:{self.side} player={self.player_id}>'
@@ -18,6 +18,9 @@ sys.path.insert(0, project_root)
 if not os.getenv('DATABASE_TYPE'):
     os.environ['DATABASE_TYPE'] = 'turso'
 
+# Serverless 环境：调用结束后进程可能被冻结，不依赖后台线程与定时器（见 database_config.is_serverless）
+os.environ.setdefault('SERVERLESS', '1')
+
 # 设置Flask环境
 os.environ['FLASK_ENV'] = 'production'
 
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单个选手的档案聚合
+固定次数的查询（选手、该选手的排名记录、该选手的比赛）只读取与该选手相关的行，
+在内存中整理出历届排名、最近20届基准分、奖牌、按赛季分组的排名与场次，
+供 /player/<id> 与 /user/profile 共用。
+"""
+
+from collections import namedtuple
+
+from queries import register_query
+
+
+ProfilePlayer = namedtuple('ProfilePlayer', ['player_id', 'name', 'status'])
+
+ProfileSeason = namedtuple('ProfileSeason', ['season_id', 'year'])
+
+ProfileTournament = namedtuple('ProfileTournament', [
+    't_id', 'season_id', 'type', 'status', 't_format', 'player_count', 'type_session_number', 'season'
+])
+
+ProfileRanking = namedtuple('ProfileRanking', ['r_id', 't_id', 'player_id', 'ranks', 'scores', 'tournament'])
+
+
+class ProfileMatch(namedtuple('ProfileMatch', [
+    'm_id', 't_id', 'player_1_id', 'player_1_score', 'player_2_id', 'player_2_score', 'm_type',
+    'tournament', 'player1', 'player2'
+])):
+    """选手档案中的一场比赛（与 Match 模型的模板用法保持一致）"""
+    __slots__ = ()
+
+    def winner_id(self):
+        if self.player_1_score > self.player_2_score:
+            return self.player_1_id
+        if self.player_2_score > self.player_1_score:
+            return self.player_2_id
+        return None
+
+
+# 奖牌类型键：赛事类型 -> 名称
+MEDAL_TYPE_KEYS = {1: 'major', 2: 'minor', 3: 'final'}
+
+# 选手参与的比赛：经比赛长表 player_matches 的 (player_id, t_id) 索引定位，再按主键回表取比赛
+MATCHES_BY_PLAYER_SQL = """
+    SELECT m.m_id, m.t_id, m.player_1_id, m.player_1_score, m.player_2_id, m.player_2_score, m.m_type,
+           p1.player_id AS player_1_row_id, p1.name AS player_1_name, p1.status AS player_1_status,
+           p2.player_id AS player_2_row_id, p2.name AS player_2_name, p2.status AS player_2_status,
+           {tournament_columns}
+    FROM player_matches pm
+    JOIN matches m ON m.m_id = pm.m_id
+    JOIN tournament t ON m.t_id = t.t_id
+    LEFT JOIN seasons s ON t.season_id = s.season_id
+    LEFT JOIN tournament_sequence ts ON t.t_id = ts.t_id
+    LEFT JOIN players p1 ON m.player_1_id = p1.player_id
+    LEFT JOIN players p2 ON m.player_2_id = p2.player_id
+    WHERE pm.player_id = :player_id
+    ORDER BY m.m_id
+"""
+
+# 选手参与的比赛中，赛事、赛季与届次序号的公共列
+_TOURNAMENT_COLUMNS = """
+    t.t_id AS tour_t_id, t.season_id AS tour_season_id, t.type AS tour_type, t.status AS tour_status,
+    t.t_format AS tour_t_format, t.player_count AS tour_player_count,
+    ts.type_session_number AS tour_session_number, s.season_id AS season_row_id, s.year AS season_year
+"""
+
+
+# 选手档案的三条查询（注册为具名语句，见 queries.py）
+PROFILE_PLAYER = register_query('player_profile.player', """
+    SELECT player_id, name, status FROM players WHERE player_id = :player_id
+""")
+PROFILE_RANKINGS = register_query('player_profile.rankings', f"""
+    SELECT r.r_id, r.t_id, r.player_id, r.ranks, r.scores, {_TOURNAMENT_COLUMNS}
+    FROM rankings r
+    JOIN tournament t ON r.t_id = t.t_id
+    LEFT JOIN seasons s ON t.season_id = s.season_id
+    LEFT JOIN tournament_sequence ts ON t.t_id = ts.t_id
+    WHERE r.player_id = :player_id
+    ORDER BY r.r_id
+""")
+PROFILE_MATCHES = register_query(
+    'player_profile.matches', MATCHES_BY_PLAYER_SQL.format(tournament_columns=_TOURNAMENT_COLUMNS)
+)
+
+
+def empty_medals():
+    return {type_key: {'gold': 0, 'silver': 0, 'bronze': 0} for type_key in MEDAL_TYPE_KEYS.values()}
+
+
+def is_unplayed(player_1_score, player_2_score):
+    """未进行的比赛（0-0 或 -1:-1）"""
+    return (player_1_score == 0 and player_2_score == 0) or \
+           (player_1_score == -1 and player_2_score == -1)
+
+
+class PlayerProfile:
+    """单个选手的档案：排名记录与比赛记录，各附带所属赛事（含赛季与届次序号）"""
+
+    def __init__(self, player, rankings, matches):
+        self.player = player
+        self.rankings = rankings
+        self.matches = matches
+
+    @classmethod
+    def load(cls, player_id, include_matches=True):
+        """加载选手档案；选手不存在时返回 None"""
+        row = PROFILE_PLAYER.execute({'player_id': player_id}).fetchone()
+        if not row:
+            return None
+
+        tournaments = {}
+        rankings = cls.load_rankings(player_id, tournaments)
+        matches = cls.load_matches(player_id, tournaments) if include_matches else []
+        return cls(ProfilePlayer(row.player_id, row.name, row.status), rankings, matches)
+
+    @staticmethod
+    def _tournament(row, tournaments):
+        """由查询行构造（并复用）赛事对象，同一届赛事在排名与比赛之间共享"""
+        tournament = tournaments.get(row.tour_t_id)
+        if tournament is None:
+            season = ProfileSeason(row.season_row_id, row.season_year) if row.season_row_id is not None else None
+            tournament = ProfileTournament(
+                t_id=row.tour_t_id,
+                season_id=row.tour_season_id,
+                type=row.tour_type,
+                status=row.tour_status,
+                t_format=row.tour_t_format,
+                player_count=row.tour_player_count,
+                type_session_number=row.tour_session_number,
+                season=season
+            )
+            tournaments[row.tour_t_id] = tournament
+        return tournament
+
+    @classmethod
+    def load_rankings(cls, player_id, tournaments=None):
+        """该选手的全部排名记录（按 r_id），一次查询带出赛事、赛季与届次序号"""
+        tournaments = {} if tournaments is None else tournaments
+        rows = PROFILE_RANKINGS.execute({'player_id': player_id}).fetchall()
+        return [
+            ProfileRanking(row.r_id, row.t_id, row.player_id, row.ranks, row.scores, cls._tournament(row, tournaments))
+            for row in rows
+        ]
+
+    @classmethod
+    def load_matches(cls, player_id, tournaments=None):
+        """该选手的全部比赛（按 m_id），一次查询带出赛事、赛季、届次序号与双方姓名"""
+        tournaments = {} if tournaments is None else tournaments
+        rows = PROFILE_MATCHES.execute({'player_id': player_id}).fetchall()
+
+        matches = []
+        for row in rows:
+            player1 = ProfilePlayer(row.player_1_id, row.player_1_name, row.player_1_status) \
+                if row.player_1_row_id is not None else None
+            player2 = ProfilePlayer(row.player_2_id, row.player_2_name, row.player_2_status) \
+                if row.player_2_row_id is not None else None
+            matches.append(ProfileMatch(
+                row.m_id, row.t_id, row.player_1_id, row.player_1_score, row.player_2_id, row.player_2_score,
+                row.m_type, cls._tournament(row, tournaments), player1, player2
+            ))
+        return matches
+
+    def tournament_history(self):
+        """历届排名和积分：(t_id, type, 赛季, 届次, 名次, 积分)，只含正常状态且已有积分的赛事，
+        按赛季、届次倒序"""
+        history = [
+            (r.t_id, r.tournament.type, r.tournament.season.year, r.tournament.type_session_number, r.ranks, r.scores)
+            for r in self.rankings
+            if r.tournament.status == 1 and r.scores is not None
+            and r.tournament.season is not None and r.tournament.type_session_number is not None
+        ]
+        # 与 SQL ORDER BY ... DESC 一致：NULL 视为最小值
+        history.sort(key=lambda h: (h[2] is not None, h[2] or '', h[3]), reverse=True)
+        return history
+
+    def tenth_highest_score(self, history=None):
+        """最近20届比赛中的第10高分（不足10届返回 None）"""
+        history = self.tournament_history() if history is None else history
+        recent_20_scores = sorted((scores for *_, scores in history[:20] if scores is not None), reverse=True)
+        if len(recent_20_scores) >= 10:
+            return recent_20_scores[9]
+        return None
+
+    def medals(self):
+        """奖牌统计（只统计正常状态的赛事；不参与排名的选手不计奖牌）"""
+        medals = empty_medals()
+        if self.player.status != 1:
+            return medals
+        medal_keys = {1: 'gold', 2: 'silver', 3: 'bronze'}
+        for r in self.rankings:
+            type_key = MEDAL_TYPE_KEYS.get(r.tournament.type)
+            if type_key and r.tournament.status == 1 and r.ranks in medal_keys:
+                medals[type_key][medal_keys[r.ranks]] += 1
+        return medals
+
+    def summary(self):
+        """可缓存的档案摘要：历届排名、最近20届第10高分与奖牌"""
+        history = self.tournament_history()
+        return {
+            'tournament_history': history,
+            'tenth_highest_score': self.tenth_highest_score(history),
+            'medals': self.medals()
+        }
+
+    @staticmethod
+    def group_by_season(records):
+        """按 赛季 -> 赛事类型 分组（保持原有顺序）；无赛季记录时以 season_id 作为键"""
+        grouped = {}
+        for record in records:
+            tournament = record.tournament
+            season_year = tournament.season.year if tournament.season else tournament.season_id
+            grouped.setdefault(season_year, {}).setdefault(tournament.type, []).append(record)
+        return grouped
+
+    def played_matches(self):
+        """过滤掉未进行的比赛（0-0或-1:-1）"""
+        return [m for m in self.matches if not is_unplayed(m.player_1_score, m.player_2_score)]
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+具名 SQL 语句注册表
+热点查询在模块导入时注册为具名、参数化的语句：text() 与 IN 列表的展开参数（expanding bindparam）只构造一次，
+每条语句记录执行次数与耗时，便于找出热点（/admin-secret/metrics 中的 queries）。
+
+展开参数在执行时按列表长度渲染为 IN (?, ?, ...)，不同长度的列表对应不同的 SQL 文本，各占 SQLite/libsql
+语句缓存的一项。执行前把非空列表重复最后一个值补齐到 2 的幂（IN/NOT IN 的结果不变），
+每条语句的 SQL 文本最多 log2(最长列表) + 1 种，语句缓存可以复用。
+
+用法：
+    TOURNAMENT_BY_ID = register_query('tournament.by_id', "SELECT ... WHERE t_id = :t_id")
+    TYPE_SESSION_NUMBERS = register_query('tournament_sequence.by_ids', "... WHERE t_id IN :t_ids", expanding=('t_ids',))
+    TOURNAMENT_BY_ID.execute({'t_id': t_id}).fetchone()
+    batch.add(TOURNAMENT_BY_ID, {'t_id': t_id})      # 也可加入 ReadBatch
+"""
+
+import re
+import threading
+import time
+from collections.abc import Mapping
+
+from sqlalchemy import bindparam, text
+
+from db import db
+
+
+class NamedQuery:
+    """注册表中的一条语句"""
+
+    def __init__(self, name, sql, expanding=()):
+        self.name = name
+        self.sql = sql
+        self.expanding = tuple(expanding)
+        statement = text(sql)
+        if self.expanding:
+            statement = statement.bindparams(*[bindparam(param, expanding=True) for param in self.expanding])
+        self.statement = statement
+        self._patterns = {param: re.compile(rf':{param}\b') for param in self.expanding}
+        self.runs = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<NamedQuery {self.name}>"
+
+    def padded(self, params=None):
+        """IN 列表参数补齐到 2 的幂长度后的参数（见模块说明）；executemany 的参数列表原样返回"""
+        if params is None:
+            return {}
+        if not isinstance(params, Mapping) or not self.expanding:
+            return params
+        params = dict(params)
+        for param in self.expanding:
+            values = list(params[param])
+            if values:
+                size = 1 << (len(values) - 1).bit_length()
+                values.extend(values[-1:] * (size - len(values)))
+            params[param] = values
+        return params
+
+    def execute(self, params=None, session=None):
+        """在会话上执行，返回 Result"""
+        session = session or db.session
+        start = time.perf_counter()
+        try:
+            return session.execute(self.statement, self.padded(params))
+        finally:
+            self.record(time.perf_counter() - start)
+
+    def record(self, seconds=0.0):
+        with self._lock:
+            self.runs += 1
+            self.seconds += seconds
+
+    def inline(self, params=None):
+        """把 IN 列表参数展开为逐个命名参数，返回 (sql, params)（供不支持展开参数的 Hrana 流水线使用）"""
+        params = self.padded(params)
+        sql = self.sql
+        for param, pattern in self._patterns.items():
+            values = list(params.pop(param))
+            if values:
+                names = [f"{param}_{i}" for i in range(len(values))]
+                params.update(zip(names, values))
+                replacement = '(' + ', '.join(f":{name}" for name in names) + ')'
+            else:
+                # 空列表：IN 恒假、NOT IN 恒真
+                replacement = '(SELECT NULL WHERE 0)'
+            sql = pattern.sub(lambda match: replacement, sql)
+        return sql, params
+
+
+class QueryRegistry:
+    """具名语句的集中注册表"""
+
+    def __init__(self):
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, sql, expanding=()):
+        """注册语句并返回 NamedQuery；同名且 SQL 相同时返回已有的语句（模块被重复导入），SQL 不同则报错"""
+        with self._lock:
+            existing = self._queries.get(name)
+            if existing is not None:
+                if existing.sql != sql or existing.expanding != tuple(expanding):
+                    raise ValueError(f"查询名称重复: {name}")
+                return existing
+            query = self._queries[name] = NamedQuery(name, sql, expanding)
+            return query
+
+    def __getitem__(self, name):
+        return self._queries[name]
+
+    def __contains__(self, name):
+        return name in self._queries
+
+    def __iter__(self):
+        return iter(list(self._queries.values()))
+
+    def stats(self):
+        """各语句的执行次数与耗时（按执行次数降序）"""
+        rows = []
+        for query in self:
+            with query._lock:
+                runs, seconds = query.runs, query.seconds
+            rows.append({
+                'name': query.name,
+                'runs': runs,
+                'total_ms': round(seconds * 1000, 2),
+                'mean_ms': round(seconds * 1000 / runs, 3) if runs else 0.0,
+            })
+        rows.sort(key=lambda row: (-row['runs'], row['name']))
+        return rows
+
+    def reset_stats(self):
+        for query in self:
+            with query._lock:
+                query.runs = 0
+                query.seconds = 0.0
+
+
+queries = QueryRegistry()
+
+
+def register_query(name, sql, expanding=()):
+    """在全局注册表中注册语句（见模块说明）"""
+    return queries.register(name, sql, expanding)
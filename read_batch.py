@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+独立只读查询的批量执行
+Turso(libsql) 上每条 db.session.execute 都是一次 HTTP 往返。页面把互不依赖的读查询先加入 ReadBatch，
+再一次性执行：配置了 Hrana 客户端时，整批语句放在一个 /v2/pipeline 请求里（BEGIN ... COMMIT 包裹，
+读到同一快照）发送，按加入顺序返回结果集；本地 SQLite，或当前会话有尚未提交的写入（需读到自己的写入）时，
+在会话上逐条执行，行为与直接查询一致。
+
+单条语句出错（SQL 错误、参数错误）不影响同批的其他语句，错误在读取该语句结果时抛出；
+会话级的错误（事务需要回滚、连接失效）在 execute 时直接抛出，不记到单条语句上。
+
+用法：
+    batch = ReadBatch()
+    session_number = batch.add("SELECT ... WHERE t_id = :t_id", {'t_id': t_id})
+    matches = batch.add("SELECT ... WHERE t_id = :t_id", {'t_id': t_id})
+    batch.execute()
+    session_number.scalar(), matches.rows
+"""
+
+import base64
+import http.client
+import json
+import threading
+from collections import namedtuple
+from urllib.parse import urlparse, parse_qsl
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, StatementError
+
+from db import db
+from queries import NamedQuery
+from standings_cache import session_has_pending_writes
+
+
+class HranaError(Exception):
+    """Hrana 请求失败（网络错误、HTTP 错误或响应格式不符）"""
+
+
+class HranaStatementError(Exception):
+    """批量中单条语句在服务端执行出错"""
+
+
+# 默认的 Hrana 客户端（None 表示在会话上逐条执行）
+_default_client = None
+
+_stats_lock = threading.Lock()
+_stats = {'batches': 0, 'statements': 0, 'pipelined_batches': 0, 'round_trips': 0, 'fallbacks': 0}
+
+
+def configure_read_batch(client):
+    """设置默认的 Hrana 客户端；传入 None 时关闭流水线"""
+    global _default_client
+    _default_client = client
+
+
+def read_batch_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['pipeline_enabled'] = _default_client is not None
+    return stats
+
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+
+# Hrana 值编码：https://github.com/tursodatabase/libsql/blob/main/docs/HRANA_2_SPEC.md
+def encode_value(value):
+    if value is None:
+        return {'type': 'null'}
+    if isinstance(value, bool):
+        return {'type': 'integer', 'value': str(int(value))}
+    if isinstance(value, int):
+        return {'type': 'integer', 'value': str(value)}
+    if isinstance(value, float):
+        return {'type': 'float', 'value': value}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'type': 'blob', 'base64': base64.b64encode(bytes(value)).decode('ascii')}
+    return {'type': 'text', 'value': str(value)}
+
+
+def decode_value(value):
+    value_type = value.get('type')
+    if value_type == 'null':
+        return None
+    if value_type == 'integer':
+        return int(value['value'])
+    if value_type == 'float':
+        return float(value['value'])
+    if value_type == 'blob':
+        return base64.b64decode(value['base64'])
+    if value_type == 'text':
+        return value['value']
+    raise HranaError(f"未知的值类型: {value_type}")
+
+
+_row_classes = {}
+
+
+def _row_class(columns):
+    """按列名生成结果行类型：支持下标、属性访问与 _mapping，与 SQLAlchemy Row 的用法一致"""
+    columns = tuple(columns)
+    row_class = _row_classes.get(columns)
+    if row_class is None:
+        base = namedtuple('BatchRow', columns, rename=True)
+
+        class BatchRow(base):
+            __slots__ = ()
+
+            @property
+            def _mapping(self):
+                return dict(zip(columns, self))
+
+        row_class = _row_classes[columns] = BatchRow
+    return row_class
+
+
+class HranaClient:
+    """Hrana over HTTP 客户端：一次 /v2/pipeline 请求执行一批语句（每个线程复用一条 HTTP 连接）"""
+
+    def __init__(self, url, auth_token=None, timeout=30):
+        parsed = urlparse(url)
+        self.secure = parsed.scheme == 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.path = parsed.path.rstrip('/') + '/v2/pipeline'
+        self.auth_token = auth_token
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @classmethod
+    def from_database_url(cls, database_url, timeout=30):
+        """由 Turso 数据库 URL（libsql://、libsql+https://、https://，authToken 在查询参数中）构造客户端"""
+        parsed = urlparse(database_url)
+        query = dict(parse_qsl(parsed.query))
+        secure = query.get('secure', query.get('tls', 'true')).lower() != 'false'
+        scheme = 'https' if secure else 'http'
+        return cls(f"{scheme}://{parsed.netloc}{parsed.path}", query.get('authToken') or query.get('auth_token'), timeout)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+            connection = connection_class(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _reset_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+        self._local.connection = None
+
+    def _post(self, body):
+        headers = {'Content-Type': 'application/json'}
+        if self.auth_token:
+            headers['Authorization'] = f"Bearer {self.auth_token}"
+        payload = json.dumps(body)
+        # 复用的连接可能已被服务端关闭，失败时重建连接重试一次
+        for attempt in range(2):
+            try:
+                connection = self._connection()
+                connection.request('POST', self.path, payload, headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                self._reset_connection()
+                if attempt:
+                    raise HranaError(f"请求失败: {e}") from e
+        if response.status != 200:
+            raise HranaError(f"HTTP {response.status}: {data[:200].decode('utf-8', 'replace')}")
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise HranaError(f"响应不是 JSON: {e}") from e
+
+    def pipeline(self, statements):
+        """在同一个读事务中执行 [(sql, params)]，按顺序返回每条语句的 (列名, 行列表) 或 HranaStatementError"""
+        requests = [{'type': 'execute', 'stmt': {'sql': 'BEGIN', 'want_rows': False}}]
+        for sql, params in statements:
+            requests.append({'type': 'execute', 'stmt': {
+                'sql': sql,
+                'named_args': [{'name': f":{name}", 'value': encode_value(value)} for name, value in params.items()],
+                'want_rows': True,
+            }})
+        requests.append({'type': 'execute', 'stmt': {'sql': 'COMMIT', 'want_rows': False}})
+        requests.append({'type': 'close'})
+
+        response = self._post({'baton': None, 'requests': requests})
+        results = response.get('results')
+        if not isinstance(results, list) or len(results) != len(requests):
+            raise HranaError("响应中的结果数量与请求不符")
+
+        outputs = []
+        for result in results[1:len(statements) + 1]:
+            if result.get('type') != 'ok':
+                message = (result.get('error') or {}).get('message', '未知错误')
+                outputs.append(HranaStatementError(message))
+                continue
+            execute_result = result['response']['result']
+            columns = [column.get('name') or f"column_{i}" for i, column in enumerate(execute_result['cols'])]
+            rows = [[decode_value(value) for value in row] for row in execute_result['rows']]
+            outputs.append((columns, rows))
+        return outputs
+
+
+class BatchResult:
+    """批量中单条语句的结果；ReadBatch.execute() 之后可读取"""
+
+    def __init__(self, sql, params):
+        self.query = sql if isinstance(sql, NamedQuery) else None
+        self.sql = sql.sql if self.query else sql
+        self.params = params
+        self._rows = None
+        self._error = None
+        self.done = False
+
+    def _set_rows(self, rows):
+        self._rows = rows
+        self.done = True
+
+    def _set_error(self, error):
+        self._error = error
+        self.done = True
+
+    @property
+    def rows(self):
+        if not self.done:
+            raise RuntimeError("批量查询尚未执行")
+        if self._error is not None:
+            raise self._error
+        return self._rows
+
+    def first(self):
+        rows = self.rows
+        return rows[0] if rows else None
+
+    def scalar(self):
+        row = self.first()
+        return row[0] if row is not None else None
+
+
+class ReadBatch:
+    """收集互不依赖的读查询，一次执行（见模块说明）；client=False 时总是在会话上逐条执行"""
+
+    def __init__(self, session=None, client=None):
+        self.session = session or db.session
+        self.client = _default_client if client is None else client
+        self._pending = []
+
+    def add(self, sql, params=None):
+        """加入一条读语句（SQL 文本或注册表中的 NamedQuery；命名参数 :name，值为 int/float/str/bytes/None），
+        返回 BatchResult"""
+        result = BatchResult(sql, dict(params or {}))
+        self._pending.append(result)
+        return result
+
+    def execute(self):
+        """执行已加入且尚未执行的语句，返回它们的 BatchResult 列表"""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return pending
+        _count(batches=1, statements=len(pending))
+
+        if self.client and not session_has_pending_writes(self.session):
+            try:
+                outputs = self.client.pipeline([
+                    result.query.inline(result.params) if result.query else (result.sql, result.params)
+                    for result in pending
+                ])
+            except HranaError as e:
+                current_app.logger.warning("批量读取失败，改为逐条执行: %s", e)
+                _count(fallbacks=1)
+            else:
+                _count(pipelined_batches=1, round_trips=1)
+                for result, output in zip(pending, outputs):
+                    if result.query:
+                        result.query.record()
+                    if isinstance(output, Exception):
+                        result._set_error(output)
+                    else:
+                        columns, rows = output
+                        row_class = _row_class(columns)
+                        result._set_rows([row_class(*row) for row in rows])
+                return pending
+
+        for result in pending:
+            try:
+                if result.query:
+                    result._set_rows(result.query.execute(result.params, self.session).fetchall())
+                else:
+                    result._set_rows(self.session.execute(text(result.sql), result.params).fetchall())
+            except StatementError as e:
+                if isinstance(e, DBAPIError) and e.connection_invalidated:
+                    raise
+                result._set_error(e)
+            _count(round_trips=1)
+        return pending
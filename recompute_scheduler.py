@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+赛事积分重算的合并调度
+录入比分后不立即重算，而是把赛事标记为待重算：同一赛事在合并窗口内的多次录入只触发一次重算
+（窗口从第一次标记开始计时，到期后在后台线程中执行），避免比赛日短时间内大量录入时对同一赛事反复全量重算、
+反复占用写锁。
+
+读到自己的写入：调用方可以要求立即重算（schedule(..., inline=True)，录入接口的 recompute=inline），
+这会取消该赛事的待执行重算并在当前请求中完成；赛事页面渲染前也会先执行该赛事的待执行重算（flush）。
+合并窗口为 0 时退化为每次录入都立即重算。
+
+延迟重算依赖进程内的定时器与退出钩子（flush_all），只适用于常驻进程。Serverless 环境（Netlify Functions）
+的调用结束后进程可能被冻结或回收，排队的重算可能永远不执行；使用 Turso 时应用通常也以多实例运行，
+其他实例看不到本进程排队的重算，页面渲染前的 flush 无法补上。因此这两种情况下默认窗口为 0（每次录入立即重算）：
+Serverless 环境始终为 0，Turso 可以显式设置 RECOMPUTE_WINDOW 启用合并。
+
+立即重算（schedule(..., inline=True)、run_now）失败时抛出 RecomputeError，由调用方报告给用户；
+后台执行与页面渲染前的 flush 失败时只打印并计入统计（failures、last_error）。
+
+录入的比赛随标记一起合并，重算函数以 recompute(t_id, m_ids) 调用：m_ids 为合并窗口内录入比分的比赛，
+淘汰赛对阵只从这些比赛沿下游推进；任一次标记未给出比赛时 m_ids 为 None（全量检查）。
+
+环境变量：
+- RECOMPUTE_WINDOW: 合并窗口秒数，0 为每次录入立即重算 (默认: 本地 2，Turso 0；Serverless 环境固定为 0)
+"""
+
+import os
+import threading
+import time
+
+from database_config import is_serverless
+
+
+class RecomputeError(Exception):
+    """立即重算失败"""
+
+
+class RecomputeScheduler:
+    """按赛事合并重算（见模块说明）"""
+
+    def __init__(self, recompute, window=2.0, app=None):
+        self.recompute = recompute
+        self.window = window
+        self.app = app
+        self._lock = threading.Lock()
+        self._pending = {}        # t_id -> 待执行的 Timer
+        self._changed = {}        # t_id -> 合并的录入比赛集合（None 表示全量检查）
+        self._run_locks = {}      # t_id -> 保证同一赛事的重算不并发执行
+        self.marked = 0
+        self.coalesced = 0
+        self.deferred_runs = 0
+        self.inline_runs = 0
+        self.failures = 0
+        self.total_run_seconds = 0.0
+        self.max_run_seconds = 0.0
+        self.last_error = None
+
+    @classmethod
+    def from_env(cls, recompute, app=None, database_type='local'):
+        default = '2' if database_type == 'local' and not is_serverless() else '0'
+        try:
+            window = float(os.getenv('RECOMPUTE_WINDOW', default))
+        except ValueError:
+            print(f"⚠️  环境变量 RECOMPUTE_WINDOW 不是数字，使用默认值 {default}")
+            window = float(default)
+        if window > 0 and is_serverless():
+            print("⚠️  Serverless 环境不支持延迟重算，忽略 RECOMPUTE_WINDOW，每次录入立即重算")
+            window = 0.0
+        return cls(recompute, window=max(window, 0.0), app=app)
+
+    def schedule(self, t_id, inline=False, m_ids=None):
+        """标记赛事待重算，返回 'inline'（已立即重算）、'scheduled'（新排入）或 'coalesced'（并入已排队的重算）
+
+        立即重算失败时抛出 RecomputeError。
+        """
+        t_id = int(t_id)
+        if inline or self.window <= 0:
+            with self._lock:
+                self.marked += 1
+            self.run_now(t_id, m_ids)
+            return 'inline'
+        with self._lock:
+            self.marked += 1
+            self._merge_changed(t_id, m_ids)
+            if t_id in self._pending:
+                self.coalesced += 1
+                return 'coalesced'
+            timer = threading.Timer(self.window, self._fire, args=(t_id,))
+            timer.daemon = True
+            self._pending[t_id] = timer
+        timer.start()
+        return 'scheduled'
+
+    def is_pending(self, t_id):
+        with self._lock:
+            return int(t_id) in self._pending
+
+    def run_now(self, t_id, m_ids=None):
+        """在当前线程立即重算并返回重算函数的结果（取消该赛事已排队的重算，其间的录入一并计入本次重算）
+
+        重算失败时抛出 RecomputeError。
+        """
+        t_id = int(t_id)
+        with self._lock:
+            timer = self._pending.pop(t_id, None)
+            if timer is not None:
+                self.coalesced += 1
+            self._merge_changed(t_id, m_ids)
+            changed = self._changed.pop(t_id)
+        if timer is not None:
+            timer.cancel()
+        return self._run(t_id, changed, inline=True, raise_errors=True)
+
+    def flush(self, t_id):
+        """赛事有待执行的重算时立即在当前线程执行，返回是否执行了重算"""
+        t_id = int(t_id)
+        with self._lock:
+            timer = self._pending.pop(t_id, None)
+            changed = self._changed.pop(t_id, None)
+        if timer is None:
+            return False
+        timer.cancel()
+        self._run(t_id, changed, inline=True)
+        return True
+
+    def flush_all(self):
+        """执行全部待执行的重算（进程退出前调用）"""
+        with self._lock:
+            pending = [(t_id, timer, self._changed.pop(t_id, None)) for t_id, timer in self._pending.items()]
+            self._pending.clear()
+        for t_id, timer, changed in pending:
+            timer.cancel()
+            if self.app is not None:
+                with self.app.app_context():
+                    self._run(t_id, changed)
+            else:
+                self._run(t_id, changed)
+
+    def _merge_changed(self, t_id, m_ids):
+        """在锁内合并录入的比赛"""
+        if m_ids is None:
+            self._changed[t_id] = None
+        elif t_id not in self._changed:
+            self._changed[t_id] = {int(m_id) for m_id in m_ids}
+        elif self._changed[t_id] is not None:
+            self._changed[t_id].update(int(m_id) for m_id in m_ids)
+
+    def _fire(self, t_id):
+        with self._lock:
+            if self._pending.get(t_id) is None:
+                return
+            del self._pending[t_id]
+            changed = self._changed.pop(t_id, None)
+        if self.app is not None:
+            with self.app.app_context():
+                self._run(t_id, changed)
+        else:
+            self._run(t_id, changed)
+
+    def _run(self, t_id, m_ids=None, inline=False, raise_errors=False):
+        with self._lock:
+            run_lock = self._run_locks.setdefault(t_id, threading.Lock())
+        with run_lock:
+            start = time.perf_counter()
+            result, error = None, None
+            try:
+                result = self.recompute(t_id, m_ids)
+            except Exception as e:
+                print(f"重算赛事 {t_id} 失败: {e}")
+                error = f"{t_id}: {e}"
+            seconds = time.perf_counter() - start
+        with self._lock:
+            if inline:
+                self.inline_runs += 1
+            else:
+                self.deferred_runs += 1
+            if error:
+                self.failures += 1
+                self.last_error = error
+            self.total_run_seconds += seconds
+            self.max_run_seconds = max(self.max_run_seconds, seconds)
+        if error and raise_errors:
+            raise RecomputeError(f"重算赛事 {error}")
+        return result
+
+    def stats(self):
+        with self._lock:
+            runs = self.inline_runs + self.deferred_runs
+            return {
+                'window_seconds': self.window,
+                'pending': len(self._pending),
+                'pending_tournaments': sorted(self._pending),
+                'marked': self.marked,
+                'coalesced': self.coalesced,
+                'runs': runs,
+                'inline_runs': self.inline_runs,
+                'deferred_runs': self.deferred_runs,
+                'failures': self.failures,
+                'last_error': self.last_error,
+                'mean_run_ms': round(self.total_run_seconds * 1000 / runs, 2) if runs else 0.0,
+                'max_run_ms': round(self.max_run_seconds * 1000, 2),
+            }
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Turso 部署的本地只读副本
+在本地 SQLite 文件中保存主库的副本：公开页面的读语句走副本，写语句始终走主库。
+
+同步方式（ReplicaSync）：
+- 主库每张表上有 AFTER INSERT/UPDATE/DELETE 触发器，把变化行的 (表名, rowid) 追加到变更日志 replica_changes，
+  seq 为自增的变更计数；
+- 副本在 replica_state 中记录已同步到的 seq 与主库的 schema_version。同步时读取 seq 之后的变更，
+  按 rowid 从主库取回这些行的当前内容，在副本中先删后插（主库已删除的行只删除）；
+- 主库表结构变化（schema_version 改变）、副本落后于已清理的日志（floor_seq）、或待同步的变更过多时，
+  整库复制（表、索引、视图；不复制触发器，副本只读）。
+
+陈旧上限（ReplicaRouter）：距上次同步超过 max_staleness 秒时，读请求先同步再读取；
+本进程提交写入后立即标记副本需要同步，保证读到自己的写入。同步失败时该请求改读主库。
+
+本模块只依赖两个 SQLAlchemy Engine，可以用两个本地 SQLite 文件分别充当主库和副本测试
+（见 check/check_replica.py）。
+"""
+
+import re
+import threading
+import time
+
+from sqlalchemy import bindparam, create_engine, event, text
+from sqlalchemy.sql.elements import TextClause
+
+from standings_cache import session_has_pending_writes
+
+
+CHANGE_LOG_TABLE = 'replica_changes'
+LOG_STATE_TABLE = 'replica_log_state'
+REPLICA_STATE_TABLE = 'replica_state'
+
+# 不复制、不记录变更的表
+_INTERNAL_TABLES = {CHANGE_LOG_TABLE, LOG_STATE_TABLE, REPLICA_STATE_TABLE}
+
+# 只读语句：SELECT，或不含写入的 WITH 查询
+_READ_SQL_PATTERN = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+_WRITE_KEYWORD_PATTERN = re.compile(r'\b(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+# 按 rowid 取行/删行的分块大小（SQLite 绑定参数个数有上限）
+_CHUNK_SIZE = 500
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _chunks(values, size=_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def replica_engine_for_path(path):
+    """副本文件的 Engine：WAL 模式，同步写入时不阻塞并发读取"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={'timeout': 30, 'check_same_thread': False})
+
+    @event.listens_for(engine, 'connect')
+    def _configure(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=30000')
+        cursor.close()
+
+    return engine
+
+
+class ReplicaSync:
+    """把主库同步到本地副本（见模块说明）"""
+
+    def __init__(self, primary_engine, replica_engine, max_delta=50000):
+        self.primary_engine = primary_engine
+        self.replica_engine = replica_engine
+        self.max_delta = max_delta
+        self.last_result = None
+
+    # ---- 主库：变更日志与触发器 ----
+
+    @staticmethod
+    def _user_tables(connection):
+        rows = connection.execute(text("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+            ORDER BY name
+        """)).fetchall()
+        return [row[0] for row in rows if row[0] not in _INTERNAL_TABLES]
+
+    def ensure_change_log(self, connection):
+        """在主库创建变更日志与各表的触发器（已存在则跳过），返回是否新建了对象"""
+        connection.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {CHANGE_LOG_TABLE} (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        connection.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {LOG_STATE_TABLE} (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                floor_seq INTEGER NOT NULL DEFAULT 0
+            )
+        """))
+        connection.execute(text(f"INSERT OR IGNORE INTO {LOG_STATE_TABLE} (id, floor_seq) VALUES (1, 0)"))
+
+        existing = {row[0] for row in connection.execute(text("""
+            SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'replica_log_%'
+        """)).fetchall()}
+        created = False
+        for table in self._user_tables(connection):
+            literal = table.replace("'", "''")
+            triggers = {
+                f"replica_log_{table}_ins": f"AFTER INSERT ON {_quote(table)} BEGIN "
+                f"INSERT INTO {CHANGE_LOG_TABLE} (table_name, row_id) VALUES ('{literal}', NEW.rowid); END",
+                f"replica_log_{table}_upd": f"AFTER UPDATE ON {_quote(table)} BEGIN "
+                f"INSERT INTO {CHANGE_LOG_TABLE} (table_name, row_id) VALUES ('{literal}', NEW.rowid); "
+                f"INSERT INTO {CHANGE_LOG_TABLE} (table_name, row_id) "
+                f"SELECT '{literal}', OLD.rowid WHERE OLD.rowid IS NOT NEW.rowid; END",
+                f"replica_log_{table}_del": f"AFTER DELETE ON {_quote(table)} BEGIN "
+                f"INSERT INTO {CHANGE_LOG_TABLE} (table_name, row_id) VALUES ('{literal}', OLD.rowid); END",
+            }
+            for name, body in triggers.items():
+                if name not in existing:
+                    connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {_quote(name)} {body}"))
+                    created = True
+        return created
+
+    def drop_change_log(self):
+        """删除主库上的触发器与变更日志（停用副本后执行，避免日志继续增长）"""
+        with self.primary_engine.begin() as connection:
+            triggers = connection.execute(text("""
+                SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'replica_log_%'
+            """)).fetchall()
+            for (name,) in triggers:
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {_quote(name)}"))
+            connection.execute(text(f"DROP TABLE IF EXISTS {CHANGE_LOG_TABLE}"))
+            connection.execute(text(f"DROP TABLE IF EXISTS {LOG_STATE_TABLE}"))
+        return len(triggers)
+
+    def prune_change_log(self, retention_seconds):
+        """清理早于保留期的变更日志；落后于 floor_seq 的副本下次同步时整库复制"""
+        if not retention_seconds or retention_seconds <= 0:
+            return 0
+        with self.primary_engine.begin() as connection:
+            floor = connection.execute(text(f"""
+                SELECT MAX(seq) FROM {CHANGE_LOG_TABLE}
+                WHERE created_at < datetime('now', :offset)
+            """), {'offset': f"-{int(retention_seconds)} seconds"}).scalar()
+            if floor is None:
+                return 0
+            deleted = connection.execute(text(f"DELETE FROM {CHANGE_LOG_TABLE} WHERE seq <= :floor"),
+                                         {'floor': floor}).rowcount
+            connection.execute(text(f"UPDATE {LOG_STATE_TABLE} SET floor_seq = MAX(floor_seq, :floor) WHERE id = 1"),
+                               {'floor': floor})
+            return deleted
+
+    # ---- 副本状态 ----
+
+    def _ensure_replica_state(self, connection):
+        connection.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {REPLICA_STATE_TABLE} (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_seq INTEGER NOT NULL DEFAULT -1,
+                schema_version INTEGER,
+                synced_at REAL
+            )
+        """))
+        connection.execute(text(f"INSERT OR IGNORE INTO {REPLICA_STATE_TABLE} (id, last_seq) VALUES (1, -1)"))
+
+    def replica_state(self):
+        """副本的 (已同步 seq, 主库 schema_version, 同步时间)；副本未初始化时返回 None"""
+        with self.replica_engine.connect() as connection:
+            exists = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {'name': REPLICA_STATE_TABLE}).fetchone()
+            if not exists:
+                return None
+            row = connection.execute(text(
+                f"SELECT last_seq, schema_version, synced_at FROM {REPLICA_STATE_TABLE} WHERE id = 1"
+            )).fetchone()
+            return tuple(row) if row else None
+
+    # ---- 同步 ----
+
+    def sync(self):
+        """把副本同步到主库当前状态，返回 {'mode': 'noop'|'delta'|'full', 'changes': n, 'seq': seq, 'synced_at': t}
+
+        synced_at 为读取主库快照之前的时间：副本至少包含该时刻之前提交的全部写入。
+        """
+        synced_at = time.time()
+        with self.primary_engine.connect() as primary:
+            # 变更日志与触发器在单独的事务中补建；之后在一个读事务中读取变更与行，得到一致的快照
+            with primary.begin():
+                self.ensure_change_log(primary)
+            with primary.begin():
+                schema_version = primary.execute(text("PRAGMA schema_version")).scalar()
+                max_seq = primary.execute(text(f"SELECT COALESCE(MAX(seq), 0) FROM {CHANGE_LOG_TABLE}")).scalar()
+                floor_seq = primary.execute(text(f"SELECT floor_seq FROM {LOG_STATE_TABLE} WHERE id = 1")).scalar()
+
+                with self.replica_engine.connect() as replica:
+                    replica.exec_driver_sql('BEGIN IMMEDIATE')
+                    try:
+                        self._ensure_replica_state(replica)
+                        last_seq, replica_schema_version, _ = replica.execute(text(
+                            f"SELECT last_seq, schema_version, synced_at FROM {REPLICA_STATE_TABLE} WHERE id = 1"
+                        )).fetchone()
+
+                        pending = max_seq - last_seq
+                        if (last_seq < 0 or replica_schema_version != schema_version
+                                or last_seq < floor_seq or pending > self.max_delta):
+                            self._full_copy(primary, replica)
+                            result = {'mode': 'full', 'changes': None, 'seq': max_seq}
+                        elif pending > 0:
+                            changes = self._apply_delta(primary, replica, last_seq, max_seq)
+                            result = {'mode': 'delta', 'changes': changes, 'seq': max_seq}
+                        else:
+                            result = {'mode': 'noop', 'changes': 0, 'seq': max_seq}
+
+                        replica.execute(text(f"""
+                            UPDATE {REPLICA_STATE_TABLE}
+                            SET last_seq = :seq, schema_version = :schema_version, synced_at = :synced_at
+                            WHERE id = 1
+                        """), {'seq': max_seq, 'schema_version': schema_version, 'synced_at': synced_at})
+                        replica.exec_driver_sql('COMMIT')
+                    except Exception:
+                        replica.exec_driver_sql('ROLLBACK')
+                        raise
+
+        result['synced_at'] = synced_at
+        self.last_result = result
+        return result
+
+    def _apply_delta(self, primary, replica, last_seq, max_seq):
+        """按变更日志逐表同步变化的行，返回涉及的行数"""
+        rows = primary.execute(text(f"""
+            SELECT table_name, row_id FROM {CHANGE_LOG_TABLE}
+            WHERE seq > :last_seq AND seq <= :max_seq
+        """), {'last_seq': last_seq, 'max_seq': max_seq}).fetchall()
+        changed = {}
+        for table_name, row_id in rows:
+            changed.setdefault(table_name, set()).add(row_id)
+
+        replica_tables = set(self._user_tables(replica))
+        count = 0
+        for table, row_ids in changed.items():
+            if table not in replica_tables:
+                # 副本缺少该表说明结构不同步；schema_version 会使下次同步整库复制
+                continue
+            for chunk in _chunks(sorted(row_ids)):
+                current = primary.execute(
+                    text(f"SELECT rowid AS __replica_rowid, * FROM {_quote(table)} WHERE rowid IN :row_ids")
+                    .bindparams(bindparam('row_ids', expanding=True)),
+                    {'row_ids': chunk}
+                )
+                columns = list(current.keys())[1:]
+                current_rows = current.fetchall()
+                replica.execute(
+                    text(f"DELETE FROM {_quote(table)} WHERE rowid IN :row_ids")
+                    .bindparams(bindparam('row_ids', expanding=True)),
+                    {'row_ids': chunk}
+                )
+                self._insert_rows(replica, table, columns, current_rows)
+                count += len(chunk)
+        return count
+
+    @staticmethod
+    def _insert_rows(replica, table, columns, rows):
+        if not rows:
+            return
+        column_list = ', '.join(['rowid'] + [_quote(column) for column in columns])
+        placeholders = ', '.join(f":p{i}" for i in range(len(columns) + 1))
+        replica.execute(
+            text(f"INSERT INTO {_quote(table)} ({column_list}) VALUES ({placeholders})"),
+            [{f"p{i}": value for i, value in enumerate(row)} for row in rows]
+        )
+
+    def _full_copy(self, primary, replica):
+        """整库复制：重建副本中的表、索引与视图并复制全部行"""
+        for kind, name in replica.execute(text("""
+            SELECT type, name FROM sqlite_master
+            WHERE type IN ('view', 'table') AND name NOT LIKE 'sqlite_%'
+        """)).fetchall():
+            if name in _INTERNAL_TABLES:
+                continue
+            replica.execute(text(f"DROP {kind.upper()} IF EXISTS {_quote(name)}"))
+
+        objects = primary.execute(text("""
+            SELECT type, name, sql FROM sqlite_master
+            WHERE type IN ('table', 'index', 'view') AND sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        """)).fetchall()
+        tables = [(name, sql) for kind, name, sql in objects if kind == 'table' and name not in _INTERNAL_TABLES]
+        for name, sql in tables:
+            replica.execute(text(sql))
+            result = primary.execute(text(f"SELECT rowid AS __replica_rowid, * FROM {_quote(name)}"))
+            columns = list(result.keys())[1:]
+            while True:
+                rows = result.fetchmany(_CHUNK_SIZE)
+                if not rows:
+                    break
+                self._insert_rows(replica, name, columns, rows)
+        for kind, name, sql in objects:
+            if kind == 'index' and not name.startswith('replica_'):
+                replica.execute(text(sql))
+        for kind, name, sql in objects:
+            if kind == 'view':
+                replica.execute(text(sql))
+
+
+class ReplicaRouter:
+    """按陈旧上限维护副本，并为会话选择读语句的 Engine"""
+
+    def __init__(self, replica_sync, max_staleness=5, log_retention=7 * 24 * 3600):
+        self.sync = replica_sync
+        self.max_staleness = max_staleness
+        self.log_retention = log_retention
+        self.last_synced_at = 0.0
+        self.last_pruned_at = 0.0
+        self.dirty = True
+        self.syncs = 0
+        self.failures = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    @property
+    def replica_engine(self):
+        return self.sync.replica_engine
+
+    def mark_dirty(self):
+        """本进程向主库提交了写入：下一个读请求先同步副本"""
+        self.dirty = True
+
+    def is_fresh(self):
+        return not self.dirty and (time.time() - self.last_synced_at) <= self.max_staleness
+
+    def ensure_fresh(self):
+        """副本超过陈旧上限（或本进程有新写入）时先同步；返回副本是否可用"""
+        if self.is_fresh():
+            return True
+        with self._lock:
+            if self.is_fresh():
+                return True
+            try:
+                if not self.dirty:
+                    # 其他进程可能刚同步过同一个副本文件
+                    state = self.sync.replica_state()
+                    if state and state[2] and time.time() - state[2] <= self.max_staleness:
+                        self.last_synced_at = state[2]
+                        return True
+                self.dirty = False
+                result = self.sync.sync()
+                self.last_synced_at = result['synced_at']
+                self.syncs += 1
+                self.last_error = None
+                if self.log_retention and self.last_synced_at - self.last_pruned_at > 3600:
+                    self.last_pruned_at = self.last_synced_at
+                    self.sync.prune_change_log(self.log_retention)
+                return True
+            except Exception as e:
+                self.dirty = True
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"同步本地副本失败，本次请求改读主库: {e}")
+                return False
+
+    @staticmethod
+    def is_read_statement(clause):
+        """只读语句：SELECT 构造，或以 SELECT/WITH 开头且不含写入关键字的文本 SQL"""
+        if clause is None or getattr(clause, 'is_dml', False) or getattr(clause, 'is_ddl', False):
+            return False
+        if getattr(clause, 'is_select', False):
+            return True
+        if isinstance(clause, TextClause):
+            sql = clause.text
+            return bool(_READ_SQL_PATTERN.match(sql)) and not _WRITE_KEYWORD_PATTERN.search(sql)
+        return False
+
+    def read_bind(self, session, clause):
+        """会话选择 Engine 的钩子：本请求启用副本、语句只读、且本事务尚无写入时返回副本 Engine"""
+        if (session_has_pending_writes(session) or getattr(session, '_flushing', False)
+                or (clause is not None and not self.is_read_statement(clause))):
+            # 写入始终走主库；之后本事务的读取也走主库，读到自己的写入
+            session.info['replica_dirty'] = True
+            return None
+        if clause is None or not session.info.get('use_read_replica') or session.info.get('replica_dirty'):
+            return None
+        return self.replica_engine
+
+    def stats(self):
+        return {
+            'max_staleness': self.max_staleness,
+            'last_synced_at': self.last_synced_at,
+            'dirty': self.dirty,
+            'syncs': self.syncs,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'last_result': self.sync.last_result,
+        }
+
+
+def register_replica_hooks(session, router):
+    """提交写入后标记副本需要同步；回滚时丢弃标记"""
+    def after_commit(committed_session):
+        if committed_session.info.pop('replica_dirty', False):
+            router.mark_dirty()
+            # 同一请求中之后的读取不再使用（尚未同步的）副本
+            committed_session.info.pop('use_read_replica', None)
+
+    def after_rollback(rolled_back_session):
+        rolled_back_session.info.pop('replica_dirty', None)
+
+    event.listen(session, 'after_commit', after_commit)
+    event.listen(session, 'after_rollback', after_rollback)
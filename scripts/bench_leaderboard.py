@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+总积分排行榜性能对比
+在临时生成的合成数据库上，对比旧版逐选手查询（N+1）与新版窗口函数集合查询的查询次数与耗时，
+并校验两者结果一致。查询语句与 app.calculate_player_total_scores 保持一致。
+
+用法: python scripts/bench_leaderboard.py [选手数] [赛季数] [每赛季赛事数]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+
+LEADERBOARD_SQL = """
+    WITH recent_tournaments AS (
+        SELECT t_id
+        FROM (
+            SELECT t.t_id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY t.type
+                       ORDER BY t.season_id DESC, tsv.type_session_number DESC
+                   ) AS recent_no
+            FROM tournament t
+            JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
+            WHERE t.status = 1 AND t.type IN (1, 2)
+        )
+        WHERE recent_no <= 20
+    ),
+    recent_scores AS (
+        SELECT r.player_id,
+               r.scores,
+               ROW_NUMBER() OVER (PARTITION BY r.player_id ORDER BY r.scores DESC) AS score_no
+        FROM rankings r
+        JOIN recent_tournaments rt ON r.t_id = rt.t_id
+        WHERE r.scores IS NOT NULL
+    ),
+    score_totals AS (
+        SELECT player_id,
+               SUM(scores) AS total_score,
+               MAX(CASE WHEN score_no = 10 THEN scores END) AS baseline_score
+        FROM recent_scores
+        GROUP BY player_id
+    ),
+    entry_counts AS (
+        SELECT r.player_id,
+               SUM(CASE WHEN t.type = 1 THEN 1 ELSE 0 END) AS major_count,
+               SUM(CASE WHEN t.type = 2 THEN 1 ELSE 0 END) AS minor_count
+        FROM rankings r
+        JOIN tournament t ON r.t_id = t.t_id
+        WHERE t.status = 1 AND r.scores IS NOT NULL
+        GROUP BY r.player_id
+    )
+    SELECT p.player_id,
+           p.name,
+           COALESCE(st.total_score, 0) AS total_score,
+           COALESCE(st.baseline_score, 0) AS baseline_score,
+           COALESCE(ec.major_count, 0) AS major_count,
+           COALESCE(ec.minor_count, 0) AS minor_count
+    FROM players p
+    LEFT JOIN score_totals st ON p.player_id = st.player_id
+    LEFT JOIN entry_counts ec ON p.player_id = ec.player_id
+    WHERE p.status = 1
+    ORDER BY p.player_id
+"""
+
+
+class CountingConnection:
+    """记录执行次数的 sqlite3 连接包装"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.query_count = 0
+
+    def execute(self, sql, params=()):
+        self.query_count += 1
+        return self.conn.execute(sql, params)
+
+
+def build_dataset(path, player_count, season_count, tournaments_per_season):
+    """生成合成数据集"""
+    random.seed(2025)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE seasons (season_id INTEGER PRIMARY KEY AUTOINCREMENT, year TEXT);
+        CREATE TABLE tournament (
+            t_id INTEGER PRIMARY KEY AUTOINCREMENT, season_id INTEGER NOT NULL, type INTEGER NOT NULL,
+            t_format INTEGER, player_count INTEGER, signup_deadline TEXT, status INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE TABLE players (player_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, status INTEGER NOT NULL DEFAULT 1);
+        CREATE TABLE rankings (
+            r_id INTEGER PRIMARY KEY AUTOINCREMENT, t_id INTEGER NOT NULL, player_id INTEGER NOT NULL,
+            ranks INTEGER NOT NULL, scores INTEGER
+        );
+        CREATE VIEW tournament_session_view AS
+        SELECT t.t_id, t.season_id, s.year, t.type,
+               ROW_NUMBER() OVER (PARTITION BY t.season_id, t.type ORDER BY t.t_id) AS type_session_number
+        FROM tournament t
+        JOIN seasons s ON t.season_id = s.season_id;
+    """)
+
+    conn.executemany(
+        "INSERT INTO players (name, status) VALUES (?, ?)",
+        [(f"选手{i:05d}", 1 if i % 10 else 2) for i in range(1, player_count + 1)]
+    )
+    for season_no in range(1, season_count + 1):
+        season_id = conn.execute("INSERT INTO seasons (year) VALUES (?)", (f"赛季{season_no}",)).lastrowid
+        for k in range(tournaments_per_season):
+            t_type = 3 if k == tournaments_per_season - 1 else (1 if k % 2 == 0 else 2)
+            entrants = random.randint(8, min(24, player_count))
+            status = 2 if random.random() < 0.05 else 1
+            t_id = conn.execute(
+                "INSERT INTO tournament (season_id, type, t_format, player_count, status) VALUES (?, ?, 1, ?, ?)",
+                (season_id, t_type, entrants, status)
+            ).lastrowid
+            picked = random.sample(range(1, player_count + 1), entrants)
+            conn.executemany(
+                "INSERT INTO rankings (t_id, player_id, ranks, scores) VALUES (?, ?, ?, ?)",
+                [(t_id, pid, rank, max(10, (entrants - rank + 1) * random.randint(5, 30)))
+                 for rank, pid in enumerate(picked, 1)]
+            )
+    conn.commit()
+    conn.close()
+
+
+def legacy_leaderboard(conn):
+    """旧版：每个选手 4 次查询"""
+    players = conn.execute("SELECT player_id, name FROM players WHERE status = 1").fetchall()
+    latest_season_id = conn.execute("SELECT MAX(season_id) FROM tournament WHERE status = 1").fetchone()[0]
+
+    recent_ids = {}
+    for t_type in (1, 2):
+        latest = conn.execute("""
+            SELECT t.t_id FROM tournament t
+            JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
+            WHERE t.status = 1 AND t.type = ? AND t.season_id = ?
+            ORDER BY tsv.type_session_number DESC
+        """, (t_type, latest_season_id)).fetchall()
+        ids = [row[0] for row in latest[:20]]
+        if len(ids) < 20:
+            others = conn.execute("""
+                SELECT t.t_id FROM tournament t
+                JOIN tournament_session_view tsv ON t.t_id = tsv.t_id
+                WHERE t.status = 1 AND t.type = ? AND t.season_id < ?
+                ORDER BY t.season_id DESC, tsv.type_session_number DESC
+                LIMIT ?
+            """, (t_type, latest_season_id, 20 - len(ids))).fetchall()
+            ids.extend(row[0] for row in others)
+        recent_ids[t_type] = ids
+
+    result = []
+    for player_id, name in players:
+        scores = []
+        for t_type in (1, 2):
+            if recent_ids[t_type]:
+                in_list = ','.join(str(t_id) for t_id in recent_ids[t_type])
+                scores.extend(row[0] for row in conn.execute(
+                    f"SELECT scores FROM rankings WHERE player_id = {player_id} "
+                    f"AND t_id IN ({in_list}) AND scores IS NOT NULL"
+                ).fetchall())
+        counts = []
+        for t_type in (1, 2):
+            counts.append(conn.execute(
+                f"SELECT COUNT(*) FROM rankings r JOIN tournament t ON r.t_id = t.t_id "
+                f"WHERE r.player_id = {player_id} AND t.type = {t_type} AND t.status = 1 AND r.scores IS NOT NULL"
+            ).fetchone()[0])
+        baseline = sorted(scores, reverse=True)[9] if len(scores) >= 10 else 0
+        result.append((player_id, name, sum(scores), baseline, counts[0], counts[1]))
+    return sorted(result, key=lambda x: x[2], reverse=True)
+
+
+def set_based_leaderboard(conn):
+    """新版：一次窗口函数查询"""
+    rows = conn.execute(LEADERBOARD_SQL).fetchall()
+    return sorted((tuple(row) for row in rows), key=lambda x: x[2], reverse=True)
+
+
+def run_once(path, func):
+    conn = CountingConnection(sqlite3.connect(path))
+    start = time.perf_counter()
+    rows = func(conn)
+    elapsed = (time.perf_counter() - start) * 1000
+    conn.conn.close()
+    return rows, conn.query_count, elapsed
+
+
+def main():
+    player_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    season_count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    tournaments_per_season = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench_leaderboard.db')
+        print(f"正在生成合成数据: {player_count} 名选手, {season_count} 个赛季, 每赛季 {tournaments_per_season} 届赛事...")
+        build_dataset(path, player_count, season_count, tournaments_per_season)
+
+        legacy_rows, legacy_queries, legacy_ms = run_once(path, legacy_leaderboard)
+        new_rows, new_queries, new_ms = run_once(path, set_based_leaderboard)
+
+        print(f"旧版逐选手查询: {legacy_queries} 次查询, {legacy_ms:.1f} ms")
+        print(f"新版集合查询:   {new_queries} 次查询, {new_ms:.1f} ms")
+        if new_ms > 0:
+            print(f"加速比: {legacy_ms / new_ms:.1f}x")
+
+        if legacy_rows == new_rows:
+            print("✅ 两种实现结果一致")
+        else:
+            print("❌ 两种实现结果不一致")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
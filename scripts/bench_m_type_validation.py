@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比赛类型校验触发器性能对比
+在临时生成的合成数据库上，对比旧版 validate_m_type 触发器（逐个赛制比较的相关子查询）、
+新版触发器（查 allowed_m_types，迁移 0005）与不设触发器时的批量写入吞吐：
+1. 生成循环赛：逐行插入所有对阵（与后台生成比赛的方式一致），在一个事务中提交；
+2. 录入比分：逐行更新全部比赛的比分。
+并对每种赛制 × 比赛类型（含未设置赛制、比赛类型为空、赛事不存在）校验新旧触发器的接受/拒绝结果一致。
+
+用法: python scripts/bench_m_type_validation.py [赛事数] [每赛事选手数] [重复次数]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from match_formats import FORMAT_ALLOWED_M_TYPES, allowed_m_type_rows  # noqa: E402
+from migrations import M_TYPE_TRIGGER_BODY  # noqa: E402
+
+
+SCHEMA = """
+    CREATE TABLE tournament (t_id INTEGER PRIMARY KEY, t_format INTEGER);
+    CREATE TABLE players (player_id INTEGER PRIMARY KEY, name TEXT);
+    CREATE TABLE matches (
+        m_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        t_id INTEGER NOT NULL REFERENCES tournament(t_id),
+        m_type INTEGER,
+        player_1_id INTEGER NOT NULL,
+        player_1_score INTEGER NOT NULL,
+        player_2_id INTEGER NOT NULL,
+        player_2_score INTEGER NOT NULL
+    );
+    CREATE INDEX ix_matches_t_type ON matches (t_id, m_type);
+    CREATE TABLE allowed_m_types (t_format INTEGER NOT NULL, m_type INTEGER NOT NULL, PRIMARY KEY (t_format, m_type));
+"""
+
+
+def legacy_trigger_body():
+    """旧版 sql/m_type_trg1.sql 的触发器体（按同一映射生成）"""
+    branches = []
+    for t_format, m_types in FORMAT_ALLOWED_M_TYPES.items():
+        values = ','.join(str(m_type) for m_type in m_types)
+        branches.append(
+            f"WHEN (SELECT t_format FROM tournament WHERE t_id = NEW.t_id) = {t_format} AND NEW.m_type NOT IN ({values}) "
+            f"THEN RAISE(ABORT, 't_format={t_format}时，m_type必须是{values}之一')"
+        )
+    return (
+        "\nBEGIN\n    SELECT CASE\n"
+        "        WHEN NEW.t_id NOT IN (SELECT t_id FROM tournament) THEN RAISE(ABORT, '无效的锦标赛ID')\n        "
+        + "\n        ".join(branches)
+        + "\n    END;\nEND\n"
+    )
+
+
+VARIANTS = {
+    'none': None,
+    'legacy': ("CREATE TRIGGER validate_m_type BEFORE INSERT ON matches" + legacy_trigger_body(),
+               "CREATE TRIGGER validate_m_type_update BEFORE UPDATE ON matches" + legacy_trigger_body()),
+    'lookup': ("CREATE TRIGGER validate_m_type BEFORE INSERT ON matches" + M_TYPE_TRIGGER_BODY,
+               "CREATE TRIGGER validate_m_type_update BEFORE UPDATE OF t_id, m_type ON matches" + M_TYPE_TRIGGER_BODY),
+}
+
+
+def create_database(path, variant, tournament_count, player_count):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO allowed_m_types (t_format, m_type) VALUES (?, ?)", allowed_m_type_rows())
+    # 赛制 1~7 轮流，使旧触发器的每个分支都被走到
+    conn.executemany("INSERT INTO tournament (t_id, t_format) VALUES (?, ?)",
+                     [(t_id, (t_id - 1) % 7 + 1) for t_id in range(1, tournament_count + 1)])
+    conn.executemany("INSERT INTO players (player_id, name) VALUES (?, ?)",
+                     [(player_id, f"选手{player_id}") for player_id in range(1, player_count + 1)])
+    for sql in VARIANTS[variant] or ():
+        conn.execute(sql)
+    conn.commit()
+    return conn
+
+
+def round_robin_rows(tournament_count, player_count):
+    """每个赛事的单循环对阵，比赛类型取该赛制允许的第一个类型"""
+    rows = []
+    for t_id in range(1, tournament_count + 1):
+        m_type = FORMAT_ALLOWED_M_TYPES[(t_id - 1) % 7 + 1][0]
+        for p1 in range(1, player_count + 1):
+            for p2 in range(p1 + 1, player_count + 1):
+                rows.append((t_id, m_type, p1, p2))
+    return rows
+
+
+def run_variant(variant, tournament_count, player_count):
+    """返回 (插入秒数, 更新秒数, 行数)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_database(os.path.join(tmp, 'bench.db'), variant, tournament_count, player_count)
+        rows = round_robin_rows(tournament_count, player_count)
+
+        start = time.perf_counter()
+        for t_id, m_type, p1, p2 in rows:
+            conn.execute("""
+                INSERT INTO matches (t_id, m_type, player_1_id, player_1_score, player_2_id, player_2_score)
+                VALUES (?, ?, ?, 0, ?, 0)
+            """, (t_id, m_type, p1, p2))
+        conn.commit()
+        insert_seconds = time.perf_counter() - start
+
+        m_ids = [row[0] for row in conn.execute("SELECT m_id FROM matches ORDER BY m_id")]
+        start = time.perf_counter()
+        for m_id in m_ids:
+            conn.execute("UPDATE matches SET player_1_score = ?, player_2_score = ? WHERE m_id = ?",
+                         (m_id % 9, m_id % 7, m_id))
+        conn.commit()
+        update_seconds = time.perf_counter() - start
+        conn.close()
+    return insert_seconds, update_seconds, len(rows)
+
+
+def accepted(conn, t_id, m_type):
+    try:
+        conn.execute("""
+            INSERT INTO matches (t_id, m_type, player_1_id, player_1_score, player_2_id, player_2_score)
+            VALUES (?, ?, 1, 0, 2, 0)
+        """, (t_id, m_type))
+    except sqlite3.IntegrityError:
+        return False
+    conn.execute("DELETE FROM matches")
+    return True
+
+
+def check_equivalence():
+    """新旧触发器对每种 (赛制, 比赛类型) 的接受/拒绝结果一致，返回不一致的组合"""
+    formats = list(FORMAT_ALLOWED_M_TYPES) + [None, 99]
+    m_types = list(range(0, 17)) + [None]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant in ('legacy', 'lookup'):
+            conn = create_database(os.path.join(tmp, f'{variant}.db'), variant, 0, 2)
+            conn.executemany("INSERT INTO tournament (t_id, t_format) VALUES (?, ?)",
+                             [(index + 1, t_format) for index, t_format in enumerate(formats)])
+            outcome = {}
+            for index, t_format in enumerate(formats):
+                for m_type in m_types:
+                    outcome[(t_format, m_type)] = accepted(conn, index + 1, m_type)
+            # 赛事不存在
+            outcome[('missing', 1)] = accepted(conn, len(formats) + 100, 1)
+            results[variant] = outcome
+            conn.close()
+    return [key for key in results['legacy'] if results['legacy'][key] != results['lookup'][key]]
+
+
+def main():
+    tournament_count = int(sys.argv[1]) if len(sys.argv) > 1 else 70
+    player_count = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    mismatches = check_equivalence()
+    if mismatches:
+        for key in mismatches:
+            print(f"❌ 新旧触发器结果不一致: (t_format, m_type) = {key}")
+        sys.exit(1)
+    print("✅ 新旧触发器对所有赛制与比赛类型的校验结果一致")
+
+    print(f"{tournament_count} 个赛事 × {player_count} 名选手的循环赛，取 {repeat} 次中最快的一次")
+    print(f"{'触发器':<8} {'插入行数':>8} {'插入 ms':>9} {'插入 行/秒':>11} {'更新 ms':>9} {'更新 行/秒':>11}")
+    for variant in VARIANTS:
+        runs = [run_variant(variant, tournament_count, player_count) for _ in range(repeat)]
+        insert_seconds = min(run[0] for run in runs)
+        update_seconds = min(run[1] for run in runs)
+        rows = runs[0][2]
+        print(f"{variant:<8} {rows:>8} {insert_seconds * 1000:>9.1f} {rows / insert_seconds:>11.0f} "
+              f"{update_seconds * 1000:>9.1f} {rows / update_seconds:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+连接池请求延迟对比
+分别以不同的连接池模式（DB_POOL_MODE）启动应用，用测试客户端反复请求几个只读页面，
+统计每个请求的延迟（平均/中位数/P95）与物理连接建立次数。
+连接池配置在导入 app 时读取，因此每种模式在单独的子进程中运行。
+
+基准在当前配置的数据库上运行（默认本地 curling_masters.db），只发送 GET 请求；
+派生数据缓存默认关闭（STANDINGS_CACHE_MAX_ENTRIES=0），使每个请求都实际访问数据库。
+
+用法: python scripts/bench_pooling.py [每个URL的请求次数] [模式,模式,...]
+      例如 python scripts/bench_pooling.py 50 null,queue,singleton
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODES = ['null', 'queue', 'singleton']
+
+# 路径参数 -> 取样查询
+SAMPLE_QUERIES = {
+    'season_id': "SELECT season_id FROM seasons ORDER BY season_id DESC LIMIT 1",
+    't_id': "SELECT t_id FROM tournament ORDER BY t_id DESC LIMIT 1",
+    'player_id': "SELECT player_id FROM players ORDER BY player_id LIMIT 1",
+}
+
+
+def bench_urls(db):
+    """待请求的页面：健康检查、首页，以及样例赛季/赛事/选手页面"""
+    from sqlalchemy import text
+
+    urls = ['/health', '/']
+    samples = {name: db.session.execute(text(query)).fetchone() for name, query in SAMPLE_QUERIES.items()}
+    if samples['season_id']:
+        urls.append(f"/season/{samples['season_id'][0]}")
+    if samples['t_id']:
+        urls.append(f"/tournament/{samples['t_id'][0]}")
+    if samples['player_id']:
+        urls.append(f"/player/{samples['player_id'][0]}")
+    return urls
+
+
+def run_worker(requests_per_url):
+    """子进程：按当前环境变量的连接池配置导入应用并计时，结果以 JSON 输出到最后一行"""
+    sys.path.insert(0, ROOT)
+    from app import app, db, sync_materialized_tables, connection_stats, db_config
+    from database_config import describe_pool_options
+
+    client = app.test_client()
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求，不计入统计
+    client.get('/health')
+    with app.app_context():
+        urls = bench_urls(db)
+    for url in urls:
+        client.get(url)
+
+    connects_before = connection_stats['connects']
+    latencies = []
+    errors = 0
+    for _ in range(requests_per_url):
+        for url in urls:
+            start = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 500:
+                errors += 1
+
+    latencies.sort()
+    print(json.dumps({
+        'pool': describe_pool_options(db_config['SQLALCHEMY_ENGINE_OPTIONS']),
+        'requests': len(latencies),
+        'urls': urls,
+        'mean_ms': statistics.mean(latencies),
+        'median_ms': statistics.median(latencies),
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1],
+        'connects': connection_stats['connects'] - connects_before,
+        'errors': errors,
+    }))
+
+
+def run_mode(mode, requests_per_url):
+    env = dict(os.environ, DB_POOL_MODE=mode)
+    env.setdefault('STANDINGS_CACHE_MAX_ENTRIES', '0')
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', str(requests_per_url)],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0 or not result.stdout.strip():
+        print(f"❌ 模式 {mode} 运行失败:\n{result.stderr[-2000:]}")
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        run_worker(int(sys.argv[2]))
+        return
+
+    requests_per_url = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    modes = sys.argv[2].split(',') if len(sys.argv) > 2 else DEFAULT_MODES
+
+    results = {}
+    for mode in modes:
+        print(f"正在测试连接池模式 {mode} ...")
+        result = run_mode(mode, requests_per_url)
+        if result is None:
+            sys.exit(1)
+        results[mode] = result
+
+    first = next(iter(results.values()))
+    print(f"页面: {', '.join(first['urls'])}，每个页面请求 {requests_per_url} 次")
+    print(f"{'模式':<10} {'请求数':>6} {'平均ms':>8} {'中位ms':>8} {'P95ms':>8} {'新建连接':>8}  连接池")
+    for mode, result in results.items():
+        print(f"{mode:<10} {result['requests']:>6} {result['mean_ms']:>8.2f} {result['median_ms']:>8.2f} "
+              f"{result['p95_ms']:>8.2f} {result['connects']:>8}  {result['pool']}")
+
+    if 'null' in results:
+        baseline = results['null']['mean_ms']
+        for mode, result in results.items():
+            if mode != 'null' and result['mean_ms'] > 0:
+                print(f"{mode} 相对 null 的平均延迟加速比: {baseline / result['mean_ms']:.2f}x")
+
+    if any(result['errors'] for result in results.values()):
+        print("❌ 存在返回 5xx 的请求")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全部赛事积分重算性能对比
+在当前配置的数据库上（本地 SQLite/SQLCipher 或 Turso），对比两种重算全部赛事积分的方式：
+1. 逐赛事：对每个赛事调用 calculate_tournament_scores（每个赛事一次事务、一次排行榜刷新，重算任务原来的做法）；
+2. 批量：calculate_scores_for_tournaments 一次查询、一次 executemany 更新、一次排行榜刷新，在一个事务中提交。
+每次重算前清空全部排名的积分（不计入耗时），两种方式都必须成功计算每个赛事、确实写入积分，且写入的积分一致；
+结束后恢复原有的积分。
+
+用法: python scripts/bench_rescoring.py [重复次数]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db, sync_materialized_tables, calculate_tournament_scores, calculate_scores_for_tournaments  # noqa: E402
+
+
+def ranking_scores():
+    rows = db.session.execute(text("SELECT r_id, scores FROM rankings ORDER BY r_id")).fetchall()
+    db.session.commit()
+    return dict(rows)
+
+
+def clear_scores():
+    db.session.execute(text("UPDATE rankings SET scores = NULL"))
+    db.session.commit()
+
+
+def restore_scores(scores):
+    db.session.rollback()
+    db.session.execute(text("UPDATE rankings SET scores = :scores WHERE r_id = :r_id"),
+                       [{'r_id': r_id, 'scores': value} for r_id, value in scores.items()])
+    db.session.commit()
+
+
+def per_tournament(t_ids):
+    return sum(1 for t_id in t_ids if calculate_tournament_scores(t_id))
+
+
+def bulk(t_ids):
+    return sum(calculate_scores_for_tournaments(t_ids).values())
+
+
+def timed(func, t_ids, repeat):
+    """返回 (最快一次的秒数, 成功的赛事数)，重算过程中的逐行输出不显示"""
+    best, succeeded = None, 0
+    for _ in range(repeat):
+        clear_scores()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            succeeded = func(t_ids)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, succeeded
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    client = app.test_client()
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求预热
+    client.get('/health')
+    with app.app_context():
+        t_ids = [row[0] for row in db.session.execute(text(
+            "SELECT DISTINCT t_id FROM rankings ORDER BY t_id"
+        ))]
+        if not t_ids:
+            print("❌ 数据库中没有排名数据")
+            sys.exit(1)
+        ranking_count = db.session.execute(text("SELECT COUNT(*) FROM rankings")).scalar()
+        print(f"{len(t_ids)} 个赛事, {ranking_count} 条排名，取 {repeat} 次中最快的一次")
+
+        original_scores = ranking_scores()
+        try:
+            per_seconds, per_succeeded = timed(per_tournament, t_ids, repeat)
+            per_scores = ranking_scores()
+            bulk_seconds, bulk_succeeded = timed(bulk, t_ids, repeat)
+            bulk_scores = ranking_scores()
+        finally:
+            restore_scores(original_scores)
+
+    print(f"逐赛事: {per_succeeded} 个赛事成功, {per_seconds * 1000:.1f} ms")
+    print(f"批量:   {bulk_succeeded} 个赛事成功, {bulk_seconds * 1000:.1f} ms")
+    if bulk_seconds > 0:
+        print(f"加速比: {per_seconds / bulk_seconds:.1f}x")
+
+    if per_succeeded != len(t_ids) or bulk_succeeded != len(t_ids):
+        print(f"❌ 有赛事积分计算失败（逐赛事 {per_succeeded}/{len(t_ids)}，批量 {bulk_succeeded}/{len(t_ids)}）")
+        sys.exit(1)
+    for name, scores in (('逐赛事', per_scores), ('批量', bulk_scores)):
+        if all(value is None for value in scores.values()):
+            print(f"❌ {name}重算后没有写入任何积分")
+            sys.exit(1)
+
+    if per_scores == bulk_scores:
+        print("✅ 两种方式写入的积分一致")
+    else:
+        changed = [r_id for r_id in per_scores if per_scores[r_id] != bulk_scores.get(r_id)]
+        print(f"❌ 两种方式写入的积分不一致（{len(changed)} 条排名）")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
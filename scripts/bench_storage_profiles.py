@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存储配置吞吐量对比
+分别以不同的存储配置（DB_STORAGE_PROFILE）启动应用，多个线程各用一个测试客户端反复请求公开只读页面，
+统计每秒请求数与平均延迟。存储配置在导入 app 时读取，因此每种配置在单独的子进程中运行。
+
+基准在当前配置的本地数据库上运行（默认 curling_masters.db），只发送 GET 请求；
+派生数据缓存默认关闭（STANDINGS_CACHE_MAX_ENTRIES=0），使每个请求都实际访问数据库。
+
+用法: python scripts/bench_storage_profiles.py [每线程轮数] [线程数] [配置,配置,...]
+      例如 python scripts/bench_storage_profiles.py 20 4 default,read-heavy
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from bench_pooling import bench_urls
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PROFILES = ['default', 'read-heavy', 'write-heavy', 'serverless-cold']
+
+
+def run_worker(rounds, thread_count):
+    """子进程：按当前环境变量的存储配置导入应用并压测，结果以 JSON 输出到最后一行"""
+    sys.path.insert(0, ROOT)
+    from app import app, db, sync_materialized_tables, storage_profile
+
+    client = app.test_client()
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求，不计入统计
+    client.get('/health')
+    with app.app_context():
+        urls = bench_urls(db)
+    for url in urls:
+        client.get(url)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        thread_client = app.test_client()
+        local_latencies = []
+        local_errors = 0
+        for _ in range(rounds):
+            for url in urls:
+                start = time.perf_counter()
+                response = thread_client.get(url)
+                local_latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 500:
+                    local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=worker) for _ in range(thread_count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'profile': storage_profile.name,
+        'pragmas': dict(storage_profile.pragmas),
+        'urls': urls,
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed > 0 else 0,
+        'mean_ms': sum(latencies) / len(latencies) if latencies else 0,
+        'errors': sum(errors),
+    }))
+
+
+def run_profile(profile, rounds, thread_count):
+    env = dict(os.environ, DB_STORAGE_PROFILE=profile)
+    env.setdefault('STANDINGS_CACHE_MAX_ENTRIES', '0')
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', str(rounds), str(thread_count)],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0 or not result.stdout.strip():
+        print(f"❌ 存储配置 {profile} 运行失败:\n{result.stderr[-2000:]}")
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        run_worker(int(sys.argv[2]), int(sys.argv[3]))
+        return
+
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    thread_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    profiles = sys.argv[3].split(',') if len(sys.argv) > 3 else DEFAULT_PROFILES
+
+    results = {}
+    for profile in profiles:
+        print(f"正在测试存储配置 {profile} ...")
+        result = run_profile(profile, rounds, thread_count)
+        if result is None:
+            sys.exit(1)
+        results[profile] = result
+
+    first = next(iter(results.values()))
+    print(f"页面: {', '.join(first['urls'])}，{thread_count} 个线程，每线程 {rounds} 轮")
+    print(f"{'配置':<16} {'请求数':>6} {'耗时s':>7} {'请求/秒':>8} {'平均ms':>8}")
+    for profile, result in results.items():
+        print(f"{profile:<16} {result['requests']:>6} {result['seconds']:>7.2f} "
+              f"{result['throughput']:>8.1f} {result['mean_ms']:>8.2f}")
+
+    if any(result['errors'] for result in results.values()):
+        print("❌ 存在返回 5xx 的请求")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
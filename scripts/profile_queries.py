@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面 SQL 开销分析
+用测试客户端请求首页、赛事页、选手页与管理后台首页，按 sql_metrics 的统计输出每个页面的语句数、SQL 耗时，
+以及执行次数达到 N+1 阈值的重复语句（指纹）与注册表中具名语句的执行次数。
+
+派生数据缓存默认关闭（STANDINGS_CACHE_MAX_ENTRIES=0），统计的是缓存未命中时的实际开销。
+
+用法: python scripts/profile_queries.py [每页重复语句显示条数]
+"""
+
+import os
+import sys
+
+os.environ.setdefault('STANDINGS_CACHE_MAX_ENTRIES', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db, sync_materialized_tables, sql_metrics, queries  # noqa: E402
+
+
+def target_urls():
+    """首页、最近一届赛事页、第一位选手页与管理后台首页"""
+    urls = ['/']
+    t_id = db.session.execute(text("SELECT t_id FROM tournament ORDER BY t_id DESC LIMIT 1")).scalar()
+    if t_id:
+        urls.append(f"/tournament/{t_id}")
+    player_id = db.session.execute(text("SELECT player_id FROM players ORDER BY player_id LIMIT 1")).scalar()
+    if player_id:
+        urls.append(f"/player/{player_id}")
+    urls.append('/admin-secret')
+    return urls
+
+
+def main():
+    show_repeated = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    if not sql_metrics.enabled:
+        print("❌ SQL 统计已关闭（SQL_METRICS=0）")
+        sys.exit(1)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+    with app.app_context():
+        # 执行迁移并校准物化表（请求中只检查迁移版本）
+        sync_materialized_tables()
+    # 首个请求，不计入统计
+    client.get('/health')
+    with app.app_context():
+        urls = target_urls()
+    # 赛事页首次访问可能写入最终排名，先各请求一遍使数据稳定
+    for url in urls:
+        client.get(url)
+
+    sql_metrics.clear()
+    queries.reset_stats()
+    for url in urls:
+        response = client.get(url)
+        if response.status_code >= 400:
+            print(f"❌ {url}: HTTP {response.status_code}")
+
+    summaries = {item['path']: item for item in sql_metrics.recent(len(urls))}
+    print(f"{'页面':<24} {'端点':<18} {'语句数':>6} {'不同语句':>8} {'SQL ms':>8} {'总 ms':>8} {'N+1':>4}")
+    for url in urls:
+        summary = summaries[url]
+        print(f"{url:<24} {summary['endpoint']:<18} {summary['queries']:>6} {summary['distinct_statements']:>8} "
+              f"{summary['sql_ms']:>8.2f} {summary['duration_ms']:>8.2f} {len(summary['repeated']):>4}")
+
+    for url in urls:
+        repeated = summaries[url]['repeated'][:show_repeated]
+        if not repeated:
+            continue
+        print(f"\n{url} 重复执行的语句（≥ {sql_metrics.repeat_threshold} 次）:")
+        for item in repeated:
+            print(f"  {item['count']:>5} 次 {item['ms']:>8.2f} ms  {item['sql'][:150]}")
+
+    named = [row for row in queries.stats() if row['runs']]
+    if named:
+        print("\n具名语句执行次数（queries.py 注册表）:")
+        for row in named[:show_repeated * 5]:
+            print(f"  {row['runs']:>5} 次 {row['total_ms']:>8.2f} ms  {row['name']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+-- 各赛制允许的比赛类型（与 match_formats.py 的 FORMAT_ALLOWED_M_TYPES 一致，供 validate_m_type 触发器查询）
+CREATE TABLE IF NOT EXISTS allowed_m_types (
+    t_format INTEGER NOT NULL,
+    m_type INTEGER NOT NULL,
+    PRIMARY KEY (t_format, m_type)
+);
+DELETE FROM allowed_m_types;
+INSERT INTO allowed_m_types (t_format, m_type) VALUES
+    (1, 1),
+    (1, 2),
+    (1, 3),
+    (1, 8),
+    (1, 10),
+    (1, 11),
+    (1, 12),
+    (1, 13),
+    (1, 14),
+    (2, 1),
+    (2, 2),
+    (2, 3),
+    (2, 7),
+    (2, 14),
+    (3, 1),
+    (3, 2),
+    (3, 3),
+    (3, 9),
+    (3, 10),
+    (3, 11),
+    (3, 12),
+    (3, 13),
+    (3, 14),
+    (4, 1),
+    (4, 9),
+    (4, 10),
+    (4, 11),
+    (4, 12),
+    (4, 14),
+    (5, 2),
+    (5, 3),
+    (5, 9),
+    (5, 10),
+    (5, 11),
+    (5, 12),
+    (5, 14),
+    (6, 2),
+    (6, 3),
+    (6, 9),
+    (6, 10),
+    (6, 11),
+    (6, 12),
+    (6, 14),
+    (7, 4),
+    (7, 5),
+    (7, 6),
+    (7, 11),
+    (7, 12),
+    (7, 14),
+    (8, 1),
+    (8, 2),
+    (8, 3),
+    (8, 4),
+    (8, 5),
+    (8, 6),
+    (8, 7),
+    (8, 8),
+    (8, 9),
+    (8, 10),
+    (8, 11),
+    (8, 12),
+    (8, 13),
+    (8, 14),
+    (8, 15);
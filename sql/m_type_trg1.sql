@@ -1,26 +1,13 @@
--- 创建触发器验证m_type值
+-- 创建触发器验证m_type值（先执行 allowed_m_types.sql；应用启动时的迁移 0005 会自动完成同样的操作）
 DROP TRIGGER IF EXISTS validate_m_type;
 CREATE TRIGGER validate_m_type BEFORE INSERT ON matches
 BEGIN
-    SELECT
-        CASE
-            WHEN NEW.t_id NOT IN (SELECT t_id FROM tournament) THEN
-                RAISE(ABORT, '无效的锦标赛ID')
-            WHEN (SELECT t_format FROM tournament WHERE t_id = NEW.t_id) = 1 AND NEW.m_type NOT IN (1,2,3,8,10,11,12,13,14) THEN
-                RAISE(ABORT, 't_format=1时，m_type必须是1,2,3,8,10,11,12,13,14之一')
-            WHEN (SELECT t_format FROM tournament WHERE t_id = NEW.t_id) = 2 AND NEW.m_type NOT IN (1,2,3,7,14) THEN
-                RAISE(ABORT, 't_format=2时，m_type必须是1,2,3,7,14之一')
-            WHEN (SELECT t_format FROM tournament WHERE t_id = NEW.t_id) = 3 AND NEW.m_type NOT IN (1,2,3,9,10,11,12,13,14) THEN
-                RAISE(ABORT, 't_format=3时，m_type必须是1,2,3,9,10,11,12,13,14之一')
-            WHEN (SELECT t_format FROM tournament WHERE t_id = NEW.t_id) = 4 AND NEW.m_type NOT IN (1,9,10,11,12,14) THEN
-                RAISE(ABORT, 't_format=4时，m_type必须是1,9,10,11,12,14之一')
-            WHEN (SELECT t_format FROM tournament WHERE t_id = NEW.t_id) = 5 AND NEW.m_type NOT IN (2,3,9,10,11,12,14) THEN
-                RAISE(ABORT, 't_format=5时，m_type必须是2,3,9,10,11,12,14之一')
-            WHEN (SELECT t_format FROM tournament WHERE t_id = NEW.t_id) = 6 AND NEW.m_type NOT IN (2,3,9,10,11,12,14) THEN
-                RAISE(ABORT, 't_format=6时，m_type必须是2,3,9,10,11,12,14之一')
-            WHEN (SELECT t_format FROM tournament WHERE t_id = NEW.t_id) = 7 AND NEW.m_type NOT IN (4,5,6,11,12,14) THEN
-                RAISE(ABORT, 't_format=7时，m_type必须是4,5,6,11,12,14之一')
-            WHEN (SELECT t_format FROM tournament WHERE t_id = NEW.t_id) = 8 AND NEW.m_type NOT IN (1,2,3,4,5,6,7,8,9,10,11,12,13,14,15) THEN
-                RAISE(ABORT, 't_format=8时，m_type必须是1,2,3,4,5,6,7,8,9,10,11,12,13,14,15之一')
-        END;
-END;
\ No newline at end of file
+    SELECT RAISE(ABORT, '无效的锦标赛ID')
+    WHERE NOT EXISTS (SELECT 1 FROM tournament WHERE t_id = NEW.t_id);
+    SELECT RAISE(ABORT, 'm_type不在该t_format允许的比赛类型中（见 allowed_m_types）')
+    FROM tournament t
+    WHERE t.t_id = NEW.t_id
+      AND NEW.m_type IS NOT NULL
+      AND EXISTS (SELECT 1 FROM allowed_m_types a WHERE a.t_format = t.t_format)
+      AND NOT EXISTS (SELECT 1 FROM allowed_m_types a WHERE a.t_format = t.t_format AND a.m_type = NEW.m_type);
+END;
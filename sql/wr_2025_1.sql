@@ -1,29 +1,26 @@
-SELECT 
-    p.player_id,
-    SUM(CASE WHEN mr.winner_id = p.player_id THEN 1 ELSE 0 END) AS wins,
-    SUM(CASE WHEN mr.loser_id = p.player_id THEN 1 ELSE 0 END) AS losses,
-    SUM(CASE WHEN mr.is_draw = 1 
-             AND (p.player_id IN (mr.player_1_id, mr.player_2_id)) 
-             THEN 1 ELSE 0 END) AS draws,
-    COUNT(mr.m_id) AS total_matches,
+-- 选手胜率统计（season_id = 1），基于比赛长表 player_matches：
+-- 每场比赛每名参赛选手一行，按 (t_id, m_type) 索引取本赛季赛事的比赛，无需 player_id IN (player_1_id, player_2_id) 的连接
+SELECT
+    pm.player_id,
+    SUM(CASE WHEN pm.result = 1 THEN 1 ELSE 0 END) AS wins,
+    SUM(CASE WHEN pm.result = -1 THEN 1 ELSE 0 END) AS losses,
+    SUM(CASE WHEN pm.result = 0 THEN 1 ELSE 0 END) AS draws,
+    COUNT(pm.m_id) AS total_matches,
     ROUND(
-        SUM(CASE WHEN mr.winner_id = p.player_id THEN 1 ELSE 0 END) * 1.0 /
-        COUNT(mr.m_id), 3
+        SUM(CASE WHEN pm.result = 1 THEN 1 ELSE 0 END) * 1.0 /
+        COUNT(pm.m_id), 3
     ) AS win_rate,
     ROUND(
-        SUM(CASE WHEN mr.is_draw = 1 
-                 AND (p.player_id IN (mr.player_1_id, mr.player_2_id)) 
-                 THEN 1 ELSE 0 END) * 1.0 /
-        COUNT(mr.m_id), 3
+        SUM(CASE WHEN pm.result = 0 THEN 1 ELSE 0 END) * 1.0 /
+        COUNT(pm.m_id), 3
     ) AS draw_rate,
     ROUND(
-        SUM(CASE WHEN mr.loser_id = p.player_id THEN 1 ELSE 0 END) * 1.0 /
-        COUNT(mr.m_id), 3
+        SUM(CASE WHEN pm.result = -1 THEN 1 ELSE 0 END) * 1.0 /
+        COUNT(pm.m_id), 3
     ) AS loss_rate
-FROM players p
-JOIN MatchResults mr
-  ON p.player_id IN (mr.player_1_id, mr.player_2_id)
-WHERE mr.t_id IN (
+FROM player_matches pm
+JOIN players p ON p.player_id = pm.player_id
+WHERE pm.t_id IN (
     SELECT t_id FROM tournament WHERE season_id = 1
 )
-GROUP BY p.player_id;
+GROUP BY pm.player_id;
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按请求统计 SQL
+在 SQLAlchemy 的游标执行事件上计时，为每个请求记录语句数、SQL 总耗时、最慢的几条语句，
+以及语句指纹（去掉字面量与参数列表长度后的 SQL）的重复次数：同一指纹在一个请求中执行次数达到阈值时视为 N+1 查询。
+
+结果的出口：
+- 响应头 Server-Timing（浏览器开发者工具的 Timing 面板可见）；
+- 内存中最近若干个请求的环形缓冲与按端点的汇总（/admin-secret/metrics）；
+- 可选：每个请求一行 JSON 日志。
+
+环境变量：
+- SQL_METRICS: 0 关闭统计 (默认: 1)
+- SQL_METRICS_BUFFER: 环形缓冲保留的请求数 (默认: 200)
+- SQL_METRICS_SLOWEST: 每个请求保留的最慢语句条数 (默认: 5)
+- SQL_METRICS_REPEAT_THRESHOLD: 同一指纹执行多少次视为 N+1 (默认: 10)
+- SQL_METRICS_LOG: 1 时每个请求输出一行 JSON 日志 (默认: 0)
+"""
+
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# 指纹：字符串/数字字面量替换为 ?，IN (?, ?, ...) 合并，空白归一
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMETER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement):
+    """语句指纹：只保留 SQL 结构，同一查询不同参数得到相同指纹"""
+    sql = _STRING_LITERAL.sub('?', statement)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    return _PARAMETER_LIST.sub('(?+)', sql)
+
+
+class RequestSqlRecord:
+    """一个请求中执行的语句"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = {}   # 指纹 -> [次数, 总秒数, 最长秒数]
+
+    def add(self, statement, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+
+class SqlMetrics:
+    """按请求统计 SQL（见模块说明）"""
+
+    def __init__(self, buffer_size=200, slowest=5, repeat_threshold=10, log_json=False):
+        self.slowest = slowest
+        self.repeat_threshold = repeat_threshold
+        self.log_json = log_json
+        self.enabled = True
+        self._recent = deque(maxlen=buffer_size)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._installed = False
+
+    @classmethod
+    def from_env(cls):
+        def env_int(name, default):
+            try:
+                return int(os.getenv(name, default))
+            except ValueError:
+                print(f"⚠️  环境变量 {name} 不是整数，使用默认值 {default}")
+                return default
+
+        metrics = cls(
+            buffer_size=env_int('SQL_METRICS_BUFFER', 200),
+            slowest=env_int('SQL_METRICS_SLOWEST', 5),
+            repeat_threshold=env_int('SQL_METRICS_REPEAT_THRESHOLD', 10),
+            log_json=os.getenv('SQL_METRICS_LOG', '0') == '1',
+        )
+        metrics.enabled = os.getenv('SQL_METRICS', '1') != '0'
+        return metrics
+
+    # ---- 语句计时 ----
+
+    def install(self, target=Engine):
+        """在所有 Engine（含本地副本）的游标执行事件上计时"""
+        if self._installed:
+            return
+        event.listen(target, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(target, 'after_cursor_execute', self._after_cursor_execute)
+        self._installed = True
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('sql_metrics_started', []).append(time.perf_counter())
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('sql_metrics_started')
+        if not started:
+            return
+        seconds = time.perf_counter() - started.pop()
+        if has_request_context():
+            record = g.get('sql_metrics')
+            if record is not None:
+                record.add(statement, seconds)
+
+    # ---- 请求 ----
+
+    def start_request(self):
+        if self.enabled:
+            g.sql_metrics = RequestSqlRecord()
+
+    def finish_request(self, request, response):
+        """汇总本请求的统计，写入 Server-Timing 响应头、环形缓冲与日志，返回汇总"""
+        record = g.pop('sql_metrics', None)
+        if record is None:
+            return None
+        duration_ms = (time.perf_counter() - record.started_at) * 1000
+        summary = self.summarize(record)
+        summary.update({
+            'time': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+        })
+
+        timing = [f'sql;dur={summary["sql_ms"]:.2f};desc="{summary["queries"]} queries"',
+                  f'app;dur={duration_ms:.2f}']
+        if summary['repeated']:
+            timing.append(f'nplus1;desc="{len(summary["repeated"])} repeated statements"')
+        response.headers.add('Server-Timing', ', '.join(timing))
+
+        self._store(summary)
+        if self.log_json:
+            print(json.dumps({'sql_metrics': summary}, ensure_ascii=False))
+        return summary
+
+    def summarize(self, record):
+        """语句数、SQL 耗时、最慢的语句与达到 N+1 阈值的重复语句（按指纹合并）"""
+        by_fingerprint = {}
+        for statement, (count, total, longest) in record.statements.items():
+            entry = by_fingerprint.setdefault(fingerprint(statement), [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], longest)
+
+        slowest = heapq.nlargest(self.slowest, by_fingerprint.items(), key=lambda item: item[1][2])
+        repeated = sorted(
+            (item for item in by_fingerprint.items() if item[1][0] >= self.repeat_threshold),
+            key=lambda item: (-item[1][0], item[0])
+        )
+        return {
+            'queries': record.queries,
+            'sql_ms': round(record.sql_seconds * 1000, 2),
+            'distinct_statements': len(by_fingerprint),
+            'slowest': [{'sql': sql, 'ms': round(longest * 1000, 2), 'count': count}
+                        for sql, (count, _, longest) in slowest],
+            'repeated': [{'sql': sql, 'count': count, 'ms': round(total * 1000, 2)}
+                         for sql, (count, total, _) in repeated],
+        }
+
+    def _store(self, summary):
+        with self._lock:
+            self._recent.append(summary)
+            stats = self._endpoints.setdefault(summary['endpoint'] or summary['path'], {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_ms': 0.0, 'duration_ms': 0.0, 'nplus1_requests': 0,
+            })
+            stats['requests'] += 1
+            stats['queries'] += summary['queries']
+            stats['max_queries'] = max(stats['max_queries'], summary['queries'])
+            stats['sql_ms'] += summary['sql_ms']
+            stats['duration_ms'] += summary['duration_ms']
+            if summary['repeated']:
+                stats['nplus1_requests'] += 1
+
+    # ---- 查看 ----
+
+    def recent(self, limit=50, endpoint=None, nplus1_only=False):
+        """最近的请求（新的在前）"""
+        with self._lock:
+            items = list(self._recent)
+        items.reverse()
+        if endpoint:
+            items = [item for item in items if item['endpoint'] == endpoint]
+        if nplus1_only:
+            items = [item for item in items if item['repeated']]
+        return items[:limit]
+
+    def endpoint_summary(self):
+        """按端点汇总：请求数、平均/最多语句数、平均 SQL 与请求耗时、出现 N+1 的请求数（按平均语句数降序）"""
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self._endpoints.items()}
+        rows = []
+        for name, stats in endpoints.items():
+            requests = stats['requests']
+            rows.append({
+                'endpoint': name,
+                'requests': requests,
+                'mean_queries': round(stats['queries'] / requests, 1),
+                'max_queries': stats['max_queries'],
+                'mean_sql_ms': round(stats['sql_ms'] / requests, 2),
+                'mean_duration_ms': round(stats['duration_ms'] / requests, 2),
+                'nplus1_requests': stats['nplus1_requests'],
+            })
+        rows.sort(key=lambda row: -row['mean_queries'])
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+            self._endpoints.clear()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+排名/奖牌等派生数据的进程内缓存
+以全局数据版本和按赛事的数据版本作为失效依据，写入提交后自动递增版本；
+LRU 淘汰 + 条目数上限 + 可选过期时间（用于多实例部署时限制陈旧时间）。
+
+环境变量：
+- STANDINGS_CACHE_MAX_ENTRIES: 最大缓存条目数（默认 512，0 表示关闭缓存）
+- STANDINGS_CACHE_TTL: 条目最长存活秒数（默认 300，0 表示不过期）
+"""
+
+import copy
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from sqlalchemy import event
+
+from db import db
+
+
+# 识别写语句（INSERT/UPDATE/DELETE/REPLACE）
+_WRITE_SQL_PATTERN = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+
+class VersionedCache:
+    """带数据版本校验的 LRU 缓存"""
+
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # 全局版本：任何写入都会递增
+        self._global_version = 0
+        # 共享版本：未标明赛事的写入（选手、赛季、赛事增删等）递增，使所有赛事级条目失效
+        self._shared_version = 0
+        self._tournament_versions = {}
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evictions = 0
+        self._function_stats = {}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def version_token(self, t_id=None):
+        """返回当前版本标记：全局条目使用全局版本，赛事条目使用 (共享版本, 赛事版本)"""
+        with self._lock:
+            if t_id is None:
+                return ('global', self._global_version)
+            return ('tournament', self._shared_version, self._tournament_versions.get(t_id, 0))
+
+    def tournaments_version_token(self, t_ids):
+        """返回一组赛事（如同一赛季的全部赛事）的版本标记，其中任一赛事的写入都会使其变化"""
+        with self._lock:
+            versions = tuple((t_id, self._tournament_versions.get(t_id, 0)) for t_id in sorted(set(t_ids)))
+            return ('tournaments', self._shared_version, versions)
+
+    def get(self, key, token, name=None):
+        """读取条目，返回 (命中与否, 值)"""
+        with self._lock:
+            stats = self._function_stats.setdefault(name, {'hits': 0, 'misses': 0})
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_token, created_at, value = entry
+                expired = self.ttl and (time.time() - created_at) > self.ttl
+                if entry_token == token and not expired:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    stats['hits'] += 1
+                    return True, value
+                # 版本变化或过期，丢弃旧条目
+                del self._entries[key]
+                self._stale += 1
+            self._misses += 1
+            stats['misses'] += 1
+            return False, None
+
+    def set(self, key, token, value):
+        with self._lock:
+            self._entries[key] = (token, time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def bump(self, t_ids=None):
+        """递增数据版本；t_ids 为空表示影响所有赛事"""
+        with self._lock:
+            self._global_version += 1
+            if t_ids:
+                for t_id in t_ids:
+                    self._tournament_versions[t_id] = self._tournament_versions.get(t_id, 0) + 1
+            else:
+                self._shared_version += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'stale': self._stale,
+                'evictions': self._evictions,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'global_version': self._global_version,
+                'shared_version': self._shared_version,
+                'tournament_versions': dict(self._tournament_versions),
+                'functions': {
+                    name: dict(values, hit_rate=round(values['hits'] / (values['hits'] + values['misses']), 4)
+                               if (values['hits'] + values['misses']) else 0.0)
+                    for name, values in self._function_stats.items()
+                }
+            }
+
+
+standings_cache = VersionedCache(
+    max_entries=int(os.getenv('STANDINGS_CACHE_MAX_ENTRIES', '512')),
+    ttl=int(os.getenv('STANDINGS_CACHE_TTL', '300'))
+)
+
+
+def session_has_pending_writes(session=None):
+    """当前会话事务中是否有尚未提交的写入（此时绕过缓存，保证读到自己的写入）"""
+    session = session or db.session
+    return bool(session.info.get('pending_writes') or session.new or session.dirty or session.deleted)
+
+
+def get_or_compute(name, key, token, compute, copy_result=True):
+    """按调用方给定的键和版本标记读取缓存，未命中时调用 compute() 计算并写入
+
+    用于版本范围无法由装饰器表达的场景（如按赛季内全部赛事的版本缓存）。
+    """
+    if not standings_cache.enabled or session_has_pending_writes():
+        return compute()
+
+    hit, value = standings_cache.get(key, token, name=name)
+    if not hit:
+        value = compute()
+        standings_cache.set(key, token, copy.deepcopy(value) if copy_result else value)
+        return value
+    return copy.deepcopy(value) if copy_result else value
+
+
+def cached(scope='global', copy_result=True):
+    """缓存派生数据的装饰器
+
+    scope='global'：依赖全局数据版本；scope='tournament'：第一个参数为 t_id，依赖该赛事的数据版本。
+    copy_result=True 时返回深拷贝，调用方可放心修改结果。
+    """
+    def decorator(func):
+        name = func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not standings_cache.enabled or session_has_pending_writes():
+                return func(*args, **kwargs)
+
+            t_id = args[0] if scope == 'tournament' and args else kwargs.get('t_id')
+            token = standings_cache.version_token(t_id if scope == 'tournament' else None)
+            # ctx 为赛事数据快照，只影响取数方式，不参与缓存键
+            key = (name, args, tuple(sorted((k, v) for k, v in kwargs.items() if k != 'ctx')))
+            return get_or_compute(name, key, token, lambda: func(*args, **kwargs), copy_result=copy_result)
+
+        return wrapper
+    return decorator
+
+
+def mark_tournament_changed(t_id):
+    """标记当前事务修改了指定赛事的数据，提交后只递增该赛事（及全局）的数据版本"""
+    if t_id is None:
+        return
+    db.session.info.setdefault('changed_tournaments', set()).add(int(t_id))
+    db.session.info['pending_writes'] = True
+
+
+def _on_orm_execute(orm_execute_state):
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['pending_writes'] = True
+    elif _WRITE_SQL_PATTERN.match(str(statement)):
+        orm_execute_state.session.info['pending_writes'] = True
+
+
+def _on_after_flush(session, flush_context):
+    session.info['pending_writes'] = True
+
+
+def _on_after_commit(session):
+    if session.info.pop('pending_writes', False):
+        changed_tournaments = session.info.pop('changed_tournaments', None)
+        # 未标明赛事的写入使所有缓存失效
+        standings_cache.bump(changed_tournaments or None)
+    session.info.pop('changed_tournaments', None)
+
+
+def _on_after_rollback(session):
+    session.info.pop('pending_writes', None)
+    session.info.pop('changed_tournaments', None)
+
+
+def register_session_hooks(session):
+    """在会话上注册写入检测与提交后版本递增的事件"""
+    event.listen(session, 'do_orm_execute', _on_orm_execute)
+    event.listen(session, 'after_flush', _on_after_flush)
+    event.listen(session, 'after_commit', _on_after_commit)
+    event.listen(session, 'after_rollback', _on_after_rollback)
@@ -63,3 +63,42 @@ if (document.readyState === 'loading') {
 } else {
   applyScoreStyles();
 }
+
+// 后台任务：轮询 /admin-secret/jobs/<jobId> 直到任务结束，onProgress 在每次查询后收到任务状态
+function waitForJob(jobId, onProgress, interval) {
+  interval = interval || 1000;
+  return new Promise(function(resolve, reject) {
+    function poll() {
+      fetch('/admin-secret/jobs/' + jobId)
+        .then(function(response) { return response.json(); })
+        .then(function(data) {
+          if (!data.success) {
+            reject(new Error(data.error || '查询任务状态失败'));
+            return;
+          }
+          if (onProgress) onProgress(data.job);
+          if (data.job.finished) {
+            resolve(data.job);
+          } else {
+            setTimeout(poll, interval);
+          }
+        })
+        .catch(reject);
+    }
+    poll();
+  });
+}
+
+// 后台任务进度的文字说明
+function formatJobProgress(job) {
+  if (job.status === 'queued') return '排队中…';
+  if (job.status === 'failed') return '失败：' + (job.error || '未知错误');
+  if (job.status === 'succeeded') return (job.result && job.result.message) || '已完成';
+  var text = '进行中';
+  if (job.progress_total) {
+    text += '：' + job.progress_done + '/' + job.progress_total;
+    if (job.percent !== null) text += '（' + job.percent + '%）';
+  }
+  if (job.message) text += ' ' + job.message;
+  return text;
+}
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 SQLite/SQLCipher 存储性能配置
+按部署场景选择一组连接级 PRAGMA 与 WAL 检查点策略，通过环境变量 DB_STORAGE_PROFILE 选择：
+
+- default: WAL + synchronous=NORMAL + busy_timeout（原有设置）
+- read-heavy: 大页缓存与内存映射，公开只读页面的请求以 query_only 连接执行，后台定期被动检查点
+- write-heavy: 较大的 WAL 自动检查点阈值，减少写路径上的检查点，由后台线程更频繁地检查点
+- serverless-cold: 小缓存、不做内存映射，连接建立快；WAL 阈值小，冷启动时需回放的 WAL 少，不启动后台线程
+
+SQLCipher 的 cipher_page_size / kdf_iter 必须与加密数据库文件时使用的参数一致（db/encrypt_database.py
+使用库默认值），因此各配置默认不修改，需要时用环境变量 DB_CIPHER_PAGE_SIZE / DB_CIPHER_KDF_ITER 指定。
+其余单项可用 DB_MMAP_SIZE、DB_CACHE_SIZE、DB_WAL_AUTOCHECKPOINT、DB_CHECKPOINT_INTERVAL 覆盖。
+"""
+
+import os
+import threading
+from collections import namedtuple
+
+
+StorageProfile = namedtuple('StorageProfile', [
+    'name',
+    'pragmas',                # 每个物理连接建立时执行的 PRAGMA：[(名称, 值)]
+    'cipher_pragmas',         # SQLCipher 参数，须紧跟在 PRAGMA key 之后执行；值为 None 时不设置
+    'wal_autocheckpoint',     # WAL 自动检查点阈值（页数），None 表示使用库默认值
+    'checkpoint_interval',    # 后台检查点间隔秒数，0 表示不启动后台线程
+    'checkpoint_mode',        # 后台检查点模式：PASSIVE / FULL / RESTART / TRUNCATE
+    'read_only_requests',     # 公开只读页面的请求是否以 query_only 连接执行
+])
+
+_BASE_PRAGMAS = [('journal_mode', 'WAL'), ('synchronous', 'NORMAL'), ('busy_timeout', 30000)]
+
+_DEFAULT_CIPHER = {'cipher_page_size': None, 'kdf_iter': None}
+
+STORAGE_PROFILES = {
+    'default': StorageProfile(
+        name='default',
+        pragmas=_BASE_PRAGMAS,
+        cipher_pragmas=_DEFAULT_CIPHER,
+        wal_autocheckpoint=None,
+        checkpoint_interval=0,
+        checkpoint_mode='PASSIVE',
+        read_only_requests=False,
+    ),
+    'read-heavy': StorageProfile(
+        name='read-heavy',
+        pragmas=_BASE_PRAGMAS + [
+            ('mmap_size', 268435456),   # 256 MB
+            ('cache_size', -65536),     # 64 MB
+            ('temp_store', 'MEMORY'),
+        ],
+        cipher_pragmas=_DEFAULT_CIPHER,
+        wal_autocheckpoint=1000,
+        checkpoint_interval=300,
+        checkpoint_mode='PASSIVE',
+        read_only_requests=True,
+    ),
+    'write-heavy': StorageProfile(
+        name='write-heavy',
+        pragmas=_BASE_PRAGMAS + [
+            ('mmap_size', 67108864),    # 64 MB
+            ('cache_size', -32768),     # 32 MB
+            ('temp_store', 'MEMORY'),
+        ],
+        cipher_pragmas=_DEFAULT_CIPHER,
+        wal_autocheckpoint=4000,
+        checkpoint_interval=60,
+        checkpoint_mode='PASSIVE',
+        read_only_requests=False,
+    ),
+    'serverless-cold': StorageProfile(
+        name='serverless-cold',
+        pragmas=_BASE_PRAGMAS + [
+            ('mmap_size', 0),
+            ('cache_size', -2000),      # 约 2 MB（SQLite 默认值）
+            ('temp_store', 'MEMORY'),
+        ],
+        cipher_pragmas=_DEFAULT_CIPHER,
+        wal_autocheckpoint=256,
+        checkpoint_interval=0,
+        checkpoint_mode='TRUNCATE',
+        read_only_requests=True,
+    ),
+}
+
+# 单项覆盖：环境变量 -> PRAGMA 名称
+_PRAGMA_OVERRIDES = {'DB_MMAP_SIZE': 'mmap_size', 'DB_CACHE_SIZE': 'cache_size'}
+_CIPHER_OVERRIDES = {'DB_CIPHER_PAGE_SIZE': 'cipher_page_size', 'DB_CIPHER_KDF_ITER': 'kdf_iter'}
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+def _env_int(name):
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        print(f"⚠️  环境变量 {name}={value!r} 不是整数，已忽略")
+        return None
+
+
+def get_storage_profile(name=None):
+    """读取存储配置（默认取 DB_STORAGE_PROFILE），并应用单项环境变量覆盖"""
+    name = (name or os.getenv('DB_STORAGE_PROFILE', 'default')).strip().lower()
+    profile = STORAGE_PROFILES.get(name)
+    if profile is None:
+        print(f"⚠️  未知的存储配置 DB_STORAGE_PROFILE={name!r}，使用 default")
+        profile = STORAGE_PROFILES['default']
+
+    pragmas = dict(profile.pragmas)
+    for env_name, pragma in _PRAGMA_OVERRIDES.items():
+        value = _env_int(env_name)
+        if value is not None:
+            pragmas[pragma] = value
+    cipher_pragmas = dict(profile.cipher_pragmas)
+    for env_name, pragma in _CIPHER_OVERRIDES.items():
+        value = _env_int(env_name)
+        if value is not None:
+            cipher_pragmas[pragma] = value
+
+    wal_autocheckpoint = _env_int('DB_WAL_AUTOCHECKPOINT')
+    checkpoint_interval = _env_int('DB_CHECKPOINT_INTERVAL')
+    return profile._replace(
+        pragmas=list(pragmas.items()),
+        cipher_pragmas=cipher_pragmas,
+        wal_autocheckpoint=profile.wal_autocheckpoint if wal_autocheckpoint is None else wal_autocheckpoint,
+        checkpoint_interval=profile.checkpoint_interval if checkpoint_interval is None else checkpoint_interval,
+    )
+
+
+def apply_cipher_pragmas(cursor, profile):
+    """SQLCipher 参数（在 PRAGMA key 之后、首次读取数据库之前执行）"""
+    for pragma, value in profile.cipher_pragmas.items():
+        if value is not None:
+            cursor.execute(f"PRAGMA {pragma} = {int(value)}")
+
+
+def apply_connection_pragmas(cursor, profile):
+    """连接级 PRAGMA 与 WAL 自动检查点阈值；单项失败时跳过（如旧版 SQLite 不支持 mmap）"""
+    statements = [f"PRAGMA {pragma}={value}" for pragma, value in profile.pragmas]
+    if profile.wal_autocheckpoint is not None:
+        statements.append(f"PRAGMA wal_autocheckpoint={int(profile.wal_autocheckpoint)}")
+    for statement in statements:
+        try:
+            cursor.execute(statement)
+        except Exception as e:
+            print(f"设置 {statement} 失败: {e}")
+
+
+def wal_checkpoint(connection, mode='PASSIVE'):
+    """执行一次 WAL 检查点，返回 (是否被阻塞, WAL 总页数, 已写回页数)"""
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"未知的检查点模式: {mode}")
+    row = connection.exec_driver_sql(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    return tuple(row) if row else None
+
+
+class WalCheckpointer:
+    """后台 WAL 检查点线程：按配置的间隔用独立连接执行检查点，使 WAL 文件不随读多写少的负载无限增长"""
+
+    def __init__(self, engine, profile):
+        self.engine = engine
+        self.profile = profile
+        self.runs = 0
+        self.last_result = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.profile.checkpoint_interval <= 0 or self.running:
+            return False
+        self._thread = threading.Thread(target=self._run, name='wal-checkpoint', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def checkpoint(self):
+        with self.engine.connect() as connection:
+            self.last_result = wal_checkpoint(connection, self.profile.checkpoint_mode)
+        self.runs += 1
+        return self.last_result
+
+    def _run(self):
+        while not self._stop.wait(self.profile.checkpoint_interval):
+            try:
+                self.checkpoint()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"WAL 检查点失败: {e}")
+
+    def stats(self):
+        return {
+            'profile': self.profile.name,
+            'interval': self.profile.checkpoint_interval,
+            'mode': self.profile.checkpoint_mode,
+            'running': self.running,
+            'runs': self.runs,
+            'last_result': self.last_result,
+            'last_error': self.last_error,
+        }
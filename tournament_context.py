@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单个赛事的内存快照
+一次性加载赛事的比赛、分组、组员、排名与选手姓名（固定 6 条查询，批量执行），
+排名/淘汰赛/展示等计算函数都基于该快照在内存中完成，查询次数与参赛人数无关。
+"""
+
+from collections import namedtuple
+
+from queries import register_query
+from read_batch import ReadBatch
+
+
+# 赛事快照的 6 条查询与附加赛查询（注册为具名语句，见 queries.py）
+CONTEXT_TOURNAMENT = register_query('tournament_context.tournament', """
+    SELECT t_id, season_id, type, t_format, player_count, status
+    FROM tournament
+    WHERE t_id = :t_id
+""")
+CONTEXT_MATCHES = register_query('tournament_context.matches', """
+    SELECT m_id, t_id, player_1_id, player_1_score, player_2_id, player_2_score, m_type
+    FROM matches
+    WHERE t_id = :t_id
+    ORDER BY m_id
+""")
+CONTEXT_GROUPS = register_query('tournament_context.groups', """
+    SELECT tg_id, t_name
+    FROM tgroups
+    WHERE t_id = :t_id
+    ORDER BY t_name, tg_id
+""")
+CONTEXT_GROUP_MEMBERS = register_query('tournament_context.group_members', """
+    SELECT tgp.tgp_id, tgp.tg_id, tgp.player_id
+    FROM tg_players tgp
+    JOIN tgroups tg ON tgp.tg_id = tg.tg_id
+    WHERE tg.t_id = :t_id
+    ORDER BY tgp.tgp_id
+""")
+CONTEXT_RANKINGS = register_query('tournament_context.rankings', """
+    SELECT r_id, t_id, player_id, ranks, scores
+    FROM rankings
+    WHERE t_id = :t_id
+    ORDER BY ranks, r_id
+""")
+CONTEXT_PLAYERS = register_query('tournament_context.players', """
+    SELECT p.player_id, p.name, p.status
+    FROM players p
+    WHERE p.player_id IN (
+        SELECT player_1_id FROM matches WHERE t_id = :t_id
+        UNION
+        SELECT player_2_id FROM matches WHERE t_id = :t_id
+        UNION
+        SELECT player_id FROM rankings WHERE t_id = :t_id
+        UNION
+        SELECT tgp.player_id FROM tg_players tgp
+        JOIN tgroups tg ON tgp.tg_id = tg.tg_id
+        WHERE tg.t_id = :t_id
+    )
+""")
+PLAYOFF_MATCHES = register_query('tournament_context.playoff_matches', """
+    SELECT player_1_id, player_2_id, player_1_score, player_2_score
+    FROM matches
+    WHERE t_id = :t_id AND m_type = 14
+    ORDER BY m_id
+""")
+
+ContextMatch = namedtuple('ContextMatch', [
+    'm_id', 't_id', 'player_1_id', 'player_1_score', 'player_2_id', 'player_2_score', 'm_type'
+])
+
+ContextRanking = namedtuple('ContextRanking', ['r_id', 't_id', 'player_id', 'ranks', 'scores'])
+
+
+class HeadToHeadIndex:
+    """选手两两交手索引
+
+    一次遍历比赛列表，按选手槽位构建稠密矩阵：wins[i][j] 为 i 胜 j 的场数，
+    points[i][j] 为 i 对 j 的积分（胜3平1，0-0 也算平），goals_for[i][j] 为 i 对 j 的得分，
+    first[i][j] 为两人首场交手（按比赛顺序）i 的结果：1 胜，-1 负，0 平或未交手。
+    比分为空的比赛与自己对自己的比赛不计入。
+    """
+
+    def __init__(self, matches):
+        """matches: 可迭代的 (player_1_id, player_2_id, player_1_score, player_2_score[, ...])"""
+        matches = [tuple(match[:4]) for match in matches]
+        self.slots = {}
+        for player_1_id, player_2_id, score_1, score_2 in matches:
+            self.slots.setdefault(player_1_id, len(self.slots))
+            self.slots.setdefault(player_2_id, len(self.slots))
+
+        size = len(self.slots)
+        self.wins = [[0] * size for _ in range(size)]
+        self.draws = [[0] * size for _ in range(size)]
+        self.points = [[0] * size for _ in range(size)]
+        self.goals_for = [[0] * size for _ in range(size)]
+        self.first = [[0] * size for _ in range(size)]
+        played = [[False] * size for _ in range(size)]
+
+        for player_1_id, player_2_id, score_1, score_2 in matches:
+            if score_1 is None or score_2 is None or player_1_id == player_2_id:
+                continue
+            i, j = self.slots[player_1_id], self.slots[player_2_id]
+            self.goals_for[i][j] += score_1
+            self.goals_for[j][i] += score_2
+            if score_1 > score_2:
+                result = 1
+                self.wins[i][j] += 1
+                self.points[i][j] += 3
+            elif score_2 > score_1:
+                result = -1
+                self.wins[j][i] += 1
+                self.points[j][i] += 3
+            else:
+                result = 0
+                self.draws[i][j] += 1
+                self.draws[j][i] += 1
+                self.points[i][j] += 1
+                self.points[j][i] += 1
+            if not played[i][j]:
+                played[i][j] = played[j][i] = True
+                self.first[i][j] = result
+                self.first[j][i] = -result
+
+    def goal_difference(self, player_id, opponent_id):
+        """player 对 opponent 的净胜分"""
+        i, j = self.slots.get(player_id), self.slots.get(opponent_id)
+        if i is None or j is None:
+            return 0
+        return self.goals_for[i][j] - self.goals_for[j][i]
+
+    def totals(self, player_id, opponent_ids):
+        """player 对一组对手的交手汇总（对手去重，不含自己）"""
+        totals = {'points': 0, 'wins': 0, 'draws': 0, 'losses': 0, 'goals_for': 0, 'goals_against': 0}
+        i = self.slots.get(player_id)
+        if i is None:
+            return totals
+        for opponent_id in set(opponent_ids):
+            j = self.slots.get(opponent_id)
+            if j is None or j == i:
+                continue
+            totals['points'] += self.points[i][j]
+            totals['wins'] += self.wins[i][j]
+            totals['draws'] += self.draws[i][j]
+            totals['losses'] += self.wins[j][i]
+            totals['goals_for'] += self.goals_for[i][j]
+            totals['goals_against'] += self.goals_for[j][i]
+        return totals
+
+    def first_result(self, player1_id, player2_id):
+        """两人首场交手中 player1 的结果：1 胜，-1 负，0 平局或未交手"""
+        i, j = self.slots.get(player1_id), self.slots.get(player2_id)
+        if i is None or j is None:
+            return 0
+        return self.first[i][j]
+
+
+class CrossGroupHeadToHead:
+    """跨组总排名的胜负关系索引，与原 calculate_head_to_head_result 的比较结果一致
+
+    原函数按 (p1_id, p1_score, p2_id, p2_score, m_type) 拆解调用方传入的
+    (player_1_id, player_2_id, player_1_score, player_2_score, m_type)，
+    实际以 (player_1_id, player_1_score) 作为“两名选手”、(player_2_id, player_2_score) 作为“比分”比较。
+    总排名沿用这一历史规则以保持排名不变，这里一次遍历预先统计，比较时不再扫描比赛列表。
+    """
+
+    def __init__(self, matches):
+        """matches: 可迭代的 (player_1_id, player_2_id, player_1_score, player_2_score[, ...])"""
+        self.wins = {}
+        for player_1_id, player_2_id, score_1, score_2 in (tuple(match[:4]) for match in matches):
+            if player_1_id == score_1:
+                continue
+            if player_2_id > score_2:
+                key = (player_1_id, score_1)
+            elif score_2 > player_2_id:
+                key = (score_1, player_1_id)
+            else:
+                continue
+            self.wins[key] = self.wins.get(key, 0) + 1
+
+    def head_to_head_result(self, player1_id, player2_id):
+        """1 表示 player1 胜，-1 表示 player2 胜，0 表示平局或未交手"""
+        player1_wins = self.wins.get((player1_id, player2_id), 0)
+        player2_wins = self.wins.get((player2_id, player1_id), 0)
+        if player1_wins > player2_wins:
+            return 1
+        if player2_wins > player1_wins:
+            return -1
+        return 0
+
+
+class PlayoffIndex:
+    """附加赛（m_type=14）结果索引
+
+    pair_results[(a, b)] 为 a 对 b 的附加赛结果（1 胜，-1 负，0 平）：比分取两人第一场有比分的附加赛，
+    主客队以两人第一场附加赛为准；adjustments[player_id] 为该选手附加赛获胜场次带来的
+    (得分, 失分) 增量（只统计双方比分非负的比赛，负者不变）。
+    """
+
+    def __init__(self, matches):
+        """matches: 按 m_id 升序的附加赛 (player_1_id, player_2_id, player_1_score, player_2_score)"""
+        self.pair_results = {}
+        self.adjustments = {}
+        first_home = {}
+        for player_1_id, player_2_id, score_1, score_2 in matches:
+            first_home.setdefault(frozenset((player_1_id, player_2_id)), player_1_id)
+            if score_1 is None or score_2 is None:
+                continue
+
+            if (player_1_id, player_2_id) not in self.pair_results:
+                # 主队比分记在该组合第一场附加赛的主队名下
+                home_id = first_home[frozenset((player_1_id, player_2_id))]
+                away_id = player_2_id if home_id == player_1_id else player_1_id
+                result = (score_1 > score_2) - (score_1 < score_2)
+                self.pair_results[(home_id, away_id)] = result
+                self.pair_results[(away_id, home_id)] = -result
+
+            if score_1 < 0 or score_2 < 0:
+                continue
+            if score_1 > score_2:
+                self._add_adjustment(player_1_id, score_1, score_2)
+            elif score_2 > score_1:
+                self._add_adjustment(player_2_id, score_2, score_1)
+
+    def _add_adjustment(self, player_id, goals_for, goals_against):
+        current_for, current_against = self.adjustments.get(player_id, (0, 0))
+        self.adjustments[player_id] = (current_for + goals_for, current_against + goals_against)
+
+    @classmethod
+    def load(cls, t_id):
+        """单次查询加载赛事的附加赛索引"""
+        rows = PLAYOFF_MATCHES.execute({'t_id': t_id}).fetchall()
+        return cls(tuple(row) for row in rows)
+
+    def result(self, player1_id, player2_id):
+        """player1 对 player2 的附加赛结果：1 胜，-1 负，0 平局或没有附加赛"""
+        return self.pair_results.get((player1_id, player2_id), 0)
+
+    def apply(self, players):
+        """把附加赛获胜带来的得失分计入选手数据（只影响净胜分和总进球，不影响积分）"""
+        for player in players:
+            adjustment = self.adjustments.get(player['player_id'])
+            if adjustment:
+                player['goals_for'] += adjustment[0]
+                player['goals_against'] += adjustment[1]
+                player['goal_difference'] = player['goals_for'] - player['goals_against']
+
+
+class TournamentContext:
+    """赛事数据快照：比赛按 m_id 升序，分组按组名排序，组员按分配顺序（tgp_id）"""
+
+    def __init__(self, t_id):
+        self.t_id = t_id
+        self.tournament = None
+        self.matches = []
+        self.groups = []
+        self.group_members = []
+        self.rankings = []
+        self.players = {}
+        self._total_matches = {}
+        self._head_to_head = {}
+        self._cross_group_head_to_head = None
+        self._playoffs = None
+
+    @classmethod
+    def load(cls, t_id, batch=None):
+        """从数据库加载赛事快照；6 条查询互不依赖，放在同一个 ReadBatch 中执行
+        （batch 可由调用方传入，其中已加入的其他查询一并执行）"""
+        ctx = cls(t_id)
+        params = {'t_id': t_id}
+        batch = batch if batch is not None else ReadBatch()
+
+        tournament_result = batch.add(CONTEXT_TOURNAMENT, params)
+        matches_result = batch.add(CONTEXT_MATCHES, params)
+        groups_result = batch.add(CONTEXT_GROUPS, params)
+        members_result = batch.add(CONTEXT_GROUP_MEMBERS, params)
+        rankings_result = batch.add(CONTEXT_RANKINGS, params)
+        players_result = batch.add(CONTEXT_PLAYERS, params)
+        batch.execute()
+
+        tournament_row = tournament_result.first()
+        if tournament_row:
+            ctx.tournament = dict(tournament_row._mapping)
+        ctx.matches = [ContextMatch(*row) for row in matches_result.rows]
+        ctx.groups = [{'tg_id': row[0], 't_name': row[1]} for row in groups_result.rows]
+        ctx.group_members = [tuple(row) for row in members_result.rows]
+        ctx.rankings = [ContextRanking(*row) for row in rankings_result.rows]
+        ctx.players = {row[0]: {'name': row[1], 'status': row[2]} for row in players_result.rows}
+
+        return ctx
+
+    @property
+    def t_format(self):
+        return self.tournament['t_format'] if self.tournament else None
+
+    def player_name(self, player_id, default=None):
+        player = self.players.get(player_id)
+        return player['name'] if player else default
+
+    @staticmethod
+    def sort_by_name(player_ids, names):
+        """按姓名排序（与 SQLite ORDER BY name 一致：NULL 在前）"""
+        return sorted(player_ids, key=lambda pid: (names[pid] is not None, names[pid] or ''))
+
+    def scored_matches(self, m_types, non_negative=False):
+        """指定类型且双方比分非空的比赛；non_negative=True 时排除未进行（负分）的比赛"""
+        result = []
+        for match in self.matches:
+            if match.m_type not in m_types:
+                continue
+            if match.player_1_score is None or match.player_2_score is None:
+                continue
+            if non_negative and (match.player_1_score < 0 or match.player_2_score < 0):
+                continue
+            result.append(match)
+        return result
+
+    def matches_of_types(self, m_types):
+        """指定类型的全部比赛（不过滤比分），按 m_id 升序"""
+        return [match for match in self.matches if match.m_type in m_types]
+
+    def ranking_player_ids(self):
+        """排名表中的选手（去重，保持名次顺序）"""
+        seen = []
+        for ranking in self.rankings:
+            if ranking.player_id not in seen:
+                seen.append(ranking.player_id)
+        return seen
+
+    def group_player_ids(self, tg_id):
+        """分组内的选手（按分配顺序，保留重复分配）"""
+        return [player_id for tgp_id, member_tg_id, player_id in self.group_members if member_tg_id == tg_id]
+
+    def group_member_count(self, tg_id):
+        return len(self.group_player_ids(tg_id))
+
+    def groups_of_player(self, player_id):
+        """选手所在的分组（按分配顺序）"""
+        return [tg_id for tgp_id, tg_id, member_id in self.group_members if member_id == player_id]
+
+    def cached_total_matches(self, key, compute):
+        """按 key 缓存每名选手应赛场次的计算结果"""
+        if key not in self._total_matches:
+            self._total_matches[key] = compute()
+        return self._total_matches[key]
+
+    def head_to_head(self, m_types):
+        """指定比赛类型（比分非空）的交手索引，同一快照内复用"""
+        key = tuple(m_types)
+        if key not in self._head_to_head:
+            self._head_to_head[key] = HeadToHeadIndex(
+                (m.player_1_id, m.player_2_id, m.player_1_score, m.player_2_score)
+                for m in self.scored_matches(key)
+            )
+        return self._head_to_head[key]
+
+    def cross_group_head_to_head(self):
+        """小组赛（m_type 1/2/3，比分非空）跨组总排名的胜负关系索引，同一快照内复用"""
+        if self._cross_group_head_to_head is None:
+            self._cross_group_head_to_head = CrossGroupHeadToHead(
+                (m.player_1_id, m.player_2_id, m.player_1_score, m.player_2_score)
+                for m in self.scored_matches((1, 2, 3))
+            )
+        return self._cross_group_head_to_head
+
+    def playoffs(self):
+        """附加赛结果索引，同一快照内复用"""
+        if self._playoffs is None:
+            self._playoffs = PlayoffIndex(
+                (m.player_1_id, m.player_2_id, m.player_1_score, m.player_2_score)
+                for m in self.matches_of_types((14,))
+            )
+        return self._playoffs
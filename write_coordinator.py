@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+写入协调器：进程内所有写事务排队串行执行
+SQLite 同一时刻只允许一个写事务。原先各请求各自写入，提交时遇到 "database is locked" 就回滚、休眠后重试，
+回滚会丢掉本次事务的修改，重试只会提交一个空事务。
+
+现在会话在事务中第一次写入（ORM flush 或 INSERT/UPDATE/DELETE 语句）之前先在先到先得的队列中取得写入权，
+事务提交或回滚后释放；本地 SQLite 取得写入权后立即 BEGIN IMMEDIATE，事务开始时就持有数据库写锁，
+不会在提交时才发现冲突。跨进程（命令行脚本、其他工作进程）的冲突由 busy_timeout 等待，超时的错误直接抛出。
+
+统计：当前排队数、最大排队数、等待/持有时间、排队超时与锁冲突次数（见 stats()，管理后台缓存统计页展示）。
+同一线程可重入（同一请求中嵌套的会话不会等待自己）。
+"""
+
+import re
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+
+
+_WRITE_SQL_PATTERN = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+
+class WriteQueueTimeout(Exception):
+    """等待写入权超时"""
+
+
+class WriteCoordinator:
+    """先到先得的进程内写入队列（见模块说明）"""
+
+    def __init__(self, timeout=30, slow_wait_ms=200):
+        self.timeout = timeout
+        self.slow_wait_ms = slow_wait_ms
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._owner = None
+        self._depth = 0
+        self._acquired_at = None
+        self._stats = {
+            'acquisitions': 0, 'contended': 0, 'timeouts': 0, 'lock_errors': 0,
+            'max_queue_depth': 0, 'total_wait_ms': 0.0, 'max_wait_ms': 0.0,
+            'total_hold_ms': 0.0, 'max_hold_ms': 0.0,
+        }
+
+    def acquire(self, label=None):
+        """取得写入权（同一线程可重入），返回等待的毫秒数；超时抛出 WriteQueueTimeout"""
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                return 0.0
+
+            start = time.perf_counter()
+            token = object()
+            self._queue.append(token)
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], len(self._queue))
+            deadline = start + self.timeout
+            waited = False
+            try:
+                while self._owner is not None or self._queue[0] is not token:
+                    waited = True
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise WriteQueueTimeout(
+                            f"等待写入超过 {self.timeout} 秒（排队 {len(self._queue)}）：{label or '写事务'}")
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._queue.remove(token)
+                self._cond.notify_all()
+                raise
+
+            self._queue.popleft()
+            self._owner = me
+            self._depth = 1
+            self._acquired_at = time.perf_counter()
+            wait_ms = (self._acquired_at - start) * 1000
+            self._stats['acquisitions'] += 1
+            self._stats['total_wait_ms'] += wait_ms
+            self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], wait_ms)
+            if waited:
+                self._stats['contended'] += 1
+            queued = len(self._queue)
+
+        if wait_ms >= self.slow_wait_ms:
+            print(f"写入排队等待 {wait_ms:.0f} ms（其后仍有 {queued} 个写事务排队）：{label or '写事务'}")
+        return wait_ms
+
+    def release(self):
+        with self._cond:
+            if self._owner != threading.get_ident():
+                return
+            self._depth -= 1
+            if self._depth > 0:
+                return
+            hold_ms = (time.perf_counter() - self._acquired_at) * 1000
+            self._stats['total_hold_ms'] += hold_ms
+            self._stats['max_hold_ms'] = max(self._stats['max_hold_ms'], hold_ms)
+            self._owner = None
+            self._acquired_at = None
+            self._cond.notify_all()
+
+    def record_lock_error(self):
+        """提交时仍遇到数据库锁（来自其他进程的写入超过 busy_timeout）"""
+        with self._cond:
+            self._stats['lock_errors'] += 1
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._queue)
+            stats['held'] = self._owner is not None
+        acquisitions = stats['acquisitions']
+        stats['mean_wait_ms'] = stats['total_wait_ms'] / acquisitions if acquisitions else 0.0
+        stats['mean_hold_ms'] = stats['total_hold_ms'] / acquisitions if acquisitions else 0.0
+        return stats
+
+
+def register_write_hooks(session, coordinator, begin_immediate=False):
+    """在会话上注册：首次写入前取得写入权（可选 BEGIN IMMEDIATE），事务结束时释放"""
+
+    def start_write(write_session, label):
+        if write_session.info.get('write_slot'):
+            return
+        coordinator.acquire(label)
+        write_session.info['write_slot'] = True
+        # 确保会话事务已开始，事务结束时（after_transaction_end）释放写入权
+        connection = write_session.connection()
+        if begin_immediate:
+            dbapi_connection = connection.connection.dbapi_connection
+            if not getattr(dbapi_connection, 'in_transaction', True):
+                connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+    def before_flush(flush_session, flush_context, instances):
+        start_write(flush_session, 'flush')
+
+    def do_orm_execute(orm_execute_state):
+        if (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+                or _WRITE_SQL_PATTERN.match(str(orm_execute_state.statement))):
+            start_write(orm_execute_state.session, str(orm_execute_state.statement).strip().split('\n')[0][:80])
+
+    def after_transaction_end(end_session, transaction):
+        if transaction.parent is None and end_session.info.pop('write_slot', False):
+            coordinator.release()
+
+    event.listen(session, 'before_flush', before_flush)
+    event.listen(session, 'do_orm_execute', do_orm_execute)
+    event.listen(session, 'after_transaction_end', after_transaction_end)